@@ -8,7 +8,7 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 
-from .auth import require_admin
+from .auth import auth_stats, invalidate_share_link, invalidate_user_cache, require_admin
 from .db import connect_direct
 
 logger = logging.getLogger(__name__)
@@ -132,6 +132,7 @@ async def update_user(user_id: int, body: UpdateUser, admin: dict = Depends(requ
         await conn.execute(
             f"UPDATE studio_users SET {', '.join(updates)} WHERE id = ${idx}", *params
         )
+        invalidate_user_cache(user_id)
         return {"message": f"User {user_id} updated"}
     finally:
         await conn.close()
@@ -150,6 +151,7 @@ async def delete_user(user_id: int, admin: dict = Depends(require_admin)):
         )
         if not deleted:
             raise HTTPException(status_code=404, detail="User not found")
+        invalidate_user_cache(user_id)
         return {"message": f"User {user_id} deleted"}
     finally:
         await conn.close()
@@ -235,11 +237,20 @@ async def revoke_share_link(token: str, admin: dict = Depends(require_admin)):
         )
         if not updated:
             raise HTTPException(status_code=404, detail="Share link not found")
+        invalidate_share_link(token)
         return {"message": "Share link revoked"}
     finally:
         await conn.close()
 
 
+# ── Auth cache ──────────────────────────────────────────────────
+
+@router.get("/studio/admin/auth-stats")
+async def get_auth_stats(admin: dict = Depends(require_admin)):
+    """Auth middleware overhead per request (cached vs. uncached) and cache sizes."""
+    return auth_stats()
+
+
 # ── Reviewer Comments ───────────────────────────────────────────
 
 @router.get("/studio/admin/comments")
@@ -0,0 +1,299 @@
+"""Model/LoRA asset registry — in-memory index of the ComfyUI model directories.
+
+Readiness checks, orchestrator gates and the training endpoints used to stat()
+or glob /opt/ComfyUI/models/** on every request and every tick. The registry
+indexes each model kind (unet, diffusion_models, loras, ...) into
+name → Asset(path, size, mtime), with names relative to the kind directory
+("wan22_motion/walk.safetensors").
+
+Staying current without inotify: adding, removing or renaming a file bumps
+its directory's mtime, so a rescan walks the directory tree and only re-lists
+directories whose mtime moved. Files modified in the last few minutes are
+re-stat()ed as well, so sizes of LoRAs still being written settle. The
+background watcher (start_watcher, app startup) rescans every SCAN_INTERVAL
+seconds in a worker thread; without it (scripts, tests) lookups rescan
+lazily at most once per interval.
+
+Content hashes are optional and computed on demand, memoized per
+(path, size, mtime).
+"""
+
+import asyncio
+import fnmatch
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import COMFYUI_MODELS_DIR
+
+logger = logging.getLogger(__name__)
+
+ASSET_KINDS = (
+    "unet", "diffusion_models", "loras", "vae", "clip_vision", "text_encoders", "clip",
+)
+SCAN_INTERVAL = float(os.getenv("ASSET_SCAN_INTERVAL", "5"))
+HOT_WINDOW = 300  # seconds; recently modified files are re-stat()ed on every scan
+
+
+@dataclass(frozen=True)
+class Asset:
+    kind: str
+    name: str
+    path: Path
+    size: int
+    mtime: float
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "path": str(self.path),
+            "size_mb": round(self.size / (1024 * 1024), 1),
+            "mtime": self.mtime,
+        }
+
+
+@dataclass
+class _DirState:
+    kind: str
+    mtime_ns: int
+    files: dict[str, Asset]
+    subdirs: list[str]
+
+
+class AssetView:
+    """Membership view over one kind: `"x.safetensors" in registry.view("loras")`."""
+
+    def __init__(self, registry: "AssetRegistry", kind: str):
+        self._registry = registry
+        self.kind = kind
+
+    def __contains__(self, name) -> bool:
+        return self._registry.exists(self.kind, str(name))
+
+    def get(self, name: str) -> Asset | None:
+        return self._registry.get(self.kind, name)
+
+
+class AssetRegistry:
+    """name → Asset maps per model kind, refreshed by directory-mtime rescans."""
+
+    def __init__(self, root: Path, kinds=ASSET_KINDS, interval: float = SCAN_INTERVAL):
+        self.root = Path(root)
+        self.kinds = tuple(kinds)
+        self.interval = interval
+        self._dirs: dict[str, _DirState] = {}
+        self._assets: dict[str, dict[str, Asset]] = {k: {} for k in self.kinds}
+        self._hashes: dict[tuple[str, int, float], str] = {}
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._watching = False
+        self._stats = {"scans": 0, "dirs_relisted": 0, "last_scan_ms": 0.0}
+
+    # ── Scanning ─────────────────────────────────────────────────────
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rescan changed directories. Returns True if any asset changed."""
+        if not force and time.monotonic() - self._checked_at < self.interval:
+            return False
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.interval:
+                return False
+            started = time.perf_counter()
+            changed = self._scan()
+            self._checked_at = time.monotonic()
+            self._stats["scans"] += 1
+            self._stats["last_scan_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        if changed:
+            logger.debug(f"Asset registry updated: {self.counts()}")
+        return changed
+
+    def invalidate(self):
+        """Relist every directory now (call after writing/deleting a model).
+
+        Synchronous and independent of the watcher, so the caller's next
+        lookup already reflects its change even within one mtime tick.
+        """
+        with self._lock:
+            self._dirs = {}
+        self.refresh(force=True)
+
+    def _maybe_refresh(self):
+        if not self._watching:
+            self.refresh()
+
+    def _scan(self) -> bool:
+        new_dirs: dict[str, _DirState] = {}
+        hot_after = time.time() - HOT_WINDOW
+        changed = False
+        for kind in self.kinds:
+            seen: set[tuple[int, int]] = set()
+            stack = [(self.root / kind, "")]
+            while stack:
+                d, prefix = stack.pop()
+                try:
+                    st = d.stat()
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) in seen:
+                    continue  # symlink loop
+                seen.add((st.st_dev, st.st_ino))
+                key = str(d)
+                prev = self._dirs.get(key)
+                if prev and prev.kind == kind and prev.mtime_ns == st.st_mtime_ns:
+                    state = prev
+                    if any(a.mtime >= hot_after for a in prev.files.values()):
+                        files = {n: self._restat(a) for n, a in prev.files.items()}
+                        if files != prev.files:
+                            state = _DirState(kind, prev.mtime_ns, files, prev.subdirs)
+                            changed = True
+                else:
+                    state = self._list_dir(kind, d, prefix, st.st_mtime_ns)
+                    self._stats["dirs_relisted"] += 1
+                    changed = True
+                new_dirs[key] = state
+                stack.extend((d / s, f"{prefix}{s}/") for s in state.subdirs)
+
+        if set(new_dirs) != set(self._dirs):
+            changed = True
+        self._dirs = new_dirs
+        if changed:
+            assets: dict[str, dict[str, Asset]] = {k: {} for k in self.kinds}
+            for state in new_dirs.values():
+                assets[state.kind].update(state.files)
+            self._assets = assets
+        return changed
+
+    @staticmethod
+    def _list_dir(kind: str, d: Path, prefix: str, mtime_ns: int) -> _DirState:
+        files: dict[str, Asset] = {}
+        subdirs: list[str] = []
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            st = entry.stat()
+                            name = f"{prefix}{entry.name}"
+                            files[name] = Asset(kind, name, Path(entry.path),
+                                                st.st_size, st.st_mtime)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return _DirState(kind, mtime_ns, files, subdirs)
+
+    @staticmethod
+    def _restat(asset: Asset) -> Asset:
+        try:
+            st = asset.path.stat()
+        except OSError:
+            return asset
+        if st.st_size == asset.size and st.st_mtime == asset.mtime:
+            return asset
+        return Asset(asset.kind, asset.name, asset.path, st.st_size, st.st_mtime)
+
+    # ── Lookups ──────────────────────────────────────────────────────
+
+    def get(self, kind: str, name: str) -> Asset | None:
+        self._maybe_refresh()
+        return self._assets.get(kind, {}).get(name)
+
+    def exists(self, kind: str, name: str) -> bool:
+        return self.get(kind, name) is not None
+
+    def find(self, name: str, kinds=None) -> Asset | None:
+        """First asset called name across kinds (in the given order)."""
+        self._maybe_refresh()
+        for kind in kinds or self.kinds:
+            asset = self._assets.get(kind, {}).get(name)
+            if asset is not None:
+                return asset
+        return None
+
+    def assets(self, kind: str, pattern: str | None = None) -> list[Asset]:
+        """Assets of one kind sorted by name, optionally fnmatch-filtered on name."""
+        self._maybe_refresh()
+        items = self._assets.get(kind, {})
+        names = sorted(items)
+        if pattern:
+            names = [n for n in names if fnmatch.fnmatchcase(n, pattern)]
+        return [items[n] for n in names]
+
+    def view(self, kind: str) -> AssetView:
+        return AssetView(self, kind)
+
+    def content_hash(self, asset: Asset) -> str:
+        """sha256 of the file, memoized per (path, size, mtime)."""
+        key = (str(asset.path), asset.size, asset.mtime)
+        digest = self._hashes.get(key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(asset.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            digest = self._hashes[key] = h.hexdigest()
+        return digest
+
+    def counts(self) -> dict[str, int]:
+        return {kind: len(items) for kind, items in self._assets.items()}
+
+    def inventory(self, kind: str | None = None, detail: bool = False) -> dict:
+        self._maybe_refresh()
+        kinds = [kind] if kind else list(self.kinds)
+        out = {
+            "root": str(self.root),
+            "watcher": self._watching,
+            "stats": dict(self._stats),
+            "kinds": {},
+        }
+        for k in kinds:
+            items = self._assets.get(k, {})
+            entry = {
+                "count": len(items),
+                "total_gb": round(sum(a.size for a in items.values()) / 1024**3, 2),
+            }
+            if detail:
+                entry["assets"] = [items[n].to_dict() for n in sorted(items)]
+            out["kinds"][k] = entry
+        return out
+
+
+registry = AssetRegistry(COMFYUI_MODELS_DIR)
+
+_watch_task: asyncio.Task | None = None
+
+
+async def _watch_loop():
+    while True:
+        try:
+            await asyncio.to_thread(registry.refresh, True)
+        except Exception as e:
+            logger.warning(f"Asset registry scan failed: {e}")
+        await asyncio.sleep(registry.interval)
+
+
+async def start_watcher():
+    """Index the model directories and keep them current (app startup)."""
+    global _watch_task
+    if _watch_task is not None and not _watch_task.done():
+        return
+    await asyncio.to_thread(registry.refresh, True)
+    registry._watching = True
+    _watch_task = asyncio.create_task(_watch_loop())
+    logger.info(f"Asset registry watching {registry.root}: {registry.counts()}")
+
+
+async def stop_watcher():
+    """Stop the background rescans (app shutdown); lookups fall back to lazy rescans."""
+    global _watch_task
+    registry._watching = False
+    if _watch_task is not None:
+        _watch_task.cancel()
+        _watch_task = None
@@ -9,11 +9,21 @@ import json
 import logging
 from typing import Any
 
+from . import quality_stats
 from .db import get_pool
 
 logger = logging.getLogger(__name__)
 
 
+async def _update_quality_stats(conn, hook, *args):
+    """Run a quality_stats hook in a savepoint so a stats error never loses the history write."""
+    try:
+        async with conn.transaction():
+            await hook(conn, *args)
+    except Exception as e:
+        logger.warning(f"Quality stats update failed (rebuild to repair): {e}")
+
+
 async def log_generation(
     character_slug: str,
     project_name: str = None,
@@ -39,21 +49,28 @@ async def log_generation(
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            row = await conn.fetchrow("""
-                INSERT INTO generation_history
-                    (character_slug, project_name, comfyui_prompt_id, generation_type,
-                     checkpoint_model, prompt, negative_prompt, seed,
-                     cfg_scale, steps, sampler, scheduler, width, height,
-                     pose_tag, lora_name, lora_strength, session_id, source)
-                VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13,$14,$15,$16,$17,
-                        $18::uuid, $19)
-                RETURNING id
-            """,
-                character_slug, project_name, comfyui_prompt_id, generation_type,
-                checkpoint_model, prompt, negative_prompt, seed,
-                cfg_scale, steps, sampler, scheduler, width, height,
-                pose_tag, lora_name, lora_strength, session_id, source,
-            )
+            async with conn.transaction():
+                row = await conn.fetchrow("""
+                    INSERT INTO generation_history
+                        (character_slug, project_name, comfyui_prompt_id, generation_type,
+                         checkpoint_model, prompt, negative_prompt, seed,
+                         cfg_scale, steps, sampler, scheduler, width, height,
+                         pose_tag, lora_name, lora_strength, session_id, source)
+                    VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13,$14,$15,$16,$17,
+                            $18::uuid, $19)
+                    RETURNING id, generated_at
+                """,
+                    character_slug, project_name, comfyui_prompt_id, generation_type,
+                    checkpoint_model, prompt, negative_prompt, seed,
+                    cfg_scale, steps, sampler, scheduler, width, height,
+                    pose_tag, lora_name, lora_strength, session_id, source,
+                )
+                if row:
+                    await _update_quality_stats(conn, quality_stats.on_generation_logged, {
+                        "character_slug": character_slug, "project_name": project_name,
+                        "checkpoint_model": checkpoint_model, "sampler": sampler,
+                        "generated_at": row.get("generated_at"),
+                    })
         return row["id"] if row else None
     except Exception as e:
         logger.warning(f"Failed to log generation: {e}")
@@ -76,18 +93,32 @@ async def update_generation_quality(
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE generation_history SET
-                    quality_score = $2, character_match = $3, clarity = $4,
-                    training_value = $5, solo = $6, species_verified = $7,
-                    status = $8, rejection_categories = $9, artifact_path = $10,
-                    reviewed_at = NOW()
-                WHERE id = $1
-            """,
-                gen_id, quality_score, character_match, clarity,
-                training_value, solo, species_verified,
-                status, rejection_categories, artifact_path,
-            )
+            async with conn.transaction():
+                row = await conn.fetchrow("""
+                    WITH old AS (
+                        SELECT id, quality_score AS old_quality, status AS old_status
+                        FROM generation_history WHERE id = $1 FOR UPDATE
+                    )
+                    UPDATE generation_history gh SET
+                        quality_score = $2, character_match = $3, clarity = $4,
+                        training_value = $5, solo = $6, species_verified = $7,
+                        status = $8, rejection_categories = $9, artifact_path = $10,
+                        reviewed_at = NOW()
+                    FROM old
+                    WHERE gh.id = old.id
+                    RETURNING gh.id, gh.character_slug, gh.project_name, gh.checkpoint_model,
+                              gh.sampler, gh.scheduler, gh.cfg_scale, gh.steps, gh.width, gh.height,
+                              gh.generated_at, old.old_quality, old.old_status
+                """,
+                    gen_id, quality_score, character_match, clarity,
+                    training_value, solo, species_verified,
+                    status, rejection_categories, artifact_path,
+                )
+                if row:
+                    await _update_quality_stats(
+                        conn, quality_stats.on_quality_updated, dict(row),
+                        quality_score, status, row["old_quality"], row["old_status"],
+                    )
     except Exception as e:
         logger.warning(f"Failed to update generation quality: {e}")
 
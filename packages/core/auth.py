@@ -5,19 +5,31 @@ Auth paths:
   B) Local network + studio_profile cookie → profile picker flow
   C) Local network + no cookies → fallback to admin (backward compat)
   D) Share link token → project-scoped reviewer access
+
+Every lookup on the request path is cached in-process: verified tokens
+(keyed by token hash, never past the JWT exp), studio_user rows, share
+links and each user's allowed-project set. A steady-state request does no
+network or DB I/O. Writers call invalidate_user_cache() /
+invalidate_project_access() / invalidate_share_link() so changes made
+through the admin and project routes take effect immediately; everything
+else ages out within USER_CACHE_TTL.
 """
 
+import asyncio
+import contextvars
+import hashlib
 import ipaddress
 import logging
 import os
 import time
-from collections import defaultdict
-from datetime import datetime, timedelta
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
 from functools import lru_cache
 from typing import Optional
 
+import httpx
 from fastapi import Depends, HTTPException, Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
 
 from .ratings import allowed_ratings
 
@@ -25,6 +37,12 @@ logger = logging.getLogger(__name__)
 
 AUTH_SERVICE_URL = "http://localhost:8088"
 
+# Verified tokens are trusted for at most this long (and never past exp)
+TOKEN_CACHE_TTL = 300
+# studio_user rows and allowed-project sets
+USER_CACHE_TTL = 60
+SHARE_LINK_CACHE_TTL = 30
+
 TRUSTED_NETWORKS = [
     ipaddress.ip_network("192.168.50.0/24"),
     ipaddress.ip_network("127.0.0.0/8"),
@@ -49,6 +67,148 @@ def is_trusted_network(client_ip: str) -> bool:
         return False
 
 
+class TTLCache:
+    """Bounded LRU map whose entries expire individually."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires_at: float | None = None):
+        limit = time.time() + self.ttl
+        self._data[key] = (value, min(expires_at, limit) if expires_at else limit)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def discard_where(self, predicate):
+        """Drop entries for which predicate(key, value) is true."""
+        for key in [k for k, (v, _) in self._data.items() if predicate(k, v)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_token_cache = TTLCache(maxsize=4096, ttl=TOKEN_CACHE_TTL)
+_user_cache = TTLCache(maxsize=1024, ttl=USER_CACHE_TTL)
+_share_cache = TTLCache(maxsize=1024, ttl=SHARE_LINK_CACHE_TTL)
+_project_cache = TTLCache(maxsize=1024, ttl=USER_CACHE_TTL)
+
+_http_client: httpx.AsyncClient | None = None
+# Background remote verifications (kept referenced until done)
+_pending_checks: set[asyncio.Task] = set()
+
+# Uncached DB / auth-service calls made while resolving the current request
+_io_calls: contextvars.ContextVar[list | None] = contextvars.ContextVar("auth_io_calls", default=None)
+
+_stats = {
+    "requests": 0,
+    "cache_hits": 0,
+    "hit_ms_total": 0.0,
+    "misses": 0,
+    "miss_ms_total": 0.0,
+    "remote_revocations": 0,
+}
+
+
+def _note_io():
+    calls = _io_calls.get()
+    if calls is not None:
+        calls.append(1)
+
+
+def _record(started: float, calls: list):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _stats["requests"] += 1
+    if calls:
+        _stats["misses"] += 1
+        _stats["miss_ms_total"] += elapsed_ms
+    else:
+        _stats["cache_hits"] += 1
+        _stats["hit_ms_total"] += elapsed_ms
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=AUTH_SERVICE_URL,
+            timeout=httpx.Timeout(5.0, connect=2.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_auth_client():
+    """Close the pooled auth-service client (app shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def invalidate_user_cache(user_id: int | None = None):
+    """Forget cached studio_user rows and project sets (all users if None)."""
+    if user_id is None:
+        _user_cache.clear()
+        _project_cache.clear()
+        return
+    _user_cache.discard_where(lambda k, row: row.get("id") == user_id)
+    _project_cache.discard_where(lambda k, v: k[0] == user_id)
+
+
+def invalidate_project_access():
+    """Forget every cached allowed-project set (projects or access rows changed)."""
+    _project_cache.clear()
+
+
+def invalidate_share_link(token: str | None = None):
+    """Forget a cached share link (all if token is None)."""
+    if token is None:
+        _share_cache.clear()
+    else:
+        _share_cache.pop(token)
+
+
+def auth_stats() -> dict:
+    """Per-request auth overhead: cache hits vs. full (uncached) resolution."""
+    hits, misses = _stats["cache_hits"], _stats["misses"]
+    return {
+        "requests": _stats["requests"],
+        "cache_hits": hits,
+        "misses": misses,
+        "avg_hit_ms": round(_stats["hit_ms_total"] / hits, 3) if hits else None,
+        "avg_miss_ms": round(_stats["miss_ms_total"] / misses, 3) if misses else None,
+        "remote_revocations": _stats["remote_revocations"],
+        "cached_tokens": len(_token_cache),
+        "cached_users": len(_user_cache),
+        "cached_project_sets": len(_project_cache),
+    }
+
+
 @lru_cache()
 def _get_jwt_secret() -> str:
     """Get JWT secret from Vault or environment."""
@@ -84,29 +244,104 @@ def _verify_jwt_locally(token: str) -> dict | None:
 
 
 async def _verify_with_auth_service(token: str) -> dict | None:
-    """Verify token with the Tower auth service."""
+    """Verify token with the Tower auth service (pooled, non-blocking)."""
+    _note_io()
     try:
-        import urllib.request
-        req = urllib.request.Request(
-            f"{AUTH_SERVICE_URL}/api/auth/verify",
-            headers={"Authorization": f"Bearer {token}"},
+        resp = await _get_http_client().get(
+            "/api/auth/verify", headers={"Authorization": f"Bearer {token}"},
         )
-        resp = urllib.request.urlopen(req, timeout=5)
-        import json
-        data = json.loads(resp.read())
-        if data.get("valid"):
-            return data
+        if resp.status_code == 200:
+            data = resp.json()
+            if data.get("valid"):
+                return data
     except Exception as e:
         logger.debug(f"Auth service verification failed: {e}")
     return None
 
 
+async def _recheck_with_auth_service(token: str, key: str):
+    """Confirm a locally verified token remotely; evict it if revoked."""
+    try:
+        resp = await _get_http_client().get(
+            "/api/auth/verify", headers={"Authorization": f"Bearer {token}"},
+        )
+    except Exception as e:
+        logger.debug(f"Auth service recheck unavailable: {e}")
+        return
+    revoked = resp.status_code in (401, 403)
+    if resp.status_code == 200:
+        try:
+            revoked = not resp.json().get("valid")
+        except ValueError:
+            pass
+    if revoked:
+        _token_cache.pop(key)
+        _stats["remote_revocations"] += 1
+        logger.info("Auth service rejected a locally valid token — evicted from cache")
+
+
+async def _verify_token(token: str) -> dict | None:
+    """Verify a JWT: token cache, then local signature check, then auth service.
+
+    A locally valid token is accepted at once and confirmed by the auth
+    service in the background; only tokens we cannot verify locally wait
+    on the remote call.
+    """
+    key = _token_key(token)
+    cached = _token_cache.get(key)
+    if cached is not None:
+        return cached
+
+    user_data = _verify_jwt_locally(token)
+    if user_data:
+        task = asyncio.create_task(_recheck_with_auth_service(token, key))
+        _pending_checks.add(task)
+        task.add_done_callback(_pending_checks.discard)
+    else:
+        user_data = await _verify_with_auth_service(token)
+
+    if user_data and user_data.get("valid"):
+        exp = user_data.get("expires") or user_data.get("exp")
+        _token_cache.set(key, user_data, expires_at=_parse_expiry(exp))
+    return user_data
+
+
+def _parse_expiry(exp) -> float | None:
+    """Epoch seconds from a numeric or ISO-8601 expiry; None (default TTL) otherwise."""
+    if not exp:
+        return None
+    try:
+        return float(exp)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(exp).replace("Z", "+00:00"))
+    except ValueError:
+        logger.debug(f"Unparseable token expiry {exp!r} — using the default cache TTL")
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
 async def _get_or_create_studio_user(jwt_data: dict) -> dict | None:
     """Look up or auto-provision a studio_user from JWT claims."""
-    from .db import connect_direct
     auth_user_id = jwt_data.get("auth_user_id")
     if not auth_user_id:
         return None
+    cache_key = ("auth", str(auth_user_id))
+    cached = _user_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    _note_io()
+    row = await _load_or_create_studio_user(jwt_data, auth_user_id)
+    if row:
+        _user_cache.set(cache_key, row)
+    return row
+
+
+async def _load_or_create_studio_user(jwt_data: dict, auth_user_id) -> dict | None:
+    from .db import connect_direct
 
     try:
         conn = await connect_direct()
@@ -143,6 +378,10 @@ async def _get_or_create_studio_user(jwt_data: dict) -> dict | None:
 async def _get_studio_user_by_id(user_id: int) -> dict | None:
     """Look up a studio_user by ID (for profile cookie flow)."""
     from .db import connect_direct
+    cached = _user_cache.get(("id", user_id))
+    if cached is not None:
+        return cached
+    _note_io()
     try:
         conn = await connect_direct()
         row = await conn.fetchrow("SELECT * FROM studio_users WHERE id = $1", user_id)
@@ -151,6 +390,8 @@ async def _get_studio_user_by_id(user_id: int) -> dict | None:
                 "UPDATE studio_users SET last_login = NOW() WHERE id = $1", user_id
             )
         await conn.close()
+        if row:
+            _user_cache.set(("id", user_id), dict(row))
         return dict(row) if row else None
     except Exception as e:
         logger.warning(f"studio_user lookup by id failed: {e}")
@@ -160,6 +401,10 @@ async def _get_studio_user_by_id(user_id: int) -> dict | None:
 async def _get_admin_user() -> dict:
     """Get the Patrick admin profile as fallback."""
     from .db import connect_direct
+    cached = _user_cache.get(("admin",))
+    if cached is not None:
+        return cached
+    _note_io()
     try:
         conn = await connect_direct()
         row = await conn.fetchrow(
@@ -167,6 +412,7 @@ async def _get_admin_user() -> dict:
         )
         await conn.close()
         if row:
+            _user_cache.set(("admin",), dict(row))
             return dict(row)
     except Exception as e:
         logger.warning(f"Admin user lookup failed: {e}")
@@ -181,6 +427,10 @@ async def _get_admin_user() -> dict:
 async def _validate_share_token(token: str) -> dict | None:
     """Validate a share link token, return share link data if valid."""
     from .db import connect_direct
+    cached = _share_cache.get(token)
+    if cached is not None:
+        return cached
+    _note_io()
     try:
         conn = await connect_direct()
         row = await conn.fetchrow("""
@@ -190,7 +440,12 @@ async def _validate_share_token(token: str) -> dict | None:
             WHERE sl.token = $1 AND sl.is_active = TRUE AND sl.expires_at > NOW()
         """, token)
         await conn.close()
-        return dict(row) if row else None
+        if not row:
+            return None
+        link = dict(row)
+        expires_at = link.get("expires_at")
+        _share_cache.set(token, link, expires_at=expires_at.timestamp() if expires_at else None)
+        return link
     except Exception as e:
         logger.warning(f"Share token validation failed: {e}")
         return None
@@ -243,6 +498,10 @@ async def get_user_projects(request: Request) -> list[int]:
     max_rating = user.get("max_rating", "PG")
     ratings = allowed_ratings(max_rating)
     studio_user_id = user.get("studio_user_id")
+    cache_key = (studio_user_id, max_rating, user.get("role"))
+    cached = _project_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
 
     try:
         conn = await connect_direct()
@@ -268,7 +527,9 @@ async def get_user_projects(request: Request) -> list[int]:
                 rating_project_ids = set()
 
         await conn.close()
-        return sorted(rating_project_ids)
+        result = sorted(rating_project_ids)
+        _project_cache.set(cache_key, tuple(result))
+        return result
     except Exception as e:
         logger.warning(f"get_user_projects failed: {e}")
         return []
@@ -336,42 +597,69 @@ def _extract_token(request: Request) -> str | None:
     return None
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    """ASGI middleware: multi-user auth with JWT, profiles, and share links."""
+class AuthMiddleware:
+    """Pure ASGI middleware: multi-user auth with JWT, profiles, and share links.
 
-    async def dispatch(self, request: Request, call_next):
+    Resolves request.state.user (or rejects with 401) before handing the
+    untouched scope to the app, so responses stream without being buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        started = time.perf_counter()
+        calls: list = []
+        token = _io_calls.set(calls)
+        try:
+            rejection = await self._authenticate(request)
+        finally:
+            _io_calls.reset(token)
+        if scope["path"].startswith("/api/"):
+            _record(started, calls)
+
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+    async def _authenticate(self, request: Request) -> JSONResponse | None:
+        """Set request.state.user; return a response only to reject the request."""
         client_ip = _get_client_ip(request)
         path = request.url.path
 
         # Public paths — always open
         if path in PUBLIC_PATHS:
             request.state.user = {"user": "anonymous", "role": "viewer", "max_rating": "G"}
-            return await call_next(request)
+            return None
 
         # Static file serving — no auth needed
         if not path.startswith("/api/"):
-            return await call_next(request)
+            return None
+
+        share_token = (
+            request.query_params.get("share_token")
+            or request.headers.get("x-share-token")
+        )
 
         # ── Path A: JWT token present (any network) ──
         token = _extract_token(request)
         if token:
-            user_data = await _verify_with_auth_service(token)
-            if not user_data:
-                user_data = _verify_jwt_locally(token)
+            user_data = await _verify_token(token)
 
             if user_data and user_data.get("valid"):
                 studio_user = await _get_or_create_studio_user(user_data)
                 if studio_user:
                     # Check for share token alongside JWT
-                    share_token = (
-                        request.query_params.get("share_token")
-                        or request.headers.get("x-share-token")
-                    )
                     share_link = None
                     if share_token:
                         share_link = await _validate_share_token(share_token)
                     request.state.user = _build_user_state(studio_user, share_link)
-                    return await call_next(request)
                 else:
                     # JWT valid but no studio_user — use JWT data directly
                     request.state.user = {
@@ -383,16 +671,11 @@ class AuthMiddleware(BaseHTTPMiddleware):
                         "onboarded": False,
                         "local": False,
                     }
-                    return await call_next(request)
+                return None
 
         # ── Path D: Share link token (no JWT) ──
-        share_token = (
-            request.query_params.get("share_token")
-            or request.headers.get("x-share-token")
-        )
         if share_token and not is_trusted_network(client_ip):
             # External share link access requires Google login (JWT)
-            from starlette.responses import JSONResponse
             return JSONResponse(
                 status_code=401,
                 content={"detail": "Google login required to view shared projects", "login_required": True},
@@ -408,26 +691,21 @@ class AuthMiddleware(BaseHTTPMiddleware):
                     studio_user = await _get_studio_user_by_id(profile_id)
                     if studio_user:
                         # Check share token on local network too
+                        share_link = None
                         if share_token:
                             share_link = await _validate_share_token(share_token)
-                            request.state.user = _build_user_state(studio_user, share_link)
-                        else:
-                            request.state.user = _build_user_state(studio_user)
-                        return await call_next(request)
+                        request.state.user = _build_user_state(studio_user, share_link)
+                        return None
                 except (ValueError, TypeError):
                     pass
 
             # Path C: No JWT, no profile cookie → admin fallback
             admin_user = await _get_admin_user()
             request.state.user = _build_user_state(admin_user)
-            return await call_next(request)
+            return None
 
         # ── External, no valid auth ──
-        if path.startswith("/api/"):
-            from starlette.responses import JSONResponse
-            return JSONResponse(
-                status_code=401,
-                content={"detail": "Authorization required for external access"},
-            )
-
-        return await call_next(request)
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Authorization required for external access"},
+        )
@@ -25,6 +25,7 @@ COMFYUI_URL = "http://127.0.0.1:8188"
 COMFYUI_VIDEO_URL = os.getenv("COMFYUI_VIDEO_URL", "http://127.0.0.1:8189")
 COMFYUI_OUTPUT_DIR = Path("/opt/ComfyUI/output")
 COMFYUI_INPUT_DIR = Path("/opt/ComfyUI/input")
+COMFYUI_MODELS_DIR = Path("/opt/ComfyUI/models")
 
 
 def get_comfyui_url(task_type: str = "video", gpu_preference: str | None = None) -> str:
@@ -223,3 +223,6 @@ def invalidate_char_cache():
     global _char_project_cache, _cache_time
     _char_project_cache = {}
     _cache_time = 0
+    # Character, style and world-setting edits all land here — drop derived prompt plans too
+    from .prompt_plan import invalidate
+    invalidate()
@@ -1021,6 +1021,44 @@ async def run_migrations():
         await conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_lora_eff_quality ON lora_effectiveness(avg_quality DESC NULLS LAST)"
         )
+        # Normalized LoRA key, computed at write time:
+        # wan22_nsfw/assertive_cowgirl_HIGH.safetensors → assertive_cowgirl
+        await conn.execute("""
+            DO $$ BEGIN
+                ALTER TABLE shots ADD COLUMN lora_key TEXT GENERATED ALWAYS AS (
+                    REGEXP_REPLACE(
+                        REGEXP_REPLACE(
+                            SPLIT_PART(lora_name, '/', -1),
+                            '_(HIGH|LOW)\\.safetensors$', '', 'i'
+                        ),
+                        '\\.safetensors$', '', 'i'
+                    )
+                ) STORED;
+            EXCEPTION WHEN duplicate_column THEN NULL;
+            END $$
+        """)
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_shots_lora_key ON shots(lora_key) "
+            "WHERE lora_key IS NOT NULL"
+        )
+        # Group each shot was last counted in, so a LoRA/character change can
+        # re-aggregate the group it left as well as the one it joined
+        for col in ("effectiveness_lora_key", "effectiveness_char_slug"):
+            await conn.execute(f"""
+                DO $$ BEGIN
+                    ALTER TABLE shots ADD COLUMN {col} TEXT;
+                EXCEPTION WHEN duplicate_column THEN NULL;
+                END $$
+            """)
+        # Reader paths: best_loras_for_character / recommended_params
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_lora_eff_char_quality "
+            "ON lora_effectiveness(character_slug, avg_quality DESC NULLS LAST)"
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_lora_eff_key_quality "
+            "ON lora_effectiveness(lora_key, avg_quality DESC NULLS LAST)"
+        )
 
         # --- Shot Feedback (Interactive Feedback Loop) ---
         await conn.execute("""
@@ -1133,6 +1171,129 @@ async def run_migrations():
             "CREATE INDEX IF NOT EXISTS idx_gls_project ON generation_loop_sessions(project_id)"
         )
 
+        # ── Project change notifications (ETag counters, see project_versions) ──
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION notify_project_change() RETURNS trigger AS $$
+            DECLARE
+                rec JSONB;
+                pid INTEGER;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN rec := to_jsonb(OLD); ELSE rec := to_jsonb(NEW); END IF;
+                IF TG_TABLE_NAME = 'shots' THEN
+                    SELECT project_id INTO pid FROM scenes WHERE id = (rec->>'scene_id')::uuid;
+                ELSIF TG_TABLE_NAME = 'episode_scenes' THEN
+                    SELECT project_id INTO pid FROM episodes WHERE id = (rec->>'episode_id')::uuid;
+                ELSE
+                    pid := (rec->>'project_id')::int;
+                END IF;
+                IF pid IS NOT NULL THEN
+                    PERFORM pg_notify('project_changed', pid::text);
+                END IF;
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql
+        """)
+        for table in ("scenes", "shots", "episodes", "episode_scenes"):
+            await conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_project_change ON {table}")
+            await conn.execute(f"""
+                CREATE TRIGGER trg_{table}_project_change
+                AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION notify_project_change()
+            """)
+
+        # Keyset pagination over a project's scenes
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scenes_project_order "
+            "ON scenes(project_id, scene_number, created_at, id)"
+        )
+
+        # Durable job queue (packages/core/job_queue.py)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id BIGSERIAL PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload JSONB NOT NULL DEFAULT '{}',
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                dedupe_key TEXT,
+                worker_id TEXT,
+                heartbeat_at TIMESTAMPTZ,
+                cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+                progress JSONB NOT NULL DEFAULT '{}',
+                result JSONB,
+                error TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                started_at TIMESTAMPTZ,
+                finished_at TIMESTAMPTZ
+            )
+        """)
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_claim "
+            "ON jobs(priority DESC, run_after, id) WHERE status = 'queued'"
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_running "
+            "ON jobs(kind, heartbeat_at) WHERE status = 'running'"
+        )
+        await conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_active_dedupe "
+            "ON jobs(dedupe_key) WHERE status IN ('queued', 'running')"
+        )
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_created ON jobs(kind, id DESC)")
+
+        # Incremental quality aggregates (packages/core/quality_stats.py)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS quality_stats (
+                character_slug TEXT NOT NULL DEFAULT '',
+                project_name TEXT NOT NULL DEFAULT '',
+                checkpoint_model TEXT NOT NULL DEFAULT '',
+                sampler TEXT NOT NULL DEFAULT '',
+                stats JSONB NOT NULL DEFAULT '{}',
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (character_slug, project_name, checkpoint_model, sampler)
+            )
+        """)
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_quality_stats_project ON quality_stats(project_name)")
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS quality_stats_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                rebuilt_at TIMESTAMPTZ,
+                rows_scanned BIGINT
+            )
+        """)
+
+        # generation_history: monthly partitions + daily rollups (packages/core/history_partitions.py)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS generation_history_daily (
+                day DATE NOT NULL,
+                project_name VARCHAR(255),
+                character_slug VARCHAR(255),
+                checkpoint_model VARCHAR(255),
+                lora_name VARCHAR(255),
+                sampler VARCHAR(100),
+                source VARCHAR(50),
+                status VARCHAR(50),
+                generations INTEGER NOT NULL,
+                scored INTEGER NOT NULL,
+                sum_quality FLOAT,
+                min_quality FLOAT,
+                max_quality FLOAT,
+                first_at TIMESTAMP,
+                last_at TIMESTAMP
+            )
+        """)
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_gh_daily_day ON generation_history_daily(day)")
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_gh_daily_project ON generation_history_daily(project_name, checkpoint_model)"
+        )
+        try:
+            from .history_partitions import migrate as migrate_history_partitions
+            await migrate_history_partitions(conn)
+        except Exception as e:
+            logger.warning(f"generation_history partitioning skipped: {e}")
+
         await conn.close()
         logger.info("Schema migrations completed successfully (incl. Phase 1 autonomy + NSM + multi-user + quality loop + feedback + convergence v2 + generation loop tables)")
     except Exception as e:
@@ -38,6 +38,7 @@ REGENERATION_QUEUED = "regeneration.queued"
 ECHO_BRAIN_CONSULTED = "echo_brain.consulted"
 SHOT_GENERATED = "shot.generated"
 SHOT_REJECTED = "shot.rejected"
+SHOT_QC_RECORDED = "shot.qc_recorded"
 FEEDBACK_SUBMITTED = "feedback.submitted"
 FEEDBACK_ACTION_EXECUTED = "feedback.action_executed"
 
@@ -176,6 +177,7 @@ def register_sfx_handlers():
                 detect_pairing, is_vocalization, vocalization_to_sfx,
             )
             from packages.core.db import connect_direct
+            from packages.core.executors import offload
 
             conn = await connect_direct()
             try:
@@ -238,15 +240,16 @@ def register_sfx_handlers():
                 if is_nsfw and lora_name:
                     # --- NSFW: BPM-synced multi-layer sequencer ---
                     try:
-                        from packages.scene_generation.audio_sequencer import sequence_for_video
-                        from packages.scene_generation.sfx_mapper import get_video_duration
+                        from packages.scene_generation.audio_sequencer import sequence_onto_video
 
-                        seq_wav = await asyncio.get_event_loop().run_in_executor(
-                            None, sequence_for_video, video_path, lora_name,
-                            primary_gender, pairing
+                        # NumPy mixing holds the GIL — run it in a worker process.
+                        # The mix is muxed onto the video in the same pass.
+                        sequenced = await offload(
+                            sequence_onto_video, video_path, lora_name,
+                            primary_gender, pairing, pool="cpu",
                         )
-                        if seq_wav:
-                            voice_wav = seq_wav
+                        if sequenced:
+                            output, voice_wav = sequenced
                             logger.info(f"Shot {shot_id}: sequenced audio for {lora_name} ({primary_gender})")
                     except Exception as seq_err:
                         logger.warning(f"Shot {shot_id}: sequencer failed ({seq_err}), falling back")
@@ -286,12 +289,13 @@ def register_sfx_handlers():
                 # --- Mix onto video ---
                 sfx_clips = match_lora_to_sfx(lora_name, pairing=pairing) if not voice_wav else []
 
-                if voice_wav and sfx_clips:
-                    output = mix_voice_and_sfx(video_path, voice_wav, sfx_clips)
+                if output:
+                    pass  # sequencer already muxed its mix onto the video
                 elif voice_wav:
-                    output = mix_voice_and_sfx(video_path, voice_wav, [])
+                    output = await offload(mix_voice_and_sfx, video_path, voice_wav,
+                                           sfx_clips, pool="media")
                 elif sfx_clips:
-                    output = overlay_sfx_on_video(video_path, sfx_clips)
+                    output = await offload(overlay_sfx_on_video, video_path, sfx_clips, pool="media")
                 else:
                     return
 
@@ -0,0 +1,235 @@
+"""Shared executors for blocking work, with queue/latency metrics and a loop-lag monitor.
+
+Async handlers must not run ffmpeg, NumPy mixing or PIL hashing on the event
+loop — one post-process call used to stall every other API request. offload()
+sends a call to one of three bounded pools:
+
+  - "io"    threads, for blocking file / network / DB-driver calls
+  - "media" threads, for calls that mostly wait on ffmpeg/ffprobe subprocesses
+            (kept small so concurrent transcodes cannot saturate the CPU)
+  - "cpu"   worker processes, for pure-Python / NumPy work that holds the GIL.
+            Functions and arguments must be picklable (module-level functions)
+
+Every pool records queue wait (submit → start) and run time over the last
+SAMPLE_WINDOW calls, plus in-flight/queued counts, exposed via
+GET /api/system/executors.
+
+The lag monitor: an asyncio task stamps a heartbeat every LAG_INTERVAL_S; a
+watchdog thread notices when the stamp is older than LAG_THRESHOLD_MS and logs
+the event-loop thread's current stack once per stall, so the blocking call is
+named in the log.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZES = {
+    "io": int(os.getenv("EXEC_IO_THREADS", "16")),
+    "media": int(os.getenv("EXEC_MEDIA_THREADS", "2")),
+    "cpu": int(os.getenv("EXEC_CPU_PROCS", str(min(4, os.cpu_count() or 1)))),
+}
+SAMPLE_WINDOW = 256
+LAG_INTERVAL_S = 0.05
+LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+
+_executors: dict[str, object] = {}
+_lock = threading.Lock()
+
+
+class _PoolStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.running = 0
+        self.wait_ms: deque[float] = deque(maxlen=SAMPLE_WINDOW)
+        self.run_ms: deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+    def to_dict(self, size: int, processes: bool = False) -> dict:
+        inflight = self.submitted - self.completed - self.errors
+        # Worker processes cannot bump the counter — assume busy slots fill first
+        running = min(inflight, size) if processes else self.running
+        return {
+            "size": size,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "errors": self.errors,
+            "running": running,
+            "queued": max(inflight - running, 0),
+            "wait_ms": _percentiles(self.wait_ms),
+            "run_ms": _percentiles(self.run_ms),
+        }
+
+
+_stats = {name: _PoolStats() for name in POOL_SIZES}
+
+
+def _percentiles(samples) -> dict | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 1)
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1], 1)}
+
+
+def _get_executor(pool: str):
+    with _lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            size = POOL_SIZES[pool]
+            if pool == "cpu":
+                # forkserver: never fork the threaded server process itself
+                ctx = multiprocessing.get_context(
+                    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                )
+                executor = ProcessPoolExecutor(max_workers=size, mp_context=ctx)
+            else:
+                executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"exec-{pool}")
+            _executors[pool] = executor
+        return executor
+
+
+def _timed_call(fn, args, kwargs):
+    """Runs in the worker: returns (wall-clock start, result)."""
+    return time.time(), fn(*args, **kwargs)
+
+
+async def offload(fn, *args, pool: str = "io", **kwargs):
+    """Run fn(*args, **kwargs) in the named pool and await its result."""
+    if pool not in POOL_SIZES:
+        raise ValueError(f"Unknown executor pool {pool!r}. Use: {list(POOL_SIZES)}")
+    stats = _stats[pool]
+    loop = asyncio.get_running_loop()
+    submitted = time.time()
+    stats.submitted += 1
+    call = functools.partial(_timed_call, fn, args, kwargs)
+    if pool != "cpu":
+        # Threads run in the caller's context (render scope, request ids)
+        call = functools.partial(contextvars.copy_context().run, _track_running, stats, call)
+    try:
+        try:
+            started, result = await loop.run_in_executor(_get_executor(pool), call)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a C extension) — rebuild once and retry
+            logger.warning("CPU process pool broken — restarting it")
+            with _lock:
+                _executors.pop("cpu", None)
+            started, result = await loop.run_in_executor(_get_executor(pool), call)
+    except BaseException:
+        stats.errors += 1
+        raise
+    finished = time.time()
+    stats.completed += 1
+    stats.wait_ms.append(max(started - submitted, 0) * 1000)
+    stats.run_ms.append(max(finished - started, 0) * 1000)
+    return result
+
+
+def _track_running(stats: _PoolStats, call):
+    stats.running += 1
+    try:
+        return call()
+    finally:
+        stats.running -= 1
+
+
+def shutdown_executors():
+    """Stop all pools (pending calls are cancelled)."""
+    with _lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+# ── Event-loop lag monitor ────────────────────────────────────────────────
+
+
+class LagMonitor:
+    def __init__(self, threshold_ms: float = LAG_THRESHOLD_MS, interval_s: float = LAG_INTERVAL_S):
+        self.threshold_s = threshold_ms / 1000
+        self.interval_s = interval_s
+        self.last_beat = time.monotonic()
+        self.loop_thread_id: int | None = None
+        self.stalls = 0
+        self.max_lag_ms = 0.0
+        self.last_stall: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._in_stall = False
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval_s
+            await asyncio.sleep(self.interval_s)
+            now = time.monotonic()
+            lag_ms = (now - expected) * 1000
+            if lag_ms > self.max_lag_ms:
+                self.max_lag_ms = lag_ms
+            self.last_beat = now
+
+    def _watch(self):
+        while not self._stop.wait(self.interval_s):
+            # Time the loop has been unable to run past its scheduled beat
+            blocked = time.monotonic() - self.last_beat - self.interval_s
+            if blocked <= self.threshold_s:
+                self._in_stall = False
+                continue
+            if self._in_stall:
+                continue
+            self._in_stall = True
+            self.stalls += 1
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)[-12:]) if frame else "<no frame>"
+            self.last_stall = {"at": time.time(), "blocked_ms": round(blocked * 1000), "stack": stack}
+            logger.warning(f"Event loop blocked for >{blocked * 1000:.0f}ms — loop thread stack:\n{stack}")
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event-loop lag monitor started (threshold {self.threshold_s * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def to_dict(self) -> dict:
+        return {
+            "threshold_ms": self.threshold_s * 1000,
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "last_stall": self.last_stall,
+        }
+
+
+lag_monitor = LagMonitor()
+
+
+def executor_stats() -> dict:
+    """Per-pool queue/latency metrics and event-loop lag."""
+    return {
+        "pools": {name: _stats[name].to_dict(size, processes=name == "cpu")
+                  for name, size in POOL_SIZES.items()},
+        "loop": lag_monitor.to_dict(),
+    }
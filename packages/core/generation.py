@@ -7,6 +7,7 @@ in-process calls to the visual pipeline's workflow builder, adding:
 - Character negatives from build_character_negatives()
 - EventBus events + audit logging
 - Pose variation from POSE_VARIATIONS
+- Per-character prompt plans (profile, negatives, params) via core.prompt_plan
 
 Callers:
     1. POST /regenerate/{slug}  (Characters tab "Generate X More")
@@ -26,6 +27,7 @@ from packages.core.config import BASE_PATH, COMFYUI_OUTPUT_DIR, normalize_sample
 from packages.core.db import get_char_project_map, log_model_change
 from packages.core.events import event_bus, GENERATION_SUBMITTED
 from packages.core.audit import log_generation
+from packages.core import prompt_plan
 from packages.core.model_selector import recommend_params
 from packages.core.model_profiles import get_model_profile, translate_prompt
 from packages.lora_training.feedback import get_feedback_negatives, register_pending_image
@@ -194,72 +196,24 @@ async def _get_style_override(style_name: str) -> dict | None:
         return None
 
 
-async def generate_batch(
+async def _build_prompt_plan(
     character_slug: str,
-    count: int = 1,
-    seed: int | None = None,
-    prompt_override: str | None = None,
-    pose_variation: bool = True,
-    include_feedback_negatives: bool = True,
-    include_learned_negatives: bool = True,
-    fire_events: bool = True,
+    db_info: dict,
+    checkpoint: str,
+    design_prompt: str,
+    using_override: bool,
+    include_feedback_negatives: bool,
+    include_learned_negatives: bool,
     style_override: str | None = None,
-    checkpoint_override: str | None = None,
-    custom_poses: list[str] | None = None,
-    lora_name: str | None = None,
-    lora_strength: float | None = None,
-    pose_tag: str | None = None,
-    session_id: str | None = None,
-    source: str = "manual",
-    comfyui_url: str | None = None,
-) -> list[dict]:
-    """Generate N images using the full visual pipeline, poll, copy to dataset, register.
+) -> tuple[dict, bool]:
+    """Resolve the model profile, negative prompt and sampler params for a batch.
 
-    This is the single shared generation function that all callers use.
-    When style_override is provided, overrides checkpoint/cfg/steps/sampler/resolution
-    from the named generation_styles row (e.g. "pony_nsfw_xl").
-    When checkpoint_override is provided, swaps just the checkpoint model (keeps
-    all other params from the project style).
-    Returns a list of result dicts, one per submitted job.
+    Returns (plan, cacheable). A plan built after recommend_params() failed is
+    not cacheable so the next batch retries instead of reusing degraded output.
     """
-    # 1. Get DB info
-    char_map = await get_char_project_map()
-    db_info = char_map.get(character_slug)
-    if not db_info:
-        raise ValueError(f"Character '{character_slug}' not found in DB")
-
-    # style_override is deprecated — use checkpoint_override instead.
-    # Named styles clobber project-tuned params (resolution, sampler, negatives).
-    if style_override:
-        logger.warning(
-            f"generate_batch: style_override='{style_override}' is DEPRECATED — "
-            f"use checkpoint_override instead. Ignoring."
-        )
+    cacheable = True
 
-    # Direct checkpoint swap — use profile defaults instead of DB project params
-    # (DB params are tuned for the project's default checkpoint, not the override)
-    using_override = bool(checkpoint_override)
-    if checkpoint_override:
-        original_checkpoint = db_info.get("checkpoint_model")
-        db_info["checkpoint_model"] = checkpoint_override
-        logger.info(f"generate_batch: checkpoint_override -> {checkpoint_override}")
-        await log_model_change(
-            action="override",
-            checkpoint_model=checkpoint_override,
-            previous_model=original_checkpoint,
-            project_name=db_info.get("project_name"),
-            reason=f"generate_batch checkpoint_override for {character_slug}",
-            metadata={"character_slug": character_slug, "count": count},
-        )
-
-    checkpoint = db_info.get("checkpoint_model")
-    if not checkpoint:
-        raise ValueError(f"No checkpoint model configured for {character_slug}")
-
-    project_name = db_info.get("project_name")
-    design_prompt = prompt_override or db_info.get("design_prompt", "")
-
-    # 2. Get model profile for checkpoint-aware pipeline
+    # Model profile for checkpoint-aware pipeline
     profile = get_model_profile(
         checkpoint,
         db_architecture=db_info.get("model_architecture"),
@@ -267,7 +221,7 @@ async def generate_batch(
     )
     logger.info(f"generate_batch: using profile '{profile['style_label']}' for {checkpoint}")
 
-    # 3. Build negative prompt: profile defaults > DB template, + learned + feedback + character
+    # Build negative prompt: profile defaults > DB template, + learned + feedback + character
     # When checkpoint_override is used, always use profile negatives (DB negatives may use
     # wrong tags e.g. score_1 for PonyXL won't work on NoobAI)
     if using_override:
@@ -294,7 +248,7 @@ async def generate_batch(
     if include_learned_negatives:
         try:
             rec = await recommend_params(
-                character_slug, project_name=project_name,
+                character_slug, project_name=db_info.get("project_name"),
                 checkpoint_model=checkpoint,
             )
             learned_neg = rec.get("learned_negatives", "")
@@ -317,7 +271,7 @@ async def generate_batch(
                     f"(confidence={rec['confidence']}, cfg={use_cfg}, steps={use_steps})"
                 )
         except Exception:
-            pass
+            cacheable = False
 
     if include_feedback_negatives:
         feedback_neg = get_feedback_negatives(character_slug)
@@ -339,6 +293,108 @@ async def generate_batch(
     use_scheduler = use_scheduler or profile.get("default_scheduler")
     norm_sampler, norm_scheduler = normalize_sampler(use_sampler, use_scheduler)
 
+    return {
+        "profile": profile,
+        "negative": base_negative,
+        "cfg": use_cfg,
+        "steps": use_steps,
+        "sampler": norm_sampler,
+        "scheduler": norm_scheduler,
+    }, cacheable
+
+
+async def generate_batch(
+    character_slug: str,
+    count: int = 1,
+    seed: int | None = None,
+    prompt_override: str | None = None,
+    pose_variation: bool = True,
+    include_feedback_negatives: bool = True,
+    include_learned_negatives: bool = True,
+    fire_events: bool = True,
+    style_override: str | None = None,
+    checkpoint_override: str | None = None,
+    custom_poses: list[str] | None = None,
+    lora_name: str | None = None,
+    lora_strength: float | None = None,
+    pose_tag: str | None = None,
+    session_id: str | None = None,
+    source: str = "manual",
+    comfyui_url: str | None = None,
+) -> list[dict]:
+    """Generate N images using the full visual pipeline, poll, copy to dataset, register.
+
+    This is the single shared generation function that all callers use.
+    When style_override is provided, overrides checkpoint/cfg/steps/sampler/resolution
+    from the named generation_styles row (e.g. "pony_nsfw_xl").
+    When checkpoint_override is provided, swaps just the checkpoint model (keeps
+    all other params from the project style).
+    Returns a list of result dicts, one per submitted job.
+    """
+    # 1. Get DB info
+    char_map = await get_char_project_map()
+    db_info = char_map.get(character_slug)
+    if not db_info:
+        raise ValueError(f"Character '{character_slug}' not found in DB")
+
+    # style_override is deprecated — use checkpoint_override instead.
+    # Named styles clobber project-tuned params (resolution, sampler, negatives).
+    if style_override:
+        logger.warning(
+            f"generate_batch: style_override='{style_override}' is DEPRECATED — "
+            f"use checkpoint_override instead. Ignoring."
+        )
+
+    # Direct checkpoint swap — use profile defaults instead of DB project params
+    # (DB params are tuned for the project's default checkpoint, not the override)
+    using_override = bool(checkpoint_override)
+    if checkpoint_override:
+        original_checkpoint = db_info.get("checkpoint_model")
+        # Copy — db_info is the shared get_char_project_map() cache entry
+        db_info = {**db_info, "checkpoint_model": checkpoint_override}
+        logger.info(f"generate_batch: checkpoint_override -> {checkpoint_override}")
+        await log_model_change(
+            action="override",
+            checkpoint_model=checkpoint_override,
+            previous_model=original_checkpoint,
+            project_name=db_info.get("project_name"),
+            reason=f"generate_batch checkpoint_override for {character_slug}",
+            metadata={"character_slug": character_slug, "count": count},
+        )
+
+    checkpoint = db_info.get("checkpoint_model")
+    if not checkpoint:
+        raise ValueError(f"No checkpoint model configured for {character_slug}")
+
+    project_name = db_info.get("project_name")
+    design_prompt = prompt_override or db_info.get("design_prompt", "")
+
+    # 2. Resolve profile, negatives and params — cached per (character, checkpoint)
+    key = prompt_plan.plan_key(
+        character_slug, checkpoint, using_override, design_prompt,
+        include_feedback_negatives, include_learned_negatives, bool(style_override),
+    )
+    plan = prompt_plan.get(key, db_info)
+    if plan is None:
+        plan, cacheable = await _build_prompt_plan(
+            character_slug, db_info, checkpoint, design_prompt,
+            using_override=using_override,
+            include_feedback_negatives=include_feedback_negatives,
+            include_learned_negatives=include_learned_negatives,
+            style_override=style_override,
+        )
+        if cacheable:
+            prompt_plan.put(key, db_info, plan)
+    else:
+        logger.debug(f"generate_batch: prompt plan cache hit for {character_slug} / {checkpoint}")
+
+    profile = plan["profile"]
+    base_negative = plan["negative"]
+    use_cfg = plan["cfg"]
+    use_steps = plan["steps"]
+    norm_sampler = plan["sampler"]
+    norm_scheduler = plan["scheduler"]
+
     # Prepare pose pool
     if custom_poses:
         # Caller-supplied poses (e.g. scene-derived) — use them in order, cycling if needed
@@ -512,16 +512,15 @@ class ProjectGenerationLoop:
             from packages.scene_generation.motion_intensity import (
                 classify_motion_intensity, get_dasiwa_motion_params,
             )
-            tier = classify_motion_intensity(motion_prompt, lora_name)
+            tier = classify_motion_intensity(dict(shot), lora_name=lora_name, prompt=motion_prompt)
             params = get_dasiwa_motion_params(tier)
 
             # Build DaSiWa I2V workflow
             from packages.scene_generation.wan_video import build_dasiwa_i2v_workflow
-            image_filename = Path(source_image).name
 
-            # Ensure image is in ComfyUI input directory
+            # Stage the image in ComfyUI's input dir under its content-addressed name
             from packages.scene_generation.scene_comfyui import copy_to_comfyui_input
-            await copy_to_comfyui_input(source_image)
+            image_filename = await copy_to_comfyui_input(source_image)
 
             file_prefix = f"genloop_video_{self.project_id}_{int(time.time())}"
             seed = random.randint(0, 2**32)
@@ -580,11 +579,12 @@ class ProjectGenerationLoop:
                 return
 
             # Update shot
+            last_frame = await _last_frame(video_path)
             await conn.execute("""
                 UPDATE shots SET output_video_path = $2, status = 'completed',
-                       seed = $3, steps = $4
+                       seed = $3, steps = $4, last_frame_path = $5
                 WHERE id = $1
-            """, shot_id, video_path, seed, params.total_steps)
+            """, shot_id, video_path, seed, params.total_steps, last_frame)
 
             self._videos_generated += 1
             logger.info(f"[GenLoop:{self.project_id}] Video completed: {video_path} (shot {shot_id})")
@@ -592,8 +592,10 @@ class ProjectGenerationLoop:
             # Emit event for audio pipeline + QC
             chars = shot["characters_present"] or []
             await event_bus.emit(SHOT_GENERATED, {
-                "shot_id": shot_id,
+                "shot_id": str(shot_id),
+                "scene_id": str(shot["scene_id"]),
                 "video_path": video_path,
+                "last_frame_path": last_frame,
                 "project_id": self.project_id,
                 "character_slug": chars[0] if chars else None,
             })
@@ -639,7 +641,7 @@ class ProjectGenerationLoop:
             source_image = shot["source_image_path"]
 
             from packages.scene_generation.motion_intensity import classify_motion_intensity
-            tier = classify_motion_intensity(motion_prompt, shot["lora_name"])
+            tier = classify_motion_intensity(dict(shot), lora_name=shot["lora_name"], prompt=motion_prompt)
 
             video_path = await self._burst_manager.burst.generate_video(
                 keyframe_path=source_image,
@@ -650,10 +652,12 @@ class ProjectGenerationLoop:
             )
 
             if video_path:
+                last_frame = await _last_frame(video_path)
                 await conn.execute("""
-                    UPDATE shots SET output_video_path = $2, status = 'completed'
+                    UPDATE shots SET output_video_path = $2, status = 'completed',
+                           last_frame_path = $3
                     WHERE id = $1
-                """, shot_id, video_path)
+                """, shot_id, video_path, last_frame)
 
                 self._videos_generated += 1
                 self._videos_burst += 1
@@ -664,8 +668,10 @@ class ProjectGenerationLoop:
 
                 chars = shot["characters_present"] or []
                 await event_bus.emit(SHOT_GENERATED, {
-                    "shot_id": shot_id,
+                    "shot_id": str(shot_id),
+                    "scene_id": str(shot["scene_id"]),
                     "video_path": video_path,
+                    "last_frame_path": last_frame,
                     "project_id": self.project_id,
                     "character_slug": chars[0] if chars else None,
                 })
@@ -870,6 +876,16 @@ def _extract_image_path(result: dict, prefix: str) -> str | None:
     return None
 
 
+async def _last_frame(video_path: str) -> str | None:
+    """Extract the video's last frame (continuity, variety index); None if ffmpeg fails."""
+    from packages.scene_generation.scene_video_utils import extract_last_frame
+    try:
+        return await extract_last_frame(video_path)
+    except Exception as e:
+        logger.warning(f"Last-frame extraction failed for {video_path}: {e}")
+        return None
+
+
 def _extract_video_path(result: dict, prefix: str) -> str | None:
     """Extract output video path from ComfyUI history result."""
     for node_id, output in result.get("outputs", {}).items():
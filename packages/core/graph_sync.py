@@ -10,6 +10,8 @@ asyncpg requires SET search_path per connection to include ag_catalog.
 
 import json
 import logging
+import time
+from datetime import timedelta
 from pathlib import Path
 
 import asyncpg
@@ -20,6 +22,12 @@ logger = logging.getLogger(__name__)
 
 GRAPH_NAME = "anime_graph"
 
+# Incremental generation_history sync (see sync_generation_history)
+HISTORY_SYNC_LOOKBACK = timedelta(days=7)
+HISTORY_FULL_SYNC_S = 86400
+_history_synced_at = None
+_history_full_at = 0.0
+
 
 async def _get_conn() -> asyncpg.Connection:
     """Get a direct connection with AGE search_path configured.
@@ -241,21 +249,33 @@ async def sync_checkpoints(conn: asyncpg.Connection | None = None) -> int:
             await conn.close()
 
 
-async def sync_generation_history(conn: asyncpg.Connection | None = None) -> int:
-    """Sync generation_history → Image vertices + DEPICTS/GENERATED_WITH/REVIEWED_AS edges."""
+async def sync_generation_history(conn: asyncpg.Connection | None = None, full: bool = False) -> int:
+    """Sync generation_history → Image vertices + DEPICTS/GENERATED_WITH/REVIEWED_AS edges.
+
+    After the first (full) pass only rows generated within HISTORY_SYNC_LOOKBACK
+    of the previous sync are re-read — a generated_at range that prunes to the
+    latest monthly partitions. Reviews land within days of generation; a full
+    pass still runs every HISTORY_FULL_SYNC_S to catch late ones.
+    """
+    global _history_synced_at, _history_full_at
     close_conn = conn is None
     if conn is None:
         conn = await _get_conn()
 
     try:
-        rows = await conn.fetch("""
+        started = await conn.fetchval("SELECT LOCALTIMESTAMP")
+        full = full or _history_synced_at is None or time.monotonic() - _history_full_at > HISTORY_FULL_SYNC_S
+        since = None if full else _history_synced_at - HISTORY_SYNC_LOOKBACK
+        window = "AND gh.generated_at >= $1" if since else ""
+        rows = await conn.fetch(f"""
             SELECT gh.id, gh.character_slug, gh.project_name, gh.checkpoint_model,
                    gh.quality_score, gh.status, gh.artifact_path, gh.cfg_scale,
                    gh.steps, gh.sampler, gh.solo, gh.generated_at,
                    gh.correction_of
             FROM generation_history gh
             WHERE gh.character_slug IS NOT NULL
-        """)
+              {window}
+        """, *([since] if since else []))
 
         count = 0
         for row in rows:
@@ -321,7 +341,10 @@ async def sync_generation_history(conn: asyncpg.Connection | None = None) -> int
 
             count += 1
 
-        logger.debug(f"graph_sync: synced {count} generation history images")
+        _history_synced_at = started
+        if full:
+            _history_full_at = time.monotonic()
+        logger.debug(f"graph_sync: synced {count} generation history images ({'full' if full else f'since {since}'})")
         return count
     finally:
         if close_conn:
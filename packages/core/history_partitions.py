@@ -0,0 +1,481 @@
+"""Monthly range partitions, retention and daily rollups for generation_history.
+
+generation_history is append-only and grows without bound, while most readers
+only look at recent rows (quality_trend's days=7, drift's last 20, graph sync).
+Partitioning by month on generated_at lets those queries prune to a few
+partitions, and lets retention drop whole months instead of DELETE-ing rows.
+
+Layout once converted:
+  generation_history                 PARTITION BY RANGE (generated_at)
+    generation_history_y2026m10      one per month, created MONTHS_AHEAD ahead
+    generation_history_default       catches anything outside the monthly ranges
+  generation_history_daily           per-day rollups of months past retention
+  generation_history_summary (view)  rollups UNION ALL live rows grouped by day,
+                                     for all-time totals that must survive retention
+
+Conversion is online. A trigger mirrors writes on the old table into the new
+partitioned one while existing rows are copied in id batches. A short ACCESS
+EXCLUSIVE swap then renames the tables; the old table is kept as
+generation_history_legacy until dropped with --drop-legacy. Partitioned
+tables cannot carry a unique constraint on id alone, so conversion drops
+EVERY foreign key pointing at generation_history(id) (rejections, approvals,
+...) during the swap and does not recreate them: the referencing columns stay
+but are no longer enforced. --status and /api/system/generation-history/partitions
+list the foreign keys a conversion would drop; check them before opting in.
+
+The conversion copies the whole table, so it is opt-in: run --convert, or set
+GENERATION_HISTORY_PARTITION=1 to convert from db_migrations at startup.
+Startup otherwise only keeps an already partitioned table's months ahead.
+Daily maintenance (next months' partitions + retention) is a durable job that
+reschedules itself. CLI:
+    python -m packages.core.history_partitions --convert | --maintain | --drop-legacy | --status
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from datetime import date
+
+from . import job_queue
+from .db import connect_direct
+
+logger = logging.getLogger(__name__)
+
+TABLE = "generation_history"
+NEW_TABLE = "generation_history_new"
+LEGACY_TABLE = "generation_history_legacy"
+DEFAULT_PARTITION = "generation_history_default"
+SUMMARY_TABLE = "generation_history_daily"
+SUMMARY_VIEW = "generation_history_summary"
+
+CONVERT_ON_STARTUP = os.getenv("GENERATION_HISTORY_PARTITION", "0") == "1"
+RETENTION_MONTHS = int(os.getenv("GENERATION_HISTORY_RETENTION_MONTHS", "24"))  # 0 keeps everything
+MONTHS_AHEAD = 3
+BATCH_ROWS = 5000
+MAINTAIN_JOB = "generation_history.maintain"
+MAINTAIN_INTERVAL_S = 86400
+
+# Indexes on the partitioned parent (cascade to every partition)
+INDEXES = {
+    "idx_gen_history_character": "character_slug",
+    "idx_gen_history_project": "project_name",
+    "idx_gen_history_quality": "quality_score",
+    "idx_gen_history_status": "status",
+    "idx_gen_history_date": "generated_at",
+    "idx_gen_history_checkpoint": "checkpoint_model",
+    "idx_gh_session": "session_id",
+    "idx_gh_pose_tag": "pose_tag",
+    "idx_gh_id": "id",
+    "idx_gh_character_recent": "character_slug, generated_at DESC",
+    "idx_gh_project_recent": "project_name, generated_at DESC",
+}
+UNIQUE_KEY = "uq_generation_history_id"  # (id, generated_at) — the ON CONFLICT target
+
+ROLLUP_DIMENSIONS = ("project_name", "character_slug", "checkpoint_model", "lora_name",
+                     "sampler", "source", "status")
+
+_PARTITION_RE = re.compile(r"^generation_history_y(\d{4})m(\d{2})$")
+
+
+# ── Month arithmetic ──────────────────────────────────────────────────────
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    index = d.year * 12 + d.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_bounds(name: str) -> tuple[date, date] | None:
+    """[lower, upper) of a monthly partition, or None for the default/other tables."""
+    m = _PARTITION_RE.match(name)
+    if not m:
+        return None
+    lower = date(int(m.group(1)), int(m.group(2)), 1)
+    return lower, add_months(lower, 1)
+
+
+def months_needed(since: date | None, today: date, months_ahead: int = MONTHS_AHEAD) -> list[date]:
+    first = month_start(since or today)
+    last = add_months(month_start(today), months_ahead)
+    months, month = [], first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def expired_partitions(names: list[str], today: date, keep_months: int) -> list[str]:
+    """Monthly partitions whose whole range is older than the retention window."""
+    if keep_months <= 0:
+        return []
+    cutoff = add_months(month_start(today), -keep_months)
+    return sorted(n for n in names if (b := partition_bounds(n)) and b[1] <= cutoff)
+
+
+def mirror_function_sql(columns: list[str]) -> str:
+    """plpgsql trigger copying each write on the old table into NEW_TABLE during conversion."""
+    cols = ", ".join(columns)
+    values = ", ".join(f"NEW.{c}" for c in columns)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in ("id", "generated_at"))
+    return f"""
+        CREATE OR REPLACE FUNCTION generation_history_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM {NEW_TABLE} WHERE id = OLD.id AND generated_at = OLD.generated_at;
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'UPDATE' AND OLD.generated_at IS DISTINCT FROM NEW.generated_at THEN
+                DELETE FROM {NEW_TABLE} WHERE id = OLD.id AND generated_at = OLD.generated_at;
+            END IF;
+            INSERT INTO {NEW_TABLE} ({cols}) VALUES ({values})
+            ON CONFLICT (id, generated_at) DO UPDATE SET {updates};
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+    """
+
+
+def rollup_sql(source: str) -> str:
+    dims = ", ".join(ROLLUP_DIMENSIONS)
+    return f"""
+        INSERT INTO {SUMMARY_TABLE}
+            (day, {dims}, generations, scored, sum_quality, min_quality, max_quality, first_at, last_at)
+        SELECT generated_at::date, {dims},
+               COUNT(*), COUNT(quality_score), SUM(quality_score), MIN(quality_score), MAX(quality_score),
+               MIN(generated_at), MAX(generated_at)
+        FROM {source}
+        GROUP BY generated_at::date, {dims}
+    """
+
+
+# ── Catalog helpers ───────────────────────────────────────────────────────
+
+
+async def is_partitioned(conn, table: str = TABLE) -> bool:
+    kind = await conn.fetchval(
+        "SELECT c.relkind::text FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = 'public' AND c.relname = $1", table,
+    )
+    return kind == "p"
+
+
+async def _table_exists(conn, table: str) -> bool:
+    return bool(await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", f"public.{table}"))
+
+
+async def list_partitions(conn, table: str = TABLE) -> list[str]:
+    rows = await conn.fetch("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::regclass
+        ORDER BY c.relname
+    """, f"public.{table}")
+    return [r["relname"] for r in rows]
+
+
+async def _columns(conn, table: str) -> list[str]:
+    rows = await conn.fetch("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = $1
+        ORDER BY ordinal_position
+    """, table)
+    return [r["column_name"] for r in rows]
+
+
+# ── Partition maintenance ─────────────────────────────────────────────────
+
+
+async def _create_month(conn, table: str, month: date, existing: set[str]) -> bool:
+    """Create one monthly partition, moving any rows the default partition already holds for it."""
+    name = partition_name(month)
+    if name in existing:
+        return False
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    async with conn.transaction():
+        stray = DEFAULT_PARTITION in existing and await conn.fetchval(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE generated_at >= $1 AND generated_at < $2)",
+            month, add_months(month, 1),
+        )
+        if stray:
+            await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {DEFAULT_PARTITION}")
+            await conn.execute(f"CREATE TABLE {name} PARTITION OF {table} {bounds}")
+            await conn.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE generated_at >= '{lower}' AND generated_at < '{upper}'
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """)
+            await conn.execute(f"ALTER TABLE {table} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+            logger.info(f"generation_history: moved default-partition rows into {name}")
+        else:
+            await conn.execute(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} {bounds}")
+    existing.add(name)
+    return True
+
+
+async def ensure_partitions(conn, table: str = TABLE, since: date | None = None,
+                            months_ahead: int = MONTHS_AHEAD, today: date | None = None) -> list[str]:
+    """Create the default partition and monthly partitions from `since` to months_ahead past today."""
+    existing = set(await list_partitions(conn, table))
+    if DEFAULT_PARTITION not in existing:
+        await conn.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {table} DEFAULT")
+        existing.add(DEFAULT_PARTITION)
+    created = []
+    for month in months_needed(since, today or date.today(), months_ahead):
+        if await _create_month(conn, table, month, existing):
+            created.append(partition_name(month))
+    if created:
+        logger.info(f"{table}: created partitions {created[0]}..{created[-1]} ({len(created)})")
+    return created
+
+
+async def apply_retention(conn, keep_months: int = RETENTION_MONTHS, today: date | None = None) -> list[dict]:
+    """Roll expired months into generation_history_daily, then detach and drop them."""
+    if keep_months <= 0 or not await is_partitioned(conn):
+        return []
+    dropped = []
+    for name in expired_partitions(await list_partitions(conn), today or date.today(), keep_months):
+        lower, upper = partition_bounds(name)
+        async with conn.transaction():
+            await conn.execute(f"DELETE FROM {SUMMARY_TABLE} WHERE day >= $1 AND day < $2", lower, upper)
+            status = await conn.execute(rollup_sql(name))
+            rows = await conn.fetchval(f"SELECT COUNT(*) FROM {name}")
+            await conn.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            await conn.execute(f"DROP TABLE {name}")
+        dropped.append({"partition": name, "rows": rows, "rollup_rows": int(status.split()[-1])})
+        logger.info(f"generation_history: rolled up and dropped {name} ({rows} rows)")
+    return dropped
+
+
+async def create_summary_view(conn):
+    """Daily rollups plus live rows grouped by day — totals that survive retention."""
+    dims = ", ".join(ROLLUP_DIMENSIONS)
+    await conn.execute(f"""
+        CREATE OR REPLACE VIEW {SUMMARY_VIEW} AS
+        SELECT day, {dims}, generations, scored, sum_quality, min_quality, max_quality, first_at, last_at
+        FROM {SUMMARY_TABLE}
+        UNION ALL
+        SELECT generated_at::date AS day, {dims},
+               COUNT(*)::int AS generations, COUNT(quality_score)::int AS scored,
+               SUM(quality_score) AS sum_quality, MIN(quality_score) AS min_quality,
+               MAX(quality_score) AS max_quality, MIN(generated_at) AS first_at, MAX(generated_at) AS last_at
+        FROM {TABLE}
+        GROUP BY generated_at::date, {dims}
+    """)
+
+
+# ── Online conversion ─────────────────────────────────────────────────────
+
+
+async def convert(conn, batch_rows: int = BATCH_ROWS) -> dict:
+    """Convert a plain generation_history into the partitioned layout without blocking writers.
+
+    Safe to re-run after an interruption: the new table, trigger and copied
+    rows are reused and the copy restarts with ON CONFLICT DO NOTHING.
+    """
+    if await is_partitioned(conn):
+        return {"converted": False, "reason": "already partitioned"}
+    started = time.monotonic()
+    columns = await _columns(conn, TABLE)
+    col_list = ", ".join(columns)
+
+    # Range partitions need a non-null key
+    await conn.execute(f"UPDATE {TABLE} SET generated_at = COALESCE(reviewed_at, NOW()) WHERE generated_at IS NULL")
+    await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {NEW_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS)
+        PARTITION BY RANGE (generated_at)
+    """)
+    await conn.execute(f"ALTER TABLE {NEW_TABLE} ALTER COLUMN generated_at SET NOT NULL")
+    await conn.execute(f"ALTER TABLE {NEW_TABLE} ALTER COLUMN generated_at SET DEFAULT NOW()")
+    since = await conn.fetchval(f"SELECT MIN(generated_at)::date FROM {TABLE}")
+    await ensure_partitions(conn, NEW_TABLE, since=since)
+    await conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {UNIQUE_KEY}_p ON {NEW_TABLE} (id, generated_at)")
+    for name, cols in INDEXES.items():
+        await conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_p ON {NEW_TABLE} ({cols})")
+
+    # From here on every write to the old table is mirrored
+    await conn.execute(mirror_function_sql(columns))
+    await conn.execute(f"DROP TRIGGER IF EXISTS generation_history_mirror ON {TABLE}")
+    await conn.execute(f"""
+        CREATE TRIGGER generation_history_mirror
+        AFTER INSERT OR UPDATE OR DELETE ON {TABLE}
+        FOR EACH ROW EXECUTE FUNCTION generation_history_mirror()
+    """)
+
+    target = await conn.fetchval(f"SELECT COALESCE(MAX(id), 0) FROM {TABLE}")
+    copied, last = 0, 0
+    while last < target:
+        status = await conn.execute(f"""
+            INSERT INTO {NEW_TABLE} ({col_list})
+            SELECT {col_list} FROM {TABLE} WHERE id > $1 AND id <= $2
+            ON CONFLICT (id, generated_at) DO NOTHING
+        """, last, last + batch_rows)
+        copied += int(status.split()[-1])
+        last += batch_rows
+        if last // batch_rows % 20 == 0:
+            logger.info(f"generation_history partition copy: id {min(last, target)}/{target}, {copied} rows")
+
+    async with conn.transaction():
+        await conn.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        old_count = await conn.fetchval(f"SELECT COUNT(*) FROM {TABLE}")
+        new_count = await conn.fetchval(f"SELECT COUNT(*) FROM {NEW_TABLE}")
+        if old_count != new_count:
+            raise RuntimeError(f"row count mismatch after copy: {old_count} vs {new_count}")
+        sequence = await conn.fetchval(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")
+        foreign_keys = await _incoming_foreign_keys(conn)
+        dropped_fks = [f'{fk["tbl"]}.{fk["conname"]}' for fk in foreign_keys]
+        for fk in foreign_keys:
+            await conn.execute(f'ALTER TABLE {fk["tbl"]} DROP CONSTRAINT "{fk["conname"]}"')
+        await conn.execute(f"DROP TRIGGER generation_history_mirror ON {TABLE}")
+        await conn.execute("DROP FUNCTION generation_history_mirror()")
+        await conn.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        await conn.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO {TABLE}")
+        for name in (UNIQUE_KEY, *INDEXES):
+            await conn.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_legacy")
+            await conn.execute(f"ALTER INDEX {name}_p RENAME TO {name}")
+        if sequence:
+            await conn.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+        await create_summary_view(conn)
+
+    if dropped_fks:
+        logger.warning(f"generation_history partitioning dropped foreign keys: {', '.join(dropped_fks)}")
+    result = {
+        "converted": True, "rows": new_count, "copied": copied,
+        "dropped_foreign_keys": dropped_fks,
+        "seconds": round(time.monotonic() - started, 1),
+    }
+    logger.info(f"generation_history partitioned: {result}")
+    return result
+
+
+async def _incoming_foreign_keys(conn) -> list:
+    """Foreign keys on other tables that reference generation_history(id)."""
+    return await conn.fetch("""
+        SELECT conrelid::regclass::text AS tbl, conname FROM pg_constraint
+        WHERE confrelid = $1::regclass AND contype = 'f'
+    """, f"public.{TABLE}")
+
+
+async def drop_legacy(conn) -> bool:
+    if not await _table_exists(conn, LEGACY_TABLE):
+        return False
+    await conn.execute(f"DROP TABLE {LEGACY_TABLE}")
+    logger.info(f"Dropped {LEGACY_TABLE}")
+    return True
+
+
+async def migrate(conn):
+    """Startup hook from db_migrations: convert once, then keep partitions ahead of NOW()."""
+    if not await _table_exists(conn, TABLE):
+        return
+    if CONVERT_ON_STARTUP and not await is_partitioned(conn):
+        await convert(conn)
+    if await is_partitioned(conn):
+        await ensure_partitions(conn)
+    await create_summary_view(conn)
+
+
+async def maintain() -> dict:
+    conn = await connect_direct()
+    try:
+        if not await is_partitioned(conn):
+            return {"partitioned": False}
+        return {
+            "partitioned": True,
+            "created": await ensure_partitions(conn),
+            "dropped": await apply_retention(conn),
+        }
+    finally:
+        await conn.close()
+
+
+@job_queue.job_kind(MAINTAIN_JOB, concurrency=1, max_attempts=3)
+async def _maintain_job(job):
+    result = await maintain()
+    await schedule_maintenance(delay_s=MAINTAIN_INTERVAL_S)
+    return result
+
+
+async def schedule_maintenance(delay_s: float = 0) -> dict:
+    """Queue the maintenance job; deduplicated per run date so the running job can queue the next."""
+    run_on = date.fromtimestamp(time.time() + delay_s)
+    return await job_queue.enqueue(MAINTAIN_JOB, dedupe_key=f"{MAINTAIN_JOB}:{run_on}", delay_s=delay_s)
+
+
+async def status() -> dict:
+    conn = await connect_direct()
+    try:
+        partitioned = await is_partitioned(conn)
+        partitions = await list_partitions(conn) if partitioned else []
+        sizes = await conn.fetch("""
+            SELECT c.relname, c.reltuples::bigint AS approx_rows
+            FROM pg_class c WHERE c.relname = ANY($1::text[])
+        """, partitions) if partitions else []
+        rollup_days = 0
+        if await _table_exists(conn, SUMMARY_TABLE):
+            rollup_days = await conn.fetchval(f"SELECT COUNT(DISTINCT day) FROM {SUMMARY_TABLE}")
+        result = {
+            "partitioned": partitioned,
+            "retention_months": RETENTION_MONTHS,
+            "legacy_table": await _table_exists(conn, LEGACY_TABLE),
+            "partitions": {r["relname"]: max(r["approx_rows"], 0) for r in sizes},
+            "rollup_days": rollup_days,
+        }
+        if not partitioned:
+            result["convert_drops_foreign_keys"] = [
+                f'{fk["tbl"]}.{fk["conname"]}' for fk in await _incoming_foreign_keys(conn)
+            ]
+            result["convert_warning"] = (
+                "Converting drops every foreign key into generation_history(id) listed in "
+                "convert_drops_foreign_keys; they are not recreated and the columns stop being enforced."
+            )
+        return result
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generation_history partition maintenance")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--convert", action="store_true", help="Convert to monthly partitions (online)")
+    group.add_argument("--maintain", action="store_true", help="Create upcoming partitions and apply retention")
+    group.add_argument("--drop-legacy", action="store_true", help="Drop generation_history_legacy after conversion")
+    group.add_argument("--status", action="store_true", help="Show the layout and what --convert would drop (default)")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        if args.maintain:
+            return await maintain()
+        if not (args.convert or args.drop_legacy):
+            return await status()
+        conn = await connect_direct()
+        try:
+            if args.convert:
+                result = await convert(conn, args.batch_rows)
+                await ensure_partitions(conn)
+                return result
+            return {"dropped": await drop_legacy(conn)}
+        finally:
+            await conn.close()
+
+    print(json.dumps(asyncio.run(run()), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Content-addressed staging of ComfyUI input files.
+
+LoadImage / video loader nodes only read from ComfyUI/input, so keyframes,
+reference images and source clips are placed there before every submission
+and every QC retry. stage_input() names the staged file by content hash
+("<stem>__<sha16><ext>") and:
+
+  - returns immediately when that file is already staged and unchanged
+  - otherwise hardlinks it (same filesystem), reflinks it (FICLONE, e.g.
+    btrfs/xfs), and only copies as a last resort
+
+Hardlinks share the inode with the source, so a source rewritten in place
+(ffmpeg -y truncates) would change the staged bytes under a stale name. Each
+staged file's size and mtime are recorded; a mismatch on the next hit
+re-stages it.
+
+The index (staged files, LRU timestamps, source hash memo) is a JSON file in
+the input dir, shared by every process that stages inputs (API, job queue
+workers). Changes to it are made under an flock on INDEX_NAME.lock after
+re-reading the on-disk copy, so one process never overwrites or evicts
+another's entries blindly. A hit writes nothing: it bumps the staged file's
+atime (what eviction checks, across processes) and the in-memory last_used,
+which is persisted at most every SAVE_INTERVAL_S. Staged files not used for
+INPUT_STAGING_MIN_AGE_S are evicted least-recently-used first once the total
+exceeds INPUT_STAGING_MAX_GB.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .config import COMFYUI_INPUT_DIR
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(float(os.getenv("INPUT_STAGING_MAX_GB", "20")) * 1024 ** 3)
+# Never evict inputs staged this recently — a queued job may still need them
+MIN_AGE_S = int(os.getenv("INPUT_STAGING_MIN_AGE_S", "21600"))
+INDEX_NAME = ".staging_index.json"
+_MAX_SOURCE_MEMO = 20000
+# Hit timestamps are flushed to the index at most this often
+SAVE_INTERVAL_S = float(os.getenv("INPUT_STAGING_SAVE_INTERVAL_S", "60"))
+_FICLONE = 0x40049409
+
+_lock = threading.Lock()
+_index: dict | None = None
+_index_mtime_ns: int | None = None  # on-disk index version _index reflects
+_saved_at = 0.0
+_stats = {"hits": 0, "linked": 0, "reflinked": 0, "copied": 0,
+          "bytes_copied": 0, "bytes_linked": 0, "evicted": 0}
+
+
+def _input_dir() -> Path:
+    return Path(COMFYUI_INPUT_DIR)
+
+
+def _index_file() -> Path:
+    return _input_dir() / INDEX_NAME
+
+
+def _read_index() -> tuple[dict, int | None]:
+    path = _index_file()
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+        index = json.loads(path.read_text())
+    except (OSError, ValueError):
+        index, mtime_ns = {}, None
+    index.setdefault("files", {})
+    index.setdefault("sources", {})
+    return index, mtime_ns
+
+
+def _load_index() -> dict:
+    global _index, _index_mtime_ns
+    if _index is None:
+        _index, _index_mtime_ns = _read_index()
+    return _index
+
+
+@contextmanager
+def _index_locked():
+    """Cross-process section: hold the index flock with _index synced from disk."""
+    input_dir = _input_dir()
+    input_dir.mkdir(parents=True, exist_ok=True)
+    with open(input_dir / f"{INDEX_NAME}.lock", "w") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            _sync_index()
+            yield _index
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+def _sync_index():
+    """Adopt another process's index changes, keeping our newer last_used times."""
+    global _index, _index_mtime_ns
+    local = _load_index()
+    try:
+        mtime_ns = _index_file().stat().st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    if mtime_ns is None or mtime_ns == _index_mtime_ns:
+        return
+    disk, _index_mtime_ns = _read_index()
+    for name, entry in disk["files"].items():
+        mine = local["files"].get(name)
+        if mine and mine["mtime_ns"] == entry["mtime_ns"]:
+            entry["last_used"] = max(entry["last_used"], mine["last_used"])
+    disk["sources"].update(local["sources"])
+    while len(disk["sources"]) > _MAX_SOURCE_MEMO:
+        disk["sources"].pop(next(iter(disk["sources"])))
+    _index = disk
+
+
+def _save_index():
+    """Write _index (call inside _index_locked)."""
+    global _index_mtime_ns, _saved_at
+    path = _index_file()
+    try:
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(_index))
+        os.replace(tmp, path)
+        _index_mtime_ns = path.stat().st_mtime_ns
+    except OSError as e:
+        logger.warning(f"Input staging index write failed: {e}")
+    _saved_at = time.monotonic()
+
+
+def _source_hash(src: Path, st: os.stat_result) -> str:
+    """SHA-256 of src, memoized on (size, mtime) so retries never re-read it."""
+    sources = _load_index()["sources"]
+    cached = sources.get(str(src))
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached[2]
+    h = hashlib.sha256()
+    with open(src, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    sources.pop(str(src), None)
+    sources[str(src)] = [st.st_size, st.st_mtime_ns, digest]
+    while len(sources) > _MAX_SOURCE_MEMO:
+        sources.pop(next(iter(sources)))
+    return digest
+
+
+def _staged_name(src: Path, digest: str, name_hint: str | None) -> str:
+    hint = Path(name_hint or src.name)
+    stem = re.sub(r"__[0-9a-f]{16}$", "", hint.stem)  # re-staging a staged file
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", stem)[:48]
+    return f"{stem}__{digest[:16]}{hint.suffix or src.suffix}"
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        shutil.copystat(src, dest)
+        return True
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+
+
+def _materialize(src: Path, dest: Path, size: int) -> str:
+    """Place src at dest (atomically). Returns "linked", "reflinked" or "copied"."""
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+        method = "linked"
+    except OSError:
+        # EXDEV (other filesystem), EPERM (protected_hardlinks), EMLINK, ...
+        method = "reflinked" if _reflink(src, tmp) else "copied"
+        if method == "copied":
+            shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+    _stats[method] += 1
+    _stats["bytes_copied" if method == "copied" else "bytes_linked"] += size
+    return method
+
+
+def stage_input(src: str | Path, name_hint: str | None = None) -> str:
+    """Make src available to ComfyUI loader nodes; return the input-dir filename.
+
+    name_hint sets the readable part of the staged name (defaults to src.name).
+    Files already inside the input dir are hashed and staged like any other.
+    """
+    src = Path(src)
+    st = src.stat()
+    input_dir = _input_dir()
+    with _lock:
+        digest = _source_hash(src, st)
+        name = _staged_name(src, digest, name_hint)
+        dest = input_dir / name
+        if _hit(name, dest):
+            if time.monotonic() - _saved_at >= SAVE_INTERVAL_S:
+                with _index_locked():
+                    _save_index()
+            return name
+
+        with _index_locked():
+            if _hit(name, dest):  # staged meanwhile by another process
+                _save_index()
+                return name
+        # Materialize outside the flock: the temp name is per-process and the
+        # file is only visible to other processes' eviction once indexed
+        input_dir.mkdir(parents=True, exist_ok=True)
+        method = _materialize(src, dest, st.st_size)
+        dst = dest.stat()
+        with _index_locked() as index:
+            index["files"][name] = {"bytes": dst.st_size, "mtime_ns": dst.st_mtime_ns,
+                                    "method": method, "last_used": time.time()}
+            _evict(keep=name)
+            _save_index()
+    return name
+
+
+def _hit(name: str, dest: Path) -> bool:
+    """True if dest is staged and unchanged; records the use without writing the index."""
+    entry = _load_index()["files"].get(name)
+    if not entry:
+        return False
+    try:
+        dst = dest.stat()
+    except OSError:
+        return False
+    if dst.st_size != entry["bytes"] or dst.st_mtime_ns != entry["mtime_ns"]:
+        return False
+    now = time.time()
+    entry["last_used"] = now
+    try:
+        # atime is what other processes' eviction sees before our next index save
+        os.utime(dest, ns=(int(now * 1e9), dst.st_mtime_ns))
+    except OSError:
+        pass
+    _stats["hits"] += 1
+    return True
+
+
+def _evict(keep: str):
+    """Drop least recently used staged files until under MAX_BYTES."""
+    files = _load_index()["files"]
+    total = sum(e["bytes"] for e in files.values())
+    if total <= MAX_BYTES:
+        return
+    cutoff = time.time() - MIN_AGE_S
+    for name in sorted(files, key=lambda n: files[n]["last_used"]):
+        if total <= MAX_BYTES:
+            break
+        entry = files[name]
+        if name == keep or entry["last_used"] > cutoff:
+            continue
+        path = _input_dir() / name
+        try:
+            if path.stat().st_atime > cutoff:
+                continue  # used by another process since its last index save
+        except OSError:
+            pass
+        path.unlink(missing_ok=True)
+        total -= entry["bytes"]
+        del files[name]
+        _stats["evicted"] += 1
+
+
+def staging_stats() -> dict:
+    """Staged file count/size plus link vs copy counters since startup."""
+    with _lock:
+        files = _load_index()["files"]
+        return {
+            "files": len(files),
+            "bytes": sum(e["bytes"] for e in files.values()),
+            "max_bytes": MAX_BYTES,
+            **_stats,
+        }
@@ -0,0 +1,553 @@
+"""Durable Postgres job queue for long-running background work.
+
+Generate-all pipelines, keyframe blitzes, trailer renders, movie extraction,
+replenishment and voice training used to run as asyncio.create_task /
+BackgroundTasks tracked in module dicts: a restart lost them and nothing
+bounded how many ran at once. Work is now a row in `jobs`:
+
+  - job kinds are registered with @job_kind(name, concurrency=, max_attempts=,
+    backoff_s=) next to the code that does the work; HANDLER_MODULES lists the
+    modules a worker imports to find them
+  - enqueue() inserts a row (optionally deduplicated on dedupe_key while the
+    previous job with that key is still queued/running)
+  - workers claim the highest-priority runnable row with
+    FOR UPDATE SKIP LOCKED. Claims take a transaction-scoped advisory lock
+    first, so the per-kind running counts they check are exact across workers
+  - running jobs heartbeat; rows whose heartbeat goes stale (worker killed)
+    are requeued, failures retry with exponential backoff up to max_attempts
+  - handlers report progress with job.progress(...), stored on the row, and
+    cancellation (cancel_job) is picked up by the owning worker's heartbeat
+
+Workers run in-process (start_workers() at app startup, JOB_WORKER_SLOTS) or
+as separate processes:  python -m packages.core.job_queue --slots 4
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+
+from .db import get_pool
+
+logger = logging.getLogger(__name__)
+
+WORKER_SLOTS = int(os.getenv("JOB_WORKER_SLOTS", "4"))
+IN_PROCESS = os.getenv("JOB_WORKERS_IN_PROCESS", "1") == "1"
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL_S", "2"))
+HEARTBEAT_S = float(os.getenv("JOB_HEARTBEAT_S", "10"))
+STALE_AFTER_S = float(os.getenv("JOB_STALE_AFTER_S", "90"))
+MAX_BACKOFF_S = 3600
+
+PRIORITY_LOW = -10
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 10
+
+ACTIVE = ("queued", "running")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+# Modules that register job kinds — imported by every worker
+HANDLER_MODULES = (
+    "packages.scene_generation.scene_crud",
+    "packages.trailer.router",
+    "packages.lora_training.ingest_videos",
+    "packages.core.replenishment",
+    "packages.voice_pipeline.cloning",
+    "packages.core.quality_stats",
+    "packages.core.history_partitions",
+)
+
+_CLAIM_LOCK = 0x6A6F6273  # pg_advisory_xact_lock key serializing claims
+
+_CLAIM_SQL = """
+    WITH caps AS (
+        SELECT k.kind, k.lim - COUNT(r.id) AS free
+        FROM unnest($1::text[], $2::int[]) AS k(kind, lim)
+        LEFT JOIN jobs r ON r.kind = k.kind AND r.status = 'running'
+        GROUP BY k.kind, k.lim
+    ), nxt AS (
+        SELECT j.id FROM jobs j
+        JOIN caps c ON c.kind = j.kind AND c.free > 0
+        WHERE j.status = 'queued' AND j.run_after <= NOW()
+        ORDER BY j.priority DESC, j.run_after, j.id
+        LIMIT 1
+        FOR UPDATE OF j SKIP LOCKED
+    )
+    UPDATE jobs SET status = 'running', attempts = attempts + 1, worker_id = $3,
+                    started_at = NOW(), heartbeat_at = NOW(), error = NULL
+    FROM nxt WHERE jobs.id = nxt.id
+    RETURNING jobs.*
+"""
+
+
+@dataclass
+class JobKind:
+    name: str
+    handler: object
+    concurrency: int = 1
+    max_attempts: int = 3
+    backoff_s: float = 30.0
+
+
+_kinds: dict[str, JobKind] = {}
+_wakeup: asyncio.Event | None = None
+_workers: list["Worker"] = []
+
+
+def job_kind(name: str, concurrency: int = 1, max_attempts: int = 3, backoff_s: float = 30.0):
+    """Register an async handler(job: Job) for a job kind.
+
+    concurrency caps running jobs of this kind across all workers.
+    The handler's return value (JSON-serializable) becomes the job result.
+    """
+    def decorator(fn):
+        _kinds[name] = JobKind(name, fn, concurrency, max_attempts, backoff_s)
+        return fn
+    return decorator
+
+
+def load_handlers():
+    """Import HANDLER_MODULES so their @job_kind registrations run."""
+    for module in HANDLER_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.error(f"Job handlers from {module} unavailable: {e}")
+
+
+def backoff_delay(kind: JobKind, attempts: int) -> float:
+    """Seconds before retry number `attempts` (1-based) of a failed job."""
+    return min(kind.backoff_s * 2 ** max(attempts - 1, 0), MAX_BACKOFF_S)
+
+
+def _row_to_dict(row) -> dict:
+    job = dict(row)
+    for key in ("payload", "progress", "result"):
+        if isinstance(job.get(key), str):
+            job[key] = json.loads(job[key])
+    for key in ("run_after", "created_at", "started_at", "heartbeat_at", "finished_at"):
+        if job.get(key) is not None:
+            job[key] = job[key].isoformat()
+    return job
+
+
+# ── Producer API ──────────────────────────────────────────────────────────
+
+
+async def enqueue(
+    kind: str,
+    payload: dict | None = None,
+    priority: int = PRIORITY_NORMAL,
+    dedupe_key: str | None = None,
+    max_attempts: int | None = None,
+    delay_s: float = 0,
+) -> dict:
+    """Queue a job. Returns the job row; "deduplicated": True when an active
+    job with the same dedupe_key already existed (that job is returned)."""
+    spec = _kinds.get(kind)
+    attempts = max_attempts or (spec.max_attempts if spec else 3)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow("""
+            INSERT INTO jobs (kind, payload, priority, dedupe_key, max_attempts, run_after)
+            VALUES ($1, $2::jsonb, $3, $4, $5, NOW() + make_interval(secs => $6))
+            ON CONFLICT (dedupe_key) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING *
+        """, kind, json.dumps(payload or {}, default=str), priority, dedupe_key,
+            attempts, float(delay_s))
+        deduplicated = row is None
+        if deduplicated:
+            row = await conn.fetchrow(
+                "SELECT * FROM jobs WHERE dedupe_key = $1 AND status IN ('queued', 'running')",
+                dedupe_key,
+            )
+    if row is None:  # the duplicate finished between the two statements
+        return await enqueue(kind, payload, priority, dedupe_key, max_attempts, delay_s)
+    if _wakeup is not None:
+        _wakeup.set()
+    job = _row_to_dict(row)
+    job["deduplicated"] = deduplicated
+    if not deduplicated:
+        logger.info(f"Job {job['id']} queued: {kind} (priority {priority})")
+    return job
+
+
+async def get_job(job_id: int) -> dict | None:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow("SELECT * FROM jobs WHERE id = $1", int(job_id))
+    return _row_to_dict(row) if row else None
+
+
+async def find_job(dedupe_key: str, active_only: bool = True) -> dict | None:
+    """Most recent job with this dedupe_key (only queued/running by default)."""
+    statuses = list(ACTIVE) if active_only else list(ACTIVE + FINISHED)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow("""
+            SELECT * FROM jobs WHERE dedupe_key = $1 AND status = ANY($2::text[])
+            ORDER BY id DESC LIMIT 1
+        """, dedupe_key, statuses)
+    return _row_to_dict(row) if row else None
+
+
+async def list_jobs(kind: str | None = None, status: str | None = None, limit: int = 50) -> list[dict]:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT * FROM jobs
+            WHERE ($1::text IS NULL OR kind = $1) AND ($2::text IS NULL OR status = $2)
+            ORDER BY id DESC LIMIT $3
+        """, kind, status, limit)
+    return [_row_to_dict(r) for r in rows]
+
+
+async def cancel_job(job_id: int) -> dict | None:
+    """Cancel a job: queued rows are cancelled at once, running ones are
+    flagged and stopped by their worker on its next heartbeat."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow("""
+            UPDATE jobs SET
+                cancel_requested = TRUE,
+                status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                finished_at = CASE WHEN status = 'queued' THEN NOW() ELSE finished_at END
+            WHERE id = $1 AND status IN ('queued', 'running')
+            RETURNING *
+        """, int(job_id))
+    for worker in _workers:
+        worker.cancel_local(int(job_id))
+    return _row_to_dict(row) if row else None
+
+
+async def cancel_jobs(kinds: list[str], dedupe_key: str | None = None) -> list[int]:
+    """Cancel every active job of the given kinds (optionally one dedupe_key)."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        ids = [r["id"] for r in await conn.fetch("""
+            SELECT id FROM jobs WHERE kind = ANY($1::text[]) AND status IN ('queued', 'running')
+              AND ($2::text IS NULL OR dedupe_key = $2)
+        """, kinds, dedupe_key)]
+    for job_id in ids:
+        await cancel_job(job_id)
+    return ids
+
+
+async def wait_for(job_id: int, timeout: float | None = None, interval: float = 1.0) -> dict:
+    """Poll until the job finishes; returns the final row (or the current one on timeout)."""
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    while True:
+        job = await get_job(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        if deadline is not None and loop.time() >= deadline:
+            return job
+        await asyncio.sleep(interval)
+
+
+async def queue_stats() -> dict:
+    """Job counts per kind/status, oldest queued age, and local worker state."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT kind, status, COUNT(*) AS n,
+                   EXTRACT(EPOCH FROM NOW() - MIN(created_at)) AS oldest_s
+            FROM jobs
+            WHERE status IN ('queued', 'running') OR finished_at > NOW() - INTERVAL '1 day'
+            GROUP BY kind, status
+        """)
+    kinds: dict[str, dict] = {}
+    for r in rows:
+        entry = kinds.setdefault(r["kind"], {"concurrency": getattr(_kinds.get(r["kind"]), "concurrency", None)})
+        entry[r["status"]] = r["n"]
+        if r["status"] == "queued":
+            entry["oldest_queued_s"] = round(float(r["oldest_s"] or 0), 1)
+    return {
+        "kinds": kinds,
+        "workers": [w.info() for w in _workers],
+        "registered_kinds": sorted(_kinds),
+    }
+
+
+# ── Worker side ───────────────────────────────────────────────────────────
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job was cancelled."""
+
+
+class Job:
+    """Handle passed to job handlers: payload, attempt number, progress reporting."""
+
+    def __init__(self, row: dict):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.payload = row["payload"]
+        self.attempt = row["attempts"]
+        self.max_attempts = row["max_attempts"]
+        self.cancel_requested = False
+        self._progress: dict = dict(row.get("progress") or {})
+
+    async def progress(self, **fields):
+        """Merge fields into the job's progress row (visible to status endpoints)."""
+        if self.cancel_requested:
+            raise JobCancelled(f"job {self.id} cancelled")
+        self._progress.update(fields)
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE jobs SET progress = $2::jsonb, heartbeat_at = NOW() WHERE id = $1",
+                self.id, json.dumps(self._progress, default=str),
+            )
+
+
+class Worker:
+    """Claims and runs jobs with up to `slots` handlers at once."""
+
+    def __init__(self, kinds: list[str] | None = None, slots: int = WORKER_SLOTS,
+                 worker_id: str | None = None):
+        self.kinds = kinds
+        self.slots = slots
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: dict[int, tuple[Job, asyncio.Task]] = {}
+        self._loop_task: asyncio.Task | None = None
+        self._heartbeat_task: asyncio.Task | None = None
+        self._stopping = False
+        self.claimed = 0
+
+    def _claimable(self) -> list[JobKind]:
+        names = self.kinds or list(_kinds)
+        return [_kinds[n] for n in names if n in _kinds]
+
+    async def claim(self) -> dict | None:
+        kinds = self._claimable()
+        if not kinds:
+            return None
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", _CLAIM_LOCK)
+                row = await conn.fetchrow(
+                    _CLAIM_SQL,
+                    [k.name for k in kinds], [k.concurrency for k in kinds], self.worker_id,
+                )
+        return _row_to_dict(row) if row else None
+
+    async def start(self):
+        global _wakeup
+        if _wakeup is None:
+            _wakeup = asyncio.Event()
+        self._stopping = False
+        self._loop_task = asyncio.create_task(self._claim_loop())
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"Job worker {self.worker_id} started ({self.slots} slots, "
+                    f"kinds={self.kinds or 'all'})")
+
+    async def stop(self):
+        """Stop claiming; requeue jobs still running here without using an attempt."""
+        self._stopping = True
+        for task in (self._loop_task, self._heartbeat_task):
+            if task:
+                task.cancel()
+        running = list(self._running)
+        for _job, task in self._running.values():
+            task.cancel()
+        if running:
+            try:
+                pool = await get_pool()
+                async with pool.acquire() as conn:
+                    await conn.execute("""
+                        UPDATE jobs SET status = 'queued', attempts = GREATEST(attempts - 1, 0),
+                                        worker_id = NULL, run_after = NOW()
+                        WHERE id = ANY($1::bigint[]) AND worker_id = $2 AND status = 'running'
+                    """, running, self.worker_id)
+            except Exception as e:
+                logger.warning(f"Job worker {self.worker_id}: requeue on stop failed: {e}")
+        logger.info(f"Job worker {self.worker_id} stopped ({len(running)} jobs requeued)")
+
+    def cancel_local(self, job_id: int):
+        entry = self._running.get(job_id)
+        if entry:
+            job, task = entry
+            job.cancel_requested = True
+            task.cancel()
+
+    def info(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "slots": self.slots,
+            "running": {jid: job.kind for jid, (job, _t) in self._running.items()},
+            "claimed": self.claimed,
+        }
+
+    async def _claim_loop(self):
+        while not self._stopping:
+            try:
+                claimed = False
+                if len(self._running) < self.slots:
+                    row = await self.claim()
+                    if row:
+                        claimed = True
+                        self._spawn(row)
+                if claimed:
+                    continue
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                logger.warning(f"Job worker {self.worker_id} claim failed: {e}")
+                await asyncio.sleep(POLL_INTERVAL * 5)
+
+    def _spawn(self, row: dict):
+        job = Job(row)
+        task = asyncio.create_task(self._execute(job))
+        self._running[job.id] = (job, task)
+        self.claimed += 1
+
+        def _done(_t, jid=job.id):
+            self._running.pop(jid, None)
+            if _wakeup is not None:
+                _wakeup.set()
+        task.add_done_callback(_done)
+
+    async def _execute(self, job: Job):
+        spec = _kinds[job.kind]
+        logger.info(f"Job {job.id} ({job.kind}) started, attempt {job.attempt}/{job.max_attempts}")
+        try:
+            result = await spec.handler(job)
+        except (asyncio.CancelledError, JobCancelled):
+            if self._stopping and not job.cancel_requested:
+                return  # stop() requeues it
+            await _finish(job.id, self.worker_id, "cancelled", error="cancelled")
+            logger.info(f"Job {job.id} ({job.kind}) cancelled")
+            return
+        except Exception as e:
+            if job.attempt < job.max_attempts:
+                delay = backoff_delay(spec, job.attempt)
+                await _retry(job.id, self.worker_id, delay, f"{type(e).__name__}: {e}")
+                logger.warning(f"Job {job.id} ({job.kind}) failed, retrying in {delay:.0f}s: {e}")
+            else:
+                await _finish(job.id, self.worker_id, "failed", error=f"{type(e).__name__}: {e}")
+                logger.error(f"Job {job.id} ({job.kind}) failed permanently: {e}", exc_info=True)
+            return
+        await _finish(job.id, self.worker_id, "succeeded", result=result)
+        logger.info(f"Job {job.id} ({job.kind}) succeeded")
+
+    async def _heartbeat_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.sleep(HEARTBEAT_S)
+                pool = await get_pool()
+                async with pool.acquire() as conn:
+                    if self._running:
+                        rows = await conn.fetch("""
+                            UPDATE jobs SET heartbeat_at = NOW()
+                            WHERE id = ANY($1::bigint[]) AND worker_id = $2
+                            RETURNING id, cancel_requested
+                        """, list(self._running), self.worker_id)
+                        for r in rows:
+                            if r["cancel_requested"]:
+                                self.cancel_local(r["id"])
+                    await reap_stale(conn)
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                logger.warning(f"Job worker {self.worker_id} heartbeat failed: {e}")
+
+
+# Both only touch a row this worker still owns: once reap_stale() has
+# requeued a slow worker's job, another worker may be running it.
+
+async def _finish(job_id: int, worker_id: str, status: str, result=None, error: str | None = None):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        done = await conn.execute("""
+            UPDATE jobs SET status = $3, result = $4::jsonb, error = $5,
+                            finished_at = NOW(), heartbeat_at = NOW()
+            WHERE id = $1 AND worker_id = $2 AND status = 'running'
+        """, job_id, worker_id, status,
+            json.dumps(result, default=str) if result is not None else None,
+            error[:2000] if error else None)
+    _warn_if_lost(done, job_id, worker_id, status)
+
+
+async def _retry(job_id: int, worker_id: str, delay: float, error: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        done = await conn.execute("""
+            UPDATE jobs SET status = 'queued', worker_id = NULL, error = $4,
+                            run_after = NOW() + make_interval(secs => $3)
+            WHERE id = $1 AND worker_id = $2 AND status = 'running'
+        """, job_id, worker_id, float(delay), error[:2000])
+    _warn_if_lost(done, job_id, worker_id, "retry")
+
+
+def _warn_if_lost(command_tag, job_id: int, worker_id: str, outcome: str):
+    if command_tag == "UPDATE 0":
+        logger.warning(f"Job {job_id}: {worker_id} no longer owns it (requeued after a "
+                       f"missed heartbeat?) — {outcome} result discarded")
+
+
+async def reap_stale(conn) -> int:
+    """Requeue (or fail, if out of attempts) running jobs whose worker went silent."""
+    rows = await conn.fetch("""
+        UPDATE jobs SET
+            status = CASE WHEN cancel_requested THEN 'cancelled'
+                          WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            finished_at = CASE WHEN cancel_requested OR attempts >= max_attempts
+                               THEN NOW() ELSE NULL END,
+            error = 'worker heartbeat lost', worker_id = NULL, run_after = NOW()
+        WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => $1)
+        RETURNING id, kind, status
+    """, float(STALE_AFTER_S))
+    for r in rows:
+        logger.warning(f"Job {r['id']} ({r['kind']}) lost its worker → {r['status']}")
+    return len(rows)
+
+
+async def start_workers():
+    """Start the in-process worker (JOB_WORKERS_IN_PROCESS=0 leaves all work
+    to separate `python -m packages.core.job_queue` processes)."""
+    load_handlers()
+    if not IN_PROCESS or _workers:
+        return
+    worker = Worker()
+    _workers.append(worker)
+    await worker.start()
+
+
+async def stop_workers():
+    while _workers:
+        await _workers.pop().stop()
+
+
+async def _main(kinds: list[str] | None, slots: int):
+    load_handlers()
+    worker = Worker(kinds=kinds, slots=slots)
+    _workers.append(worker)
+    await worker.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a job queue worker")
+    parser.add_argument("--kinds", default="", help="comma-separated job kinds (default: all)")
+    parser.add_argument("--slots", type=int, default=WORKER_SLOTS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(_main([k for k in args.kinds.split(",") if k] or None, args.slots))
+    except KeyboardInterrupt:
+        pass
@@ -3,7 +3,8 @@
 Adapted from /opt/anime-studio/quality/learning_system.py (800 LOC standalone)
 into a streamlined module that uses our asyncpg pool and new Phase 1 tables.
 
-No sklearn/numpy dependency — pattern analysis done via SQL aggregation.
+No sklearn/numpy dependency — pattern analysis done via SQL aggregation, or
+from the incremental aggregates in quality_stats once they have been built.
 
 Key functions:
     suggest_params(slug)   → dict of optimal params for a character
@@ -15,6 +16,7 @@ Key functions:
 import logging
 from typing import Any
 
+from . import quality_stats
 from .db import get_pool
 from .events import event_bus, IMAGE_REJECTED, IMAGE_APPROVED
 
@@ -24,7 +26,7 @@ logger = logging.getLogger(__name__)
 MIN_SAMPLES = 5
 
 # Quality threshold for "successful" generation
-SUCCESS_THRESHOLD = 0.7
+SUCCESS_THRESHOLD = quality_stats.SUCCESS_THRESHOLD
 
 
 async def suggest_params(character_slug: str, checkpoint_model: str = None) -> dict[str, Any]:
@@ -38,6 +40,12 @@ async def suggest_params(character_slug: str, checkpoint_model: str = None) -> d
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
+            stats = await quality_stats.params(conn, character_slug, checkpoint_model, SUCCESS_THRESHOLD)
+            if stats is not None:
+                if stats["sample_count"] < MIN_SAMPLES:
+                    return {}
+                return _suggestions(stats, stats["top_sampler"])
+
             # Get median params from successful generations
             _ckpt_filter = " AND checkpoint_model = $3" if checkpoint_model else ""
             _params = [character_slug, SUCCESS_THRESHOLD]
@@ -77,26 +85,28 @@ async def suggest_params(character_slug: str, checkpoint_model: str = None) -> d
                 LIMIT 1
             """, *_params)
 
-            suggestions = {
-                "sample_count": row["sample_count"],
-                "avg_quality": round(float(row["avg_quality"]), 3),
-                "cfg_scale": round(float(row["median_cfg"]), 1) if row["median_cfg"] else None,
-                "steps": int(row["median_steps"]) if row["median_steps"] else None,
-                "width": int(row["median_width"]) if row["median_width"] else None,
-                "height": int(row["median_height"]) if row["median_height"] else None,
-            }
-
-            if sampler_row:
-                suggestions["sampler"] = sampler_row["sampler"]
-                suggestions["sampler_avg_quality"] = round(float(sampler_row["avg_q"]), 3)
-
-            return suggestions
+            return _suggestions(row, sampler_row)
 
     except Exception as e:
         logger.warning(f"Failed to suggest params for {character_slug}: {e}")
         return {}
 
 
+def _suggestions(row, sampler_row) -> dict[str, Any]:
+    suggestions = {
+        "sample_count": row["sample_count"],
+        "avg_quality": round(float(row["avg_quality"]), 3),
+        "cfg_scale": round(float(row["median_cfg"]), 1) if row["median_cfg"] else None,
+        "steps": int(row["median_steps"]) if row["median_steps"] else None,
+        "width": int(row["median_width"]) if row["median_width"] else None,
+        "height": int(row["median_height"]) if row["median_height"] else None,
+    }
+    if sampler_row:
+        suggestions["sampler"] = sampler_row["sampler"]
+        suggestions["sampler_avg_quality"] = round(float(sampler_row["avg_q"]), 3)
+    return suggestions
+
+
 async def rejection_patterns(character_slug: str, limit: int = 10) -> list[dict]:
     """Get top rejection categories for a character, ordered by frequency.
 
@@ -139,6 +149,9 @@ async def checkpoint_rankings(project_name: str) -> list[dict]:
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
+            ranked = await quality_stats.checkpoint_table(conn, project_name)
+            if ranked is not None:
+                return ranked
             rows = await conn.fetch("""
                 SELECT
                     checkpoint_model,
@@ -177,8 +190,13 @@ async def quality_trend(character_slug: str = None, project_name: str = None, da
     Returns list of {date, avg_quality, count, approved, rejected}.
     """
     try:
+        if not character_slug and not project_name:
+            return []
         pool = await get_pool()
         async with pool.acquire() as conn:
+            trend = await quality_stats.trend(conn, character_slug, project_name, days)
+            if trend is not None:
+                return trend
             if character_slug:
                 rows = await conn.fetch("""
                     SELECT
@@ -194,7 +212,7 @@ async def quality_trend(character_slug: str = None, project_name: str = None, da
                     GROUP BY gen_date
                     ORDER BY gen_date
                 """, character_slug, str(days))
-            elif project_name:
+            else:
                 rows = await conn.fetch("""
                     SELECT
                         DATE(generated_at) as gen_date,
@@ -209,8 +227,6 @@ async def quality_trend(character_slug: str = None, project_name: str = None, da
                     GROUP BY gen_date
                     ORDER BY gen_date
                 """, project_name, str(days))
-            else:
-                return []
 
             return [
                 {
@@ -0,0 +1,290 @@
+"""Media delivery — cached path lookups, HTTP range/conditional responses, renditions.
+
+Shot/scene/episode media endpoints used to open a DB connection per request
+and hand the full-resolution file to FileResponse (which, on the pinned
+Starlette, ignores Range). Reviewers scrubbing through dozens of shots pulled
+every MP4 in full. This module provides:
+
+  - lookup_path(): entity id → row cache. Rows owned by a project stay valid
+    until that project's change counter moves (project_versions); rows
+    without a project are cached only once they are final.
+  - serve_file(): ETag / Last-Modified with 304s, single-range 206 responses
+    (416 when unsatisfiable), Accept-Ranges on everything.
+  - rendition="preview" (360p low-bitrate H.264) and "poster" (JPEG first
+    frame) generated lazily by ffmpeg in a bounded background pool and cached
+    under output/media_cache, keyed by source path + size + mtime. If a
+    rendition is not ready within RENDITION_WAIT_S the full file is served and
+    the job keeps running for the next request.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from .auth import TTLCache
+from .config import _PROJECT_DIR
+from .project_versions import current_version
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_DIR = _PROJECT_DIR / "output" / "media_cache"
+MEDIA_CACHE_MAX_BYTES = int(float(os.getenv("MEDIA_CACHE_MAX_GB", "10")) * 1024 ** 3)
+RENDITION_WORKERS = int(os.getenv("MEDIA_RENDITION_WORKERS", "2"))
+RENDITION_WAIT_S = float(os.getenv("MEDIA_RENDITION_WAIT_S", "20"))
+RENDITIONS = ("full", "preview", "poster")
+CHUNK_SIZE = 256 * 1024
+
+_RENDITION_SPECS = {
+    "preview": (".mp4", "video/mp4", [
+        "-vf", "scale=-2:360", "-c:v", "libx264", "-preset", "veryfast", "-crf", "32",
+        "-c:a", "aac", "-b:a", "64k", "-movflags", "+faststart",
+    ]),
+    "poster": (".jpg", "image/jpeg", ["-vframes", "1", "-vf", "scale=-2:360", "-q:v", "4"]),
+}
+
+# (kind, entity_id) → (row, project_id, version)
+_paths = TTLCache(maxsize=8192, ttl=3600)
+_stats = {"lookups": 0, "lookup_hits": 0, "ranges": 0, "not_modified": 0,
+          "renditions_built": 0, "rendition_fallbacks": 0}
+_inflight: dict[Path, asyncio.Task] = {}
+_pool: asyncio.Semaphore | None = None
+
+
+# ── Path lookups ──────────────────────────────────────────────────────────
+
+
+async def lookup_path(kind: str, entity_id, fetch, final=None) -> dict | None:
+    """Cached row for an entity: fetch() → (row dict | None, project_id | None).
+
+    Project-owned rows are reused while project_versions says the project is
+    unchanged. Rows without a project are reused only if final(row) is true
+    (e.g. a finished job whose output_path will not move again).
+    """
+    _stats["lookups"] += 1
+    key = (kind, str(entity_id))
+    cached = _paths.get(key)
+    if cached is not None:
+        row, project_id, version = cached
+        if project_id is None or (version is not None and version == current_version(project_id)):
+            _stats["lookup_hits"] += 1
+            return row
+
+    row, project_id = await fetch()
+    if row is None:
+        return None
+    if project_id is not None:
+        version = current_version(project_id)
+        if version is not None:
+            _paths.set(key, (row, project_id, version))
+    elif final is not None and final(row):
+        _paths.set(key, (row, None, None))
+    return row
+
+
+def forget_path(kind: str, entity_id):
+    """Drop a cached lookup (after the entity's media was replaced or deleted)."""
+    _paths.pop((kind, str(entity_id)))
+
+
+# ── Renditions ────────────────────────────────────────────────────────────
+
+
+def _rendition_dest(src: Path, st: os.stat_result, rendition: str) -> Path:
+    ext = _RENDITION_SPECS[rendition][0]
+    key = hashlib.sha1(f"{src}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()[:24]
+    return MEDIA_CACHE_DIR / rendition / f"{key}{ext}"
+
+
+async def _build_rendition(src: Path, dest: Path, rendition: str) -> Path | None:
+    global _pool
+    if _pool is None:
+        _pool = asyncio.Semaphore(RENDITION_WORKERS)
+    ext, _media_type, args = _RENDITION_SPECS[rendition]
+    async with _pool:
+        if dest.exists():
+            return dest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.stem}.tmp{ext}")
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-y", "-loglevel", "error", "-i", str(src), *args, str(tmp),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await proc.communicate()
+        if proc.returncode != 0 or not tmp.exists():
+            logger.warning(f"{rendition} rendition failed for {src.name}: {stderr.decode()[-300:]}")
+            tmp.unlink(missing_ok=True)
+            return None
+        os.replace(tmp, dest)
+    _stats["renditions_built"] += 1
+    await asyncio.to_thread(_prune_cache)
+    return dest
+
+
+def _prune_cache():
+    """Delete least recently built renditions beyond MEDIA_CACHE_MAX_BYTES."""
+    files = []
+    for p in MEDIA_CACHE_DIR.glob("*/*"):
+        if not p.name.startswith("."):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+    total = sum(size for _, size, _ in files)
+    for _, size, p in sorted(files):
+        if total <= MEDIA_CACHE_MAX_BYTES:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+
+
+async def get_rendition(src: Path, rendition: str) -> Path | None:
+    """Cached rendition of src, building it if needed. None = serve the original."""
+    try:
+        st = src.stat()
+    except OSError:
+        return None
+    dest = _rendition_dest(src, st, rendition)
+    if dest.exists():
+        return dest
+    task = _inflight.get(dest)
+    if task is None:
+        task = asyncio.create_task(_build_rendition(src, dest, rendition))
+        _inflight[dest] = task
+        task.add_done_callback(lambda _t: _inflight.pop(dest, None))
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), RENDITION_WAIT_S)
+    except asyncio.TimeoutError:
+        _stats["rendition_fallbacks"] += 1
+        return None
+
+
+# ── Responses ─────────────────────────────────────────────────────────────
+
+
+def _etag(st: os.stat_result) -> str:
+    # Same formula as Starlette's FileResponse, so 200 and 206/304 tags agree
+    base = f"{st.st_mtime}-{st.st_size}"
+    return f'"{hashlib.md5(base.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """(start, end) inclusive for a single "bytes=" range; None = ignore header.
+
+    Raises HTTPException(416) when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # multi-range: serve the full entity instead
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm:
+        return inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def _iter_range(path: Path, start: int, length: int):
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+async def serve_file(
+    request: Request,
+    path: str | Path,
+    media_type: str,
+    filename: str | None = None,
+    rendition: str = "full",
+) -> Response:
+    """Serve a media file with range/conditional support and optional rendition."""
+    path = Path(path)
+    if rendition not in RENDITIONS:
+        raise HTTPException(400, f"Unknown rendition. Use: {list(RENDITIONS)}")
+    if rendition != "full" and media_type.startswith("video/"):
+        derived = await get_rendition(path, rendition)
+        if derived is not None:
+            path = derived
+            media_type = _RENDITION_SPECS[rendition][1]
+            if filename:
+                filename = f"{Path(filename).stem}_{rendition}{derived.suffix}"
+
+    try:
+        st = path.stat()
+    except OSError:
+        raise HTTPException(404, "Media file not found")
+    etag = _etag(st)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+    }
+    if _not_modified(request, etag, st.st_mtime):
+        _stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, st.st_size)
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            _stats["ranges"] += 1
+            headers.update({
+                "Content-Range": f"bytes {start}-{end}/{st.st_size}",
+                "Content-Length": str(length),
+            })
+            return StreamingResponse(
+                _iter_range(path, start, length), status_code=206,
+                media_type=media_type, headers=headers,
+            )
+
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers,
+                        stat_result=st)
+
+
+def media_stats() -> dict:
+    """Lookup cache hit rate, range/304 counts and rendition jobs."""
+    lookups = _stats["lookups"]
+    return {
+        **_stats,
+        "lookup_hit_rate": round(_stats["lookup_hits"] / lookups, 3) if lookups else None,
+        "cached_paths": len(_paths),
+        "renditions_inflight": len(_inflight),
+    }
@@ -15,6 +15,7 @@ import random
 from pathlib import Path
 from typing import Any
 
+from . import quality_stats
 from .db import get_pool
 from .model_profiles import MODEL_PROFILES, get_model_profile
 
@@ -24,7 +25,7 @@ logger = logging.getLogger(__name__)
 MIN_CONFIDENCE_SAMPLES = 5
 
 # Quality threshold: only learn from images that scored well
-QUALITY_FLOOR = 0.65
+QUALITY_FLOOR = quality_stats.QUALITY_FLOOR
 
 # Drift detection: alert if rolling avg drops below this
 DRIFT_ALERT_THRESHOLD = 0.55
@@ -49,7 +50,10 @@ async def recommend_params(character_slug: str, project_name: str = None,
         async with pool.acquire() as conn:
             # 1. Get successful generation stats for this character
             # Filter by checkpoint_model when provided to prevent cross-model contamination
-            if checkpoint_model:
+            stats = await quality_stats.params(conn, character_slug, checkpoint_model, QUALITY_FLOOR)
+            if stats is not None:
+                param_row = stats
+            elif checkpoint_model:
                 param_row = await conn.fetchrow("""
                     SELECT
                         COUNT(*) as sample_count,
@@ -95,7 +99,10 @@ async def recommend_params(character_slug: str, project_name: str = None,
 
             # 2. Best checkpoint for this project (unfiltered — compare all models)
             checkpoint_rec = None
-            if project_name:
+            ckpt_row = None
+            if project_name and stats is not None:
+                ckpt_row = await quality_stats.best_checkpoint(conn, project_name, QUALITY_FLOOR)
+            elif project_name:
                 ckpt_row = await conn.fetchrow("""
                     SELECT checkpoint_model, AVG(quality_score) as avg_q, COUNT(*) as n
                     FROM generation_history
@@ -108,14 +115,14 @@ async def recommend_params(character_slug: str, project_name: str = None,
                     ORDER BY avg_q DESC
                     LIMIT 1
                 """, project_name, QUALITY_FLOOR)
-                if ckpt_row:
-                    checkpoint_rec = {
-                        "model": ckpt_row["checkpoint_model"],
-                        "avg_quality": round(float(ckpt_row["avg_q"]), 3),
-                        "sample_count": ckpt_row["n"],
-                    }
-                    if checkpoint_model and ckpt_row["checkpoint_model"] != checkpoint_model:
-                        checkpoint_rec["note"] = f"Current model ({checkpoint_model}) differs from best ({ckpt_row['checkpoint_model']})"
+            if ckpt_row:
+                checkpoint_rec = {
+                    "model": ckpt_row["checkpoint_model"],
+                    "avg_quality": round(float(ckpt_row["avg_q"]), 3),
+                    "sample_count": ckpt_row["n"],
+                }
+                if checkpoint_model and ckpt_row["checkpoint_model"] != checkpoint_model:
+                    checkpoint_rec["note"] = f"Current model ({checkpoint_model}) differs from best ({ckpt_row['checkpoint_model']})"
 
             # 3. Learned negative prompt additions from rejection patterns
             negatives = await _get_learned_negatives(conn, character_slug, checkpoint_model)
@@ -189,6 +196,10 @@ async def detect_drift(character_slug: str = None, project_name: str = None,
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
+            alerts = await quality_stats.drift(conn, character_slug, project_name, window,
+                                               MIN_CONFIDENCE_SAMPLES, DRIFT_ALERT_THRESHOLD)
+            if alerts is not None:
+                return alerts
             if character_slug:
                 where_clause = "WHERE gh.character_slug = $1 AND gh.quality_score IS NOT NULL"
                 args = [character_slug]
@@ -250,6 +261,9 @@ async def character_quality_summary(project_name: str) -> list[dict]:
     try:
         pool = await get_pool()
         async with pool.acquire() as conn:
+            summary = await quality_stats.character_summary(conn, project_name)
+            if summary is not None:
+                return summary
             rows = await conn.fetch("""
                 SELECT
                     character_slug,
@@ -332,18 +346,18 @@ async def checkpoint_comparison(project_name: str) -> list[dict]:
             rows = await conn.fetch("""
                 SELECT
                     checkpoint_model,
-                    COUNT(*) as total,
-                    COUNT(*) FILTER (WHERE quality_score IS NOT NULL) as scored,
-                    AVG(quality_score) FILTER (WHERE quality_score IS NOT NULL) as avg_quality,
-                    MAX(quality_score) as best_quality,
-                    COUNT(*) FILTER (WHERE status = 'approved') as approved,
-                    COUNT(*) FILTER (WHERE status = 'rejected') as rejected,
-                    MAX(generated_at) as last_used
-                FROM generation_history
+                    SUM(generations) as total,
+                    SUM(scored) as scored,
+                    SUM(sum_quality) / NULLIF(SUM(scored), 0) as avg_quality,
+                    MAX(max_quality) as best_quality,
+                    COALESCE(SUM(generations) FILTER (WHERE status = 'approved'), 0) as approved,
+                    COALESCE(SUM(generations) FILTER (WHERE status = 'rejected'), 0) as rejected,
+                    MAX(last_at) as last_used
+                FROM generation_history_summary
                 WHERE project_name = $1
                   AND checkpoint_model IS NOT NULL
                 GROUP BY checkpoint_model
-                ORDER BY AVG(quality_score) FILTER (WHERE quality_score IS NOT NULL) DESC NULLS LAST
+                ORDER BY SUM(sum_quality) / NULLIF(SUM(scored), 0) DESC NULLS LAST
             """, project_name)
 
             return [
@@ -400,11 +414,11 @@ async def suggest_exploration(
             tried_rows = await conn.fetch("""
                 SELECT
                     checkpoint_model,
-                    COUNT(*) as n,
-                    AVG(quality_score) FILTER (WHERE quality_score IS NOT NULL) as avg_q,
-                    COUNT(*) FILTER (WHERE status = 'approved') as approved,
-                    COUNT(*) FILTER (WHERE status = 'rejected') as rejected
-                FROM generation_history
+                    SUM(generations) as n,
+                    SUM(sum_quality) / NULLIF(SUM(scored), 0) as avg_q,
+                    COALESCE(SUM(generations) FILTER (WHERE status = 'approved'), 0) as approved,
+                    COALESCE(SUM(generations) FILTER (WHERE status = 'rejected'), 0) as rejected
+                FROM generation_history_summary
                 WHERE character_slug = $1
                   AND checkpoint_model IS NOT NULL
                 GROUP BY checkpoint_model
@@ -520,9 +520,10 @@ async def _tick_loop():
                         await load_adaptive_cache()
                     except Exception as _ac_err:
                         logger.debug(f"Adaptive cache refresh failed: {_ac_err}")
-                # Refresh LoRA effectiveness aggregates every 60 ticks (~60 min)
+                # Reconcile LoRA effectiveness every 360 ticks (~6 h) — safety net;
+                # per-shot updates arrive via SHOT_QC_RECORDED
                 _lora_eff_refresh_counter += 1
-                if _lora_eff_refresh_counter >= 60:
+                if _lora_eff_refresh_counter >= 360:
                     _lora_eff_refresh_counter = 0
                     try:
                         from packages.scene_generation.lora_effectiveness import refresh_effectiveness
@@ -6,8 +6,8 @@ re-exported by orchestrator.py so external callers are unaffected.
 
 import json
 import logging
-from pathlib import Path
 
+from .asset_registry import registry as assets
 from .config import BASE_PATH, COMFYUI_URL
 
 logger = logging.getLogger(__name__)
@@ -54,10 +54,10 @@ def _gate_training_data(slug: str, training_target: int) -> dict:
 
 def _gate_lora_training(slug: str) -> dict:
     """Check if LoRA safetensors file exists on disk."""
-    lora_dir = Path("/opt/ComfyUI/models/loras")
+    lora_dir = assets.root / "loras"
     sd15_path = lora_dir / f"{slug}_lora.safetensors"
     sdxl_path = lora_dir / f"{slug}_xl_lora.safetensors"
-    exists = sd15_path.exists() or sdxl_path.exists()
+    exists = assets.exists("loras", sd15_path.name) or assets.exists("loras", sdxl_path.name)
 
     if exists:
         return {
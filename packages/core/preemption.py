@@ -0,0 +1,341 @@
+"""GPU render preemption — cancellation tokens and priority classes for ComfyUI work.
+
+Every ComfyUI submission goes through post_prompt(). It runs under the
+CancelToken of the enclosing render_scope() (a context variable, so it follows
+the call through engine dispatchers, helpers and offload() threads without
+changing their signatures):
+
+  - Priority: each scope has a class, interactive > review > batch. A
+    submission above batch is placed ahead of the first pending prompt of a
+    lower class (ComfyUI orders its queue by the prompt "number"; we pick a
+    number between the neighbours). Batch work is appended as before.
+  - Cancellation: cancel_scope()/cancel_all() — or the task running the scope
+    being cancelled — removes the scope's pending prompts from the ComfyUI
+    queue (POST /queue {"delete": [...]}) and interrupts the one that is
+    running (POST /interrupt). Poll loops see was_cancelled() and return.
+  - Metrics: GPU-seconds reclaimed. A dequeued prompt reclaims its expected
+    runtime; an interrupted one reclaims expected runtime minus time since
+    submission (a lower bound, since queue wait is counted as run time).
+    Expected runtimes are an EWMA of observed submit→finish times per kind.
+
+Scopes nest: a scene scope opened inside a project pipeline scope is
+cancelled with it.
+"""
+
+import contextvars
+import json
+import logging
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from packages.core.config import COMFYUI_URL
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+REVIEW = "review"
+BATCH = "batch"
+PRIORITY_RANK = {BATCH: 0, REVIEW: 1, INTERACTIVE: 2}
+
+# Fallback runtime estimates (seconds) until real renders have been observed
+DEFAULT_RUNTIME_S = {
+    "keyframe": 20, "image": 20, "postprocess": 120,
+    "wan": 240, "ltx": 90, "framepack": 300, "render": 120,
+}
+_EWMA_ALPHA = 0.2
+_MAX_TRACKED = 4096
+_STALE_AFTER_S = 6 * 3600
+
+
+class RenderCancelled(Exception):
+    """Raised when submitting under a cancelled scope."""
+
+
+@dataclass
+class _Prompt:
+    prompt_id: str
+    url: str
+    kind: str
+    priority: str
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+class CancelToken:
+    def __init__(self, scope: str, priority: str = BATCH, parent: "CancelToken | None" = None):
+        if priority not in PRIORITY_RANK:
+            raise ValueError(f"Unknown priority {priority!r}. Use: {list(PRIORITY_RANK)}")
+        self.scope = scope
+        self.priority = priority
+        self.parent = parent
+        self.reason: str | None = None
+        self.prompts: dict[str, _Prompt] = {}
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise RenderCancelled(f"{self.scope}: {self.reason or (self.parent and self.parent.reason)}")
+
+    def cancel(self, reason: str = "cancelled") -> dict:
+        """Mark cancelled and pull this scope's (and child scopes') prompts off the GPU."""
+        with _lock:
+            tokens = [self] + [t for t in _tokens.values() if _descends_from(t, self)]
+            for token in tokens:
+                token._cancelled = True
+                token.reason = token.reason or reason
+            prompts = [p for t in tokens for p in t.prompts.values() if p.prompt_id in _active]
+        result = _cancel_prompts(prompts)
+        logger.info(
+            f"Cancelled render scope {self.scope} ({reason}): {result['dequeued']} dequeued, "
+            f"{result['interrupted']} interrupted, ~{result['gpu_seconds_reclaimed']:.0f} GPU-s reclaimed"
+        )
+        return {"scope": self.scope, **result}
+
+    def to_dict(self) -> dict:
+        return {
+            "scope": self.scope,
+            "priority": self.priority,
+            "cancelled": self.cancelled,
+            "reason": self.reason,
+            "active_prompts": [pid for pid in self.prompts if pid in _active],
+        }
+
+
+_lock = threading.RLock()
+_current: contextvars.ContextVar[CancelToken | None] = contextvars.ContextVar("render_token", default=None)
+_tokens: dict[str, CancelToken] = {}
+_active: OrderedDict[str, _Prompt] = OrderedDict()
+_cancelled_ids: OrderedDict[str, str] = OrderedDict()
+_runtime_s: dict[str, float] = {}
+_metrics = {
+    "submitted": {name: 0 for name in PRIORITY_RANK},
+    "queue_jumps": {name: 0 for name in PRIORITY_RANK},
+    "cancelled_scopes": 0,
+    "dequeued": 0,
+    "interrupted": 0,
+    "gpu_seconds_reclaimed": 0.0,
+}
+
+
+def _descends_from(token: CancelToken, ancestor: CancelToken) -> bool:
+    parent = token.parent
+    while parent is not None:
+        if parent is ancestor:
+            return True
+        parent = parent.parent
+    return False
+
+
+@contextmanager
+def render_scope(scope: str, priority: str | None = None):
+    """Run a block under a cancellation token registered as `scope`.
+
+    priority defaults to the enclosing scope's class (or batch). If the block is
+    cancelled (task.cancel()), the scope's prompts are removed from ComfyUI.
+    """
+    parent = _current.get()
+    token = CancelToken(scope, priority or (parent.priority if parent else BATCH), parent=parent)
+    with _lock:
+        _tokens[scope] = token
+    reset = _current.set(token)
+    try:
+        yield token
+    except BaseException as e:
+        if not isinstance(e, Exception) and token.prompts:
+            # Task cancelled / shutting down — don't leave its renders on the GPU
+            threading.Thread(target=token.cancel, args=("task cancelled",), daemon=True).start()
+        raise
+    finally:
+        _current.reset(reset)
+        with _lock:
+            if _tokens.get(scope) is token:
+                del _tokens[scope]
+
+
+def current_token() -> CancelToken | None:
+    return _current.get()
+
+
+def current_priority() -> str:
+    token = _current.get()
+    return token.priority if token else BATCH
+
+
+def is_cancelled() -> bool:
+    """True when the enclosing render scope has been cancelled."""
+    token = _current.get()
+    return token is not None and token.cancelled
+
+
+def was_cancelled(prompt_id: str | None) -> bool:
+    """True when this prompt was pulled from ComfyUI by a cancellation."""
+    return bool(prompt_id) and (prompt_id in _cancelled_ids or is_cancelled())
+
+
+# ── Submission ────────────────────────────────────────────────────────────
+
+
+def _http(url: str, body: dict | None = None, timeout: float = 5):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"} if data else {})
+    resp = urllib.request.urlopen(req, timeout=timeout)
+    raw = resp.read()
+    return json.loads(raw) if raw else None
+
+
+def queue_number_for(pending: list, priority: str) -> float | None:
+    """Queue number that places a `priority` prompt ahead of lower classes.
+
+    pending is ComfyUI's queue_pending ([number, prompt_id, ...] items, any
+    order). Untracked prompts count as batch. None means append normally.
+    """
+    rank = PRIORITY_RANK[priority]
+    if rank == 0 or not pending:
+        return None
+    ordered = sorted(pending, key=lambda item: item[0])
+    for i, item in enumerate(ordered):
+        tracked = _active.get(item[1]) if len(item) > 1 else None
+        if PRIORITY_RANK[tracked.priority if tracked else BATCH] < rank:
+            if i == 0:
+                return item[0] - 1
+            return (ordered[i - 1][0] + item[0]) / 2
+    return None
+
+
+def post_prompt(workflow: dict, comfyui_url: str | None = None, kind: str = "render") -> str:
+    """POST a workflow to ComfyUI under the current render scope; return the prompt_id."""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+    priority = token.priority if token else BATCH
+    url = comfyui_url or COMFYUI_URL
+    body = {"prompt": workflow}
+    if priority != BATCH:
+        try:
+            number = queue_number_for(_http(f"{url}/queue").get("queue_pending", []), priority)
+        except Exception as e:
+            logger.warning(f"Priority placement skipped ({url}): {e}")
+            number = None
+        if number is not None:
+            body["number"] = number
+            _metrics["queue_jumps"][priority] += 1
+    prompt_id = (_http(f"{url}/prompt", body, timeout=30) or {}).get("prompt_id", "")
+    if prompt_id:
+        track(prompt_id, url, kind, priority)
+    return prompt_id
+
+
+def track(prompt_id: str, comfyui_url: str | None, kind: str = "render", priority: str | None = None):
+    """Register a prompt submitted outside post_prompt() with the current scope."""
+    token = _current.get()
+    entry = _Prompt(prompt_id, comfyui_url or COMFYUI_URL, kind,
+                    priority or (token.priority if token else BATCH))
+    now = time.monotonic()
+    with _lock:
+        _active[prompt_id] = entry
+        while _active and (len(_active) > _MAX_TRACKED
+                           or now - next(iter(_active.values())).submitted_at > _STALE_AFTER_S):
+            _active.popitem(last=False)
+        if token is not None:
+            token.prompts[prompt_id] = entry
+    _metrics["submitted"][entry.priority] += 1
+
+
+def finish(prompt_id: str | None, ok: bool = True):
+    """Mark a prompt done; successful runs update the runtime estimate for its kind."""
+    with _lock:
+        entry = _active.pop(prompt_id, None) if prompt_id else None
+    if entry is None or not ok:
+        return
+    elapsed = time.monotonic() - entry.submitted_at
+    previous = _runtime_s.get(entry.kind)
+    _runtime_s[entry.kind] = elapsed if previous is None else previous + _EWMA_ALPHA * (elapsed - previous)
+
+
+def expected_runtime(kind: str) -> float:
+    return _runtime_s.get(kind, DEFAULT_RUNTIME_S.get(kind, DEFAULT_RUNTIME_S["render"]))
+
+
+# ── Cancellation ──────────────────────────────────────────────────────────
+
+
+def _cancel_prompts(prompts: list[_Prompt]) -> dict:
+    dequeued = interrupted = 0
+    reclaimed = 0.0
+    by_url: dict[str, list[_Prompt]] = {}
+    for p in prompts:
+        by_url.setdefault(p.url, []).append(p)
+    now = time.monotonic()
+    for url, entries in by_url.items():
+        try:
+            queue = _http(f"{url}/queue")
+        except Exception as e:
+            logger.warning(f"Cancel: cannot read ComfyUI queue at {url}: {e}")
+            continue
+        running = {item[1] for item in queue.get("queue_running", []) if len(item) > 1}
+        pending = {item[1] for item in queue.get("queue_pending", []) if len(item) > 1}
+        to_delete = [p for p in entries if p.prompt_id in pending]
+        if to_delete:
+            try:
+                _http(f"{url}/queue", {"delete": [p.prompt_id for p in to_delete]})
+                dequeued += len(to_delete)
+                reclaimed += sum(expected_runtime(p.kind) for p in to_delete)
+            except Exception as e:
+                logger.warning(f"Cancel: queue delete failed at {url}: {e}")
+                to_delete = []
+        to_interrupt = [p for p in entries if p.prompt_id in running]
+        for p in to_interrupt:
+            try:
+                # Newer ComfyUI only interrupts the matching prompt; older ones
+                # interrupt whatever runs — which we just checked is this one
+                _http(f"{url}/interrupt", {"prompt_id": p.prompt_id})
+                interrupted += 1
+                reclaimed += max(expected_runtime(p.kind) - (now - p.submitted_at), 0.0)
+            except Exception as e:
+                logger.warning(f"Cancel: interrupt failed at {url}: {e}")
+        with _lock:
+            for p in entries:
+                _active.pop(p.prompt_id, None)
+                _cancelled_ids[p.prompt_id] = p.kind
+            while len(_cancelled_ids) > _MAX_TRACKED:
+                _cancelled_ids.popitem(last=False)
+    _metrics["cancelled_scopes"] += 1
+    _metrics["dequeued"] += dequeued
+    _metrics["interrupted"] += interrupted
+    _metrics["gpu_seconds_reclaimed"] += reclaimed
+    return {"dequeued": dequeued, "interrupted": interrupted, "gpu_seconds_reclaimed": round(reclaimed, 1)}
+
+
+def cancel_scope(scope: str, reason: str = "cancelled") -> dict | None:
+    """Cancel a registered render scope. None if no such scope is running."""
+    with _lock:
+        token = _tokens.get(scope)
+    return token.cancel(reason) if token else None
+
+
+def cancel_all(reason: str = "cancelled") -> list[dict]:
+    """Cancel every registered top-level render scope."""
+    with _lock:
+        roots = [t for t in _tokens.values() if t.parent is None]
+    return [token.cancel(reason) for token in roots]
+
+
+def preemption_stats() -> dict:
+    with _lock:
+        active = list(_active.values())
+        scopes = [t.to_dict() for t in _tokens.values()]
+    return {
+        **_metrics,
+        "gpu_seconds_reclaimed": round(_metrics["gpu_seconds_reclaimed"], 1),
+        "active_prompts": {name: sum(1 for p in active if p.priority == name) for name in PRIORITY_RANK},
+        "scopes": scopes,
+        "expected_runtime_s": {kind: round(expected_runtime(kind), 1)
+                               for kind in sorted(set(DEFAULT_RUNTIME_S) | set(_runtime_s))},
+    }
@@ -0,0 +1,128 @@
+"""Per-project change counters for conditional GETs.
+
+Triggers on projects-owned tables (scenes, shots, episodes, episode_scenes)
+pg_notify('project_changed', project_id) on every write, from any writer —
+routers, builder, orchestrator, generation loop. One LISTEN connection bumps
+an in-memory counter per project, so read endpoints can build an ETag and
+answer If-None-Match with 304 without touching the database.
+
+The counters are only trustworthy while the listener is connected. The epoch
+changes on every (re)connect, so ETags issued before a gap never match again,
+and while disconnected project_etag() returns None (always a full response).
+"""
+
+import asyncio
+import hashlib
+import logging
+import uuid
+
+from fastapi import Request, Response
+
+from .db import connect_direct
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "project_changed"
+RECONNECT_DELAY = 5
+
+_versions: dict[int, int] = {}
+_epoch: str | None = None
+_conn = None
+_reconnect_task: asyncio.Task | None = None
+_stopping = False
+
+
+def _on_notify(conn, pid, channel, payload):
+    try:
+        bump(int(payload))
+    except ValueError:
+        pass
+
+
+def _on_terminate(conn):
+    global _epoch, _conn
+    _epoch = None
+    _conn = None
+    if not _stopping:
+        logger.warning("project_changed listener lost — ETags disabled until reconnect")
+        _schedule_reconnect()
+
+
+def _schedule_reconnect():
+    global _reconnect_task
+    if _reconnect_task is None or _reconnect_task.done():
+        _reconnect_task = asyncio.create_task(_reconnect())
+
+
+async def _reconnect():
+    await asyncio.sleep(RECONNECT_DELAY)
+    await start_listener()
+
+
+async def start_listener():
+    """Open the LISTEN connection (app startup). Retries in the background."""
+    global _conn, _epoch, _stopping
+    _stopping = False
+    if _conn is not None:
+        return
+    try:
+        conn = await connect_direct()
+        await conn.add_listener(CHANNEL, _on_notify)
+        conn.add_termination_listener(_on_terminate)
+    except Exception as e:
+        logger.warning(f"project_changed listener unavailable: {e}")
+        _schedule_reconnect()
+        return
+    _conn = conn
+    _epoch = uuid.uuid4().hex[:8]
+
+
+async def stop_listener():
+    """Close the LISTEN connection (app shutdown)."""
+    global _conn, _epoch, _stopping
+    _stopping = True
+    if _reconnect_task and not _reconnect_task.done():
+        _reconnect_task.cancel()
+    if _conn is not None:
+        conn, _conn, _epoch = _conn, None, None
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+def bump(project_id: int):
+    """Record a change to a project's scenes/shots/episodes."""
+    _versions[project_id] = _versions.get(project_id, 0) + 1
+
+
+def current_version(project_id: int) -> str | None:
+    """Opaque version of one project's rows, or None while the listener is down."""
+    if _epoch is None:
+        return None
+    return f"{_epoch}:{_versions.get(project_id, 0)}"
+
+
+def project_etag(project_ids, *variant) -> str | None:
+    """Weak ETag over the change counters of project_ids plus a request variant.
+
+    Returns None while the listener is down — callers then skip 304 handling.
+    """
+    if _epoch is None:
+        return None
+    if isinstance(project_ids, int):
+        project_ids = [project_ids]
+    state = ",".join(f"{p}:{_versions.get(p, 0)}" for p in sorted(set(project_ids)))
+    digest = hashlib.sha1(f"{state}|{variant!r}".encode()).hexdigest()[:16]
+    return f'W/"{_epoch}-{digest}"'
+
+
+def not_modified(request: Request, response: Response, etag: str | None) -> Response | None:
+    """Return a 304 if the client already has etag; otherwise tag the response."""
+    if etag is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
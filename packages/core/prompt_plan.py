@@ -0,0 +1,133 @@
+"""Prompt-plan cache — per-character generation context reused across generate_batch calls.
+
+A plan is everything generate_batch resolves before it builds per-image prompts:
+the model profile, the assembled + CLIP-truncated negative prompt and the
+sampler params after recommend_params(). Plans are keyed by character,
+checkpoint and the flags that change assembly, and are dropped when one of
+their inputs changes instead of on a wall-clock TTL:
+
+    IMAGE_REJECTED / IMAGE_APPROVED   learned negatives + recommended params move
+    feedback.json writes              record_rejection(), bulk reject, feedback reset
+    character / style / world edits   every invalidate_char_cache() call
+
+As a backstop for DB edits made outside the API, each plan also records a
+fingerprint of the character-map fields it was built from; a plan whose
+fingerprint no longer matches the reloaded character map is rebuilt.
+"""
+
+import json
+import logging
+from collections import OrderedDict
+
+from packages.core.events import event_bus, IMAGE_APPROVED, IMAGE_REJECTED
+
+logger = logging.getLogger(__name__)
+
+MAX_PLANS = 512
+
+# Character-map fields that feed profile selection, negatives and params
+_FINGERPRINT_FIELDS = (
+    "project_name", "design_prompt", "appearance_data", "negative_prompt_template",
+    "model_architecture", "prompt_format", "cfg_scale", "steps", "sampler", "scheduler",
+)
+
+_plans: "OrderedDict[tuple, tuple[tuple, dict]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0, "evictions": 0}
+
+
+def plan_key(
+    character_slug: str,
+    checkpoint: str,
+    using_override: bool,
+    design_prompt: str,
+    include_feedback_negatives: bool,
+    include_learned_negatives: bool,
+    style_override: bool = False,
+) -> tuple:
+    """Cache key for one generate_batch configuration."""
+    return (
+        character_slug, checkpoint, bool(using_override), design_prompt or "",
+        bool(include_feedback_negatives), bool(include_learned_negatives), bool(style_override),
+    )
+
+
+def fingerprint(db_info: dict) -> tuple:
+    """Hashable snapshot of the character-map fields a plan was built from."""
+    values = []
+    for field in _FINGERPRINT_FIELDS:
+        value = db_info.get(field)
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, sort_keys=True, default=str)
+        values.append(value)
+    return tuple(values)
+
+
+def get(key: tuple, db_info: dict) -> dict | None:
+    """Return the cached plan for key, or None on a miss or a stale fingerprint."""
+    entry = _plans.get(key)
+    if entry is None:
+        _stats["misses"] += 1
+        return None
+    if entry[0] != fingerprint(db_info):
+        del _plans[key]
+        _stats["stale"] += 1
+        _stats["misses"] += 1
+        return None
+    _plans.move_to_end(key)
+    _stats["hits"] += 1
+    return entry[1]
+
+
+def put(key: tuple, db_info: dict, plan: dict) -> None:
+    """Store a plan, evicting the least recently used one past MAX_PLANS."""
+    _plans[key] = (fingerprint(db_info), plan)
+    _plans.move_to_end(key)
+    while len(_plans) > MAX_PLANS:
+        _plans.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def invalidate(character_slug: str | None = None) -> int:
+    """Drop plans for one character (or all when None). Returns the count removed."""
+    if character_slug is None:
+        removed = len(_plans)
+        _plans.clear()
+    else:
+        keys = [k for k in _plans if k[0] == character_slug]
+        for k in keys:
+            del _plans[k]
+        removed = len(keys)
+    if removed:
+        _stats["invalidations"] += removed
+        logger.debug(f"prompt_plan: invalidated {removed} plan(s) for {character_slug or 'all characters'}")
+    return removed
+
+
+def clear() -> None:
+    """Drop all plans and reset counters."""
+    _plans.clear()
+    for k in _stats:
+        _stats[k] = 0
+
+
+def stats() -> dict:
+    """Hit-rate metrics for /api/system/prompt-plans."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "size": len(_plans),
+        "max_size": MAX_PLANS,
+        "characters": len({k[0] for k in _plans}),
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else None,
+    }
+
+
+# ---- EventBus Handlers ----
+# Review decisions change learned negatives and recommend_params() output
+
+@event_bus.on(IMAGE_REJECTED)
+@event_bus.on(IMAGE_APPROVED)
+async def _handle_review(data: dict):
+    slug = data.get("character_slug")
+    if slug:
+        invalidate(slug)
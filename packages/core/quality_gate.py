@@ -124,10 +124,10 @@ async def _get_historical_lora_quality(
         pool = await get_pool()
         async with pool.acquire() as conn:
             row = await conn.fetchrow("""
-                SELECT AVG(quality_score) as avg_score, COUNT(*) as cnt
-                FROM generation_history
+                SELECT SUM(sum_quality) / NULLIF(SUM(scored), 0) as avg_score,
+                       COALESCE(SUM(scored), 0) as cnt
+                FROM generation_history_summary
                 WHERE character_slug = $1 AND lora_name = $2
-                  AND quality_score IS NOT NULL
                   AND status IN ('approved', 'auto_approved')
             """, character_slug, lora_name)
             if row and row["cnt"] >= 3:
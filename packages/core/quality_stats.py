@@ -0,0 +1,682 @@
+"""Incremental quality statistics over generation_history.
+
+learning.suggest_params / checkpoint_rankings / quality_trend and
+model_selector.recommend_params / detect_drift / character_quality_summary
+each aggregated the whole generation_history table (PERCENTILE_CONT medians,
+a ROW_NUMBER window per character) on every call, and generate_batch calls
+recommend_params for every generation.
+
+This module keeps one row per (character, project, checkpoint, sampler) in
+quality_stats holding a JSON aggregate:
+
+  - counts and sums: logged, scored, quality sum/min/max, approved, rejected
+  - per quality tier (QUALITY_FLOOR, SUCCESS_THRESHOLD): count, quality sum,
+    scheduler counts and mergeable quantile sketches for cfg/steps/width/height
+  - the most recent RECENT_WINDOW scores (a ring ordered by generated_at)
+  - per-day counts for the last DAYS_KEPT days
+
+audit.log_generation and audit.update_generation_quality update the row in
+the same transaction as their generation_history write (a re-score first
+subtracts the previous score). Reads fetch the handful of rows for a
+character or project by primary key/index and merge them in Python. Results
+are cached per process for CACHE_TTL_S.
+
+The read helpers return None until a rebuild has run once; callers then keep
+using their SQL. Backfill or repair:
+    python -m packages.core.quality_stats --rebuild
+or POST /api/system/quality-stats/rebuild (queued as a job).
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from . import job_queue
+from .db import get_pool
+
+logger = logging.getLogger(__name__)
+
+QUALITY_FLOOR = 0.65       # model_selector: learn only from images that scored well
+SUCCESS_THRESHOLD = 0.7    # learning: "successful" generation
+TIERS = (QUALITY_FLOOR, SUCCESS_THRESHOLD)
+RECENT_WINDOW = 50
+DAYS_KEPT = 120
+SKETCH_BINS = 64
+CACHE_TTL_S = 30.0
+ENABLED = os.getenv("QUALITY_STATS_ENABLED", "1") != "0"
+REBUILD_JOB = "quality_stats.rebuild"
+
+_ready = False
+_cache: dict[tuple, tuple[float, list]] = {}
+
+
+# ── Sketch ────────────────────────────────────────────────────────────────
+
+
+class QuantileSketch:
+    """Streaming histogram (Ben-Haim & Tom-Tov): at most max_bins (value, count) centroids.
+
+    Exact while a column has ≤ max_bins distinct values, which covers cfg,
+    steps and resolutions in practice. Two sketches merge by adding bins.
+    """
+
+    def __init__(self, bins: list | None = None, max_bins: int = SKETCH_BINS):
+        self.max_bins = max_bins
+        self.values: list[float] = [float(v) for v, _ in bins or []]
+        self.counts: list[float] = [float(c) for _, c in bins or []]
+
+    @property
+    def count(self) -> float:
+        return sum(self.counts)
+
+    def add(self, value: float, count: float = 1.0):
+        value = float(value)
+        i = bisect.bisect_left(self.values, value)
+        if i < len(self.values) and self.values[i] == value:
+            self.counts[i] += count
+            return
+        self.values.insert(i, value)
+        self.counts.insert(i, count)
+        self._compress()
+
+    def remove(self, value: float):
+        """Take one observation out of the nearest centroid (exact while uncompressed)."""
+        if not self.values:
+            return
+        i = bisect.bisect_left(self.values, float(value))
+        if i == len(self.values) or (i > 0 and value - self.values[i - 1] < self.values[i] - value):
+            i -= 1
+        self.counts[i] -= 1
+        if self.counts[i] <= 0:
+            del self.values[i], self.counts[i]
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for value, count in zip(other.values, other.counts):
+            self.add(value, count)
+        return self
+
+    def _compress(self):
+        while len(self.values) > self.max_bins:
+            gaps = [self.values[i + 1] - self.values[i] for i in range(len(self.values) - 1)]
+            i = gaps.index(min(gaps))
+            total = self.counts[i] + self.counts[i + 1]
+            self.values[i] = (self.values[i] * self.counts[i] + self.values[i + 1] * self.counts[i + 1]) / total
+            self.counts[i] = total
+            del self.values[i + 1], self.counts[i + 1]
+
+    def quantile(self, q: float) -> float | None:
+        """Continuous quantile, matching PERCENTILE_CONT when bins are exact."""
+        n = self.count
+        if n <= 0:
+            return None
+        position = q * (n - 1)
+        lower_rank, frac = int(position), position - int(position)
+
+        def value_at(rank):
+            seen = 0.0
+            for value, count in zip(self.values, self.counts):
+                seen += count
+                if rank < seen:
+                    return value
+            return self.values[-1]
+
+        low = value_at(lower_rank)
+        return low if frac == 0 else low + (value_at(lower_rank + 1) - low) * frac
+
+    def to_json(self) -> list:
+        return [[v, c] for v, c in zip(self.values, self.counts)]
+
+
+# ── Aggregate ─────────────────────────────────────────────────────────────
+
+
+def _tier_key(floor: float) -> str:
+    return f"{floor:.2f}"
+
+
+def _iso(ts) -> str | None:
+    if ts is None:
+        return None
+    return ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
+
+
+class Aggregate:
+    """Running statistics for one (character, project, checkpoint, sampler) key."""
+
+    SKETCHED = ("cfg_scale", "steps", "width", "height")
+
+    def __init__(self, data: dict | None = None):
+        data = data or {}
+        self.total = data.get("total", 0)
+        self.last_generated = data.get("last_generated")
+        self.scored = data.get("scored", 0)
+        self.sum_q = data.get("sum_q", 0.0)
+        self.min_q = data.get("min_q")
+        self.max_q = data.get("max_q")
+        self.approved = data.get("approved", 0)
+        self.rejected = data.get("rejected", 0)
+        self.tiers = {
+            key: {
+                "n": tier.get("n", 0),
+                "sum_q": tier.get("sum_q", 0.0),
+                "schedulers": dict(tier.get("schedulers", {})),
+                **{col: QuantileSketch(tier.get(col)) for col in self.SKETCHED},
+            }
+            for key, tier in data.get("tiers", {}).items()
+        }
+        self.recent: list[list] = [list(r) for r in data.get("recent", [])]
+        self.days: dict[str, list] = {d: list(v) for d, v in data.get("days", {}).items()}
+
+    def _tier(self, floor: float) -> dict:
+        key = _tier_key(floor)
+        if key not in self.tiers:
+            self.tiers[key] = {"n": 0, "sum_q": 0.0, "schedulers": {},
+                               **{col: QuantileSketch() for col in self.SKETCHED}}
+        return self.tiers[key]
+
+    def add_generation(self, generated_at):
+        self.total += 1
+        ts = _iso(generated_at)
+        if ts and (self.last_generated is None or ts > self.last_generated):
+            self.last_generated = ts
+
+    def apply_score(self, row: dict, quality: float | None, status: str | None, sign: int = 1):
+        """Add (sign=1) or subtract (sign=-1) one reviewed generation."""
+        if status == "approved":
+            self.approved += sign
+        elif status == "rejected":
+            self.rejected += sign
+        if quality is None:
+            return
+        quality = float(quality)
+        ts = _iso(row.get("generated_at"))
+        self.scored += sign
+        self.sum_q += sign * quality
+        if sign > 0:
+            self.min_q = quality if self.min_q is None else min(self.min_q, quality)
+            self.max_q = quality if self.max_q is None else max(self.max_q, quality)
+
+        for floor in TIERS:
+            if quality < floor:
+                continue
+            tier = self._tier(floor)
+            tier["n"] += sign
+            tier["sum_q"] += sign * quality
+            if row.get("scheduler") and row.get("cfg_scale") is not None:
+                name = row["scheduler"]
+                tier["schedulers"][name] = tier["schedulers"].get(name, 0) + sign
+                if tier["schedulers"][name] <= 0:
+                    del tier["schedulers"][name]
+            if row.get("cfg_scale") is None:
+                continue  # the medians only consider generations with cfg_scale set
+            for col in self.SKETCHED:
+                if row.get(col) is None:
+                    continue
+                if sign > 0:
+                    tier[col].add(row[col])
+                else:
+                    tier[col].remove(row[col])
+
+        gen_id = row.get("id")
+        if gen_id is not None:
+            self.recent = [r for r in self.recent if r[2] != gen_id]
+        if sign > 0 and ts:
+            bisect.insort(self.recent, [ts, quality, gen_id], key=lambda r: r[0])
+            del self.recent[:-RECENT_WINDOW]
+
+        if ts:
+            day = ts[:10]
+            bucket = self.days.setdefault(day, [0, 0.0, 0, 0])
+            bucket[0] += sign
+            bucket[1] += sign * quality
+            bucket[2] += sign if status == "approved" else 0
+            bucket[3] += sign if status == "rejected" else 0
+            if len(self.days) > DAYS_KEPT:
+                for old in sorted(self.days)[:-DAYS_KEPT]:
+                    del self.days[old]
+
+    def merge(self, other: "Aggregate") -> "Aggregate":
+        self.total += other.total
+        if other.last_generated and (self.last_generated is None or other.last_generated > self.last_generated):
+            self.last_generated = other.last_generated
+        self.scored += other.scored
+        self.sum_q += other.sum_q
+        for attr, pick in (("min_q", min), ("max_q", max)):
+            mine, theirs = getattr(self, attr), getattr(other, attr)
+            setattr(self, attr, theirs if mine is None else mine if theirs is None else pick(mine, theirs))
+        self.approved += other.approved
+        self.rejected += other.rejected
+        for key, tier in other.tiers.items():
+            mine = self._tier(float(key))
+            mine["n"] += tier["n"]
+            mine["sum_q"] += tier["sum_q"]
+            for name, count in tier["schedulers"].items():
+                mine["schedulers"][name] = mine["schedulers"].get(name, 0) + count
+            for col in self.SKETCHED:
+                mine[col].merge(tier[col])
+        self.recent = sorted(self.recent + other.recent, key=lambda r: r[0])[-RECENT_WINDOW:]
+        for day, bucket in other.days.items():
+            mine = self.days.setdefault(day, [0, 0.0, 0, 0])
+            for i, value in enumerate(bucket):
+                mine[i] += value
+        return self
+
+    def tier(self, floor: float) -> dict | None:
+        return self.tiers.get(_tier_key(floor))
+
+    def avg_quality(self) -> float | None:
+        return self.sum_q / self.scored if self.scored > 0 else None
+
+    def to_json(self) -> dict:
+        return {
+            "total": self.total, "last_generated": self.last_generated,
+            "scored": self.scored, "sum_q": self.sum_q, "min_q": self.min_q, "max_q": self.max_q,
+            "approved": self.approved, "rejected": self.rejected,
+            "tiers": {
+                key: {"n": t["n"], "sum_q": t["sum_q"], "schedulers": t["schedulers"],
+                      **{col: t[col].to_json() for col in self.SKETCHED}}
+                for key, t in self.tiers.items()
+            },
+            "recent": self.recent,
+            "days": self.days,
+        }
+
+
+def _merged(rows) -> Aggregate:
+    total = Aggregate()
+    for _, agg in rows:
+        total.merge(agg)
+    return total
+
+
+def _grouped(rows, field: str) -> dict[str, Aggregate]:
+    groups: dict[str, Aggregate] = defaultdict(Aggregate)
+    for key, agg in rows:
+        groups[key[field]].merge(agg)
+    return groups
+
+
+# ── Answers (pure functions over fetched rows) ────────────────────────────
+
+
+def params_from(rows, floor: float) -> dict:
+    """The rows' `floor` tier in the column names of the SQL it replaces.
+
+    sample_count, median_* and the best_sampler/best_scheduler modes cover generations
+    with cfg_scale set; top_sampler is the best-averaging sampler with ≥3 samples.
+    """
+    tier = _merged(rows).tier(floor)
+    if not tier or tier["n"] <= 0:
+        return {"sample_count": 0}
+    by_sampler = {}
+    for sampler, agg in _grouped(rows, "sampler").items():
+        t = agg.tier(floor)
+        if sampler and t and t["n"] > 0:
+            by_sampler[sampler] = t
+    top = max(
+        ((t["sum_q"] / t["n"], s, t["n"]) for s, t in by_sampler.items() if t["n"] >= 3),
+        default=None,
+    )
+    schedulers = tier["schedulers"]
+    return {
+        "sample_count": int(tier["cfg_scale"].count),
+        "avg_quality": tier["sum_q"] / tier["n"],
+        "median_cfg": tier["cfg_scale"].quantile(0.5),
+        "median_steps": tier["steps"].quantile(0.5),
+        "median_width": tier["width"].quantile(0.5),
+        "median_height": tier["height"].quantile(0.5),
+        "best_sampler": max(by_sampler, key=lambda s: (by_sampler[s]["cfg_scale"].count, s)) if by_sampler else None,
+        "best_scheduler": max(schedulers, key=lambda s: (schedulers[s], s)) if schedulers else None,
+        "top_sampler": {"sampler": top[1], "avg_q": top[0], "n": top[2]} if top else None,
+    }
+
+
+def best_checkpoint_from(rows, floor: float, min_samples: int = 3) -> dict | None:
+    candidates = []
+    for ckpt, agg in _grouped(rows, "checkpoint_model").items():
+        tier = agg.tier(floor)
+        if ckpt and tier and tier["n"] >= min_samples:
+            candidates.append((tier["sum_q"] / tier["n"], ckpt, tier["n"]))
+    if not candidates:
+        return None
+    avg, ckpt, n = max(candidates)
+    return {"checkpoint_model": ckpt, "avg_q": avg, "n": n}
+
+
+def checkpoint_table_from(rows) -> list[dict]:
+    table = []
+    for ckpt, agg in _grouped(rows, "checkpoint_model").items():
+        if not ckpt or agg.scored <= 0:
+            continue
+        table.append({
+            "checkpoint": ckpt,
+            "avg_quality": round(agg.avg_quality(), 3),
+            "total": agg.scored,
+            "approved": agg.approved,
+            "rejected": agg.rejected,
+            "approval_rate": round(agg.approved / agg.scored, 2),
+        })
+    return sorted(table, key=lambda r: r["avg_quality"], reverse=True)
+
+
+def trend_from(rows, days: int, today: date | None = None) -> list[dict]:
+    since = ((today or date.today()) - timedelta(days=days)).isoformat()
+    buckets = _merged(rows).days
+    return [
+        {
+            "date": day,
+            "avg_quality": round(b[1] / b[0], 3),
+            "count": b[0],
+            "approved": b[2],
+            "rejected": b[3],
+        }
+        for day, b in sorted(buckets.items())
+        if day >= since and b[0] > 0
+    ]
+
+
+def drift_from(rows, window: int, min_samples: int, alert_threshold: float) -> list[dict]:
+    window = min(window, RECENT_WINDOW)
+    alerts = []
+    for slug, agg in _grouped(rows, "character_slug").items():
+        if not slug or agg.scored < min_samples:
+            continue
+        recent = [r[1] for r in agg.recent[-window:]]
+        recent_avg, overall_avg = sum(recent) / len(recent), agg.avg_quality()
+        if recent_avg < overall_avg - 0.1 or recent_avg < alert_threshold:
+            alerts.append({
+                "character_slug": slug,
+                "recent_avg": round(recent_avg, 3),
+                "overall_avg": round(overall_avg, 3),
+                "drift": round(recent_avg - overall_avg, 3),
+                "recent_count": len(recent),
+                "total_count": agg.scored,
+                "alert": recent_avg < alert_threshold,
+            })
+    return sorted(alerts, key=lambda a: a["drift"])
+
+
+def character_summary_from(rows) -> list[dict]:
+    summary = []
+    for slug, agg in _grouped(rows, "character_slug").items():
+        if not slug:
+            continue
+        avg = agg.avg_quality()
+        summary.append({
+            "character_slug": slug,
+            "total": agg.total,
+            "approved": agg.approved,
+            "rejected": agg.rejected,
+            "avg_quality": round(avg, 3) if avg else None,
+            "best_quality": round(agg.max_q, 3) if agg.max_q else None,
+            "worst_quality": round(agg.min_q, 3) if agg.min_q else None,
+            "approval_rate": round(agg.approved / agg.total, 2) if agg.total > 0 else 0,
+            "last_generated": agg.last_generated,
+        })
+    return sorted(summary, key=lambda r: (r["avg_quality"] is None, -(r["avg_quality"] or 0)))
+
+
+# ── Storage ───────────────────────────────────────────────────────────────
+
+_KEY_FIELDS = ("character_slug", "project_name", "checkpoint_model", "sampler")
+
+
+def _key(row) -> tuple[str, str, str, str]:
+    return tuple(row.get(f) or "" for f in _KEY_FIELDS)
+
+
+async def _update(conn, row: dict, mutate):
+    """Read-modify-write the aggregate row for row's key under a row lock."""
+    key = _key(row)
+    await conn.execute("""
+        INSERT INTO quality_stats (character_slug, project_name, checkpoint_model, sampler, stats)
+        VALUES ($1, $2, $3, $4, '{}'::jsonb)
+        ON CONFLICT DO NOTHING
+    """, *key)
+    raw = await conn.fetchval("""
+        SELECT stats FROM quality_stats
+        WHERE character_slug = $1 AND project_name = $2 AND checkpoint_model = $3 AND sampler = $4
+        FOR UPDATE
+    """, *key)
+    agg = Aggregate(json.loads(raw) if isinstance(raw, str) else raw)
+    mutate(agg)
+    await conn.execute("""
+        UPDATE quality_stats SET stats = $5::jsonb, updated_at = NOW()
+        WHERE character_slug = $1 AND project_name = $2 AND checkpoint_model = $3 AND sampler = $4
+    """, *key, json.dumps(agg.to_json()))
+    _cache.clear()
+
+
+async def on_generation_logged(conn, row: dict):
+    """Called by audit.log_generation inside its transaction."""
+    if ENABLED:
+        await _update(conn, row, lambda agg: agg.add_generation(row.get("generated_at")))
+
+
+async def on_quality_updated(conn, row: dict, quality: float | None, status: str | None,
+                             old_quality: float | None, old_status: str | None):
+    """Called by audit.update_generation_quality inside its transaction; replaces any earlier score."""
+    if not ENABLED:
+        return
+
+    def mutate(agg: Aggregate):
+        if old_quality is not None or old_status in ("approved", "rejected"):
+            agg.apply_score(row, old_quality, old_status, sign=-1)
+        agg.apply_score(row, quality, status)
+
+    await _update(conn, row, mutate)
+
+
+async def _rows(conn, **filters) -> list | None:
+    """(key dict, Aggregate) rows matching filters, or None before the first rebuild."""
+    global _ready
+    if not ENABLED:
+        return None
+    cache_key = tuple(sorted(filters.items()))
+    cached = _cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    if not _ready:
+        _ready = bool(await conn.fetchval("SELECT rebuilt_at IS NOT NULL FROM quality_stats_meta WHERE id = 1"))
+        if not _ready:
+            return None
+    clauses, args = [], []
+    for field, value in filters.items():
+        args.append(value or "")
+        clauses.append(f"{field} = ${len(args)}")
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    records = await conn.fetch(
+        f"SELECT character_slug, project_name, checkpoint_model, sampler, stats FROM quality_stats {where}",
+        *args,
+    )
+    rows = [
+        ({f: r[f] for f in _KEY_FIELDS},
+         Aggregate(json.loads(r["stats"]) if isinstance(r["stats"], str) else r["stats"]))
+        for r in records
+    ]
+    _cache[cache_key] = (time.monotonic() + CACHE_TTL_S, rows)
+    return rows
+
+
+async def params(conn, character_slug: str, checkpoint_model: str | None, floor: float) -> dict | None:
+    filters = {"character_slug": character_slug}
+    if checkpoint_model:
+        filters["checkpoint_model"] = checkpoint_model
+    rows = await _rows(conn, **filters)
+    return None if rows is None else params_from(rows, floor)
+
+
+async def best_checkpoint(conn, project_name: str, floor: float) -> dict | None:
+    """Best-averaging checkpoint with ≥3 samples in the floor tier (call only after params() answered)."""
+    rows = await _rows(conn, project_name=project_name)
+    return best_checkpoint_from(rows or [], floor)
+
+
+async def checkpoint_table(conn, project_name: str) -> list[dict] | None:
+    rows = await _rows(conn, project_name=project_name)
+    return None if rows is None else checkpoint_table_from(rows)
+
+
+async def trend(conn, character_slug: str | None, project_name: str | None, days: int) -> list[dict] | None:
+    filters = {"character_slug": character_slug} if character_slug else {"project_name": project_name}
+    rows = await _rows(conn, **filters)
+    return None if rows is None else trend_from(rows, days)
+
+
+async def drift(conn, character_slug: str | None, project_name: str | None, window: int,
+                min_samples: int, alert_threshold: float) -> list[dict] | None:
+    filters = {"character_slug": character_slug} if character_slug else (
+        {"project_name": project_name} if project_name else {})
+    rows = await _rows(conn, **filters)
+    return None if rows is None else drift_from(rows, window, min_samples, alert_threshold)
+
+
+async def character_summary(conn, project_name: str) -> list[dict] | None:
+    rows = await _rows(conn, project_name=project_name)
+    return None if rows is None else character_summary_from(rows)
+
+
+# ── Rebuild ───────────────────────────────────────────────────────────────
+
+
+_SCAN_SQL = """
+    SELECT id, character_slug, project_name, checkpoint_model, sampler, scheduler,
+           cfg_scale, steps, width, height, quality_score, status, generated_at
+    FROM generation_history {where}
+    ORDER BY generated_at, id
+"""
+
+
+async def _scan(conn, aggs: dict, where: str = "", *args, progress=None) -> int:
+    """Fold generation_history rows (optionally filtered) into aggs. Returns rows read."""
+    scanned = 0
+    async for r in conn.cursor(_SCAN_SQL.format(where=where), *args, prefetch=5000):
+        row = dict(r)
+        agg = aggs[_key(row)]
+        agg.add_generation(row["generated_at"])
+        if row["quality_score"] is not None or row["status"] in ("approved", "rejected"):
+            agg.apply_score(row, row["quality_score"], row["status"])
+        scanned += 1
+        if progress and scanned % 50000 == 0:
+            await progress(scanned=scanned)
+    return scanned
+
+
+async def _live_rows(conn) -> dict[tuple, tuple]:
+    """{key: (updated_at, stats text)} of the live table, to spot rows writers changed."""
+    records = await conn.fetch(
+        "SELECT character_slug, project_name, checkpoint_model, sampler, updated_at, stats::text AS stats "
+        "FROM quality_stats"
+    )
+    return {tuple(r[f] for f in _KEY_FIELDS): (r["updated_at"], r["stats"]) for r in records}
+
+
+async def _catch_up(conn, aggs: dict, seen: dict) -> tuple[dict, int]:
+    """Recompute the keys whose live row changed since `seen` — writers that committed meanwhile."""
+    live = await _live_rows(conn)
+    changed = [key for key, state in live.items() if seen.get(key) != state]
+    if not changed:
+        return live, 0
+    slugs = {key[0] for key in changed}
+    fresh: dict[tuple, Aggregate] = defaultdict(Aggregate)
+    scanned = await _scan(
+        conn, fresh, "WHERE character_slug = ANY($1::text[]) OR ($2 AND character_slug IS NULL)",
+        sorted(slug for slug in slugs if slug), "" in slugs,
+    )
+    for key in changed:
+        if key in fresh:
+            aggs[key] = fresh[key]
+        else:
+            aggs.pop(key, None)
+    return live, scanned
+
+
+async def rebuild(progress=None) -> dict:
+    """Recompute every aggregate from generation_history.
+
+    The full scan reads one REPEATABLE READ snapshot without locking
+    quality_stats, so audit writers keep updating it meanwhile. A writer
+    updates its quality_stats row in the same transaction as its history row,
+    so the rows that changed since the snapshot name exactly the keys the scan
+    is missing. Those keys are rescanned, once from a fresh snapshot and once
+    more under a brief EXCLUSIVE lock that also covers swapping the result in.
+    Writers blocked on that lock have uncommitted history rows, invisible to
+    the rescan, and apply their delta to the new row once the lock is released.
+    """
+    global _ready
+    started = time.monotonic()
+    aggs: dict[tuple, Aggregate] = defaultdict(Aggregate)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            seen = await _live_rows(conn)
+            scanned = await _scan(conn, aggs, progress=progress)
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            seen, rescanned = await _catch_up(conn, aggs, seen)
+        async with conn.transaction():
+            lock_started = time.monotonic()
+            await conn.execute("LOCK TABLE quality_stats IN EXCLUSIVE MODE")
+            _, locked_rescan = await _catch_up(conn, aggs, seen)
+            await conn.execute("DELETE FROM quality_stats")
+            await conn.executemany("""
+                INSERT INTO quality_stats (character_slug, project_name, checkpoint_model, sampler, stats)
+                VALUES ($1, $2, $3, $4, $5::jsonb)
+            """, [(*key, json.dumps(agg.to_json())) for key, agg in aggs.items()])
+            await conn.execute("""
+                INSERT INTO quality_stats_meta (id, rebuilt_at, rows_scanned) VALUES (1, NOW(), $1)
+                ON CONFLICT (id) DO UPDATE SET rebuilt_at = NOW(), rows_scanned = EXCLUDED.rows_scanned
+            """, scanned)
+            locked_s = time.monotonic() - lock_started
+    _cache.clear()
+    _ready = True
+    result = {
+        "rows_scanned": scanned,
+        "rows_rescanned": rescanned + locked_rescan,
+        "keys": len(aggs),
+        "seconds": round(time.monotonic() - started, 1),
+        "locked_seconds": round(locked_s, 2),
+    }
+    logger.info(f"Quality stats rebuilt: {result}")
+    return result
+
+
+@job_queue.job_kind(REBUILD_JOB, concurrency=1, max_attempts=1)
+async def _rebuild_job(job):
+    return await rebuild(job.progress)
+
+
+async def stats_status() -> dict:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        meta = await conn.fetchrow("SELECT rebuilt_at, rows_scanned FROM quality_stats_meta WHERE id = 1")
+        keys = await conn.fetchval("SELECT COUNT(*) FROM quality_stats")
+    return {
+        "enabled": ENABLED,
+        "ready": bool(meta and meta["rebuilt_at"]),
+        "rebuilt_at": meta["rebuilt_at"].isoformat() if meta and meta["rebuilt_at"] else None,
+        "rows_scanned": meta["rows_scanned"] if meta else None,
+        "keys": keys,
+        "cached_queries": len(_cache),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quality statistics store")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all aggregates from generation_history")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.rebuild:
+        print(json.dumps(asyncio.run(rebuild()), indent=2))
+    else:
+        print(json.dumps(asyncio.run(stats_status()), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,7 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from . import job_queue
 from .config import BASE_PATH
 from .db import get_pool
 from .events import event_bus, IMAGE_APPROVED
@@ -59,7 +60,8 @@ _consecutive_rejects: dict[str, int] = {}   # character_slug → consecutive rej
 _review_thresholds: dict[str, tuple[float, float]] = {}  # character_slug → (reject, approve)
 
 # --- Replenish task tracking ---
-_replenish_tasks: dict[str, dict] = {}  # task_id → progress dict
+_replenish_tasks: dict[str, dict] = {}  # task_id → progress dict (runs that queued no job)
+FILL_DEFICIT_JOB = "replenish.fill_deficit"
 
 
 def enable(on: bool = True):
@@ -474,9 +476,10 @@ async def fill_deficit(
 ) -> str:
     """Proactively fill all characters below target. Returns task_id for polling.
 
-    This is the entry point for POST /api/training/replenish. It runs as a
-    background asyncio task, generating and reviewing in a loop per character
-    until target is reached or safety limits are hit.
+    This is the entry point for POST /api/training/replenish. It queues a
+    replenish.fill_deficit job that generates and reviews in a loop per
+    character until target is reached or safety limits are hit. The task_id
+    is the job id.
     """
     from .db import get_char_project_map
 
@@ -529,48 +532,53 @@ async def fill_deficit(
             "status": "pending",
         }
 
-    _replenish_tasks[task_id] = {
-        "task_id": task_id,
-        "status": "running",
-        "started_at": datetime.now(timezone.utc).isoformat(),
-        "finished_at": None,
+    job = await job_queue.enqueue(FILL_DEFICIT_JOB, {
         "project_name": project_name,
         "target": target,
         "batch_size": batch_size,
+        "max_iterations": max_iterations,
         "strategy": strategy,
+        "auto_reject_threshold": auto_reject_threshold,
+        "auto_approve_threshold": auto_approve_threshold,
         "characters": characters_progress,
-    }
+        "order": [slug for slug, _ in char_list],  # jsonb does not keep key order
+    }, dedupe_key=f"replenish_{project_name or '*'}")
 
-    # Set per-character review thresholds
-    for slug in characters_progress:
-        set_review_thresholds(slug, auto_reject_threshold, auto_approve_threshold)
+    return str(job["id"])
 
-    # Launch background worker
-    asyncio.create_task(_fill_deficit_worker(
-        task_id, characters_progress, char_map,
-        target, batch_size, max_iterations, strategy,
-    ))
 
-    return task_id
+@job_queue.job_kind(FILL_DEFICIT_JOB, concurrency=1, max_attempts=1)
+async def _fill_deficit_worker(job):
+    """Queued job: loop generate→review per character until target met."""
+    from .db import get_char_project_map
 
+    params = job.payload
+    target, batch_size = params["target"], params["batch_size"]
+    max_iterations = params["max_iterations"]
+    characters_progress = {slug: params["characters"][slug] for slug in params["order"]}
+    char_map = await get_char_project_map()
+    task = {
+        "task_id": str(job.id),
+        "status": "running",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "finished_at": None,
+        "project_name": params["project_name"],
+        "target": target,
+        "batch_size": batch_size,
+        "strategy": params["strategy"],
+        "characters": characters_progress,
+    }
 
-async def _fill_deficit_worker(
-    task_id: str,
-    characters_progress: dict,
-    char_map: dict,
-    target: int,
-    batch_size: int,
-    max_iterations: int,
-    strategy: str,
-):
-    """Background worker that loops generate→review per character until target met."""
-    task = _replenish_tasks[task_id]
+    # Set per-character review thresholds (in the process doing the reviews)
+    for slug in characters_progress:
+        set_review_thresholds(slug, params["auto_reject_threshold"], params["auto_approve_threshold"])
 
     try:
         for slug, progress in characters_progress.items():
             progress["status"] = "running"
+            await job.progress(**task)
 
-            project_name = char_map[slug].get("project_name")
+            project_name = char_map.get(slug, {}).get("project_name")
             iteration = 0
 
             while iteration < max_iterations:
@@ -599,6 +607,7 @@ async def _fill_deficit_worker(
                     logger.info(f"fill_deficit: {slug} has {pending} pending, reviewing only")
                     review = await _trigger_vision_review(slug, project_name)
                     progress["reviewed"] += review.get("reviewed", 0)
+                    await job.progress(**task)
                     continue
 
                 # Determine batch size based on deficit
@@ -608,6 +617,7 @@ async def _fill_deficit_worker(
                     # Only pending images remain to review
                     review = await _trigger_vision_review(slug, project_name)
                     progress["reviewed"] += review.get("reviewed", 0)
+                    await job.progress(**task)
                     continue
 
                 # Generate and review
@@ -617,6 +627,7 @@ async def _fill_deficit_worker(
 
                 # Update approved count after review
                 progress["approved_now"] = _count_approved(slug)
+                await job.progress(**task)
 
                 # Brief cooldown between iterations
                 if progress["approved_now"] < target:
@@ -629,25 +640,49 @@ async def _fill_deficit_worker(
 
         task["status"] = "completed"
         task["finished_at"] = datetime.now(timezone.utc).isoformat()
+        await job.progress(**task)
 
         # Summary log
         total_generated = sum(p["generated"] for p in characters_progress.values())
         reached = sum(1 for p in characters_progress.values() if p["status"] == "target_reached")
         logger.info(
-            f"fill_deficit [{task_id}]: completed — {total_generated} images generated, "
+            f"fill_deficit [{job.id}]: completed — {total_generated} images generated, "
             f"{reached}/{len(characters_progress)} characters reached target"
         )
+        return {"generated": total_generated, "reached": reached}
 
+    except job_queue.JobCancelled:
+        raise
     except Exception as e:
-        logger.error(f"fill_deficit [{task_id}] error: {e}", exc_info=True)
+        logger.error(f"fill_deficit [{job.id}] error: {e}", exc_info=True)
         task["status"] = "error"
         task["error"] = str(e)
         task["finished_at"] = datetime.now(timezone.utc).isoformat()
-
-
-def get_replenish_task(task_id: str) -> dict | None:
-    """Get a replenish task by ID."""
-    return _replenish_tasks.get(task_id)
+        await job.progress(**task)
+        raise
+
+
+async def get_replenish_task(task_id: str) -> dict | None:
+    """Get a replenish task by ID (job id, or a no-op run recorded locally)."""
+    if task_id in _replenish_tasks:
+        return _replenish_tasks[task_id]
+    if not task_id.isdigit():
+        return None
+    job = await job_queue.get_job(int(task_id))
+    if job is None or job["kind"] != FILL_DEFICIT_JOB:
+        return None
+    task = job["progress"] or {
+        "task_id": task_id,
+        "project_name": job["payload"].get("project_name"),
+        "target": job["payload"].get("target"),
+        "characters": job["payload"].get("characters", {}),
+    }
+    if job["status"] == "queued":
+        task["status"] = "queued"
+    elif job["status"] in ("failed", "cancelled"):
+        task["status"] = "error" if job["status"] == "failed" else "cancelled"
+        task.setdefault("error", job["error"])
+    return task
 
 
 # ---- Query Functions ----
@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import Optional
 
+from .auth import invalidate_user_cache
 from .db import connect_direct
 
 logger = logging.getLogger(__name__)
@@ -93,6 +94,7 @@ async def update_preferences(request: Request, body: PreferencesUpdate):
             f"UPDATE studio_users SET {', '.join(updates)} WHERE id = ${idx}",
             *params,
         )
+        invalidate_user_cache(user["studio_user_id"])
         return {"message": "Preferences updated"}
     finally:
         await conn.close()
@@ -4,11 +4,13 @@ import logging
 import uuid
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import FileResponse
 
+from packages.core import media
 from packages.core.db import connect_direct
-from packages.core.auth import get_user_projects
+from packages.core.auth import TTLCache, get_user_projects
+from packages.core.project_versions import not_modified, project_etag
 from packages.core.events import event_bus, EPISODE_UPDATED
 from packages.core.models import (
     EpisodeCreateRequest, EpisodeUpdateRequest,
@@ -20,6 +22,9 @@ from packages.scene_generation.scene_audio import _auto_generate_scene_music, ov
 
 logger = logging.getLogger(__name__)
 
+# episode_id → project_id (episodes never move between projects)
+_episode_projects = TTLCache(maxsize=2000, ttl=3600)
+
 
 async def _episode_content_gate(request: Request, allowed_projects: list[int] = Depends(get_user_projects)):
     """Router-level dependency: block access to episodes in projects above user's rating."""
@@ -30,15 +35,19 @@ async def _episode_content_gate(request: Request, allowed_projects: list[int] =
         eid = uuid.UUID(episode_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid episode_id")
-    conn = await connect_direct()
-    try:
-        project_id = await conn.fetchval(
-            "SELECT project_id FROM episodes WHERE id = $1", eid
-        )
-    finally:
-        await conn.close()
+    project_id = _episode_projects.get(eid)
+    if project_id is None:
+        conn = await connect_direct()
+        try:
+            project_id = await conn.fetchval(
+                "SELECT project_id FROM episodes WHERE id = $1", eid
+            )
+        finally:
+            await conn.close()
     if project_id is None:
         raise HTTPException(status_code=404, detail="Episode not found")
+    _episode_projects.set(eid, project_id)
+    request.state.episode_project_id = project_id
     if project_id not in allowed_projects:
         raise HTTPException(status_code=403, detail="Access denied to this project")
 
@@ -138,22 +147,34 @@ async def _apply_episode_music(
 
 
 @router.get("/episodes")
-async def list_episodes(project_id: int, allowed_projects: list[int] = Depends(get_user_projects)):
+async def list_episodes(project_id: int, request: Request, response: Response,
+                        allowed_projects: list[int] = Depends(get_user_projects)):
     """List episodes for a project."""
     if project_id not in allowed_projects:
         raise HTTPException(status_code=403, detail="Access denied to this project")
+    cached = not_modified(request, response, project_etag(project_id, "episodes"))
+    if cached:
+        return cached
     conn = await connect_direct()
     try:
         rows = await conn.fetch("""
             SELECT e.*, p.name as project_name,
-                   (SELECT COUNT(*) FROM episode_scenes es WHERE es.episode_id = e.id) as scene_count,
-                   (SELECT sh.first_frame_path FROM shots sh
-                    JOIN scenes sc ON sh.scene_id = sc.id
-                    JOIN episode_scenes es ON es.scene_id = sc.id
-                    WHERE es.episode_id = e.id AND sh.first_frame_path IS NOT NULL
-                    ORDER BY es.position LIMIT 1) as cover_frame_path
+                   COALESCE(cnt.scene_count, 0) as scene_count,
+                   cover.first_frame_path as cover_frame_path
             FROM episodes e
             JOIN projects p ON e.project_id = p.id
+            LEFT JOIN (
+                SELECT es.episode_id, COUNT(*) AS scene_count
+                FROM episode_scenes es
+                JOIN episodes ep ON ep.id = es.episode_id AND ep.project_id = $1
+                GROUP BY es.episode_id
+            ) cnt ON cnt.episode_id = e.id
+            LEFT JOIN LATERAL (
+                SELECT sh.first_frame_path FROM episode_scenes es
+                JOIN shots sh ON sh.scene_id = es.scene_id
+                WHERE es.episode_id = e.id AND sh.first_frame_path IS NOT NULL
+                ORDER BY es.position LIMIT 1
+            ) cover ON TRUE
             WHERE e.project_id = $1
             ORDER BY e.episode_number
         """, project_id)
@@ -229,9 +250,13 @@ async def create_episode(body: EpisodeCreateRequest, allowed_projects: list[int]
 
 
 @router.get("/episodes/{episode_id}")
-async def get_episode(episode_id: str):
+async def get_episode(episode_id: str, request: Request, response: Response):
     """Get episode detail with its scenes."""
     eid = uuid.UUID(episode_id)
+    cached = not_modified(request, response, project_etag(
+        request.state.episode_project_id, "episode", episode_id))
+    if cached:
+        return cached
     conn = await connect_direct()
     try:
         ep = await conn.fetchrow("""
@@ -322,6 +347,7 @@ async def delete_episode(episode_id: str):
     try:
         await conn.execute("DELETE FROM episode_scenes WHERE episode_id = $1", eid)
         await conn.execute("DELETE FROM episodes WHERE id = $1", eid)
+        _episode_projects.pop(eid)
         return {"message": "Episode deleted"}
     finally:
         await conn.close()
@@ -474,17 +500,26 @@ async def assemble_episode_endpoint(episode_id: str):
 
 
 @router.get("/episodes/{episode_id}/video")
-async def serve_episode_video(episode_id: str):
-    """Serve assembled episode video."""
+async def serve_episode_video(request: Request, episode_id: str, rendition: str = "full"):
+    """Serve assembled episode video (range-aware; ?rendition=preview|poster)."""
     eid = uuid.UUID(episode_id)
-    conn = await connect_direct()
-    try:
-        path = await conn.fetchval("SELECT final_video_path FROM episodes WHERE id = $1", eid)
-    finally:
-        await conn.close()
+
+    async def fetch():
+        conn = await connect_direct()
+        try:
+            row = await conn.fetchrow(
+                "SELECT project_id, final_video_path FROM episodes WHERE id = $1", eid
+            )
+        finally:
+            await conn.close()
+        return (dict(row), row["project_id"]) if row else (None, None)
+
+    row = await media.lookup_path("episode", eid, fetch)
+    path = row["final_video_path"] if row else None
     if not path or not Path(path).exists():
         raise HTTPException(status_code=404, detail="Episode video not found")
-    return FileResponse(path, media_type="video/mp4", filename=f"episode_{episode_id}.mp4")
+    return await media.serve_file(request, path, "video/mp4",
+                                  filename=f"episode_{episode_id}.mp4", rendition=rendition)
 
 
 @router.post("/episodes/{episode_id}/publish")
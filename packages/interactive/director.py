@@ -13,8 +13,6 @@ import json
 import logging
 import time
 
-import httpx
-
 from packages.core.config import OLLAMA_URL
 
 from .echo_brain import (
@@ -24,7 +22,7 @@ from .echo_brain import (
     store_decision,
     store_session_summary,
 )
-from .engine import load_project_context, generate_scene, OLLAMA_MODEL
+from .engine import load_project_context, generate_scene, get_http_client, OLLAMA_MODEL
 from .image_gen import start_image_generation
 from .models import SceneData
 from .session_store import SessionState, store
@@ -496,25 +494,24 @@ def _build_message_prompt(
 
 async def _call_director(user_prompt: str) -> dict:
     """Call Ollama with the director system prompt."""
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        resp = await client.post(
-            f"{OLLAMA_URL}/api/chat",
-            json={
-                "model": OLLAMA_MODEL,
-                "messages": [
-                    {"role": "system", "content": DIRECTOR_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "format": "json",
-                "stream": False,
-                "options": {
-                    "temperature": 0.8,
-                    "num_predict": 4096,
-                },
+    resp = await get_http_client().post(
+        f"{OLLAMA_URL}/api/chat",
+        json={
+            "model": OLLAMA_MODEL,
+            "messages": [
+                {"role": "system", "content": DIRECTOR_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            "format": "json",
+            "stream": False,
+            "options": {
+                "temperature": 0.8,
+                "num_predict": 4096,
             },
-        )
-        resp.raise_for_status()
-        data = resp.json()
+        },
+    )
+    resp.raise_for_status()
+    data = resp.json()
 
     content = data.get("message", {}).get("content", "{}")
     try:
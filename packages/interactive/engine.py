@@ -160,22 +160,36 @@ async def start_session(project_id: int, character_slugs: list[str] | None = Non
 
 async def generate_scene(session: SessionState, choice_text: str | None = None) -> SceneData:
     """Call Ollama to generate the next scene."""
-    scene_number = len(session.scenes) + 1
+    scene = await draft_scene(session, choice_text)
+    return commit_scene(session, scene, choice_text)
 
-    prompt = build_scene_prompt(
+
+async def draft_scene(session: SessionState, choice_text: str | None = None) -> SceneData:
+    """Generate the next scene without touching session state.
+
+    Safe to run speculatively: the prompt only depends on state that does not
+    change until a scene is committed.
+    """
+    raw = await _call_ollama(build_next_scene_prompt(session, choice_text))
+    return _parse_scene_response(raw, len(session.scenes))
+
+
+def build_next_scene_prompt(session: SessionState, choice_text: str | None = None) -> str:
+    """User prompt for the scene that follows the session's current state."""
+    return build_scene_prompt(
         world_context=session.world_context,
         character_descriptions=session.characters,
         story_summary=session.story_summary,
         relationships=session.relationships,
         variables=session.variables,
         last_choice=choice_text,
-        scene_number=scene_number,
+        scene_number=len(session.scenes) + 1,
         max_scenes=MAX_SCENES,
     )
 
-    raw = await _call_ollama(prompt)
-    scene = _parse_scene_response(raw, scene_number - 1)
 
+def commit_scene(session: SessionState, scene: SceneData, choice_text: str | None = None) -> SceneData:
+    """Apply a drafted scene's effects and append it to the session history."""
     # Apply story effects
     for effect in scene.story_effects:
         if effect.type == "relationship" and effect.target in session.relationships:
@@ -201,46 +215,95 @@ async def generate_scene(session: SessionState, choice_text: str | None = None)
     return scene
 
 
+# Shared Ollama client — one connection pool for all sessions
+_http_client: httpx.AsyncClient | None = None
+
+_FALLBACK_SCENE = {
+    "narration": "The story continues, though the details are hazy...",
+    "image_prompt": "anime scene, mysterious atmosphere, soft lighting",
+    "dialogue": [],
+    "choices": [
+        {"text": "Press forward", "tone": "bold"},
+        {"text": "Take a moment to reflect", "tone": "cautious"},
+    ],
+    "story_effects": [],
+    "is_ending": False,
+    "ending_type": None,
+}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the pooled Ollama client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(120.0, connect=5.0),
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the pooled client. Called at app shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _chat_payload(user_prompt: str, stream: bool) -> dict:
+    return {
+        "model": OLLAMA_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "format": "json",
+        "stream": stream,
+        "options": {
+            "temperature": 0.8,
+            "num_predict": 4096,
+        },
+    }
+
+
 async def _call_ollama(user_prompt: str) -> dict:
     """Call Ollama and parse JSON response."""
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        resp = await client.post(
-            f"{OLLAMA_URL}/api/chat",
-            json={
-                "model": OLLAMA_MODEL,
-                "messages": [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "format": "json",
-                "stream": False,
-                "options": {
-                    "temperature": 0.8,
-                    "num_predict": 4096,
-                },
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
+    resp = await get_http_client().post(
+        f"{OLLAMA_URL}/api/chat", json=_chat_payload(user_prompt, stream=False),
+    )
+    resp.raise_for_status()
+    data = resp.json()
 
     content = data.get("message", {}).get("content", "{}")
+    return _decode_scene_json(content)
+
+
+async def _stream_ollama(user_prompt: str):
+    """Yield content fragments from a streaming Ollama chat completion."""
+    async with get_http_client().stream(
+        "POST", f"{OLLAMA_URL}/api/chat", json=_chat_payload(user_prompt, stream=True),
+    ) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            piece = chunk.get("message", {}).get("content", "")
+            if piece:
+                yield piece
+            if chunk.get("done"):
+                break
+
+
+def _decode_scene_json(content: str) -> dict:
+    """Parse Ollama's JSON output, falling back to a generic scene."""
     try:
         return json.loads(content)
     except json.JSONDecodeError:
         logger.error("Ollama returned invalid JSON: %s", content[:500])
         # Return a fallback scene
-        return {
-            "narration": "The story continues, though the details are hazy...",
-            "image_prompt": "anime scene, mysterious atmosphere, soft lighting",
-            "dialogue": [],
-            "choices": [
-                {"text": "Press forward", "tone": "bold"},
-                {"text": "Take a moment to reflect", "tone": "cautious"},
-            ],
-            "story_effects": [],
-            "is_ending": False,
-            "ending_type": None,
-        }
+        return dict(_FALLBACK_SCENE)
 
 
 def _parse_scene_response(raw: dict, scene_index: int) -> SceneData:
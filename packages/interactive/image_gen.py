@@ -3,6 +3,7 @@ import asyncio
 import logging
 from pathlib import Path
 
+from packages.core import preemption
 from packages.core.config import COMFYUI_OUTPUT_DIR
 from packages.core.generation import _comfyui_slot
 from packages.core.model_profiles import get_model_profile, translate_prompt
@@ -20,9 +21,19 @@ logger = logging.getLogger(__name__)
 INTERACTIVE_SUBDIR = "interactive"
 
 
-async def generate_scene_image(session: SessionState, scene_index: int, image_prompt: str):
-    """Queue image generation for a scene. Updates session.images in-place."""
-    session.images[scene_index] = {"status": "pending", "progress": 0.0}
+async def generate_scene_image(
+    session: SessionState, scene_index: int, image_prompt: str,
+    record: dict | None = None, priority: str = preemption.INTERACTIVE,
+):
+    """Queue image generation for a scene. Updates session.images in-place.
+
+    Speculative callers pass their own ``record`` dict; it is only attached to
+    session.images when the branch is committed. The prompt is queued ahead of
+    lower-priority ComfyUI work, and cancelling the task dequeues/interrupts it.
+    """
+    if record is None:
+        record = session.images[scene_index] = {}
+    record.update({"status": "pending", "progress": 0.0})
 
     try:
         profile = get_model_profile(session.checkpoint_model)
@@ -53,28 +64,29 @@ async def generate_scene_image(session: SessionState, scene_index: int, image_pr
 
         # Acquire shared ComfyUI slot
         async with _comfyui_slot:
-            session.images[scene_index]["status"] = "generating"
-            prompt_id = submit_comfyui_workflow(workflow)
-            session.images[scene_index]["prompt_id"] = prompt_id
+            with preemption.render_scope(f"play:{session.session_id}:{scene_index}:{priority}", priority):
+                record["status"] = "generating"
+                prompt_id = submit_comfyui_workflow(workflow)
+                record["prompt_id"] = prompt_id
 
-            # Poll until complete
-            image_path = await _poll_image(prompt_id, session, scene_index)
+                # Poll until complete
+                image_path = await _poll_image(prompt_id, record)
 
         if image_path:
-            session.images[scene_index].update({
+            record.update({
                 "status": "ready",
                 "progress": 1.0,
                 "path": str(image_path),
             })
         else:
-            session.images[scene_index]["status"] = "failed"
+            record["status"] = "failed"
 
     except Exception:
         logger.exception("Image generation failed for session %s scene %d", session.session_id, scene_index)
-        session.images[scene_index]["status"] = "failed"
+        record["status"] = "failed"
 
 
-async def _poll_image(prompt_id: str, session: SessionState, scene_index: int, timeout: float = 120.0) -> Path | None:
+async def _poll_image(prompt_id: str, record: dict, timeout: float = 120.0) -> Path | None:
     """Poll ComfyUI until image is done. Returns output path or None."""
     elapsed = 0.0
     interval = 2.0
@@ -86,6 +98,7 @@ async def _poll_image(prompt_id: str, session: SessionState, scene_index: int, t
         status = progress.get("status", "unknown")
 
         if status == "completed":
+            preemption.finish(prompt_id)
             images = progress.get("images", [])
             if images:
                 # ComfyUI returns relative paths under output dir
@@ -96,7 +109,7 @@ async def _poll_image(prompt_id: str, session: SessionState, scene_index: int, t
             return None
 
         # Update progress
-        session.images[scene_index]["progress"] = progress.get("progress", 0.0)
+        record["progress"] = progress.get("progress", 0.0)
 
     logger.warning("Image generation timed out for prompt %s", prompt_id)
     return None
@@ -116,6 +129,24 @@ async def start_image_generation(session: SessionState, scene_index: int, image_
     asyncio.create_task(generate_scene_image(session, scene_index, image_prompt))
 
 
+def discard_queued_prompt(prompt_id: str) -> bool:
+    """Drop a prompt from the ComfyUI pending queue. No-op once it is running."""
+    import json
+    import urllib.request
+    from packages.core.config import COMFYUI_URL
+    try:
+        req = urllib.request.Request(
+            f"{COMFYUI_URL}/queue",
+            data=json.dumps({"delete": [prompt_id]}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        urllib.request.urlopen(req, timeout=5)
+        return True
+    except Exception as e:
+        logger.warning("Failed to discard ComfyUI prompt %s: %s", prompt_id, e)
+        return False
+
+
 def get_image_status(session: SessionState, scene_index: int) -> dict:
     """Get current image generation status for a scene."""
     info = session.images.get(scene_index)
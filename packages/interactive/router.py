@@ -9,7 +9,7 @@ from fastapi.responses import FileResponse, StreamingResponse
 
 from packages.core.auth import get_user_projects
 
-from .engine import start_session, generate_scene
+from .engine import start_session
 from .director import (
     start_director_session,
     handle_message,
@@ -20,6 +20,8 @@ from .director import (
 from .image_gen import start_image_generation, get_image_status
 from .models import StartSessionRequest, ChoiceRequest, MessageRequest, EditSceneRequest
 from .session_store import store
+from .speculation import speculate, resolve_choice, cancel_all, speculation_stats
+from .streaming import stream_choice, streaming_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -40,6 +42,7 @@ async def create_session(req: StartSessionRequest, allowed_projects: list[int] =
 
     # Fire off image generation for the opening scene
     await start_image_generation(session, 0, opening_scene.image_prompt)
+    await speculate(session)
 
     return {
         "session_id": session.session_id,
@@ -75,6 +78,9 @@ async def get_session(session_id: str):
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     """End and remove a session."""
+    session = store.get(session_id)
+    if session:
+        cancel_all(session)
     if store.delete(session_id):
         return {"message": "Session ended"}
     raise HTTPException(status_code=404, detail="Session not found")
@@ -116,13 +122,13 @@ async def submit_choice(session_id: str, req: ChoiceRequest):
     choice_text = choices[req.choice_index]["text"]
 
     try:
-        next_scene = await generate_scene(session, choice_text)
+        next_scene = await resolve_choice(session, choice_text)
     except Exception:
         logger.exception("Failed to generate next scene")
         raise HTTPException(status_code=500, detail="Failed to generate scene")
 
     scene_idx = session.current_scene_index
-    await start_image_generation(session, scene_idx, next_scene.image_prompt)
+    await speculate(session)
 
     return {
         "scene": next_scene.model_dump(),
@@ -131,6 +137,71 @@ async def submit_choice(session_id: str, req: ChoiceRequest):
     }
 
 
+@router.post("/sessions/{session_id}/choose/stream")
+async def submit_choice_stream(session_id: str, req: ChoiceRequest):
+    """Submit a player choice; stream the next scene over SSE as it is written.
+
+    Events: narration_delta {text}, image_submitted {scene_index},
+    scene {scene, image, session_ended}, error {message}.
+    """
+    session = store.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.is_ended:
+        raise HTTPException(status_code=400, detail="Session has ended")
+
+    current = session.scenes[-1] if session.scenes else None
+    if not current:
+        raise HTTPException(status_code=400, detail="No current scene")
+
+    choices = current.get("choices", [])
+    if req.choice_index < 0 or req.choice_index >= len(choices):
+        raise HTTPException(status_code=400, detail=f"Invalid choice index (0-{len(choices)-1})")
+
+    choice_text = choices[req.choice_index]["text"]
+
+    async def event_generator():
+        try:
+            async for event_type, data in stream_choice(session, choice_text):
+                yield f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+        except Exception:
+            logger.exception("Failed to stream next scene")
+            yield f"event: error\ndata: {json.dumps({'message': 'Failed to generate scene'})}\n\n"
+            return
+        await speculate(session)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.get("/streaming/stats")
+async def get_streaming_stats():
+    """Time-to-first-text and time-to-image-submit for streamed scenes."""
+    return streaming_stats()
+
+
+@router.get("/speculation/stats")
+async def get_speculation_stats():
+    """Global branch-prefetch hit rate and latency saved."""
+    return speculation_stats()
+
+
+@router.get("/sessions/{session_id}/speculation")
+async def get_session_speculation(session_id: str):
+    """Branch-prefetch hit rate, latency saved and remaining budget for a session."""
+    session = store.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return speculation_stats(session)
+
+
 @router.get("/sessions/{session_id}/image/{scene_idx}")
 async def image_status(session_id: str, scene_idx: int):
     """Get image generation status for a scene."""
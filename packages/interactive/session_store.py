@@ -29,6 +29,14 @@ class SessionState:
     prefetch_scene_index: int | None = None
     prefetch_prompt_id: str | None = None
 
+    # Speculative branches: choice_text -> speculation.Branch
+    speculative_branches: dict[str, object] = field(default_factory=dict)
+    # Speculative Ollama calls this session may still spend
+    speculation_budget: int = 60
+    speculation_stats: dict = field(
+        default_factory=lambda: {"hits": 0, "misses": 0, "latency_saved_s": 0.0}
+    )
+
     created_at: float = field(default_factory=time.time)
     last_active: float = field(default_factory=time.time)
 
@@ -0,0 +1,214 @@
+"""Speculative branch prefetch — draft the next scene for every offered choice.
+
+After a scene is shown the player usually spends several seconds reading it.
+We use that time to draft the next scene for each choice concurrently, and to
+queue a keyframe for the most likely branch while ComfyUI has a free slot.
+When the player chooses, a finished (or in-flight) draft is committed instead
+of starting a fresh Ollama call; every other branch is cancelled.
+
+Branch likelihood comes from the player's history: choices whose tone the
+player has picked before rank first, ties keep the order the LLM offered them.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from packages.core import preemption
+from packages.core.executors import offload
+from packages.core.generation import _comfyui_slot
+
+from .engine import draft_scene, commit_scene
+from .image_gen import generate_scene_image, start_image_generation, discard_queued_prompt
+from .models import SceneData
+from .session_store import SessionState
+
+logger = logging.getLogger(__name__)
+
+# Max branches drafted after a single scene
+MAX_BRANCHES = 3
+# Speculative keyframes queued per scene (for the top-ranked branches)
+MAX_SPECULATIVE_KEYFRAMES = 1
+# Cap on concurrent speculative Ollama calls across all sessions
+_ollama_slot = asyncio.Semaphore(4)
+
+# In-flight ComfyUI queue deletions (held so the tasks aren't garbage collected)
+_pending_discards: set[asyncio.Task] = set()
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "drafts_started": 0,
+    "drafts_cancelled": 0,
+    "keyframes_queued": 0,
+    "keyframe_hits": 0,
+    "text_latency_saved_s": 0.0,
+    "image_latency_saved_s": 0.0,
+}
+
+
+@dataclass
+class Branch:
+    """One speculative continuation of the current scene."""
+    choice_text: str
+    rank: int
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+    task: asyncio.Task | None = None
+    image_record: dict | None = None
+    image_task: asyncio.Task | None = None
+    image_started_at: float | None = None
+
+
+def rank_choices(session: SessionState, choices: list[dict]) -> list[int]:
+    """Order choice indices from most to least likely, using past tone picks."""
+    tone_by_text = {}
+    for scene in session.scenes:
+        for c in scene.get("choices", []):
+            tone_by_text[c.get("text")] = c.get("tone", "neutral")
+    picked = Counter(
+        tone_by_text.get(s["chosen_text"], "neutral")
+        for s in session.scenes if s.get("chosen_text")
+    )
+    return sorted(
+        range(len(choices)),
+        key=lambda i: (-picked.get(choices[i].get("tone", "neutral"), 0), i),
+    )
+
+
+async def speculate(session: SessionState):
+    """Start drafting the next scene for each offered choice.
+
+    Called right after a scene has been shown. Returns immediately; drafts
+    run as background tasks tracked on session.speculative_branches.
+    """
+    cancel_all(session)
+    if session.is_ended or not session.scenes:
+        return
+
+    choices = session.scenes[-1].get("choices", [])
+    order = rank_choices(session, choices)[:MAX_BRANCHES]
+    order = order[:max(session.speculation_budget, 0)]
+    next_index = len(session.scenes)
+
+    for rank, idx in enumerate(order):
+        text = choices[idx]["text"]
+        branch = Branch(choice_text=text, rank=rank)
+        branch.task = asyncio.create_task(
+            _draft_branch(session, branch, next_index)
+        )
+        session.speculative_branches[text] = branch
+        session.speculation_budget -= 1
+        _stats["drafts_started"] += 1
+
+
+async def _draft_branch(session: SessionState, branch: Branch, next_index: int) -> SceneData:
+    async with _ollama_slot:
+        scene = await draft_scene(session, branch.choice_text)
+    branch.finished_at = time.monotonic()
+
+    if branch.rank < MAX_SPECULATIVE_KEYFRAMES and not _comfyui_slot.locked():
+        # Low priority: only use a ComfyUI slot nobody else is waiting for
+        branch.image_record = {}
+        branch.image_started_at = time.monotonic()
+        branch.image_task = asyncio.create_task(generate_scene_image(
+            session, next_index, scene.image_prompt, record=branch.image_record,
+            priority=preemption.REVIEW,  # behind images a player is waiting on
+        ))
+        session.prefetch_scene_index = next_index
+        _stats["keyframes_queued"] += 1
+    return scene
+
+
+async def resolve_choice(session: SessionState, choice_text: str) -> SceneData:
+    """Commit the next scene for a choice, reusing a speculative draft if any.
+
+    Falls back to a regular draft on a miss or if the speculative draft failed.
+    Starts (or adopts) the scene's image generation.
+    """
+    branch = session.speculative_branches.pop(choice_text, None)
+    chosen_at = time.monotonic()
+    cancel_all(session)
+
+    scene = None
+    if branch is not None:
+        try:
+            scene = await branch.task
+        except Exception:
+            logger.warning("Speculative draft failed for session %s", session.session_id)
+
+    if scene is None:
+        note_miss(session)
+        if branch is not None:
+            _discard_image(branch)
+        scene = await draft_scene(session, choice_text)
+        commit_scene(session, scene, choice_text)
+        await start_image_generation(session, session.current_scene_index, scene.image_prompt)
+        return scene
+
+    text_saved = (branch.finished_at or chosen_at) - branch.started_at
+    text_saved = min(text_saved, chosen_at - branch.started_at)
+    _stats["hits"] += 1
+    _stats["text_latency_saved_s"] += text_saved
+    session.speculation_stats["hits"] += 1
+    session.speculation_stats["latency_saved_s"] += text_saved
+
+    commit_scene(session, scene, choice_text)
+    scene_idx = session.current_scene_index
+    if branch.image_record is not None and branch.image_record.get("status") != "failed":
+        session.images[scene_idx] = branch.image_record
+        image_saved = chosen_at - branch.image_started_at
+        _stats["keyframe_hits"] += 1
+        _stats["image_latency_saved_s"] += image_saved
+        session.speculation_stats["latency_saved_s"] += image_saved
+    else:
+        await start_image_generation(session, scene_idx, scene.image_prompt)
+    session.prefetch_scene_index = None
+    return scene
+
+
+def note_miss(session: SessionState):
+    """Record a choice that had no usable speculative draft."""
+    _stats["misses"] += 1
+    session.speculation_stats["misses"] += 1
+
+
+def cancel_all(session: SessionState):
+    """Cancel every outstanding speculative branch and evict its keyframe."""
+    for branch in session.speculative_branches.values():
+        if branch.task and not branch.task.done():
+            branch.task.cancel()
+            _stats["drafts_cancelled"] += 1
+        _discard_image(branch)
+    session.speculative_branches.clear()
+
+
+def _discard_image(branch: Branch):
+    if branch.image_task and not branch.image_task.done():
+        branch.image_task.cancel()
+    prompt_id = (branch.image_record or {}).get("prompt_id")
+    if prompt_id and branch.image_record.get("status") != "ready":
+        # Blocking urllib POST (5s timeout) — never run it on the event loop
+        task = asyncio.get_running_loop().create_task(offload(discard_queued_prompt, prompt_id))
+        _pending_discards.add(task)
+        task.add_done_callback(_pending_discards.discard)
+
+
+def speculation_stats(session: SessionState | None = None) -> dict:
+    """Global (or per-session) hit rate and latency saved."""
+    if session is not None:
+        s = session.speculation_stats
+        total = s["hits"] + s["misses"]
+        return {
+            **s,
+            "hit_rate": round(s["hits"] / total, 3) if total else None,
+            "budget_remaining": session.speculation_budget,
+            "pending_branches": list(session.speculative_branches),
+        }
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / total, 3) if total else None,
+    }
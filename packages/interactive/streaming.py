@@ -0,0 +1,217 @@
+"""Streaming scene delivery — narration as it is written, image as soon as possible.
+
+Ollama streams the scene JSON token by token. SceneStreamParser scans that
+text incrementally and reports top-level string fields: narration is pushed
+to the client as deltas, and image_prompt is handed to ComfyUI the moment its
+closing quote arrives — long before dialogue and choices are written.
+"""
+
+import json
+import logging
+import re
+import time
+
+from .engine import (
+    _decode_scene_json,
+    _parse_scene_response,
+    _stream_ollama,
+    build_next_scene_prompt,
+    commit_scene,
+)
+from .image_gen import start_image_generation, get_image_status
+from .session_store import SessionState
+from . import speculation
+
+logger = logging.getLogger(__name__)
+
+# Trailing partial escape (\, \u, \u12, ...) or a lone high surrogate escape
+_INCOMPLETE_ESCAPE = re.compile(r'(\\u[dD][89abAB][0-9a-fA-F]{2}|\\u[0-9a-fA-F]{0,3}|\\)$')
+
+_stats = {
+    "streams": 0,
+    "ttft_ms_total": 0.0,
+    "image_submit_ms_total": 0.0,
+    "total_ms_total": 0.0,
+}
+
+
+class SceneStreamParser:
+    """Incremental scanner for a streamed top-level JSON object.
+
+    feed() returns a list of events:
+      ("delta", field, text)  — new decoded text for a field in stream_fields
+      ("field", field, value) — a top-level string field has been closed
+    Nested objects/arrays are skipped; result() parses the full document.
+    """
+
+    def __init__(self, stream_fields: tuple[str, ...] = ("narration",)):
+        self.stream_fields = stream_fields
+        self._buf: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._raw: list[str] = []
+        self._string_role: str | None = None  # "key", "value" or None (nested)
+        self._expect_value = False
+        self._key: str | None = None
+        self._emitted = 0
+
+    def feed(self, chunk: str) -> list[tuple[str, str, str]]:
+        events = []
+        self._buf.append(chunk)
+        for c in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._close_string(events)
+                    continue
+                self._raw.append(c)
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._raw = []
+                self._emitted = 0
+                if self._depth == 1:
+                    self._string_role = "value" if self._expect_value else "key"
+                else:
+                    self._string_role = None
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+            elif self._depth == 1 and c == ":":
+                self._expect_value = True
+            elif self._depth == 1 and c == ",":
+                self._expect_value = False
+
+        if self._streaming():
+            self._emit_delta(events, final=False)
+        return events
+
+    def result(self) -> dict:
+        """Parse the complete document (fallback scene on invalid JSON)."""
+        return _decode_scene_json("".join(self._buf))
+
+    def _streaming(self) -> bool:
+        return (self._in_string and self._string_role == "value"
+                and self._key in self.stream_fields)
+
+    def _close_string(self, events: list):
+        if self._streaming():
+            self._emit_delta(events, final=True)
+        self._in_string = False
+        if self._string_role == "key":
+            self._key = _decode("".join(self._raw))
+        elif self._string_role == "value":
+            events.append(("field", self._key, _decode("".join(self._raw))))
+        self._string_role = None
+
+    def _emit_delta(self, events: list, final: bool):
+        raw = "".join(self._raw)
+        if not final:
+            raw = _strip_incomplete_escape(raw)
+        text = _decode(raw)
+        if len(text) > self._emitted:
+            events.append(("delta", self._key, text[self._emitted:]))
+            self._emitted = len(text)
+
+
+def _strip_incomplete_escape(raw: str) -> str:
+    """Drop a trailing escape that the next chunk will complete.
+
+    A matched backslash only starts an escape when an even number of
+    backslashes precede it — otherwise it is the second half of an escaped
+    backslash (\\\\) and the text so far is complete.
+    """
+    match = _INCOMPLETE_ESCAPE.search(raw)
+    if not match:
+        return raw
+    head = raw[:match.start()]
+    if (len(head) - len(head.rstrip("\\"))) % 2:
+        return raw
+    return head
+
+
+def _decode(raw: str) -> str:
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw
+
+
+async def stream_choice(session: SessionState, choice_text: str):
+    """Resolve a player choice, yielding (event, data) pairs as the scene arrives.
+
+    A speculative draft for the choice is committed directly; otherwise the
+    scene is streamed from Ollama. Events: narration_delta, image_submitted,
+    scene (final).
+    """
+    if choice_text in session.speculative_branches:
+        scene = await speculation.resolve_choice(session, choice_text)
+        yield "scene", _scene_payload(session, scene)
+        return
+
+    speculation.cancel_all(session)
+    speculation.note_miss(session)
+
+    scene_index = len(session.scenes)
+    prompt = build_next_scene_prompt(session, choice_text)
+
+    started = time.monotonic()
+    first_text_at = None
+    image_submitted_at = None
+    parser = SceneStreamParser()
+
+    async for piece in _stream_ollama(prompt):
+        for kind, name, value in parser.feed(piece):
+            if kind == "delta" and name == "narration":
+                if first_text_at is None:
+                    first_text_at = time.monotonic()
+                yield "narration_delta", {"text": value}
+            elif kind == "field" and name == "image_prompt" and image_submitted_at is None:
+                await start_image_generation(session, scene_index, value)
+                image_submitted_at = time.monotonic()
+                yield "image_submitted", {"scene_index": scene_index}
+
+    scene = _parse_scene_response(parser.result(), scene_index)
+    if image_submitted_at is None:
+        await start_image_generation(session, scene_index, scene.image_prompt)
+        image_submitted_at = time.monotonic()
+    commit_scene(session, scene, choice_text)
+
+    _record(started, first_text_at, image_submitted_at)
+    yield "scene", _scene_payload(session, scene)
+
+
+def _scene_payload(session: SessionState, scene) -> dict:
+    idx = session.current_scene_index
+    return {
+        "scene": scene.model_dump(),
+        "image": get_image_status(session, idx),
+        "session_ended": session.is_ended,
+    }
+
+
+def _record(started: float, first_text_at: float | None, image_submitted_at: float):
+    done = time.monotonic()
+    _stats["streams"] += 1
+    _stats["ttft_ms_total"] += ((first_text_at or done) - started) * 1000
+    _stats["image_submit_ms_total"] += (image_submitted_at - started) * 1000
+    _stats["total_ms_total"] += (done - started) * 1000
+
+
+def streaming_stats() -> dict:
+    """Average time-to-first-text and time-to-image-submit for streamed scenes."""
+    n = _stats["streams"]
+    if not n:
+        return {"streams": 0}
+    return {
+        "streams": n,
+        "avg_time_to_first_text_ms": round(_stats["ttft_ms_total"] / n, 1),
+        "avg_time_to_image_submit_ms": round(_stats["image_submit_ms_total"] / n, 1),
+        "avg_total_ms": round(_stats["total_ms_total"] / n, 1),
+    }
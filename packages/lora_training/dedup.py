@@ -1,7 +1,9 @@
 """Perceptual hash deduplication for ingestion paths.
 
 Uses the average-hash implementation from packages.visual_pipeline.vision to detect
-near-duplicate images before they enter a character's dataset.
+near-duplicate images before they enter a character's dataset. Existing dataset
+images take their hash from the .meta.json analysis (image_analysis) when it is
+current, so building an index does not decode every image.
 """
 
 import logging
@@ -17,6 +19,18 @@ logger = logging.getLogger(__name__)
 _hash_caches: dict[str, set[str]] = {}
 
 
+def _indexed_hash(image_path: Path) -> str:
+    """Sidecar hash when current, else decode."""
+    try:
+        from packages.visual_pipeline.image_analysis import current_analysis
+        meta = current_analysis(image_path)
+        if meta and meta.get("phash"):
+            return meta["phash"]
+    except ImportError:
+        pass
+    return perceptual_hash(image_path)
+
+
 def build_hash_index(slug: str) -> set[str]:
     """Build (or return cached) perceptual hash index for a character's existing dataset."""
     if slug in _hash_caches:
@@ -27,7 +41,7 @@ def build_hash_index(slug: str) -> set[str]:
     if images_dir.is_dir():
         for img in images_dir.glob("*.png"):
             try:
-                h = perceptual_hash(img)
+                h = _indexed_hash(img)
                 hashes.add(h)
             except Exception:
                 pass
@@ -36,21 +50,25 @@ def build_hash_index(slug: str) -> set[str]:
     return hashes
 
 
-def is_duplicate(image_path: Path, slug: str) -> bool:
-    """Check whether image_path is a perceptual duplicate of anything in slug's dataset."""
+def is_duplicate(image_path: Path, slug: str, phash: str | None = None) -> bool:
+    """Check whether image_path is a perceptual duplicate of anything in slug's dataset.
+
+    Pass phash when the caller already hashed the image (the ingest pipeline
+    hashes every frame once in its extract stage) to skip re-decoding it.
+    """
     index = build_hash_index(slug)
     try:
-        h = perceptual_hash(image_path)
+        h = phash or perceptual_hash(image_path)
     except Exception:
         return False
     return h in index
 
 
-def register_hash(image_path: Path, slug: str) -> None:
+def register_hash(image_path: Path, slug: str, phash: str | None = None) -> None:
     """Add image_path's hash to the in-memory cache after a successful copy."""
     index = build_hash_index(slug)
     try:
-        h = perceptual_hash(image_path)
+        h = phash or perceptual_hash(image_path)
         index.add(h)
     except Exception:
         pass
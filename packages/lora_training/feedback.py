@@ -4,12 +4,15 @@ Also includes training job file helpers and image status registration utilities.
 """
 
 import asyncio
+import fcntl as _fcntl
 import json
 import logging
 import os
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+from packages.core import prompt_plan
 from packages.core.config import BASE_PATH
 
 logger = logging.getLogger(__name__)
@@ -18,10 +21,20 @@ logger = logging.getLogger(__name__)
 IMAGE_STATUSES = {"pending", "approved", "rejected", "flagged", "hidden"}
 
 # --- Training job storage (file-based until DB wiring is needed) ---
+#
+# training_jobs.json is shared by the API, the resident trainer and the
+# train_lora.py subprocesses. Writers read-modify-write it under an flock on
+# TRAINING_JOBS_LOCK (locked_training_jobs) and replace the file atomically,
+# so readers never see a half-written file and no process saves over a job
+# another one appended or cancelled in between.
 
 TRAINING_JOBS_FILE = BASE_PATH.parent / "training_jobs.json"
 
 
+def _jobs_lock_file() -> Path:
+    return TRAINING_JOBS_FILE.with_suffix(".lock")
+
+
 def load_training_jobs() -> list:
     if TRAINING_JOBS_FILE.exists():
         with open(TRAINING_JOBS_FILE) as f:
@@ -29,35 +42,68 @@ def load_training_jobs() -> list:
     return []
 
 
+def _write_training_jobs(jobs: list):
+    tmp = TRAINING_JOBS_FILE.with_name(f"{TRAINING_JOBS_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(jobs, f, indent=2)
+    os.replace(tmp, TRAINING_JOBS_FILE)
+
+
+@contextmanager
+def locked_training_jobs():
+    """Yield the job list under an exclusive file lock; saved atomically if changed.
+
+    Use this for any read-modify-write: load, change and save happen while
+    every other writer waits, so concurrent appends and cancels are not lost.
+    """
+    TRAINING_JOBS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(_jobs_lock_file(), "w") as lf:
+        _fcntl.flock(lf, _fcntl.LOCK_EX)
+        try:
+            jobs = load_training_jobs()
+            before = json.dumps(jobs)
+            yield jobs
+            if json.dumps(jobs) != before:
+                _write_training_jobs(jobs)
+        finally:
+            _fcntl.flock(lf, _fcntl.LOCK_UN)
+
+
 def save_training_jobs(jobs: list):
+    """Replace the whole job list. Prefer locked_training_jobs() for updates."""
     TRAINING_JOBS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(TRAINING_JOBS_FILE, "w") as f:
-        json.dump(jobs, f, indent=2)
+    with open(_jobs_lock_file(), "w") as lf:
+        _fcntl.flock(lf, _fcntl.LOCK_EX)
+        try:
+            _write_training_jobs(jobs)
+        finally:
+            _fcntl.flock(lf, _fcntl.LOCK_UN)
 
 
 def reconcile_training_jobs() -> int:
     """Detect and fix stale training jobs (running/queued but process is dead)."""
-    jobs = load_training_jobs()
     reconciled = 0
-    for job in jobs:
-        if job.get("status") not in ("running", "queued"):
-            continue
-        pid = job.get("pid")
-        alive = False
-        if pid:
-            try:
-                os.kill(pid, 0)
-                alive = True
-            except (OSError, ProcessLookupError):
-                pass
-        if not alive:
-            job["status"] = "failed"
-            job["error"] = "Process died without updating status (detected at startup)"
-            job["failed_at"] = datetime.now().isoformat()
-            reconciled += 1
-            logger.warning(f"Reconciled stale job {job['job_id']} (pid={pid})")
+    with locked_training_jobs() as jobs:
+        for job in jobs:
+            if job.get("status") not in ("running", "queued"):
+                continue
+            if job.get("status") == "queued" and job.get("runner") == "resident":
+                continue  # waiting for the resident trainer, no process yet
+            pid = job.get("pid")
+            alive = False
+            if pid:
+                try:
+                    os.kill(pid, 0)
+                    alive = True
+                except (OSError, ProcessLookupError):
+                    pass
+            if not alive:
+                job["status"] = "failed"
+                job["error"] = "Process died without updating status (detected at startup)"
+                job["failed_at"] = datetime.now().isoformat()
+                reconciled += 1
+                logger.warning(f"Reconciled stale job {job['job_id']} (pid={pid})")
     if reconciled:
-        save_training_jobs(jobs)
         logger.info(f"Reconciled {reconciled} stale training job(s)")
     return reconciled
 
@@ -144,6 +190,7 @@ def record_rejection(character_slug: str, image_name: str, feedback: str, edited
         data["rejections"] = data["rejections"][-50:]
 
     feedback_json.write_text(json.dumps(data, indent=2))
+    prompt_plan.invalidate(character_slug)
 
 
 def get_feedback_negatives(character_slug: str) -> str:
@@ -293,16 +340,28 @@ def register_pending_image(character_slug: str, image_name: str):
     register_image_status(character_slug, image_name, "pending")
 
 
-import fcntl as _fcntl
-
 def register_image_status(character_slug: str, image_name: str, status: str):
     """Register a single image with given status in approval_status.json.
 
     Uses file locking to prevent concurrent writes from clobbering each other.
     Only sets status if the image isn't already tracked (won't overwrite approved→pending).
     """
-    if status not in IMAGE_STATUSES:
-        raise ValueError(f"Invalid image status '{status}'. Must be one of: {sorted(IMAGE_STATUSES)}")
+    register_image_statuses(character_slug, {image_name: status})
+
+
+def register_image_statuses(character_slug: str, statuses: dict[str, str]):
+    """Register many images for one character in a single locked read-modify-write.
+
+    Bulk ingest saves frames in batches; rewriting approval_status.json once per
+    batch instead of once per frame keeps a multi-thousand-frame import from
+    re-serialising the whole status file thousands of times. Same no-downgrade
+    rule as register_image_status().
+    """
+    for status in statuses.values():
+        if status not in IMAGE_STATUSES:
+            raise ValueError(f"Invalid image status '{status}'. Must be one of: {sorted(IMAGE_STATUSES)}")
+    if not statuses:
+        return
     approval_file = BASE_PATH / character_slug / "approval_status.json"
     lock_file = approval_file.with_suffix(".lock")
     approval_file.parent.mkdir(parents=True, exist_ok=True)
@@ -316,11 +375,15 @@ def register_image_status(character_slug: str, image_name: str, status: str):
                     approval_status = json.loads(approval_file.read_text())
                 except (json.JSONDecodeError, IOError):
                     pass
-            # Don't downgrade: never overwrite approved/rejected with pending
-            existing = approval_status.get(image_name)
-            if existing in ("approved", "rejected") and status == "pending":
-                return
-            approval_status[image_name] = status
-            approval_file.write_text(json.dumps(approval_status, indent=2))
+            changed = False
+            for image_name, status in statuses.items():
+                # Don't downgrade: never overwrite approved/rejected with pending
+                existing = approval_status.get(image_name)
+                if existing in ("approved", "rejected") and status == "pending":
+                    continue
+                approval_status[image_name] = status
+                changed = True
+            if changed:
+                approval_file.write_text(json.dumps(approval_status, indent=2))
         finally:
             _fcntl.flock(lf, _fcntl.LOCK_UN)
@@ -58,15 +58,47 @@ def extract_smart_frames(video_path: Path, max_frames: int, tmpdir: str) -> list
         return _flat_extract(video_path, max_frames, frames_dir)
 
     logger.info(f"Video duration: {duration:.1f}s, target: {max_frames} frames")
+    return [path for path, _ in _extract_window(
+        video_path, 0.0, duration, max_frames, Path(tmpdir), frames_dir,
+    )]
+
+
+def extract_segment(
+    video_path: str, index: int, start: float, length: float, max_frames: int, tmpdir: str,
+) -> list[tuple[str, str]]:
+    """Smart-extract one time window of a long video for the staged ingest pipeline.
+
+    Same scene + uniform + dedup strategy as extract_smart_frames(), restricted to
+    [start, start + length). Working files live under tmpdir/seg_<index>/ and the
+    intermediate scene/uniform dirs are removed before returning, so only the
+    selected frames occupy disk while they wait for classification.
+
+    Module-level with plain-type arguments so it can run in the CPU process pool.
+
+    Returns: List of (frame path, perceptual hash) tuples.
+    """
+    workdir = Path(tmpdir) / f"seg_{index:04d}"
+    frames_dir = workdir / "frames"
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    frames = _extract_window(Path(video_path), start, length, max_frames, workdir, frames_dir)
+    return [(str(path), phash) for path, phash in frames]
+
+
+def _extract_window(
+    video_path: Path, start: float, length: float, max_frames: int,
+    workdir: Path, frames_dir: Path,
+) -> list[tuple[Path, str]]:
+    """Phases 1-3 of smart extraction over [start, start + length)."""
+    seek = ["-ss", f"{start:.3f}", "-t", f"{length:.3f}"] if start > 0 else ["-t", f"{length:.3f}"]
 
     # --- Phase 1: Scene-change detection ---
-    scene_dir = Path(tmpdir) / "scene_frames"
+    scene_dir = workdir / "scene_frames"
     scene_dir.mkdir(exist_ok=True)
     scene_pattern = str(scene_dir / "scene_%04d.png")
     scene_limit = max_frames * 3
 
     subprocess.run(
-        ["ffmpeg", "-i", str(video_path),
+        ["ffmpeg", *seek, "-i", str(video_path),
          "-vf", "select='gt(scene,0.3)',scale=768:-1",
          "-vsync", "vfr", "-q:v", "1",
          "-frames:v", str(scene_limit),
@@ -77,23 +109,23 @@ def extract_smart_frames(video_path: Path, max_frames: int, tmpdir: str) -> list
     logger.info(f"Scene detection found {len(scene_frames)} distinct scenes")
 
     # --- Phase 2: Uniform temporal sampling ---
-    uniform_dir = Path(tmpdir) / "uniform_frames"
+    uniform_dir = workdir / "uniform_frames"
     uniform_dir.mkdir(exist_ok=True)
     uniform_pattern = str(uniform_dir / "uniform_%04d.png")
 
     uniform_count = max_frames * 2
-    interval = duration / uniform_count if uniform_count > 0 else 1.0
+    interval = length / uniform_count if uniform_count > 0 else 1.0
     uniform_fps = 1.0 / max(interval, 0.1)
 
     subprocess.run(
-        ["ffmpeg", "-i", str(video_path),
+        ["ffmpeg", *seek, "-i", str(video_path),
          "-vf", f"fps={uniform_fps:.4f},scale=768:-1",
          "-q:v", "1", "-frames:v", str(uniform_count),
          uniform_pattern, "-y"],
         capture_output=True, timeout=300,
     )
     uniform_frames = sorted(uniform_dir.glob("uniform_*.png"))
-    logger.info(f"Uniform sampling extracted {len(uniform_frames)} frames across {duration:.0f}s")
+    logger.info(f"Uniform sampling extracted {len(uniform_frames)} frames across {length:.0f}s")
 
     # --- Phase 3: Merge + perceptual hash dedup ---
     # Scene frames get priority (they're at actual content changes)
@@ -104,7 +136,7 @@ def extract_smart_frames(video_path: Path, max_frames: int, tmpdir: str) -> list
         return []
 
     seen_hashes: set[str] = set()
-    unique_frames: list[Path] = []
+    unique_frames: list[tuple[Path, str]] = []
 
     for frame_path, source in all_candidates:
         phash = perceptual_hash(frame_path)
@@ -113,8 +145,10 @@ def extract_smart_frames(video_path: Path, max_frames: int, tmpdir: str) -> list
         seen_hashes.add(phash)
         dest = frames_dir / f"frame_{len(unique_frames) + 1:04d}.png"
         shutil.copy2(frame_path, dest)
-        unique_frames.append(dest)
+        unique_frames.append((dest, phash))
 
+    shutil.rmtree(scene_dir, ignore_errors=True)
+    shutil.rmtree(uniform_dir, ignore_errors=True)
     logger.info(f"After dedup: {len(unique_frames)} unique from {len(all_candidates)} candidates")
 
     # Trim to max_frames — take evenly spaced subset if we have too many
@@ -123,7 +157,7 @@ def extract_smart_frames(video_path: Path, max_frames: int, tmpdir: str) -> list
         selected = [unique_frames[int(i * step)] for i in range(max_frames)]
         for f in unique_frames:
             if f not in selected:
-                f.unlink(missing_ok=True)
+                f[0].unlink(missing_ok=True)
         unique_frames = selected
 
     logger.info(f"Final: {len(unique_frames)} frames for classification")
@@ -1,6 +1,5 @@
 """Ingest helpers — Pydantic models, shared state, classification and save utilities."""
 
-import asyncio
 import json
 import logging
 import re
@@ -12,6 +11,7 @@ from pydantic import BaseModel
 
 from packages.core.config import BASE_PATH, COMFYUI_OUTPUT_DIR, MOVIES_DIR
 from packages.core.comfyui import build_ipadapter_workflow
+from packages.core.executors import offload
 from packages.lora_training.dedup import is_duplicate, register_hash
 from packages.lora_training.feedback import register_pending_image
 
@@ -89,9 +89,14 @@ def _save_unclassified_frame(
     description: str,
     matched: list[str],
     timestamp: str,
+    phash: str | None = None,
+    pending: list[str] | None = None,
 ) -> str | None:
     """Copy an unmatched frame to _unclassified/images/ with metadata.
 
+    When pending is given the filename is appended to it instead of being
+    registered immediately, so a batch caller can write approval_status.json once.
+
     Returns the destination filename, or None if the frame is a duplicate.
     """
     unc_dir = BASE_PATH / _UNCLASSIFIED_SLUG / "images"
@@ -102,7 +107,7 @@ def _save_unclassified_frame(
     dest = unc_dir / dest_name
 
     # Dedup against existing unclassified images
-    if is_duplicate(frame, _UNCLASSIFIED_SLUG):
+    if is_duplicate(frame, _UNCLASSIFIED_SLUG, phash):
         return None
 
     shutil.copy2(frame, dest)
@@ -124,13 +129,16 @@ def _save_unclassified_frame(
     }
     dest.with_suffix(".meta.json").write_text(json.dumps(meta, indent=2))
     dest.with_suffix(".txt").write_text("unclassified frame")
-    register_pending_image(_UNCLASSIFIED_SLUG, dest_name)
-    register_hash(dest, _UNCLASSIFIED_SLUG)
+    if pending is None:
+        register_pending_image(_UNCLASSIFIED_SLUG, dest_name)
+    else:
+        pending.append(dest_name)
+    register_hash(dest, _UNCLASSIFIED_SLUG, phash)
     return dest_name
 
 
 def _classify_image_sync(image_path: Path, **kwargs) -> tuple[list[str], str]:
-    """Classify an image (blocking). Called via asyncio.to_thread().
+    """Classify an image (blocking). Called via offload() in the I/O pool.
 
     Tries CLIP-based classification first (fast, content-agnostic, works with NSFW).
     Falls back to vision model if CLIP has no reference embeddings for the project.
@@ -164,7 +172,29 @@ def _classify_image_sync(image_path: Path, **kwargs) -> tuple[list[str], str]:
 
 async def _classify_image(image_path: Path, **kwargs) -> tuple[list[str], str]:
     """Classify an image without blocking the event loop."""
-    return await asyncio.to_thread(_classify_image_sync, image_path, **kwargs)
+    return await offload(_classify_image_sync, image_path, **kwargs)
+
+
+async def _wd14_tags(frame: Path) -> dict:
+    """WD14 tags for an ingested frame, or {} when the tagger isn't installed.
+
+    Never downloads the model mid-ingest; run server/wd14_tagger.py once to fetch it.
+    """
+    from packages.visual_pipeline import wd14
+    if not wd14.model_ready():
+        return {}
+    try:
+        return (await wd14.tag_images([frame]))[0]
+    except Exception as e:
+        logging.getLogger(__name__).debug(f"WD14 tagging failed for {frame.name}: {e}")
+        return {}
+
+
+def _write_dataset_frame(frame: Path, dest: Path, meta: dict, caption: str) -> None:
+    """Copy a frame into a dataset with its .meta.json and caption (blocking)."""
+    shutil.copy2(frame, dest)
+    dest.with_suffix(".meta.json").write_text(json.dumps(meta, indent=2))
+    dest.with_suffix(".txt").write_text(caption)
 
 
 async def _save_frame_to_characters(
@@ -179,28 +209,36 @@ async def _save_frame_to_characters(
     project_name: str,
     description: str,
     prefix: str = "yt",
+    phash: str | None = None,
+    tags: dict | None = None,
+    pending: dict[str, list[str]] | None = None,
 ) -> tuple[list[str], int]:
     """Save a frame to ALL matched character datasets (multi-character aware).
 
     Per-character dedup: the same frame can be new for yoshi but a dupe for mario.
+    Batch callers pass the precomputed phash / WD14 tags and a pending dict
+    (slug -> filenames) to register statuses once per batch.
 
     Returns (saved_slugs, duplicate_count).
     """
     saved_slugs: list[str] = []
     dup_count = 0
+    wd14: dict | None = tags
 
     for slug in matched:
-        if await asyncio.to_thread(is_duplicate, frame, slug):
+        if await offload(is_duplicate, frame, slug, phash):
             dup_count += 1
             continue
 
+        if wd14 is None:
+            wd14 = await _wd14_tags(frame)
+
         db_info = char_map.get(slug, {})
         dataset_images = BASE_PATH / slug / "images"
         dataset_images.mkdir(parents=True, exist_ok=True)
 
         dest_name = f"{prefix}_{slug}_{timestamp}_{frame_number:04d}.png"
         dest = dataset_images / dest_name
-        shutil.copy2(frame, dest)
 
         meta = {
             "seed": None,
@@ -216,11 +254,16 @@ async def _save_frame_to_characters(
             "vision_description": description[:300] if description else "",
             "vision_matched": matched,
         }
-        dest.with_suffix(".meta.json").write_text(json.dumps(meta, indent=2))
+        if wd14.get("tags"):
+            meta["wd14_tags"] = wd14["tags"][:30]
+            meta["wd14_tag_string"] = wd14["tag_string"]
         caption = db_info.get("design_prompt") or slug.replace("_", " ")
-        dest.with_suffix(".txt").write_text(caption)
-        register_pending_image(slug, dest_name)
-        register_hash(dest, slug)
+        await offload(_write_dataset_frame, frame, dest, meta, caption)
+        if pending is None:
+            await offload(register_pending_image, slug, dest_name)
+        else:
+            pending.setdefault(slug, []).append(dest_name)
+        await offload(register_hash, dest, slug, phash)
         saved_slugs.append(slug)
 
     return saved_slugs, dup_count
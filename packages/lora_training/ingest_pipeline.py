@@ -0,0 +1,475 @@
+"""Staged bulk-ingest pipeline — download → extract → dedup → classify → persist.
+
+The video ingest endpoints (YouTube, YouTube-project, local video, movie
+extraction) used to run each phase to completion before starting the next:
+download the whole video, extract every frame into a temp dir, then classify
+and copy frames one at a time, rewriting approval_status.json once per saved
+image. A multi-hour movie put all of its PNGs on disk before the first one was
+classified, the CPU sat idle during the download and CLIP sat idle during ffmpeg.
+
+Now each phase is a Stage with its own worker count, joined to the next by a
+bounded asyncio.Queue. A full queue blocks the producer, so at most QUEUE_SIZE
+items wait between any two stages however long the source is:
+
+  download  (1 worker)   fetch / locate the video, probe its duration and split
+                         it into SEGMENT_S windows with a share of max_frames each
+  extract   (N workers)  smart-extract one window in the CPU process pool
+                         (ffmpeg + perceptual hash), emitting (frame, phash)
+  dedup     (1 worker)   drop frames already seen elsewhere in this source
+  classify  (N workers)  CLIP / vision classification in the I/O pool — the model
+                         stays resident in this process rather than being loaded
+                         by every pool worker
+  persist   (batched)    WD14-tag the batch, copy + write metadata, then register
+                         statuses once per character per batch. Temp frames are
+                         deleted as soon as they are saved or dropped.
+
+Per-stage counters (in / out / errors / busy and blocked time / backlog) are
+reported through the endpoint's progress key and GET /api/system/ingest-pipelines.
+A stage whose blocked_s grows is waiting on the stage after it; a stage with a
+full backlog is the bottleneck.
+"""
+
+import asyncio
+import inspect
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from packages.core.executors import offload
+from packages.lora_training.feedback import register_image_statuses
+from packages.lora_training.frame_extraction import (
+    download_video, extract_segment, extract_smart_frames, get_video_duration,
+)
+from packages.visual_pipeline.vision import perceptual_hash
+
+from .ingest_helpers import (
+    _UNCLASSIFIED_SLUG,
+    _classify_image,
+    _save_frame_to_characters,
+    _save_unclassified_frame,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", "2"))
+CLASSIFY_WORKERS = int(os.getenv("INGEST_CLASSIFY_WORKERS", "2"))
+SEGMENT_S = float(os.getenv("INGEST_SEGMENT_S", "600"))
+PERSIST_BATCH = int(os.getenv("INGEST_PERSIST_BATCH", "32"))
+PERSIST_FLUSH_S = float(os.getenv("INGEST_PERSIST_FLUSH_S", "2"))
+REPORT_INTERVAL_S = 1.0
+RECENT_RUNS = 20
+
+_STOP = object()
+
+# Running pipelines by name, and stats of the last few finished runs
+_active: dict[str, "Pipeline"] = {}
+_recent: deque = deque(maxlen=RECENT_RUNS)
+
+# Progress "status" shown while a stage is the earliest one with work in flight
+_STAGE_STATUS = {
+    "download": "downloading",
+    "extract": "extracting",
+    "dedup": "extracting",
+    "classify": "classifying",
+    "persist": "saving",
+}
+
+
+class Stage:
+    """One pipeline step and its counters.
+
+    fn receives one item (or a list of up to batch_size items) and returns None
+    to drop it, or an iterable / async iterator of items for the next stage.
+    Errors are counted and logged per item unless fatal=True, which aborts the
+    whole pipeline and re-raises from Pipeline.run().
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, *, batch_size: int = 1,
+                 flush_s: float = PERSIST_FLUSH_S, fatal: bool = False):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.flush_s = flush_s
+        self.fatal = fatal
+        self.received = 0
+        self.emitted = 0
+        self.errors = 0
+        self.active = 0
+        self.busy_s = 0.0
+        self.blocked_s = 0.0
+
+    def to_dict(self, inbox: asyncio.Queue, elapsed: float) -> dict:
+        working = max(self.busy_s - self.blocked_s, 0.0)
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "active": self.active,
+            "in": self.received,
+            "out": self.emitted,
+            "errors": self.errors,
+            "backlog": inbox.qsize(),
+            "capacity": inbox.maxsize,
+            "per_s": round(self.received / elapsed, 2) if elapsed > 0 else 0.0,
+            "busy_s": round(working, 2),
+            "blocked_s": round(self.blocked_s, 2),
+            "utilization": round(working / (elapsed * self.workers), 3) if elapsed > 0 else 0.0,
+        }
+
+
+class Pipeline:
+    """Stages joined by bounded queues; run() feeds items and waits for the drain."""
+
+    def __init__(self, name: str, stages: list[Stage], queue_size: int = QUEUE_SIZE):
+        self.name = name
+        self.stages = stages
+        self.queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    async def run(self, items) -> None:
+        self.started = time.time()
+        _active[self.name] = self
+        tasks = [asyncio.create_task(self._feed(items))]
+        tasks += [asyncio.create_task(self._run_stage(i)) for i in range(len(self.stages))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            self.finished = time.time()
+            if _active.get(self.name) is self:
+                _active.pop(self.name)
+            _recent.append(self.stats())
+
+    def stats(self) -> dict:
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        return {
+            "name": self.name,
+            "running": self.started is not None and self.finished is None,
+            "elapsed_s": round(elapsed, 2),
+            "stages": [stage.to_dict(queue, elapsed) for stage, queue in zip(self.stages, self.queues)],
+        }
+
+    def status(self) -> str:
+        """Name the earliest stage that still has work queued or in flight."""
+        for stage, queue in zip(self.stages, self.queues):
+            if stage.active or queue.qsize():
+                return _STAGE_STATUS.get(stage.name, stage.name)
+        return "finishing"
+
+    async def _feed(self, items) -> None:
+        for item in items:
+            await self.queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            await self.queues[0].put(_STOP)
+
+    async def _run_stage(self, i: int) -> None:
+        await asyncio.gather(*(self._worker(i) for _ in range(self.stages[i].workers)))
+        if i + 1 < len(self.stages):
+            for _ in range(self.stages[i + 1].workers):
+                await self.queues[i + 1].put(_STOP)
+
+    async def _worker(self, i: int) -> None:
+        stage = self.stages[i]
+        outbox = self.queues[i + 1] if i + 1 < len(self.stages) else None
+        while True:
+            batch, stopped = await self._take(self.queues[i], stage)
+            if batch:
+                await self._process(stage, batch if stage.batch_size > 1 else batch[0], len(batch), outbox)
+            if stopped:
+                return
+
+    @staticmethod
+    async def _take(inbox: asyncio.Queue, stage: Stage) -> tuple[list, bool]:
+        """Next item — or up to batch_size items, waiting at most flush_s to fill."""
+        item = await inbox.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        if stage.batch_size > 1:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + stage.flush_s
+            while len(batch) < stage.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(inbox.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    return batch, True
+                batch.append(item)
+        return batch, False
+
+    async def _process(self, stage: Stage, payload, count: int, outbox: asyncio.Queue | None) -> None:
+        stage.received += count
+        stage.active += 1
+        started = time.perf_counter()
+        try:
+            result = stage.fn(payload)
+            if inspect.isawaitable(result):
+                result = await result
+            if result is None:
+                return
+            if hasattr(result, "__aiter__"):
+                async for out in result:
+                    await self._emit(stage, outbox, out)
+            else:
+                for out in result:
+                    await self._emit(stage, outbox, out)
+        except Exception as e:
+            stage.errors += 1
+            if stage.fatal:
+                raise
+            logger.warning(f"Ingest {self.name}: {stage.name} stage failed: {e}")
+        finally:
+            stage.busy_s += time.perf_counter() - started
+            stage.active -= 1
+
+    @staticmethod
+    async def _emit(stage: Stage, outbox: asyncio.Queue | None, item) -> None:
+        stage.emitted += 1
+        if outbox is None:
+            return
+        started = time.perf_counter()
+        await outbox.put(item)
+        stage.blocked_s += time.perf_counter() - started
+
+
+def plan_segments(duration: float, max_frames: int, segment_s: float = SEGMENT_S) -> list[tuple[float, float, int]]:
+    """Split [0, duration) into equal windows of at most segment_s, sharing max_frames.
+
+    Returns (start, length, frame quota) tuples whose quotas sum to max_frames.
+    Unknown duration (<= 0) yields a single (0, 0, max_frames) window, which the
+    extract stage handles with the flat-fps fallback.
+    """
+    if duration <= 0 or max_frames <= 0:
+        return [(0.0, 0.0, max_frames)]
+    count = min(max(1, math.ceil(duration / segment_s)), max_frames)
+    length = duration / count
+    base, extra = divmod(max_frames, count)
+    return [(i * length, length, base + (1 if i < extra else 0)) for i in range(count)]
+
+
+async def run_ingest(
+    key: str,
+    source: str,
+    *,
+    download: bool,
+    project_name: str,
+    char_map: dict,
+    source_label: str,
+    prefix: str,
+    max_frames: int,
+    classify_kwargs: dict | None = None,
+    target_slug: str | None = None,
+    require_slug: str | None = None,
+    report=None,
+) -> dict:
+    """Ingest one video (URL when download=True, else a local path) through the stages.
+
+    Frames matching no character — or not matching require_slug, for the
+    single-character YouTube endpoint — go to _unclassified. target_slug skips
+    classification and assigns every frame to that character. report(progress)
+    (sync or async) is called every REPORT_INTERVAL_S while the pipeline runs.
+
+    Returns frames_extracted / frames_matched / frames_unclassified /
+    frames_duplicate / per_character. Download or extraction failures raise.
+    """
+    tmpdir = tempfile.mkdtemp(prefix=f"lora_{key.replace('-', '_')}_")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    counts = {"extracted": 0, "classified": 0, "matched": 0, "unclassified": 0, "duplicates": 0}
+    per_char: dict[str, int] = {}
+    seen_hashes: set[str] = set()
+
+    async def fetch(src: str):
+        video = await offload(download_video, src, tmpdir, pool="media") if download else Path(src)
+        duration = await offload(get_video_duration, video, pool="media")
+        logger.info(f"Ingest {key}: {video.name} ({duration:.0f}s) -> {max_frames} frames")
+        return [
+            {"video": str(video), "index": i, "start": start, "length": length, "quota": quota}
+            for i, (start, length, quota) in enumerate(plan_segments(duration, max_frames))
+        ]
+
+    async def extract(segment: dict):
+        if segment["length"] <= 0:
+            frames = await offload(extract_smart_frames, Path(segment["video"]), segment["quota"],
+                                   tmpdir, pool="media")
+            return [{"path": Path(p), "phash": None} for p in frames]
+        frames = await offload(
+            extract_segment, segment["video"], segment["index"], segment["start"],
+            segment["length"], segment["quota"], tmpdir, pool="cpu",
+        )
+        return [{"path": Path(p), "phash": phash} for p, phash in frames]
+
+    async def dedup(frame: dict):
+        if frame["phash"] is None:
+            try:
+                frame["phash"] = await offload(perceptual_hash, frame["path"], pool="cpu")
+            except Exception:
+                pass
+        if frame["phash"] is not None:
+            if frame["phash"] in seen_hashes:
+                frame["path"].unlink(missing_ok=True)
+                return None
+            seen_hashes.add(frame["phash"])
+        counts["extracted"] += 1
+        frame["number"] = counts["extracted"]
+        return [frame]
+
+    async def classify(frame: dict):
+        if target_slug:
+            frame["matched"] = [target_slug]
+            frame["description"] = f"direct_assign (target_slug={target_slug})"
+        else:
+            try:
+                frame["matched"], frame["description"] = await _classify_image(
+                    frame["path"], **(classify_kwargs or {}),
+                )
+            except Exception:
+                frame["path"].unlink(missing_ok=True)
+                raise
+        counts["classified"] += 1
+        return [frame]
+
+    async def persist(batch: list[dict]):
+        for frame in batch:
+            frame["to_characters"] = bool(frame["matched"]) and (
+                not require_slug or require_slug in frame["matched"]
+            )
+        tags = await _batch_tags([f["path"] for f in batch if f["to_characters"]])
+        pending: dict[str, list[str]] = {}
+        unclassified_pending: list[str] = []
+        try:
+            for frame in batch:
+                try:
+                    await _persist_frame(frame, tags, pending, unclassified_pending)
+                except Exception as e:
+                    logger.warning(f"Ingest {key}: failed to save frame {frame['number']}: {e}")
+                finally:
+                    frame["path"].unlink(missing_ok=True)
+        finally:
+            if unclassified_pending:
+                pending.setdefault(_UNCLASSIFIED_SLUG, []).extend(unclassified_pending)
+            for slug, names in pending.items():
+                await offload(register_image_statuses, slug, dict.fromkeys(names, "pending"))
+
+    async def _persist_frame(frame, tags, pending, unclassified_pending):
+        if not frame["to_characters"]:
+            saved = await offload(
+                _save_unclassified_frame, frame["path"],
+                project_name=project_name,
+                source=source_label,
+                source_url=source,
+                frame_number=frame["number"],
+                description=frame["description"],
+                matched=frame["matched"],
+                timestamp=timestamp,
+                phash=frame["phash"],
+                pending=unclassified_pending,
+            )
+            counts["unclassified" if saved else "duplicates"] += 1
+            return
+        saved_slugs, dup_count = await _save_frame_to_characters(
+            frame["path"], frame["matched"],
+            char_map=char_map,
+            source=source_label,
+            source_url=source,
+            frame_number=frame["number"],
+            timestamp=timestamp,
+            project_name=project_name,
+            description=frame["description"],
+            prefix=prefix,
+            phash=frame["phash"],
+            tags=tags.get(frame["path"], {}),
+            pending=pending,
+        )
+        counts["duplicates"] += dup_count
+        for slug in saved_slugs:
+            per_char[slug] = per_char.get(slug, 0) + 1
+        if require_slug in saved_slugs:
+            counts["matched"] += 1
+
+    pipeline = Pipeline(key, [
+        Stage("download", fetch, fatal=True),
+        Stage("extract", extract, EXTRACT_WORKERS, fatal=True),
+        Stage("dedup", dedup),
+        Stage("classify", classify, CLASSIFY_WORKERS),
+        Stage("persist", persist, batch_size=PERSIST_BATCH),
+    ])
+
+    def progress() -> dict:
+        stats = pipeline.stats()
+        return {
+            "status": pipeline.status(),
+            "frame": counts["classified"],
+            "total": counts["extracted"],
+            "matched_so_far": dict(per_char),
+            "duplicates": counts["duplicates"],
+            "unclassified": counts["unclassified"],
+            "stages": {s["name"]: s for s in stats["stages"]},
+        }
+
+    async def reporter():
+        while True:
+            result = report(progress())
+            if inspect.isawaitable(result):
+                await result
+            await asyncio.sleep(REPORT_INTERVAL_S)
+
+    report_task = asyncio.create_task(reporter()) if report else None
+    try:
+        await pipeline.run([source])
+    finally:
+        if report_task:
+            report_task.cancel()
+            await asyncio.gather(report_task, return_exceptions=True)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return {
+        "frames_extracted": counts["extracted"],
+        "frames_matched": counts["matched"] if require_slug else sum(per_char.values()),
+        "frames_unclassified": counts["unclassified"],
+        "frames_duplicate": counts["duplicates"],
+        "per_character": per_char,
+        "pipeline": pipeline.stats(),
+    }
+
+
+async def _batch_tags(paths: list[Path]) -> dict:
+    """WD14 tags for a persist batch in one call, or {} when the tagger isn't installed."""
+    from packages.visual_pipeline import wd14
+    if not paths or not wd14.model_ready():
+        return {}
+    try:
+        return dict(zip(paths, await wd14.tag_images(paths)))
+    except Exception as e:
+        logger.debug(f"WD14 batch tagging failed: {e}")
+        return {}
+
+
+def status() -> dict:
+    """Live and recently finished pipelines with per-stage throughput and backlog."""
+    return {
+        "active": [p.stats() for p in _active.values()],
+        "recent": list(_recent),
+        "config": {
+            "queue_size": QUEUE_SIZE,
+            "extract_workers": EXTRACT_WORKERS,
+            "classify_workers": CLASSIFY_WORKERS,
+            "segment_s": SEGMENT_S,
+            "persist_batch": PERSIST_BATCH,
+        },
+    }
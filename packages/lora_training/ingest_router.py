@@ -16,8 +16,11 @@ from pathlib import Path
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from pydantic import BaseModel
 
+from packages.core import job_queue
 from packages.core.config import BASE_PATH, COMFYUI_URL, COMFYUI_OUTPUT_DIR
 from packages.core.db import get_char_project_map, connect_direct
+from packages.core.executors import offload
+from packages.core.input_staging import stage_input
 from packages.lora_training.dedup import is_duplicate, register_hash
 from .ingest_helpers import (
     _ingest_progress,
@@ -34,7 +37,7 @@ from .ingest_helpers import (
     ClipClassifyRequest,
     ClipClassifyLocalRequest,
 )
-from .ingest_videos import router as video_router
+from .ingest_videos import MOVIE_EXTRACT_KEY, router as video_router
 from .ingest_analysis import analysis_router
 
 logger = logging.getLogger(__name__)
@@ -54,6 +57,10 @@ async def get_ingest_progress():
     for key in ("clip-classify", "movie", "youtube-project", "local-video", "youtube"):
         if key in _ingest_progress and isinstance(_ingest_progress[key], dict):
             return _ingest_progress[key]
+    # Movie extraction may be running in a separate worker process
+    job = await job_queue.find_job(MOVIE_EXTRACT_KEY, active_only=False)
+    if job and job["progress"]:
+        return job["progress"]
     return _ingest_progress
 
 
@@ -83,7 +90,7 @@ async def ingest_image(file: UploadFile = File(...), character_slug: str = ""):
         dest.write_bytes(content)
 
     # Dedup check: reject perceptual duplicates of existing dataset images
-    if await asyncio.to_thread(is_duplicate, dest, character_slug):
+    if await offload(is_duplicate, dest, character_slug):
         dest.unlink(missing_ok=True)
         return {"image": dest_name, "character": character_slug, "status": "duplicate"}
 
@@ -117,7 +124,7 @@ async def ingest_image(file: UploadFile = File(...), character_slug: str = ""):
             pass
     approval_status[dest_name] = "pending"
     approval_file.write_text(json.dumps(approval_status, indent=2))
-    register_hash(dest, character_slug)
+    await offload(register_hash, dest, character_slug)
 
     return {
         "image": dest_name,
@@ -185,7 +192,7 @@ async def scan_comfyui():
             for save_slug in all_slugs:
                 if save_slug not in char_map:
                     continue
-                if await asyncio.to_thread(is_duplicate, png, save_slug):
+                if await offload(is_duplicate, png, save_slug):
                     duplicates += 1
                     continue
 
@@ -210,7 +217,7 @@ async def scan_comfyui():
                     dest.with_suffix(".txt").write_text(caption)
                     from packages.lora_training.feedback import register_pending_image
                     register_pending_image(save_slug, png.name)
-                    register_hash(dest, save_slug)
+                    await offload(register_hash, dest, save_slug)
                     new_images += 1
                     matched_chars[save_slug] = matched_chars.get(save_slug, 0) + 1
         else:
@@ -244,10 +251,7 @@ async def refine_image(body: dict):
         raise HTTPException(status_code=404, detail="Reference image not found")
 
     # Copy reference image to ComfyUI input dir (LoadImage only reads from there)
-    comfyui_ref_name = f"ref_{character_slug}_{reference_image}"
-    comfyui_ref_path = COMFYUI_INPUT_DIR / comfyui_ref_name
-    COMFYUI_INPUT_DIR.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(ref_path, comfyui_ref_path)
+    comfyui_ref_name = stage_input(ref_path, name_hint=f"ref_{character_slug}_{reference_image}")
 
     char_map = await get_char_project_map()
     db_info = char_map.get(character_slug, {})
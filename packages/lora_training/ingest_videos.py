@@ -10,9 +10,11 @@ from pathlib import Path
 
 from fastapi import APIRouter, HTTPException, UploadFile, File
 
+from packages.core import job_queue
 from packages.core.config import BASE_PATH, MOVIES_DIR
 from packages.core.db import get_char_project_map
 from packages.lora_training.dedup import is_duplicate
+from packages.core.executors import offload
 from packages.lora_training.frame_extraction import extract_smart_frames, extract_frames_with_timestamps, download_video
 from .ingest_helpers import (
     _ingest_progress,
@@ -27,12 +29,16 @@ from .ingest_helpers import (
     ClipClassifyRequest,
     ClipClassifyLocalRequest,
 )
+from .ingest_pipeline import run_ingest
 
 from packages.core.db import connect_direct
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+MOVIE_EXTRACT_JOB = "ingest.movie_extract"
+MOVIE_EXTRACT_KEY = "movie_extract"  # one extraction at a time
+
 import re
 
 
@@ -160,78 +166,38 @@ async def ingest_youtube(req: YouTubeIngestRequest):
     dataset_images = BASE_PATH / req.character_slug / "images"
     dataset_images.mkdir(parents=True, exist_ok=True)
 
-    tmpdir = tempfile.mkdtemp(prefix="lora_yt_")
-    try:
-        _ingest_progress["youtube"] = {"status": "downloading", "character": req.character_slug}
-        tmp_video = await asyncio.to_thread(download_video, req.url, tmpdir)
-
-        _ingest_progress["youtube"] = {"status": "extracting", "character": req.character_slug}
-        staged_frames = await asyncio.to_thread(extract_smart_frames, tmp_video, req.max_frames, tmpdir)
-
-        char_map = await get_char_project_map()
-        db_info = char_map.get(req.character_slug, {})
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    char_map = await get_char_project_map()
+    db_info = char_map.get(req.character_slug, {})
 
-        copied = 0
-        unclassified = 0
-        duplicates = 0
-        per_char: dict[str, int] = {}
-        for i, frame in enumerate(staged_frames):
-            _ingest_progress["youtube"] = {
-                "status": "classifying",
-                "character": req.character_slug,
-                "frame": i + 1,
-                "total": len(staged_frames),
-            }
-            matched, description = await _classify_image(frame)
-            if req.character_slug not in matched:
-                saved = await asyncio.to_thread(
-                    _save_unclassified_frame, frame,
-                    project_name=db_info.get("project_name", ""),
-                    source="youtube",
-                    source_url=req.url,
-                    frame_number=i + 1,
-                    description=description,
-                    matched=matched,
-                    timestamp=timestamp,
-                )
-                if saved:
-                    unclassified += 1
-                else:
-                    duplicates += 1
-                continue
-
-            saved_slugs, dup_count = await _save_frame_to_characters(
-                frame, matched,
-                char_map=char_map,
-                source="youtube",
-                source_url=req.url,
-                frame_number=i + 1,
-                timestamp=timestamp,
-                project_name=db_info.get("project_name", ""),
-                description=description,
-                prefix="yt",
-            )
-            duplicates += dup_count
-            for slug in saved_slugs:
-                per_char[slug] = per_char.get(slug, 0) + 1
-            if req.character_slug in saved_slugs:
-                copied += 1
+    def _report(state: dict):
+        _ingest_progress["youtube"] = {"character": req.character_slug, **state}
 
+    try:
+        _report({"status": "downloading"})
+        result = await run_ingest(
+            "youtube", req.url,
+            download=True,
+            project_name=db_info.get("project_name", ""),
+            char_map=char_map,
+            source_label="youtube",
+            prefix="yt",
+            max_frames=req.max_frames,
+            require_slug=req.character_slug,
+            report=_report,
+        )
         return {
-            "frames_extracted": len(staged_frames),
-            "frames_matched": copied,
-            "frames_unclassified": unclassified,
-            "frames_duplicate": duplicates,
+            "frames_extracted": result["frames_extracted"],
+            "frames_matched": result["frames_matched"],
+            "frames_unclassified": result["frames_unclassified"],
+            "frames_duplicate": result["frames_duplicate"],
             "character": req.character_slug,
-            "per_character": per_char,
+            "per_character": result["per_character"],
             "status": "pending_approval",
         }
     except RuntimeError as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         _ingest_progress.pop("youtube", None)
-        shutil.rmtree(tmpdir, ignore_errors=True)
 
 
 @router.post("/ingest/youtube-project")
@@ -245,70 +211,28 @@ async def ingest_youtube_project(req: YouTubeProjectIngestRequest):
     if not project_slugs:
         raise HTTPException(status_code=404, detail=f"No characters found for project '{req.project_name}'")
 
-    tmpdir = tempfile.mkdtemp(prefix="lora_yt_proj_")
-    try:
-        _ingest_progress["youtube-project"] = {"status": "downloading", "project": req.project_name}
-        tmp_video = await asyncio.to_thread(download_video, req.url, tmpdir)
-
-        _ingest_progress["youtube-project"] = {"status": "extracting", "project": req.project_name}
-        staged_frames = await asyncio.to_thread(extract_smart_frames, tmp_video, req.max_frames, tmpdir)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        per_char: dict[str, int] = {}
-        skipped = 0
-        unclassified = 0
-        duplicates = 0
-
-        for i, frame in enumerate(staged_frames):
-            _ingest_progress["youtube-project"] = {
-                "status": "classifying",
-                "project": req.project_name,
-                "frame": i + 1,
-                "total": len(staged_frames),
-                "matched_so_far": dict(per_char),
-            }
-            matched, description = await _classify_image(
-                frame, allowed_slugs=project_slugs,
-                project_name=req.project_name,
-            )
-            if not matched:
-                saved = await asyncio.to_thread(
-                    _save_unclassified_frame, frame,
-                    project_name=req.project_name,
-                    source="youtube_project",
-                    source_url=req.url,
-                    frame_number=i + 1,
-                    description=description,
-                    matched=matched,
-                    timestamp=timestamp,
-                )
-                if saved:
-                    unclassified += 1
-                else:
-                    duplicates += 1
-                continue
-
-            saved_slugs, dup_count = await _save_frame_to_characters(
-                frame, matched,
-                char_map=char_map,
-                source="youtube_project",
-                source_url=req.url,
-                frame_number=i + 1,
-                timestamp=timestamp,
-                project_name=req.project_name,
-                description=description,
-                prefix="yt",
-            )
-            duplicates += dup_count
-            for slug in saved_slugs:
-                per_char[slug] = per_char.get(slug, 0) + 1
+    def _report(state: dict):
+        _ingest_progress["youtube-project"] = {"project": req.project_name, **state}
 
+    try:
+        _report({"status": "downloading"})
+        result = await run_ingest(
+            "youtube-project", req.url,
+            download=True,
+            project_name=req.project_name,
+            char_map=char_map,
+            source_label="youtube_project",
+            prefix="yt",
+            max_frames=req.max_frames,
+            classify_kwargs={"allowed_slugs": project_slugs, "project_name": req.project_name},
+            report=_report,
+        )
         return {
-            "frames_extracted": len(staged_frames),
-            "frames_matched": sum(per_char.values()),
-            "frames_unclassified": unclassified,
-            "frames_duplicate": duplicates,
-            "per_character": per_char,
+            "frames_extracted": result["frames_extracted"],
+            "frames_matched": result["frames_matched"],
+            "frames_unclassified": result["frames_unclassified"],
+            "frames_duplicate": result["frames_duplicate"],
+            "per_character": result["per_character"],
             "project": req.project_name,
             "status": "pending_approval",
         }
@@ -316,7 +240,6 @@ async def ingest_youtube_project(req: YouTubeProjectIngestRequest):
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         _ingest_progress.pop("youtube-project", None)
-        shutil.rmtree(tmpdir, ignore_errors=True)
 
 
 @router.post("/ingest/local-video")
@@ -340,73 +263,30 @@ async def ingest_local_video(req: LocalVideoIngestRequest):
 
     file_size_mb = round(video_path.stat().st_size / (1024 * 1024), 1)
 
-    tmpdir = tempfile.mkdtemp(prefix="lora_local_vid_")
-    try:
-        _ingest_progress["local-video"] = {"status": "extracting", "project": req.project_name, "file_size_mb": file_size_mb}
-        staged_frames = await asyncio.to_thread(extract_smart_frames, video_path, req.max_frames, tmpdir)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        per_char: dict[str, int] = {}
-        unclassified = 0
-        duplicates = 0
-
-        for i, frame in enumerate(staged_frames):
-            _ingest_progress["local-video"] = {
-                "status": "saving" if req.target_slug else "classifying",
-                "project": req.project_name,
-                "frame": i + 1,
-                "total": len(staged_frames),
-                "matched_so_far": dict(per_char),
-            }
-
-            if req.target_slug:
-                # Direct assignment — skip classification entirely
-                matched = [req.target_slug]
-                description = f"direct_assign (target_slug={req.target_slug})"
-            else:
-                matched, description = await _classify_image(
-                    frame, allowed_slugs=project_slugs,
-                    project_name=req.project_name,
-                )
-
-            if not matched:
-                saved = await asyncio.to_thread(
-                    _save_unclassified_frame, frame,
-                    project_name=req.project_name,
-                    source="local_video",
-                    source_url=req.path,
-                    frame_number=i + 1,
-                    description=description,
-                    matched=matched,
-                    timestamp=timestamp,
-                )
-                if saved:
-                    unclassified += 1
-                else:
-                    duplicates += 1
-                continue
-
-            saved_slugs, dup_count = await _save_frame_to_characters(
-                frame, matched,
-                char_map=char_map,
-                source="local_video",
-                source_url=req.path,
-                frame_number=i + 1,
-                timestamp=timestamp,
-                project_name=req.project_name,
-                description=description,
-                prefix="vid",
-            )
-            duplicates += dup_count
-            for slug in saved_slugs:
-                per_char[slug] = per_char.get(slug, 0) + 1
+    def _report(state: dict):
+        _ingest_progress["local-video"] = {"project": req.project_name, "file_size_mb": file_size_mb, **state}
 
+    try:
+        _report({"status": "extracting"})
+        result = await run_ingest(
+            "local-video", req.path,
+            download=False,
+            project_name=req.project_name,
+            char_map=char_map,
+            source_label="local_video",
+            prefix="vid",
+            max_frames=req.max_frames,
+            classify_kwargs={"allowed_slugs": project_slugs, "project_name": req.project_name},
+            # Direct assignment — skips classification entirely
+            target_slug=req.target_slug,
+            report=_report,
+        )
         return {
-            "frames_extracted": len(staged_frames),
-            "frames_matched": sum(per_char.values()),
-            "frames_unclassified": unclassified,
-            "frames_duplicate": duplicates,
-            "per_character": per_char,
+            "frames_extracted": result["frames_extracted"],
+            "frames_matched": result["frames_matched"],
+            "frames_unclassified": result["frames_unclassified"],
+            "frames_duplicate": result["frames_duplicate"],
+            "per_character": result["per_character"],
             "project": req.project_name,
             "target_slug": req.target_slug,
             "file_size_mb": file_size_mb,
@@ -416,7 +296,6 @@ async def ingest_local_video(req: LocalVideoIngestRequest):
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         _ingest_progress.pop("local-video", None)
-        shutil.rmtree(tmpdir, ignore_errors=True)
 
 
 @router.post("/ingest/movie-upload")
@@ -434,7 +313,7 @@ async def upload_movie(file: UploadFile = File(...), project_name: str = ""):
     size = 0
     with open(dest, "wb") as f:
         while chunk := await file.read(1024 * 1024):
-            f.write(chunk)
+            await offload(f.write, chunk)
             size += len(chunk)
 
     size_mb = round(size / (1024 * 1024), 1)
@@ -470,9 +349,9 @@ async def extract_movie(req: MovieExtractRequest):
 
     Runs as a background task -- poll GET /ingest/progress for status.
     """
-    # Check if an extraction is already running
-    existing = _ingest_progress.get("movie")
-    if isinstance(existing, dict) and existing.get("active"):
+    # Check if an extraction is already queued or running
+    existing = await job_queue.find_job(MOVIE_EXTRACT_KEY)
+    if existing:
         raise HTTPException(status_code=409, detail="A movie extraction is already running")
 
     video_path = Path(req.path)
@@ -489,11 +368,14 @@ async def extract_movie(req: MovieExtractRequest):
 
     file_size_mb = round(video_path.stat().st_size / (1024 * 1024), 1)
 
-    # Launch as background task so the HTTP response returns immediately
-    asyncio.create_task(_extract_movie_task(video_path, req, char_map, project_slugs, file_size_mb))
+    # Queue it so the HTTP response returns immediately
+    job = await job_queue.enqueue(MOVIE_EXTRACT_JOB, {
+        "request": req.model_dump(), "file_size_mb": file_size_mb,
+    }, dedupe_key=MOVIE_EXTRACT_KEY)
 
     return {
         "status": "started",
+        "job_id": job["id"],
         "file": video_path.name,
         "file_size_mb": file_size_mb,
         "project": req.project_name,
@@ -502,111 +384,91 @@ async def extract_movie(req: MovieExtractRequest):
     }
 
 
-async def _extract_movie_task(
-    video_path: Path,
-    req: MovieExtractRequest,
-    char_map: dict,
-    project_slugs: list[str],
-    file_size_mb: float,
-):
-    """Background task: extract frames from movie, classify, register."""
-    tmpdir = tempfile.mkdtemp(prefix="lora_movie_")
+@job_queue.job_kind(MOVIE_EXTRACT_JOB, concurrency=1, max_attempts=1)
+async def _extract_movie_task(job):
+    """Queued job: extract frames from movie, classify, register."""
+    req = MovieExtractRequest(**job.payload["request"])
+    file_size_mb = job.payload["file_size_mb"]
+    video_path = Path(req.path)
+    char_map = await get_char_project_map()
+    project_slugs = [
+        slug for slug, info in char_map.items()
+        if info.get("project_name") == req.project_name
+    ]
+
+    async def _report(state: dict):
+        # Local dict for in-process polling, job row for workers elsewhere
+        _ingest_progress["movie"] = state
+        await job.progress(**state)
+
     try:
-        _ingest_progress["movie"] = {
+        await _report({
             "active": True,
             "stage": "extracting",
             "project": req.project_name,
             "file": video_path.name,
             "file_size_mb": file_size_mb,
             "message": f"Extracting frames from {video_path.name} ({file_size_mb} MB)...",
-        }
+        })
 
-        staged_frames = await asyncio.to_thread(
-            extract_smart_frames, video_path, req.max_frames, tmpdir
-        )
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        per_char: dict[str, int] = {}
-        unclassified = 0
-        duplicates = 0
-
-        for i, frame in enumerate(staged_frames):
-            _ingest_progress["movie"] = {
+        async def _report_progress(state: dict):
+            await _report({
                 "active": True,
-                "stage": "classifying",
+                "stage": state["status"],
                 "project": req.project_name,
                 "file": video_path.name,
-                "frame": i + 1,
-                "total": len(staged_frames),
-                "frame_current": i + 1,
-                "frame_total": len(staged_frames),
-                "matched_so_far": dict(per_char),
-                "per_character": dict(per_char),
-                "duplicates": duplicates,
-                "message": f"Classifying frame {i + 1}/{len(staged_frames)}...",
-            }
-
-            matched, description = await _classify_image(
-                frame, allowed_slugs=project_slugs,
-                project_name=req.project_name,
-            )
-            if not matched:
-                saved = await asyncio.to_thread(
-                    _save_unclassified_frame, frame,
-                    project_name=req.project_name,
-                    source="movie_upload",
-                    source_url=str(video_path),
-                    frame_number=i + 1,
-                    description=description,
-                    matched=matched,
-                    timestamp=timestamp,
-                )
-                if saved:
-                    unclassified += 1
-                else:
-                    duplicates += 1
-                continue
-
-            saved_slugs, dup_count = await _save_frame_to_characters(
-                frame, matched,
-                char_map=char_map,
-                source="movie_upload",
-                source_url=str(video_path),
-                frame_number=i + 1,
-                timestamp=timestamp,
-                project_name=req.project_name,
-                description=description,
-                prefix="movie",
-            )
-            duplicates += dup_count
-            for slug in saved_slugs:
-                per_char[slug] = per_char.get(slug, 0) + 1
+                "frame": state["frame"],
+                "total": state["total"],
+                "frame_current": state["frame"],
+                "frame_total": state["total"],
+                "matched_so_far": state["matched_so_far"],
+                "per_character": state["matched_so_far"],
+                "duplicates": state["duplicates"],
+                "stages": state["stages"],
+                "message": f"Classified {state['frame']}/{state['total']} frames extracted so far...",
+            })
+
+        result = await run_ingest(
+            "movie", str(video_path),
+            download=False,
+            project_name=req.project_name,
+            char_map=char_map,
+            source_label="movie_upload",
+            prefix="movie",
+            max_frames=req.max_frames,
+            classify_kwargs={"allowed_slugs": project_slugs, "project_name": req.project_name},
+            report=_report_progress,
+        )
+        per_char = result["per_character"]
+        unclassified = result["frames_unclassified"]
+        duplicates = result["frames_duplicate"]
 
-        _ingest_progress["movie"] = {
+        await _report({
             "active": False,
             "stage": "complete",
             "project": req.project_name,
             "file": video_path.name,
-            "frame_total": len(staged_frames),
-            "frame_current": len(staged_frames),
+            "frame_total": result["frames_extracted"],
+            "frame_current": result["frames_extracted"],
             "per_character": per_char,
             "duplicates": duplicates,
             "skipped": unclassified,
+            "stages": {stage["name"]: stage for stage in result["pipeline"]["stages"]},
             "message": f"Done. {sum(per_char.values())} frames matched, {unclassified} unclassified, {duplicates} duplicates.",
-        }
+        })
         logger.info(
             f"Movie extraction complete: {video_path.name} -> "
             f"{sum(per_char.values())} matched, {unclassified} unclassified, {duplicates} dupes"
         )
+        return {"per_character": per_char, "unclassified": unclassified, "duplicates": duplicates}
     except Exception as e:
         logger.error(f"Movie extraction failed: {e}", exc_info=True)
-        _ingest_progress["movie"] = {
+        await _report({
             "active": False,
             "stage": "error",
             "message": f"Extraction failed: {e}",
-        }
-    finally:
-        shutil.rmtree(tmpdir, ignore_errors=True)
+        })
+        raise
 
 
 @router.post("/ingest/clip-classify")
@@ -0,0 +1,359 @@
+"""Latent / text-embedding cache for LoRA training, with aspect-ratio buckets.
+
+The training scripts used to push every dataset image through the VAE and both
+text encoders at the start of every run, one at a time, and hold the results
+in a Python list. Retraining after adding ten images re-encoded all three
+hundred, and every image was center-cropped to a square.
+
+Here each image is assigned the bucket (w×h, multiple of 64, ~resolution² px)
+closest to its aspect ratio and resized to cover it with a minimal crop.
+Latents are keyed by (image SHA-256, VAE id, bucket) and text embeddings by
+(caption SHA-256, encoder id). Only missing keys are encoded, in batches (one
+bucket per VAE batch), and each batch is written as a .npy shard under
+LATENT_CACHE_DIR. BucketBatchLoader memory-maps the shards and yields
+same-bucket batches, so a training run holds one batch in RAM, not the set.
+
+build_cache() takes encode_images(pixels) and encode_text(captions) callables
+mapping numpy to numpy; sdxl_encoders() builds them from diffusers components,
+so torch is only imported by the training scripts that call it.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from packages.core.config import BASE_PATH
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(os.getenv("LATENT_CACHE_DIR", str(BASE_PATH / "_latent_cache")))
+BUCKET_STEP = 64
+MAX_ASPECT = 2.0
+STORE_DTYPE = np.float16
+
+
+# ── Buckets ─────────────────────────────────────────────────────────────
+
+
+def make_buckets(resolution: int = 768, step: int = BUCKET_STEP, max_aspect: float = MAX_ASPECT) -> list[tuple[int, int]]:
+    """(width, height) buckets with area ≤ resolution², sides multiples of step."""
+    max_area = resolution * resolution
+    buckets = set()
+    width = step
+    while width <= resolution * max_aspect:
+        height = min((max_area // width) // step * step, int(resolution * max_aspect) // step * step)
+        if height >= step and max(width, height) / min(width, height) <= max_aspect:
+            buckets.add((width, height))
+            buckets.add((height, width))
+        width += step
+    return sorted(buckets)
+
+
+def assign_bucket(width: int, height: int, buckets: list[tuple[int, int]]) -> tuple[int, int]:
+    """Bucket whose aspect ratio is closest (in log space) to width/height; larger area wins ties."""
+    ratio = math.log(width / height)
+    return min(buckets, key=lambda b: (abs(math.log(b[0] / b[1]) - ratio), -b[0] * b[1]))
+
+
+def _cover(orig_w: int, orig_h: int, bucket: tuple[int, int]) -> tuple[int, int, int, int]:
+    """Resized (w, h) that covers the bucket, and the (left, top) of the centered crop."""
+    target_w, target_h = bucket
+    scale = max(target_w / orig_w, target_h / orig_h)
+    resized_w, resized_h = max(target_w, round(orig_w * scale)), max(target_h, round(orig_h * scale))
+    return resized_w, resized_h, (resized_w - target_w) // 2, (resized_h - target_h) // 2
+
+
+def time_ids(orig_w: int, orig_h: int, bucket: tuple[int, int]) -> tuple[int, ...]:
+    """SDXL size/crop conditioning: orig_h, orig_w, crop_top, crop_left, target_h, target_w."""
+    _, _, left, top = _cover(orig_w, orig_h, bucket)
+    return orig_h, orig_w, top, left, bucket[1], bucket[0]
+
+
+def prepare_image(path: Path, bucket: tuple[int, int]) -> np.ndarray:
+    """Resize to cover the bucket and center-crop the overhang → CHW float32 in [-1, 1]."""
+    from PIL import Image
+
+    target_w, target_h = bucket
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        resized_w, resized_h, left, top = _cover(*img.size, bucket)
+        img = img.resize((resized_w, resized_h), Image.LANCZOS)
+        img = img.crop((left, top, left + target_w, top + target_h))
+        pixels = np.asarray(img, dtype=np.float32)
+    return pixels.transpose(2, 0, 1) / 127.5 - 1.0
+
+
+# ── Cache ───────────────────────────────────────────────────────────────
+
+
+def model_id(path: str | Path) -> str:
+    """Cheap identity for a checkpoint file: name, size and mtime."""
+    p = Path(path)
+    try:
+        st = p.stat()
+        raw = f"{p.name}:{st.st_size}:{int(st.st_mtime)}"
+    except OSError:
+        raw = str(p)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class LatentCache:
+    """Index of keys → (shard, row) plus the .npy shards themselves.
+
+    Shards are immutable once written; the index is a JSON file replaced
+    atomically after each shard, so an interrupted run keeps what it encoded.
+    """
+
+    def __init__(self, vae_id: str, encoder_id: str, root: Path | None = None):
+        self.root = Path(root or CACHE_DIR)
+        self.vae_id = vae_id
+        self.encoder_id = encoder_id
+        self._lock = threading.Lock()
+        self._mmaps: dict[str, np.ndarray] = {}
+        try:
+            self.index = json.loads((self.root / "index.json").read_text())
+        except (OSError, ValueError):
+            self.index = {}
+        self.index.setdefault("latent", {})
+        self.index.setdefault("text", {})
+        self.index.setdefault("files", {})
+
+    def latent_key(self, image_hash: str, bucket: tuple[int, int]) -> str:
+        return f"{image_hash}:{self.vae_id}:{bucket[0]}x{bucket[1]}"
+
+    def text_key(self, caption_hash: str) -> str:
+        return f"{caption_hash}:{self.encoder_id}"
+
+    def has(self, kind: str, key: str) -> bool:
+        entry = self.index[kind].get(key)
+        return entry is not None and (self.root / kind / f"{entry[0]}.{next(iter(entry[2]))}.npy").exists()
+
+    def image_hash(self, path: Path) -> str:
+        """SHA-256 of an image, memoized on (size, mtime) in the index."""
+        st = path.stat()
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        memo = self.index["files"].get(str(path))
+        if memo and memo[0] == stamp:
+            return memo[1]
+        digest = _sha256_file(path)
+        self.index["files"][str(path)] = [stamp, digest]
+        return digest
+
+    def put(self, kind: str, keys: list[str], arrays: dict[str, np.ndarray]):
+        """Write one shard holding a row per key for every named array."""
+        shard = uuid.uuid4().hex[:12]
+        shard_dir = self.root / kind
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        for field, values in arrays.items():
+            assert len(values) == len(keys), f"{field}: {len(values)} rows for {len(keys)} keys"
+            np.save(shard_dir / f"{shard}.{field}.npy", np.ascontiguousarray(values, dtype=STORE_DTYPE))
+        with self._lock:
+            for row, key in enumerate(keys):
+                self.index[kind][key] = [shard, row, sorted(arrays)]
+            self.save()
+
+    def get(self, kind: str, key: str) -> dict[str, np.ndarray]:
+        """Memory-mapped rows for key — nothing is read until the caller copies."""
+        shard, row, fields = self.index[kind][key]
+        out = {}
+        for field in fields:
+            name = f"{kind}/{shard}.{field}"
+            mm = self._mmaps.get(name)
+            if mm is None:
+                mm = self._mmaps[name] = np.load(self.root / f"{name}.npy", mmap_mode="r")
+            out[field] = mm[row]
+        return out
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / "index.json.tmp"
+        tmp.write_text(json.dumps(self.index))
+        os.replace(tmp, self.root / "index.json")
+
+
+def sdxl_encoders(vae, text_encoder, text_encoder_2, tokenizer, tokenizer_2, device: str, dtype):
+    """encode_images / encode_text callables for an SDXL pipeline's components."""
+    import torch
+
+    def encode_images(pixels: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            latent = vae.encode(torch.from_numpy(pixels).to(device, dtype=dtype)).latent_dist.sample()
+            return (latent * vae.config.scaling_factor).float().cpu().numpy()
+
+    def encode_text(captions: list[str]) -> dict[str, np.ndarray]:
+        with torch.no_grad():
+            tokens1 = tokenizer(captions, padding="max_length", max_length=77,
+                                truncation=True, return_tensors="pt")
+            hidden1 = text_encoder(tokens1.input_ids.to(device), output_hidden_states=True).hidden_states[-2]
+            tokens2 = tokenizer_2(captions, padding="max_length", max_length=77,
+                                  truncation=True, return_tensors="pt")
+            out2 = text_encoder_2(tokens2.input_ids.to(device), output_hidden_states=True)
+            hidden = torch.cat([hidden1, out2.hidden_states[-2]], dim=-1)  # penultimate layers
+            return {"hidden": hidden.float().cpu().numpy(), "pooled": out2.text_embeds.float().cpu().numpy()}
+
+    return encode_images, encode_text
+
+
+def sd15_encoders(vae, text_encoder, tokenizer, device: str, dtype):
+    """encode_images / encode_text for a single-encoder (SD1.5-style) pipeline; pooled is a placeholder."""
+    import torch
+
+    def encode_images(pixels: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            latent = vae.encode(torch.from_numpy(pixels).to(device, dtype=dtype)).latent_dist.sample()
+            return (latent * vae.config.scaling_factor).float().cpu().numpy()
+
+    def encode_text(captions: list[str]) -> dict[str, np.ndarray]:
+        with torch.no_grad():
+            tokens = tokenizer(captions, padding="max_length", max_length=77,
+                               truncation=True, return_tensors="pt")
+            hidden = text_encoder(tokens.input_ids.to(device))[0]
+            return {"hidden": hidden.float().cpu().numpy(), "pooled": np.zeros((len(captions), 1), np.float32)}
+
+    return encode_images, encode_text
+
+
+@dataclass
+class CachedSample:
+    image: Path
+    latent_key: str
+    text_key: str
+    bucket: tuple[int, int]
+    time_ids: tuple[int, ...]
+
+
+def build_cache(
+    samples: list[tuple[Path, str]],
+    cache: LatentCache,
+    encode_images,
+    encode_text,
+    resolution: int = 768,
+    batch_size: int = 4,
+    workers: int = 4,
+) -> tuple[list[CachedSample], dict]:
+    """Encode whatever samples are missing from the cache; return one CachedSample per input.
+
+    encode_images(np (N,3,H,W) float32 in [-1,1]) → np (N,C,H/8,W/8) scaled latents.
+    encode_text(list[str]) → {"hidden": (N,77,D), "pooled": (N,P)} as numpy.
+    """
+    started = time.monotonic()
+    buckets = make_buckets(resolution)
+    items: list[CachedSample] = []
+    latent_todo: dict[tuple[int, int], list[int]] = defaultdict(list)
+    text_todo: dict[str, str] = {}
+
+    from PIL import Image
+    for path, caption in samples:
+        path = Path(path)
+        with Image.open(path) as img:
+            size = img.size
+        bucket = assign_bucket(*size, buckets)
+        item = CachedSample(
+            image=path,
+            latent_key=cache.latent_key(cache.image_hash(path), bucket),
+            text_key=cache.text_key(_sha256_text(caption)),
+            bucket=bucket,
+            time_ids=time_ids(*size, bucket),
+        )
+        if not cache.has("latent", item.latent_key):
+            latent_todo[bucket].append(len(items))
+        if not cache.has("text", item.text_key) and item.text_key not in text_todo:
+            text_todo[item.text_key] = caption
+        items.append(item)
+
+    # Several samples can share an image (same file in two datasets) — encode once
+    encoded_images = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="latent-prep") as pool:
+        for bucket, indices in latent_todo.items():
+            unique = list({items[i].latent_key: i for i in indices}.values())
+            for start in range(0, len(unique), batch_size):
+                chunk = unique[start:start + batch_size]
+                prepared = list(pool.map(lambda i: prepare_image(items[i].image, bucket), chunk))
+                latents = encode_images(np.stack(prepared))
+                cache.put("latent", [items[i].latent_key for i in chunk], {"latent": latents})
+                encoded_images += len(chunk)
+
+    text_keys = list(text_todo)
+    for start in range(0, len(text_keys), batch_size * 4):
+        keys = text_keys[start:start + batch_size * 4]
+        cache.put("text", keys, encode_text([text_todo[k] for k in keys]))
+
+    cache.save()
+    stats = {
+        "samples": len(items),
+        "buckets": len({item.bucket for item in items}),
+        "encoded_images": encoded_images,
+        "encoded_captions": len(text_keys),
+        "reused_latents": len(items) - sum(len(v) for v in latent_todo.values()),
+        "seconds": round(time.monotonic() - started, 1),
+    }
+    logger.info(
+        f"Latent cache: {stats['samples']} samples in {stats['buckets']} buckets, "
+        f"encoded {encoded_images} images / {len(text_keys)} captions, "
+        f"reused {stats['reused_latents']} ({stats['seconds']}s)"
+    )
+    return items, stats
+
+
+class BucketBatchLoader:
+    """Same-bucket batches read from memory-mapped shards.
+
+    Each epoch shuffles samples within buckets, chunks them into batches and
+    shuffles the batch order. Yields dicts of numpy arrays: latent (B,C,h,w),
+    hidden (B,77,D), pooled (B,P), time_ids (B,6).
+    """
+
+    def __init__(self, cache: LatentCache, items: list[CachedSample], batch_size: int = 1,
+                 seed: int | None = None, dtype=np.float32):
+        self.cache = cache
+        self.items = items
+        self.batch_size = max(1, batch_size)
+        self.dtype = dtype
+        self._rng = random.Random(seed)
+        self._by_bucket: dict[tuple[int, int], list[CachedSample]] = defaultdict(list)
+        for item in items:
+            self._by_bucket[item.bucket].append(item)
+
+    def __len__(self) -> int:
+        return sum(math.ceil(len(group) / self.batch_size) for group in self._by_bucket.values())
+
+    def __iter__(self):
+        batches = []
+        for group in self._by_bucket.values():
+            group = group[:]
+            self._rng.shuffle(group)
+            batches += [group[i:i + self.batch_size] for i in range(0, len(group), self.batch_size)]
+        self._rng.shuffle(batches)
+        for batch in batches:
+            latents = [self.cache.get("latent", item.latent_key)["latent"] for item in batch]
+            texts = [self.cache.get("text", item.text_key) for item in batch]
+            yield {
+                "latent": np.stack(latents).astype(self.dtype),
+                "hidden": np.stack([t["hidden"] for t in texts]).astype(self.dtype),
+                "pooled": np.stack([t["pooled"] for t in texts]).astype(self.dtype),
+                "time_ids": np.array([item.time_ids for item in batch], dtype=self.dtype),
+            }
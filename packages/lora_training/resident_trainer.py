@@ -0,0 +1,552 @@
+"""Resident LoRA training worker — load the frozen base model once, train many jobs.
+
+start_training() used to Popen server/train_lora.py per job, and the batch
+scripts (train_lora_cpu.py --all-fury, train_lora_gpu.py --all-needing) loop
+over characters in-process but still reload the checkpoint for each one. The
+SDXL load (UNet + VAE + two text encoders) often takes longer than training a
+small dataset.
+
+This worker keeps the frozen components of the most recently used checkpoint
+in memory. For each queued job it attaches a fresh PEFT LoRA adapter to the
+resident UNet, trains only the adapter, saves it as a Kohya safetensors file
+and deletes the adapter. The base weights are never modified, so the next
+job starts from the same state. Latents and text embeddings come from the
+latent cache (packages/lora_training/latent_cache.py), so a re-queued
+character only encodes what changed.
+
+Jobs come from training_jobs.json: start_training() queues them with
+runner="resident" when LORA_TRAINING_RESIDENT=1, or use --characters to queue
+a batch directly. Each finished job records load_s (0 when the base was
+reused), encode_s and train_s so the saving is visible. The API writes the
+same file, so every update goes through feedback.locked_training_jobs().
+
+    python3 -m packages.lora_training.resident_trainer              # serve the queue
+    python3 -m packages.lora_training.resident_trainer --once
+    python3 -m packages.lora_training.resident_trainer --characters roxy,gem --checkpoint <path>
+    python3 -m packages.lora_training.resident_trainer --tiny --smoke datasets/roxy --jobs 3   # CPU
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from packages.core.config import BASE_PATH
+from .feedback import load_training_jobs, locked_training_jobs
+
+logger = logging.getLogger(__name__)
+
+RESIDENT = os.getenv("LORA_TRAINING_RESIDENT", "0") == "1"
+RUNNER = "resident"
+POLL_INTERVAL_S = 10
+TARGET_MODULES = ["to_k", "to_q", "to_v", "to_out.0"]
+TINY_CHECKPOINT = "tiny"
+
+
+class JobCancelled(Exception):
+    """Raised from the progress callback when the job was cancelled via the API."""
+
+
+# ── Job file helpers ───────────────────────────────────────────────────
+
+
+def update_job(job_id: str, **fields) -> dict | None:
+    """Merge fields into the job under the job-file lock.
+
+    Once the job has left "running" (cancelled or reconciled by the API), its
+    status is kept: the worker's outcome fields are recorded next to it.
+    """
+    with locked_training_jobs() as jobs:
+        for job in jobs:
+            if job["job_id"] == job_id:
+                if job.get("status") != "running" and "status" in fields:
+                    fields = {k: v for k, v in fields.items() if k != "status"}
+                job.update(fields)
+                job["last_heartbeat"] = datetime.now().isoformat()
+                return dict(job)
+    return None
+
+
+def claim_next_job() -> dict | None:
+    """Oldest queued resident job, marked running under this process."""
+    with locked_training_jobs() as jobs:
+        queued = [j for j in jobs if j.get("status") == "queued" and j.get("runner") == RUNNER]
+        if not queued:
+            return None
+        job = min(queued, key=lambda j: j.get("created_at", ""))
+        job.update(status="running", pid=os.getpid(), started_at=datetime.now().isoformat())
+        return dict(job)
+
+
+def is_cancelled(job_id: str) -> bool:
+    """True once the API moved the job out of "running" (cancel sets it to failed)."""
+    for job in load_training_jobs():
+        if job["job_id"] == job_id:
+            return job.get("status") != "running"
+    return False
+
+
+def enqueue_job(character_slug: str, checkpoint: str, model_type: str = "sdxl", **params) -> dict:
+    """Append a resident job for character_slug to training_jobs.json."""
+    suffix = "_xl_lora" if model_type == "sdxl" else "_lora"
+    now = datetime.now()
+    job = {
+        "job_id": f"train_{character_slug}_{now.strftime('%Y%m%d_%H%M%S_%f')}",
+        "character_name": character_slug,
+        "character_slug": character_slug,
+        "status": "queued",
+        "runner": RUNNER,
+        "checkpoint": Path(checkpoint).name,
+        "checkpoint_path": str(checkpoint),
+        "dataset_dir": str(BASE_PATH / character_slug),
+        "model_type": model_type,
+        "prediction_type": "epsilon",
+        "epochs": 20,
+        "learning_rate": 1e-4,
+        "resolution": 1024 if model_type == "sdxl" else 512,
+        "lora_rank": 64 if model_type == "sdxl" else 32,
+        "output_path": str(Path("/opt/ComfyUI/models/loras") / f"{character_slug}{suffix}.safetensors"),
+        "created_at": now.isoformat(),
+    }
+    job.update(params)
+    with locked_training_jobs() as jobs:
+        jobs.append(job)
+    return job
+
+
+def approved_samples(dataset_dir: Path) -> list[tuple[Path, str]]:
+    """(image, caption) for approved images — all images when nothing is approved yet."""
+    images_dir = dataset_dir / "images"
+    approved = set()
+    approval_file = dataset_dir / "approval_status.json"
+    if approval_file.exists():
+        for name, status in json.loads(approval_file.read_text()).items():
+            if status == "approved" or (isinstance(status, dict) and status.get("status") == "approved"):
+                approved.add(name)
+    images = sorted(images_dir.glob("*.png")) if images_dir.exists() else []
+    chosen = [p for p in images if p.name in approved] or images
+    return [
+        (p, p.with_suffix(".txt").read_text().strip() if p.with_suffix(".txt").exists() else "")
+        for p in chosen
+    ]
+
+
+# ── Backends ───────────────────────────────────────────────────────────
+
+
+class DiffusersBackend:
+    """Loads checkpoints with diffusers and trains PEFT adapters on the resident UNet."""
+
+    def __init__(self, device: str | None = None):
+        import torch
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.dtype = torch.float16 if self.device == "cuda" else torch.float32
+
+    def load_base(self, checkpoint: str, model_type: str) -> dict:
+        from diffusers import StableDiffusionPipeline, StableDiffusionXLPipeline
+        from .latent_cache import model_id
+
+        if model_type == "sdxl":
+            pipe = StableDiffusionXLPipeline.from_single_file(checkpoint, torch_dtype=self.dtype)
+        else:
+            pipe = StableDiffusionPipeline.from_single_file(
+                checkpoint, torch_dtype=self.dtype, safety_checker=None, requires_safety_checker=False,
+            )
+        base = self._prepare(
+            model_id(checkpoint), model_type, pipe.unet, pipe.vae, pipe.text_encoder, pipe.tokenizer,
+            getattr(pipe, "text_encoder_2", None), getattr(pipe, "tokenizer_2", None), pipe.scheduler.config,
+        )
+        del pipe
+        return base
+
+    def _prepare(self, base_id, model_type, unet, vae, text_encoder, tokenizer,
+                 text_encoder_2, tokenizer_2, scheduler_config) -> dict:
+        from .latent_cache import sd15_encoders, sdxl_encoders
+
+        for module in (unet, vae, text_encoder, text_encoder_2):
+            if module is not None:
+                module.requires_grad_(False)
+                module.to(self.device, dtype=self.dtype)
+                module.eval()
+        if self.device == "cuda":
+            unet.enable_gradient_checkpointing()
+        if model_type == "sdxl":
+            encoders = sdxl_encoders(vae, text_encoder, text_encoder_2, tokenizer, tokenizer_2,
+                                     self.device, self.dtype)
+        else:
+            encoders = sd15_encoders(vae, text_encoder, tokenizer, self.device, self.dtype)
+        return {
+            "id": base_id,
+            "model_type": model_type,
+            "unet": unet,
+            "encoders": encoders,
+            "scheduler_config": scheduler_config,
+        }
+
+    def _optimizer(self, params, lr: float):
+        import torch
+        if self.device == "cuda":
+            try:
+                import bitsandbytes as bnb
+                return bnb.optim.AdamW8bit(params, lr=lr, weight_decay=1e-2)
+            except ImportError:
+                pass
+        return torch.optim.AdamW(params, lr=lr, weight_decay=1e-2)
+
+    def train(self, base: dict, job: dict, progress) -> dict:
+        """Attach an adapter, train it, return its Kohya state dict; the adapter is always removed."""
+        import torch
+        from diffusers import DDPMScheduler
+        from diffusers.utils import convert_state_dict_to_kohya
+        from peft import LoraConfig
+        from peft.utils import get_peft_model_state_dict
+        from torch.optim.lr_scheduler import CosineAnnealingLR
+
+        from .latent_cache import BucketBatchLoader, LatentCache, build_cache
+
+        samples = approved_samples(Path(job["dataset_dir"]))
+        if not samples:
+            raise RuntimeError("No approved images found in dataset")
+
+        encode_start = time.monotonic()
+        cache = LatentCache(vae_id=base["id"], encoder_id=base["id"])
+        items, _ = build_cache(samples, cache, *base["encoders"], resolution=job.get("resolution", 512))
+        encode_s = time.monotonic() - encode_start
+
+        is_vpred = job.get("prediction_type") == "v_prediction"
+        if is_vpred:
+            noise_scheduler = DDPMScheduler.from_config(
+                base["scheduler_config"], prediction_type="v_prediction", rescale_betas_zero_snr=True,
+            )
+        else:
+            noise_scheduler = DDPMScheduler.from_config(base["scheduler_config"])
+
+        unet = base["unet"]
+        adapter = job["job_id"].replace(".", "_")
+        rank = job.get("lora_rank") or 32
+        unet.add_adapter(
+            LoraConfig(r=rank, lora_alpha=rank, target_modules=TARGET_MODULES, lora_dropout=0.0),
+            adapter_name=adapter,
+        )
+        try:
+            params = [p for p in unet.parameters() if p.requires_grad]
+            # Adapter weights train in fp32 even on a fp16 base
+            for p in params:
+                p.data = p.data.float()
+            optimizer = self._optimizer(params, job.get("learning_rate", 1e-4))
+            loader = BucketBatchLoader(cache, items, batch_size=1)
+            epochs = job.get("epochs") or 20
+            grad_accum = job.get("grad_accum") or 4
+            total_steps = max(1, epochs * len(loader) // grad_accum)
+            scheduler = CosineAnnealingLR(optimizer, T_max=total_steps, eta_min=1e-6)
+            num_timesteps = noise_scheduler.config.num_train_timesteps
+
+            unet.train()
+            global_step, best_loss, losses = 0, float("inf"), []
+            for epoch in range(epochs):
+                epoch_loss, batches = 0.0, 0
+                for step, data in enumerate(loader):
+                    latents = torch.from_numpy(data["latent"]).to(self.device, dtype=self.dtype)
+                    hidden = torch.from_numpy(data["hidden"]).to(self.device, dtype=self.dtype)
+                    noise = torch.randn_like(latents)
+                    if is_vpred:
+                        u = torch.sigmoid(torch.randn(latents.shape[0], device=self.device))
+                        timesteps = (u * num_timesteps).long().clamp(0, num_timesteps - 1)
+                    else:
+                        timesteps = torch.randint(0, num_timesteps, (latents.shape[0],), device=self.device).long()
+                    noisy = noise_scheduler.add_noise(latents, noise, timesteps)
+                    kwargs = {"encoder_hidden_states": hidden}
+                    if base["model_type"] == "sdxl":
+                        kwargs["added_cond_kwargs"] = {
+                            "text_embeds": torch.from_numpy(data["pooled"]).to(self.device, dtype=self.dtype),
+                            "time_ids": torch.from_numpy(data["time_ids"]).to(self.device, dtype=self.dtype),
+                        }
+                    with torch.autocast(self.device, dtype=self.dtype, enabled=self.device == "cuda"):
+                        pred = unet(noisy, timesteps, **kwargs).sample
+                    target = noise_scheduler.get_velocity(latents, noise, timesteps) if is_vpred else noise
+                    loss = torch.nn.functional.mse_loss(pred.float(), target.float()) / grad_accum
+                    loss.backward()
+                    epoch_loss += loss.item() * grad_accum
+                    batches += 1
+                    if (step + 1) % grad_accum == 0 or step + 1 == len(loader):
+                        torch.nn.utils.clip_grad_norm_(params, 1.0)
+                        optimizer.step()
+                        scheduler.step()
+                        optimizer.zero_grad()
+                        global_step += 1
+                avg = epoch_loss / max(batches, 1)
+                losses.append(avg)
+                best_loss = min(best_loss, avg)
+                progress(epoch + 1, epochs, avg, global_step)
+
+            state = convert_state_dict_to_kohya(get_peft_model_state_dict(unet, adapter_name=adapter))
+            return {
+                "state_dict": {k: v.detach().half().cpu().contiguous() for k, v in state.items()},
+                "images": len(samples),
+                "encode_s": encode_s,
+                "total_steps": global_step,
+                "best_loss": best_loss,
+                "final_loss": losses[-1] if losses else None,
+            }
+        finally:
+            unet.eval()
+            unet.zero_grad(set_to_none=True)
+            unet.delete_adapters(adapter)
+
+    def base_is_clean(self, base: dict) -> bool:
+        return not any("lora" in name for name, _ in base["unet"].named_parameters())
+
+    def save(self, state_dict: dict, path: Path):
+        from safetensors.torch import save_file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_file(state_dict, str(path))
+
+
+class TinyBackend(DiffusersBackend):
+    """Randomly initialised miniature SD1.5-style components — smoke tests on CPU."""
+
+    def __init__(self):
+        super().__init__(device="cpu")
+
+    def load_base(self, checkpoint: str, model_type: str) -> dict:
+        import torch
+        from diffusers import AutoencoderKL, DDPMScheduler, UNet2DConditionModel
+        from transformers import CLIPTextConfig, CLIPTextModel
+
+        torch.manual_seed(0)
+        unet = UNet2DConditionModel(
+            sample_size=32, in_channels=4, out_channels=4, layers_per_block=1,
+            block_out_channels=(32, 64), cross_attention_dim=32, attention_head_dim=8,
+            down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+            up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        )
+        vae = AutoencoderKL(
+            in_channels=3, out_channels=3, latent_channels=4, block_out_channels=(32, 64),
+            down_block_types=("DownEncoderBlock2D",) * 2, up_block_types=("UpDecoderBlock2D",) * 2,
+        )
+        text_encoder = CLIPTextModel(CLIPTextConfig(
+            hidden_size=32, intermediate_size=37, num_attention_heads=4, num_hidden_layers=2,
+            vocab_size=1000, max_position_embeddings=77,
+        ))
+        scheduler = DDPMScheduler(beta_start=0.00085, beta_end=0.012, beta_schedule="scaled_linear")
+        return self._prepare(TINY_CHECKPOINT, "sd15", unet, vae, text_encoder, _HashTokenizer(),
+                             None, None, scheduler.config)
+
+
+class _HashTokenizer:
+    """Enough of a CLIP tokenizer for the tiny model: words → stable ids, padded to 77."""
+
+    def __call__(self, captions, padding="max_length", max_length=77, truncation=True, return_tensors="pt"):
+        import zlib
+        from types import SimpleNamespace
+        import torch
+        rows = []
+        for caption in captions:
+            ids = [zlib.crc32(w.encode()) % 997 + 2 for w in caption.lower().split()][:max_length - 2]
+            rows.append(([0] + ids + [1] + [1] * max_length)[:max_length])
+        return SimpleNamespace(input_ids=torch.tensor(rows, dtype=torch.long))
+
+
+# ── Worker ─────────────────────────────────────────────────────────────
+
+
+class ResidentTrainer:
+    """Runs training jobs against one resident base model."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.base: dict | None = None
+        self.base_key: tuple[str, str] | None = None
+        self.history: list[dict] = []
+
+    def _ensure_base(self, job: dict) -> float:
+        """Load the job's base unless it is already resident. Returns seconds spent loading."""
+        key = (job.get("checkpoint_path") or job["checkpoint"], job.get("model_type") or "sdxl")
+        if self.base is not None and self.base_key == key:
+            return 0.0
+        self.base = self.base_key = None  # drop the old base before loading the new one
+        started = time.monotonic()
+        logger.info(f"Loading base {key[1]} checkpoint {Path(key[0]).name}")
+        self.base = self.backend.load_base(*key)
+        self.base_key = key
+        return time.monotonic() - started
+
+    def run_job(self, job: dict) -> dict:
+        job_id = job["job_id"]
+        started = time.monotonic()
+        try:
+            load_s = self._ensure_base(job)
+
+            def progress(epoch, epochs, loss, step):
+                update_job(job_id, epoch=epoch, total_epochs=epochs, loss=round(loss, 6), global_step=step)
+                if is_cancelled(job_id):
+                    raise JobCancelled(f"Cancelled by user after epoch {epoch}/{epochs}")
+
+            train_start = time.monotonic()
+            result = self.backend.train(self.base, job, progress)
+            train_s = time.monotonic() - train_start - result.get("encode_s", 0.0)
+
+            output_path = Path(job["output_path"])
+            self.backend.save(result["state_dict"], output_path)
+            timing = {"load_s": round(load_s, 1), "encode_s": round(result.get("encode_s", 0.0), 1),
+                      "train_s": round(train_s, 1), "base_reused": load_s == 0.0}
+            record = {
+                "status": "completed",
+                "completed_at": datetime.now().isoformat(),
+                "output_path": str(output_path),
+                "file_size_mb": round(output_path.stat().st_size / (1024 * 1024), 1) if output_path.exists() else None,
+                "best_loss": round(result["best_loss"], 6) if result.get("best_loss") is not None else None,
+                "final_loss": round(result["final_loss"], 6) if result.get("final_loss") is not None else None,
+                "total_steps": result.get("total_steps"),
+                "images": result.get("images"),
+                **timing,
+            }
+            update_job(job_id, **record)
+            _write_manifest(job, record)
+            _record_in_db(job, record, time.monotonic() - started)
+            logger.info(
+                f"Job {job_id}: load {timing['load_s']}s, encode {timing['encode_s']}s, "
+                f"train {timing['train_s']}s → {output_path.name}"
+            )
+        except JobCancelled as e:
+            record = {"status": "failed", "error": str(e), "failed_at": datetime.now().isoformat()}
+            update_job(job_id, **record)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            record = {"status": "failed", "error": str(e), "failed_at": datetime.now().isoformat()}
+            update_job(job_id, **record)
+        finally:
+            if self.base is not None and hasattr(self.backend, "base_is_clean") \
+                    and not self.backend.base_is_clean(self.base):
+                logger.warning("Adapter left on resident base — dropping it, next job reloads")
+                self.base = self.base_key = None
+
+        self.history.append({"job_id": job_id, **record})
+        return record
+
+    def run_pending(self) -> int:
+        """Train every queued resident job; returns how many ran."""
+        count = 0
+        while (job := claim_next_job()) is not None:
+            self.run_job(job)
+            count += 1
+        return count
+
+    def serve(self, poll_interval: float = POLL_INTERVAL_S):
+        logger.info(f"Resident trainer waiting for jobs (pid {os.getpid()})")
+        while True:
+            if not self.run_pending():
+                time.sleep(poll_interval)
+
+    def stats(self) -> dict:
+        done = [h for h in self.history if h.get("status") == "completed"]
+        load = sum(h["load_s"] for h in done)
+        train = sum(h["train_s"] + h["encode_s"] for h in done)
+        return {
+            "jobs": len(self.history),
+            "completed": len(done),
+            "base_loads": sum(1 for h in done if not h["base_reused"]),
+            "load_s": round(load, 1),
+            "train_s": round(train, 1),
+            "load_fraction": round(load / (load + train), 3) if load + train else None,
+        }
+
+
+def _write_manifest(job: dict, record: dict):
+    """Training manifest next to the LoRA, same shape as the batch scripts write."""
+    output_path = Path(record["output_path"])
+    try:
+        samples = approved_samples(Path(job["dataset_dir"]))
+        manifest = {
+            "character": job.get("character_slug"),
+            "trained_at": record["completed_at"],
+            "lora_path": str(output_path),
+            "image_count": len(samples),
+            "images": [{"file": p.name} for p, _ in samples],
+            "steps": record.get("total_steps"),
+            "rank": job.get("lora_rank"),
+            "best_loss": record.get("best_loss"),
+            "training_time_min": round(record["train_s"] / 60, 1),
+            "checkpoint": job.get("checkpoint"),
+            "runner": RUNNER,
+        }
+        output_path.with_suffix(".manifest.json").write_text(json.dumps(manifest, indent=2))
+    except Exception as e:
+        logger.warning(f"Could not write training manifest for {job['job_id']}: {e}")
+
+
+def _record_in_db(job: dict, record: dict, elapsed: float):
+    async def _insert():
+        from packages.core.db import connect_direct
+        conn = await connect_direct()
+        try:
+            await conn.execute("""
+                INSERT INTO lora_training_status
+                    (status, model_path, training_started_at, training_completed_at,
+                     training_steps, final_loss, version)
+                VALUES ('completed', $1, NOW() - make_interval(secs => $2), NOW(), $3, $4,
+                        COALESCE((SELECT MAX(version) FROM lora_training_status
+                                  WHERE model_path = $1), 0) + 1)
+            """, record["output_path"], float(elapsed), record.get("total_steps"), record.get("final_loss"))
+        finally:
+            await conn.close()
+
+    if job.get("checkpoint") == TINY_CHECKPOINT:
+        return
+    try:
+        asyncio.run(_insert())
+    except Exception as e:
+        logger.warning(f"Could not write training record to DB: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident LoRA training worker")
+    parser.add_argument("--once", action="store_true", help="Train queued jobs, then exit")
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL_S, help="Queue poll interval (s)")
+    parser.add_argument("--characters", type=str, help="Comma-separated slugs to queue, then train")
+    parser.add_argument("--checkpoint", type=str, help="Checkpoint for --characters")
+    parser.add_argument("--model-type", choices=["sd15", "sdxl"], default="sdxl")
+    parser.add_argument("--steps", type=int, default=None, help="Approximate steps per job (sets epochs)")
+    parser.add_argument("--tiny", action="store_true", help="Use a tiny random model on CPU")
+    parser.add_argument("--smoke", type=str, help="Dataset dir for --tiny smoke jobs")
+    parser.add_argument("--jobs", type=int, default=2, help="Number of --smoke jobs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    trainer = ResidentTrainer(TinyBackend() if args.tiny else DiffusersBackend())
+
+    if args.smoke:
+        out_dir = Path(args.smoke) / "_smoke_loras"
+        for n in range(args.jobs):
+            job = {
+                "job_id": f"smoke_{n}", "checkpoint": TINY_CHECKPOINT, "model_type": "sd15",
+                "dataset_dir": args.smoke, "epochs": 1, "resolution": 64, "lora_rank": 4,
+                "grad_accum": 1, "output_path": str(out_dir / f"smoke_{n}.safetensors"),
+            }
+            trainer.run_job(job)
+        print(json.dumps({"jobs": trainer.history, "summary": trainer.stats()}, indent=2))
+        return
+
+    if args.characters:
+        if not args.checkpoint:
+            parser.error("--characters needs --checkpoint")
+        for slug in [s.strip() for s in args.characters.split(",") if s.strip()]:
+            params = {}
+            if args.steps:
+                images = len(approved_samples(BASE_PATH / slug)) or 1
+                params["epochs"] = max(1, args.steps // images)
+            enqueue_job(slug, args.checkpoint, args.model_type, **params)
+
+    if args.once or args.characters:
+        trainer.run_pending()
+        print(json.dumps(trainer.stats(), indent=2))
+    else:
+        trainer.serve(args.poll)
+
+
+if __name__ == "__main__":
+    main()
@@ -443,7 +443,7 @@ async def start_replenish(body: ReplenishRequest):
 
     return {
         "task_id": task_id,
-        "status": "running",
+        "status": "queued",
         "message": f"Replenishment started (target: {body.target_per_character})",
         "poll_url": f"/api/training/replenish/{task_id}",
     }
@@ -458,7 +458,7 @@ async def get_replenish_status(task_id: str):
     """
     from packages.core.replenishment import get_replenish_task
 
-    task = get_replenish_task(task_id)
+    task = await get_replenish_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail=f"Replenish task '{task_id}' not found")
     return task
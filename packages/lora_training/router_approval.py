@@ -9,6 +9,7 @@ from datetime import datetime
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from packages.core import prompt_plan
 from packages.core.config import BASE_PATH
 from packages.core.db import get_char_project_map, invalidate_char_cache, connect_direct
 from packages.core.auth import get_user_projects
@@ -520,6 +521,7 @@ async def bulk_reject(req: BulkRejectRequest):
                 feedback["rejection_count"] = len(feedback["rejections"])
             with open(feedback_file, "w") as f:
                 json.dump(feedback, f, indent=2)
+            prompt_plan.invalidate(slug)
 
     if req.dry_run:
         return {
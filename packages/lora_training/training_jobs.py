@@ -14,6 +14,8 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from packages.core import prompt_plan
+from packages.core.asset_registry import registry as assets
 from packages.core.config import BASE_PATH, _SCRIPT_DIR, _PROJECT_DIR
 from packages.core.db import get_char_project_map, get_pool
 from packages.core.generation import POSE_VARIATIONS
@@ -21,7 +23,7 @@ from packages.core.gpu_router import ensure_gpu_ready
 from packages.core.models import TrainingRequest
 from .feedback import (
     load_training_jobs,
-    save_training_jobs,
+    locked_training_jobs,
     reconcile_training_jobs,
 )
 
@@ -85,32 +87,34 @@ async def start_training(training: TrainingRequest):
         if not checkpoint_path.exists():
             raise HTTPException(status_code=400, detail=f"Checkpoint not found: {checkpoint_name}")
 
-        # Check for ANY running training process (by PID, not just job file)
-        jobs = load_training_jobs()
-        for existing in jobs:
-            if existing.get("status") == "running":
-                pid = existing.get("pid")
-                if pid:
-                    try:
-                        os.kill(pid, 0)  # Check if process is alive
-                        raise HTTPException(
-                            status_code=409,
-                            detail=f"Training already in progress for {existing.get('character_name', 'unknown')} "
-                                   f"(job {existing['job_id']}, pid {pid}). "
-                                   f"Only one training job can run at a time."
-                        )
-                    except (OSError, ProcessLookupError):
+        from .resident_trainer import RESIDENT, RUNNER
+
+        # Check for ANY running training process (by PID, not just job file).
+        # The resident worker serializes its own queue, so jobs can stack up behind it.
+        busy = None
+        with locked_training_jobs() as jobs:
+            for existing in jobs:
+                if existing.get("status") == "running" and not RESIDENT:
+                    pid = existing.get("pid")
+                    if pid:
+                        try:
+                            os.kill(pid, 0)  # Check if process is alive
+                            busy = existing
+                        except (OSError, ProcessLookupError):
+                            existing["status"] = "failed"
+                            existing["error"] = "Process died without updating status (detected at training start)"
+                            existing["failed_at"] = datetime.now().isoformat()
+                    else:
                         existing["status"] = "failed"
-                        existing["error"] = "Process died without updating status (detected at training start)"
+                        existing["error"] = "Process died without updating status (no PID recorded)"
                         existing["failed_at"] = datetime.now().isoformat()
-                        save_training_jobs(jobs)
-                        jobs = load_training_jobs()
-                else:
-                    existing["status"] = "failed"
-                    existing["error"] = "Process died without updating status (no PID recorded)"
-                    existing["failed_at"] = datetime.now().isoformat()
-                    save_training_jobs(jobs)
-                    jobs = load_training_jobs()
+        if busy:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Training already in progress for {busy.get('character_name', 'unknown')} "
+                       f"(job {busy['job_id']}, pid {busy['pid']}). "
+                       f"Only one training job can run at a time."
+            )
 
         gpu_ready, gpu_msg = ensure_gpu_ready("lora_training")
         if not gpu_ready:
@@ -152,9 +156,31 @@ async def start_training(training: TrainingRequest):
             "output_path": str(output_path),
             "created_at": datetime.now().isoformat(),
         }
+        if RESIDENT:
+            job.update(runner=RUNNER, checkpoint_path=str(checkpoint_path), dataset_dir=str(dataset_path))
+
+        with locked_training_jobs() as jobs:
+            jobs.append(job)
 
-        jobs.append(job)
-        save_training_jobs(jobs)
+        if RESIDENT:
+            queued_ahead = sum(
+                1 for j in jobs
+                if j.get("runner") == RUNNER and j.get("status") in ("queued", "running") and j is not job
+            )
+            logger.info(f"Training queued for resident worker: {job_id} ({queued_ahead} ahead)")
+            return {
+                "message": "Training job queued for the resident trainer",
+                "job_id": job_id,
+                "queued_ahead": queued_ahead,
+                "approved_images": approved_count,
+                "checkpoint": checkpoint_name,
+                "model_type": model_type,
+                "prediction_type": prediction_type,
+                "lora_rank": lora_rank,
+                "resolution": resolution,
+                "output": str(output_path),
+                "gpu": gpu_msg,
+            }
 
         train_script = _SCRIPT_DIR / "train_lora.py"
         log_dir = _PROJECT_DIR / "logs"
@@ -185,12 +211,11 @@ async def start_training(training: TrainingRequest):
         )
         log_fh.close()
 
-        jobs = load_training_jobs()
-        for j in jobs:
-            if j["job_id"] == job_id:
-                j["pid"] = proc.pid
-                break
-        save_training_jobs(jobs)
+        with locked_training_jobs() as jobs:
+            for j in jobs:
+                if j["job_id"] == job_id:
+                    j["pid"] = proc.pid
+                    break
 
         logger.info(
             f"Training launched: {job_id} (pid={proc.pid}) for {training.character_name} "
@@ -249,7 +274,11 @@ async def cancel_training_job(job_id: str):
                 raise HTTPException(status_code=400, detail=f"Job is not running (status: {job['status']})")
             pid = job.get("pid")
             killed = False
+            if job.get("runner") == "resident":
+                # The pid is the shared worker — it sees the status change and stops after the epoch
+                pid = None
             if pid:
+                # Not under the job-file lock: the trainer records its own exit on SIGTERM
                 try:
                     os.kill(pid, sig.SIGTERM)
                     for _ in range(10):
@@ -264,10 +293,12 @@ async def cancel_training_job(job_id: str):
                         killed = True
                 except (OSError, ProcessLookupError):
                     killed = True
-            job["status"] = "failed"
-            job["error"] = "Cancelled by user"
-            job["failed_at"] = datetime.now().isoformat()
-            save_training_jobs(jobs)
+            with locked_training_jobs() as current:
+                for j in current:
+                    if j["job_id"] == job_id:
+                        j["status"] = "failed"
+                        j["error"] = "Cancelled by user"
+                        j["failed_at"] = datetime.now().isoformat()
             return {"message": f"Job {job_id} cancelled", "pid": pid, "killed": killed}
     raise HTTPException(status_code=404, detail="Job not found")
 
@@ -275,38 +306,39 @@ async def cancel_training_job(job_id: str):
 @jobs_router.delete("/jobs/{job_id}")
 async def delete_training_job(job_id: str):
     """Remove a finished job from the jobs list."""
-    jobs = load_training_jobs()
-    for i, job in enumerate(jobs):
-        if job["job_id"] == job_id:
-            if job["status"] in ("running", "queued"):
-                raise HTTPException(status_code=400, detail="Cannot delete a running/queued job -- cancel it first")
-            jobs.pop(i)
-            save_training_jobs(jobs)
-            log_file = _PROJECT_DIR / "logs" / f"{job_id}.log"
-            if log_file.exists():
-                log_file.unlink()
-            return {"message": f"Job {job_id} deleted"}
-    raise HTTPException(status_code=404, detail="Job not found")
+    with locked_training_jobs() as jobs:
+        for i, job in enumerate(jobs):
+            if job["job_id"] == job_id:
+                if job["status"] in ("running", "queued"):
+                    raise HTTPException(status_code=400, detail="Cannot delete a running/queued job -- cancel it first")
+                jobs.pop(i)
+                break
+        else:
+            raise HTTPException(status_code=404, detail="Job not found")
+    log_file = _PROJECT_DIR / "logs" / f"{job_id}.log"
+    if log_file.exists():
+        log_file.unlink()
+    return {"message": f"Job {job_id} deleted"}
 
 
 @jobs_router.post("/jobs/clear-finished")
 async def clear_finished_jobs(days: int = 7):
     """Remove all completed/failed/invalidated jobs older than N days."""
-    jobs = load_training_jobs()
     cutoff = datetime.now().timestamp() - (days * 86400)
     kept = []
     removed = 0
-    for job in jobs:
-        if job["status"] in ("completed", "failed", "invalidated"):
-            created = datetime.fromisoformat(job["created_at"]).timestamp()
-            if created < cutoff:
-                log_file = _PROJECT_DIR / "logs" / f"{job['job_id']}.log"
-                if log_file.exists():
-                    log_file.unlink()
-                removed += 1
-                continue
-        kept.append(job)
-    save_training_jobs(kept)
+    with locked_training_jobs() as jobs:
+        for job in jobs:
+            if job["status"] in ("completed", "failed", "invalidated"):
+                created = datetime.fromisoformat(job["created_at"]).timestamp()
+                if created < cutoff:
+                    log_file = _PROJECT_DIR / "logs" / f"{job['job_id']}.log"
+                    if log_file.exists():
+                        log_file.unlink()
+                    removed += 1
+                    continue
+            kept.append(job)
+        jobs[:] = kept
     return {"message": f"Removed {removed} finished jobs older than {days} days", "removed": removed, "remaining": len(kept)}
 
 
@@ -331,23 +363,24 @@ async def retry_training_job(job_id: str):
 @jobs_router.post("/jobs/{job_id}/invalidate")
 async def invalidate_training_job(job_id: str, delete_lora: bool = False):
     """Mark a completed job as invalidated (trained on bad data). Optionally delete the LoRA file."""
-    jobs = load_training_jobs()
-    for job in jobs:
-        if job["job_id"] == job_id:
-            if job["status"] != "completed":
-                raise HTTPException(status_code=400, detail=f"Can only invalidate completed jobs (status: {job['status']})")
-            job["status"] = "invalidated"
-            job["error"] = "Invalidated by user"
-            lora_deleted = False
-            if delete_lora and job.get("output_path"):
-                lora_path = Path(job["output_path"])
-                if lora_path.exists():
-                    lora_path.unlink()
-                    lora_deleted = True
-                    job["error"] = "Invalidated by user -- LoRA file deleted"
-            save_training_jobs(jobs)
-            return {"message": f"Job {job_id} invalidated", "lora_deleted": lora_deleted}
-    raise HTTPException(status_code=404, detail="Job not found")
+    with locked_training_jobs() as jobs:
+        for job in jobs:
+            if job["job_id"] == job_id:
+                if job["status"] != "completed":
+                    raise HTTPException(status_code=400, detail=f"Can only invalidate completed jobs (status: {job['status']})")
+                job["status"] = "invalidated"
+                job["error"] = "Invalidated by user"
+                lora_deleted = False
+                if delete_lora and job.get("output_path"):
+                    lora_path = Path(job["output_path"])
+                    if lora_path.exists():
+                        lora_path.unlink()
+                        lora_deleted = True
+                        job["error"] = "Invalidated by user -- LoRA file deleted"
+                break
+        else:
+            raise HTTPException(status_code=404, detail="Job not found")
+    return {"message": f"Job {job_id} invalidated", "lora_deleted": lora_deleted}
 
 
 @jobs_router.post("/reconcile")
@@ -357,10 +390,14 @@ async def reconcile_training_jobs_endpoint():
     return {"message": f"Reconciled {count} stale job(s)", "reconciled": count}
 
 
+def _trained_lora_assets():
+    """Top-level *_lora.safetensors files in the LoRA directory, sorted by name."""
+    return [a for a in assets.assets("loras", "*_lora.safetensors") if "/" not in a.name]
+
+
 @jobs_router.get("/loras")
 async def list_trained_loras():
     """List all trained LoRA files on disk with metadata."""
-    lora_dir = Path("/opt/ComfyUI/models/loras")
     loras = []
     jobs = load_training_jobs()
     job_by_path = {}
@@ -368,30 +405,29 @@ async def list_trained_loras():
         if job.get("output_path"):
             job_by_path[job["output_path"]] = job
 
-    if lora_dir.exists():
-        # Match both SD1.5 (*_lora.safetensors) and SDXL (*_xl_lora.safetensors)
-        for f in sorted(lora_dir.glob("*_lora.safetensors")):
-            stat = f.stat()
-            is_xl = f.stem.endswith("_xl_lora")
-            slug = f.stem.replace("_xl_lora", "") if is_xl else f.stem.replace("_lora", "")
-            architecture = "sdxl" if is_xl else "sd15"
-            related_job = job_by_path.get(str(f))
-            loras.append({
-                "filename": f.name,
-                "slug": slug,
-                "architecture": architecture,
-                "path": str(f),
-                "size_mb": round(stat.st_size / (1024 * 1024), 1),
-                "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                "job_id": related_job["job_id"] if related_job else None,
-                "job_status": related_job["status"] if related_job else None,
-                "checkpoint": related_job.get("checkpoint") if related_job else None,
-                "trained_epochs": related_job.get("epoch") or related_job.get("total_epochs") if related_job else None,
-                "final_loss": related_job.get("loss") or related_job.get("final_loss") if related_job else None,
-                "best_loss": related_job.get("best_loss") if related_job else None,
-                "resolution": related_job.get("resolution") if related_job else None,
-                "lora_rank": related_job.get("lora_rank") if related_job else None,
-            })
+    # Match both SD1.5 (*_lora.safetensors) and SDXL (*_xl_lora.safetensors)
+    for asset in _trained_lora_assets():
+        f = asset.path
+        is_xl = f.stem.endswith("_xl_lora")
+        slug = f.stem.replace("_xl_lora", "") if is_xl else f.stem.replace("_lora", "")
+        architecture = "sdxl" if is_xl else "sd15"
+        related_job = job_by_path.get(str(f))
+        loras.append({
+            "filename": f.name,
+            "slug": slug,
+            "architecture": architecture,
+            "path": str(f),
+            "size_mb": round(asset.size / (1024 * 1024), 1),
+            "created_at": datetime.fromtimestamp(asset.mtime).isoformat(),
+            "job_id": related_job["job_id"] if related_job else None,
+            "job_status": related_job["status"] if related_job else None,
+            "checkpoint": related_job.get("checkpoint") if related_job else None,
+            "trained_epochs": related_job.get("epoch") or related_job.get("total_epochs") if related_job else None,
+            "final_loss": related_job.get("loss") or related_job.get("final_loss") if related_job else None,
+            "best_loss": related_job.get("best_loss") if related_job else None,
+            "resolution": related_job.get("resolution") if related_job else None,
+            "lora_rank": related_job.get("lora_rank") if related_job else None,
+        })
     return {"loras": loras}
 
 
@@ -403,6 +439,7 @@ async def delete_trained_lora(slug: str):
         raise HTTPException(status_code=404, detail=f"LoRA file not found: {lora_path.name}")
     size_mb = round(lora_path.stat().st_size / (1024 * 1024), 1)
     lora_path.unlink()
+    assets.invalidate()
     return {"message": f"Deleted {lora_path.name} ({size_mb} MB)", "filename": lora_path.name}
 
 
@@ -437,14 +474,13 @@ async def gap_analysis(project_name: str | None = None):
             if row:
                 project_id = row["id"]
 
-    # Build LoRA lookup from disk
-    lora_dir = Path("/opt/ComfyUI/models/loras")
+    # Build LoRA lookup from the asset registry
     lora_slugs: set[str] = set()
-    if lora_dir.exists():
-        for f in lora_dir.glob("*_lora.safetensors"):
-            is_xl = f.stem.endswith("_xl_lora")
-            slug = f.stem.replace("_xl_lora", "") if is_xl else f.stem.replace("_lora", "")
-            lora_slugs.add(slug)
+    for asset in _trained_lora_assets():
+        stem = asset.path.stem
+        is_xl = stem.endswith("_xl_lora")
+        slug = stem.replace("_xl_lora", "") if is_xl else stem.replace("_lora", "")
+        lora_slugs.add(slug)
 
     # Per-character analysis
     characters_out = []
@@ -857,4 +893,5 @@ async def clear_feedback(character_slug: str):
     feedback_json = BASE_PATH / character_slug / "feedback.json"
     if feedback_json.exists():
         feedback_json.unlink()
+        prompt_plan.invalidate(character_slug)
     return {"message": f"Feedback cleared for {character_slug}"}
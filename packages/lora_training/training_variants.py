@@ -4,7 +4,6 @@ import json
 import logging
 import random
 import re
-import shutil
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
@@ -13,6 +12,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from packages.core.config import BASE_PATH, COMFYUI_URL, COMFYUI_INPUT_DIR, normalize_sampler
+from packages.core.input_staging import stage_input
 from packages.core.comfyui import build_ipadapter_workflow
 from packages.core.db import get_char_project_map, get_pool
 
@@ -67,10 +67,7 @@ async def generate_variant(character_slug: str, image_name: str, body: VariantRe
         meta.get("scheduler") or db_info.get("scheduler"),
     )
 
-    comfyui_ref_name = f"variant_ref_{character_slug}.png"
-    comfyui_ref_path = COMFYUI_INPUT_DIR / comfyui_ref_name
-    COMFYUI_INPUT_DIR.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(image_path, comfyui_ref_path)
+    comfyui_ref_name = stage_input(image_path, name_hint=f"variant_ref_{character_slug}.png")
 
     results = []
     for i in range(body.count):
@@ -2,6 +2,8 @@
 
 import json
 import logging
+import time
+import uuid
 from typing import Any
 
 from packages.core.db import connect_direct
@@ -13,6 +15,77 @@ OLLAMA_URL = "http://localhost:11434"
 OLLAMA_MODEL = "gemma3:12b"
 OLLAMA_TIMEOUT = 120
 
+_UPSERT_STATE_SQL = """
+    INSERT INTO character_scene_state
+        (scene_id, character_slug, clothing, hair_state, injuries,
+         accessories, body_state, emotional_state, energy_level,
+         relationship_context, location_in_scene, carrying,
+         state_source, version)
+    VALUES ($1, $2, $3, $4, $5::jsonb, $6, $7, $8, $9, $10::jsonb, $11, $12, $13, 1)
+    ON CONFLICT (scene_id, character_slug) DO UPDATE SET
+        clothing = COALESCE(EXCLUDED.clothing, character_scene_state.clothing),
+        hair_state = COALESCE(EXCLUDED.hair_state, character_scene_state.hair_state),
+        injuries = COALESCE(EXCLUDED.injuries, character_scene_state.injuries),
+        accessories = COALESCE(EXCLUDED.accessories, character_scene_state.accessories),
+        body_state = COALESCE(EXCLUDED.body_state, character_scene_state.body_state),
+        emotional_state = COALESCE(EXCLUDED.emotional_state, character_scene_state.emotional_state),
+        energy_level = COALESCE(EXCLUDED.energy_level, character_scene_state.energy_level),
+        relationship_context = COALESCE(EXCLUDED.relationship_context, character_scene_state.relationship_context),
+        location_in_scene = COALESCE(EXCLUDED.location_in_scene, character_scene_state.location_in_scene),
+        carrying = COALESCE(EXCLUDED.carrying, character_scene_state.carrying),
+        state_source = EXCLUDED.state_source,
+        version = character_scene_state.version + 1,
+        updated_at = now()
+"""
+
+# Batch variant: a manual override that lands between our read and write wins.
+_PROPAGATE_UPSERT_SQL = (
+    _UPSERT_STATE_SQL + " WHERE character_scene_state.state_source <> 'manual'"
+)
+
+
+def _state_params(scene_id, character_slug: str, state: dict, source: str) -> tuple:
+    """Positional parameters for _UPSERT_STATE_SQL."""
+    return (
+        scene_id, character_slug,
+        state.get("clothing"),
+        state.get("hair_state"),
+        json.dumps(state.get("injuries", [])),
+        state.get("accessories", []),
+        state.get("body_state", "clean"),
+        state.get("emotional_state", "calm"),
+        state.get("energy_level", "normal"),
+        json.dumps(state.get("relationship_context", {})),
+        state.get("location_in_scene"),
+        state.get("carrying", []),
+        source,
+    )
+
+
+def plan_propagation(
+    source_states: list[dict],
+    downstream: list[tuple[str, dict[str, dict]]],
+) -> list[tuple[str, str, dict]]:
+    """Walk decay chains in memory. Pure — no DB access.
+
+    downstream is [(scene_id, {character_slug: existing_state})] in scene order.
+    Manual overrides are never written but become the base for the scenes
+    after them. Returns [(scene_id, character_slug, decayed_state)] to upsert.
+    """
+    writes = []
+    for src_state in source_states:
+        slug = src_state["character_slug"]
+        current_state = src_state
+        for scene_id, existing_states in downstream:
+            existing = existing_states.get(slug)
+            if existing and existing.get("state_source") == "manual":
+                current_state = existing
+                continue
+            decayed = apply_all_decay(current_state)
+            writes.append((scene_id, slug, decayed))
+            current_state = decayed
+    return writes
+
 
 class NarrativeStateEngine:
     """Manages character state across scenes."""
@@ -50,41 +123,9 @@ class NarrativeStateEngine:
         """UPSERT a character state for a scene. Increments version on update."""
         conn = await connect_direct()
         try:
-            row = await conn.fetchrow("""
-                INSERT INTO character_scene_state
-                    (scene_id, character_slug, clothing, hair_state, injuries,
-                     accessories, body_state, emotional_state, energy_level,
-                     relationship_context, location_in_scene, carrying,
-                     state_source, version)
-                VALUES ($1, $2, $3, $4, $5::jsonb, $6, $7, $8, $9, $10::jsonb, $11, $12, $13, 1)
-                ON CONFLICT (scene_id, character_slug) DO UPDATE SET
-                    clothing = COALESCE(EXCLUDED.clothing, character_scene_state.clothing),
-                    hair_state = COALESCE(EXCLUDED.hair_state, character_scene_state.hair_state),
-                    injuries = COALESCE(EXCLUDED.injuries, character_scene_state.injuries),
-                    accessories = COALESCE(EXCLUDED.accessories, character_scene_state.accessories),
-                    body_state = COALESCE(EXCLUDED.body_state, character_scene_state.body_state),
-                    emotional_state = COALESCE(EXCLUDED.emotional_state, character_scene_state.emotional_state),
-                    energy_level = COALESCE(EXCLUDED.energy_level, character_scene_state.energy_level),
-                    relationship_context = COALESCE(EXCLUDED.relationship_context, character_scene_state.relationship_context),
-                    location_in_scene = COALESCE(EXCLUDED.location_in_scene, character_scene_state.location_in_scene),
-                    carrying = COALESCE(EXCLUDED.carrying, character_scene_state.carrying),
-                    state_source = EXCLUDED.state_source,
-                    version = character_scene_state.version + 1,
-                    updated_at = now()
-                RETURNING *
-            """,
-                scene_id, character_slug,
-                state.get("clothing"),
-                state.get("hair_state"),
-                json.dumps(state.get("injuries", [])),
-                state.get("accessories", []),
-                state.get("body_state", "clean"),
-                state.get("emotional_state", "calm"),
-                state.get("energy_level", "normal"),
-                json.dumps(state.get("relationship_context", {})),
-                state.get("location_in_scene"),
-                state.get("carrying", []),
-                source,
+            row = await conn.fetchrow(
+                _UPSERT_STATE_SQL + " RETURNING *",
+                *_state_params(scene_id, character_slug, state, source),
             )
             return self._row_to_dict(row)
         finally:
@@ -174,81 +215,79 @@ class NarrativeStateEngine:
         Respects manual overrides (state_source='manual') — never overwrites them.
         Applies decay rules between scenes.
         """
-        conn = await connect_direct()
-        try:
-            # Get source scene states
-            source_states = await conn.fetch(
-                "SELECT * FROM character_scene_state WHERE scene_id = $1",
-                from_scene_id,
-            )
-            if not source_states:
-                return []
+        report = await self.propagate(from_scene_id)
+        return report["states"]
 
-            # Get scene order for this project
-            source_scene = await conn.fetchrow(
-                "SELECT scene_number, project_id FROM scenes WHERE id = $1",
-                from_scene_id,
-            )
-            if not source_scene:
-                return []
+    async def propagate(self, from_scene_id: str) -> dict:
+        """Set-based forward propagation.
 
-            pid = source_scene["project_id"]
-            source_num = source_scene["scene_number"]
-            if source_num is None:
-                return []
+        Loads the character x scene state matrix for the source scene and
+        everything downstream in one query, walks the decay chains in memory,
+        and writes all propagated rows with a single executemany inside a
+        transaction. Returns {"states", "rows_written", "elapsed_ms"}.
+        """
+        started = time.perf_counter()
+        report = {"states": [], "rows_written": 0, "elapsed_ms": 0.0}
+        conn = await connect_direct()
+        try:
+            rows = await conn.fetch("""
+                SELECT s.id AS scene_key, css.*
+                FROM scenes src
+                JOIN scenes s ON s.project_id = src.project_id
+                 AND (s.id = src.id OR s.scene_number > src.scene_number)
+                LEFT JOIN character_scene_state css ON css.scene_id = s.id
+                WHERE src.id = $1 AND src.scene_number IS NOT NULL
+                ORDER BY s.scene_number, css.character_slug
+            """, uuid.UUID(str(from_scene_id)))
+
+            source_key = str(from_scene_id)
+            source_states: list[dict] = []
+            downstream: dict[str, dict[str, dict]] = {}
+            for r in rows:
+                key = str(r["scene_key"])
+                state = None
+                if r["character_slug"] is not None:
+                    state = self._row_to_dict(r)
+                    state.pop("scene_key", None)
+                if key == source_key:
+                    if state:
+                        source_states.append(state)
+                    continue
+                scene_states = downstream.setdefault(key, {})
+                if state:
+                    scene_states[state["character_slug"]] = state
+
+            writes = plan_propagation(source_states, list(downstream.items()))
+            if not writes:
+                return report
+
+            async with conn.transaction():
+                await conn.executemany(
+                    _PROPAGATE_UPSERT_SQL,
+                    [_state_params(sid, slug, st, "propagated")
+                     for sid, slug, st in writes],
+                )
 
-            # Get downstream scenes (higher scene_number)
-            downstream = await conn.fetch(
-                "SELECT id, scene_number FROM scenes "
-                "WHERE project_id = $1 AND scene_number > $2 "
-                "ORDER BY scene_number",
-                pid, source_num,
+            written = await conn.fetch("""
+                SELECT css.* FROM character_scene_state css
+                JOIN unnest($1::uuid[], $2::text[]) AS w(scene_id, character_slug)
+                  USING (scene_id, character_slug)
+                WHERE css.state_source = 'propagated'
+            """,
+                [uuid.UUID(sid) for sid, _, _ in writes],
+                [slug for _, slug, _ in writes],
             )
-            if not downstream:
-                return []
-
-            propagated = []
-            # Propagate each character separately
-            for src_state in source_states:
-                slug = src_state["character_slug"]
-                current_state = self._row_to_dict(src_state)
-
-                for ds_scene in downstream:
-                    ds_id = ds_scene["id"]
-
-                    # Check if target has a manual override
-                    existing = await conn.fetchrow(
-                        "SELECT state_source FROM character_scene_state "
-                        "WHERE scene_id = $1 AND character_slug = $2",
-                        ds_id, slug,
-                    )
-                    if existing and existing["state_source"] == "manual":
-                        # Don't overwrite manual overrides, but use it as base
-                        # for further downstream propagation
-                        manual_row = await conn.fetchrow(
-                            "SELECT * FROM character_scene_state "
-                            "WHERE scene_id = $1 AND character_slug = $2",
-                            ds_id, slug,
-                        )
-                        if manual_row:
-                            current_state = self._row_to_dict(manual_row)
-                        continue
-
-                    # Apply decay
-                    decayed = apply_all_decay(current_state)
-
-                    # Save propagated state
-                    saved = await self.set_state(
-                        str(ds_id), slug, decayed, source="propagated"
-                    )
-                    propagated.append(saved)
-
-                    # Use the decayed state as base for next scene
-                    current_state = decayed
-
-            return propagated
+            report["states"] = [self._row_to_dict(r) for r in written]
+            report["rows_written"] = len(report["states"])
+            return report
         finally:
             await conn.close()
+            report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            if report["rows_written"]:
+                logger.info(
+                    f"NSM: propagated {report['rows_written']} states from scene "
+                    f"{from_scene_id} in {report['elapsed_ms']}ms"
+                )
 
     async def get_timeline(
         self, project_id: int, character_slug: str,
@@ -24,9 +24,11 @@ async def tag_image_visual_properties(
     character_slug: str,
     design_prompt: str | None = None,
     project_name: str | None = None,
+    booru_tags: list[str] | None = None,
 ) -> dict | None:
     """Analyze a single image and extract visual properties via Ollama vision.
 
+    booru_tags (WD14 output) are passed to the model as hints.
     Returns the tag dict on success, None on failure.
     """
     image_path = Path(image_path)
@@ -38,7 +40,7 @@ async def tag_image_visual_properties(
     image_data = base64.b64encode(image_path.read_bytes()).decode("utf-8")
     image_name = image_path.name
 
-    prompt = _build_tag_prompt(character_slug, design_prompt)
+    prompt = _build_tag_prompt(character_slug, design_prompt, booru_tags)
 
     tags = await _call_ollama_vision(prompt, image_data)
     if not tags:
@@ -141,12 +143,15 @@ async def batch_tag_character_images(
     finally:
         await conn.close()
 
+    # One batched WD14 pass up front grounds the per-image vision calls
+    booru = await _wd14_hints([images_dir / n for n in to_tag])
+
     tagged = 0
     errors = 0
-    for image_name in to_tag:
+    for image_name, hints in zip(to_tag, booru):
         image_path = images_dir / image_name
         result = await tag_image_visual_properties(
-            image_path, character_slug, design_prompt, project_name
+            image_path, character_slug, design_prompt, project_name, hints
         )
         if result:
             tagged += 1
@@ -198,11 +203,28 @@ async def get_image_tags(
         await conn.close()
 
 
-def _build_tag_prompt(character_slug: str, design_prompt: str | None) -> str:
+async def _wd14_hints(paths: list[Path], limit: int = 25) -> list[list[str] | None]:
+    """Top WD14 tags per image, or None per image when the tagger isn't installed."""
+    from packages.visual_pipeline import wd14
+    if not paths or not wd14.model_ready():
+        return [None] * len(paths)
+    try:
+        results = await wd14.tag_images(paths)
+    except Exception as e:
+        logger.warning(f"WD14 pre-tagging failed: {e}")
+        return [None] * len(paths)
+    return [[t["tag"] for t in r.get("tags", [])[:limit]] or None for r in results]
+
+
+def _build_tag_prompt(
+    character_slug: str, design_prompt: str | None, booru_tags: list[str] | None = None,
+) -> str:
     """Build the Ollama vision prompt for image tagging."""
     context = f"Character: {character_slug}"
     if design_prompt:
         context += f"\nDesign: {design_prompt}"
+    if booru_tags:
+        context += f"\nDetected tags (WD14): {', '.join(booru_tags)}"
 
     return f"""Analyze this anime/illustration image and extract visual properties.
 {context}
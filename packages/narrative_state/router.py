@@ -121,7 +121,8 @@ async def propagate_states(scene_id: str):
     finally:
         await conn.close()
 
-    propagated = await narrative_engine.propagate_forward(str(sid), project_id)
+    report = await narrative_engine.propagate(str(sid))
+    propagated = report["states"]
     if propagated:
         await event_bus.emit(STATE_PROPAGATED, {
             "source_scene_id": scene_id,
@@ -131,6 +132,8 @@ async def propagate_states(scene_id: str):
     return {
         "source_scene_id": scene_id,
         "propagated": len(propagated),
+        "rows_written": report["rows_written"],
+        "elapsed_ms": report["elapsed_ms"],
         "states": propagated,
     }
 
@@ -0,0 +1,596 @@
+"""Streaming audio mixer — cached clips, block rendering, vectorised beat layers, direct mux.
+
+The shot sequencer used to build one float32 buffer for the whole duration,
+re-read every foley / vocal WAV from disk with scipy for every placement,
+"resampled" by slicing the first second off, and added beats one at a time in
+a Python loop. Its WAV was then handed to another ffmpeg pass to be loudness
+normalised and muxed onto the video.
+
+This module splits that into three parts:
+
+  Clip cache   load_clip() decodes a WAV (or anything ffmpeg reads), downmixes to
+               mono, resamples with a polyphase filter and stores the result as
+               .npy under CACHE_DIR. Later loads memory-map that file, so every
+               CPU-pool worker shares the same decoded pages through the OS page
+               cache; an in-process LRU (CACHE_MB budget) keeps the mappings open.
+  Mix          a timeline of patterns (one clip placed at many sample offsets,
+               e.g. every humanised beat), one-shot clips with fades, and ducking
+               rules. Nothing is rendered when layers are added.
+  Rendering    blocks() yields BLOCK_S-second float32 blocks. The hits of a
+               pattern that overlap a block are found with searchsorted; short
+               clips are scattered with one np.add.at, longer ones slice-added
+               per hit. Fades and sidechain ducking are NumPy ramps and a
+               moving-RMS envelope. Memory is bounded by the block size, not
+               the scene length.
+
+write() streams blocks into a float WAV (tracking the peak, then rescaling
+the file in place through a memmap) or straight into ffmpeg, which can copy
+the video stream, loudness-normalise and encode AAC in the same invocation.
+
+CLI: python -m packages.scene_generation.audio_mixer --benchmark [--minutes 20]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000  # Bark's native rate — the sequencer's working rate
+BLOCK_S = float(os.getenv("AUDIO_MIX_BLOCK_S", "5"))
+CACHE_DIR = Path(os.getenv("AUDIO_CLIP_CACHE_DIR", "/opt/anime-studio/output/audio_clip_cache"))
+CACHE_MB = int(os.getenv("AUDIO_CLIP_CACHE_MB", "256"))
+DUCK_WINDOW_S = 0.05
+DUCK_HOP_S = 0.01  # envelope resolution; gain is interpolated between hops
+# Break-even clip length between one np.add.at scatter and a slice add per hit
+SCATTER_MAX_SAMPLES = int(os.getenv("AUDIO_MIX_SCATTER_MAX", "128"))
+
+# Decoded clips by (path, size, mtime_ns, rate) — values are usually read-only memmaps
+_clips: OrderedDict[tuple, np.ndarray] = OrderedDict()
+_clip_bytes = 0
+_stats = {
+    "hits": 0, "disk_hits": 0, "decodes": 0, "evictions": 0,
+    "mixes": 0, "rendered_s": 0.0, "render_time_s": 0.0,
+}
+
+
+# ---------------------------------------------------------------------------
+# Clip cache
+# ---------------------------------------------------------------------------
+
+def _to_float(data: np.ndarray) -> np.ndarray:
+    """PCM of any scipy-supported dtype → float32 in [-1, 1], mono."""
+    if data.dtype == np.int16:
+        data = data.astype(np.float32) / 32768.0
+    elif data.dtype == np.int32:
+        data = data.astype(np.float32) / 2147483648.0
+    elif data.dtype == np.uint8:
+        data = (data.astype(np.float32) - 128.0) / 128.0
+    else:
+        data = data.astype(np.float32)
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    return data
+
+
+def resample(data: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    """Polyphase resample (scipy), falling back to linear interpolation."""
+    if from_rate == to_rate or len(data) == 0:
+        return data
+    divisor = math.gcd(from_rate, to_rate)
+    try:
+        from scipy.signal import resample_poly
+        return resample_poly(data, to_rate // divisor, from_rate // divisor).astype(np.float32)
+    except ImportError:
+        count = int(round(len(data) * to_rate / from_rate))
+        return np.interp(np.linspace(0, len(data) - 1, count), np.arange(len(data)), data).astype(np.float32)
+
+
+def decode_clip(path: Path, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode an audio file to mono float32 at sample_rate."""
+    if path.suffix.lower() == ".wav":
+        import scipy.io.wavfile
+        rate, data = scipy.io.wavfile.read(str(path))
+        return np.ascontiguousarray(resample(_to_float(data), rate, sample_rate), dtype=np.float32)
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(path), "-f", "f32le", "-ac", "1",
+         "-ar", str(sample_rate), "pipe:1"],
+        capture_output=True, timeout=60,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed for {path.name}: {result.stderr.decode()[-200:]}")
+    return np.frombuffer(result.stdout, dtype=np.float32).copy()
+
+
+def load_clip(path, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decoded, resampled clip — from the LRU, the shared .npy cache, or a fresh decode."""
+    global _clip_bytes
+    path = Path(path)
+    st = path.stat()
+    key = (str(path), st.st_size, st.st_mtime_ns, sample_rate)
+    clip = _clips.get(key)
+    if clip is not None:
+        _clips.move_to_end(key)
+        _stats["hits"] += 1
+        return clip
+
+    cached = CACHE_DIR / f"{hashlib.sha1(repr(key).encode()).hexdigest()[:24]}.npy"
+    try:
+        clip = np.load(cached, mmap_mode="r")
+        _stats["disk_hits"] += 1
+    except (OSError, ValueError):
+        clip = decode_clip(path, sample_rate)
+        _stats["decodes"] += 1
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = cached.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, clip)
+            os.replace(tmp, cached)
+            clip = np.load(cached, mmap_mode="r")
+        except OSError as e:
+            logger.debug(f"Audio clip cache not writable ({e}) — keeping {path.name} in memory")
+
+    _clips[key] = clip
+    _clip_bytes += clip.nbytes
+    while _clip_bytes > CACHE_MB * 1024 * 1024 and len(_clips) > 1:
+        _, old = _clips.popitem(last=False)
+        _clip_bytes -= old.nbytes
+        _stats["evictions"] += 1
+    return clip
+
+
+def clear_cache() -> None:
+    """Drop in-process clip mappings (the .npy files stay for other workers)."""
+    global _clip_bytes
+    _clips.clear()
+    _clip_bytes = 0
+
+
+def stats() -> dict:
+    loads = _stats["hits"] + _stats["disk_hits"] + _stats["decodes"]
+    return {
+        **{k: round(v, 3) if isinstance(v, float) else v for k, v in _stats.items()},
+        "clips": len(_clips),
+        "cache_mb": round(_clip_bytes / (1024 * 1024), 2),
+        "cache_limit_mb": CACHE_MB,
+        "hit_rate": round((_stats["hits"] + _stats["disk_hits"]) / loads, 3) if loads else None,
+        "realtime_factor": round(_stats["rendered_s"] / _stats["render_time_s"], 1) if _stats["render_time_s"] else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Mix timeline + block renderer
+# ---------------------------------------------------------------------------
+
+def beat_grid(first: int, interval: int, total: int, jitter: float = 0.0, rng=None) -> np.ndarray:
+    """Humanised beat positions in samples: each step is interval ± jitter·interval."""
+    if interval <= 0 or first >= total:
+        return np.zeros(0, dtype=np.int64)
+    rng = rng or np.random.default_rng()
+    count = int((total - first) / max(interval * (1 - jitter), 1)) + 2
+    steps = interval + (rng.uniform(-jitter, jitter, count) * interval).astype(np.int64)
+    starts = first + np.concatenate([[0], np.cumsum(np.maximum(steps[:-1], 1))])
+    return starts[starts < total]
+
+
+class Mix:
+    """A mono timeline of buses built from clip patterns and one-shots, rendered in blocks.
+
+    Positions are in samples at sample_rate. Buses are summed into the output
+    after ducking; the "voice" bus is the usual sidechain key.
+    """
+
+    def __init__(self, duration_s: float, sample_rate: int = SAMPLE_RATE, block_s: float = BLOCK_S):
+        self.sample_rate = sample_rate
+        self.total = int(duration_s * sample_rate)
+        self.hop = max(int(DUCK_HOP_S * sample_rate), 1)
+        # Whole hops per block so the ducking envelope stays aligned across blocks
+        self.block = max(int(block_s * sample_rate) // self.hop, 1) * self.hop
+        self._patterns: list[tuple[np.ndarray, np.ndarray, np.ndarray, str]] = []
+        self._events: list[tuple[int, np.ndarray, float, int, str]] = []
+        self._ducks: list[tuple[str, str, float, float, int]] = []
+
+    def add_pattern(self, clip: np.ndarray, starts, gains=1.0, bus: str = "fx") -> int:
+        """Place clip at every offset in starts (one gain per hit or a scalar)."""
+        starts = np.asarray(starts, dtype=np.int64)
+        gains = np.broadcast_to(np.asarray(gains, dtype=np.float32), starts.shape)
+        keep = (starts < self.total) & (starts + len(clip) > 0)
+        if len(clip) == 0 or not keep.any():
+            return 0
+        order = np.argsort(starts[keep], kind="stable")
+        self._patterns.append((np.asarray(clip, dtype=np.float32), starts[keep][order],
+                               gains[keep][order].copy(), bus))
+        return int(keep.sum())
+
+    def add_clip(self, clip: np.ndarray, start: int, gain: float = 1.0, fade: int = 0, bus: str = "fx") -> None:
+        """Place one clip with optional linear fade-in/out of fade samples."""
+        if len(clip) and start < self.total and start + len(clip) > 0:
+            self._events.append((int(start), clip, float(gain), int(fade), bus))
+
+    def duck(self, bus: str, key: str = "voice", depth: float = 0.6, threshold: float = 0.05,
+             window_s: float = DUCK_WINDOW_S) -> None:
+        """Lower bus by up to depth while key's moving RMS approaches threshold."""
+        self._ducks.append((bus, key, depth, threshold, max(int(window_s * self.sample_rate) // self.hop, 1)))
+
+    @property
+    def duration_s(self) -> float:
+        return self.total / self.sample_rate
+
+    def blocks(self):
+        """Yield the mix as float32 blocks of at most block samples."""
+        events = sorted(self._events, key=lambda e: e[0])
+        next_event = 0
+        live: list = []
+        tails = {id(duck): np.zeros(duck[4]) for duck in self._ducks}
+        started = time.perf_counter()
+
+        for b0 in range(0, self.total, self.block):
+            n = min(self.block, self.total - b0)
+            buses: dict[str, np.ndarray] = {}
+
+            for clip, starts, gains, bus in self._patterns:
+                _scatter(buses.setdefault(bus, np.zeros(n, dtype=np.float32)), clip, starts, gains, b0)
+
+            while next_event < len(events) and events[next_event][0] < b0 + n:
+                live.append(events[next_event])
+                next_event += 1
+            live = [e for e in live if e[0] + len(e[1]) > b0]
+            for start, clip, gain, fade, bus in live:
+                _place(buses.setdefault(bus, np.zeros(n, dtype=np.float32)), clip, start, gain, fade, b0)
+
+            for duck in self._ducks:
+                bus, key, depth, threshold, window = duck
+                tail = tails[id(duck)]
+                if key not in buses and not tail.any():
+                    continue  # key silent in and just before this block — nothing to duck
+                keyed = buses.get(key, np.zeros(n, dtype=np.float32))
+                gain, tails[id(duck)] = _duck_gain(keyed, tail, window, self.hop, depth, threshold)
+                if bus in buses:
+                    buses[bus] *= gain
+
+            out = np.zeros(n, dtype=np.float32)
+            for signal in buses.values():
+                out += signal
+            yield out
+
+        _stats["rendered_s"] += self.duration_s
+        _stats["render_time_s"] += time.perf_counter() - started
+
+    def peak(self) -> float:
+        return max((float(np.abs(block).max()) for block in self.blocks()), default=0.0)
+
+    def write(self, output_path: str, *, normalize_to: float | None = 0.7, video_path: str | None = None,
+              wav_copy: str | None = None, audio_filter: str | None = None) -> str:
+        """Render to output_path, peak-normalised to normalize_to.
+
+        A .wav target without a video is written directly as 32-bit float.
+        Anything else streams raw samples into one ffmpeg process, which muxes
+        them with video_path's video stream (copied), applies audio_filter and
+        optionally writes wav_copy as a second output of the same invocation.
+        """
+        _stats["mixes"] += 1
+        if output_path.lower().endswith(".wav") and not video_path and not audio_filter:
+            peak = 0.0
+            with FloatWavWriter(output_path, self.sample_rate) as wav:
+                for block in self.blocks():
+                    peak = max(peak, float(np.abs(block).max()))
+                    wav.write(block)
+            if normalize_to and peak > 0:
+                _rescale_wav(output_path, wav.frames, normalize_to / peak, self.block)
+            return output_path
+        # ffmpeg can't be rewound, so the peak costs one extra render
+        peak = self.peak() if normalize_to else 0.0
+        scale = normalize_to / peak if peak > 0 else 1.0
+        return self._write_ffmpeg(output_path, scale, video_path, wav_copy, audio_filter)
+
+    def _write_ffmpeg(self, output_path, scale, video_path, wav_copy, audio_filter) -> str:
+        cmd = ["ffmpeg", "-y", "-v", "error",
+               "-f", "f32le", "-ar", str(self.sample_rate), "-ac", "1", "-i", "pipe:0"]
+        if video_path:
+            cmd += ["-i", str(video_path), "-map", "1:v", "-map", "0:a", "-c:v", "copy", "-shortest"]
+        if audio_filter:
+            cmd += ["-af", audio_filter]
+        if video_path or output_path.lower().endswith((".mp4", ".m4a", ".mov")):
+            cmd += ["-c:a", "aac", "-b:a", "192k"]
+        cmd.append(str(output_path))
+        if wav_copy:
+            cmd += ["-map", "0:a", "-c:a", "pcm_f32le", str(wav_copy)]
+
+        with tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=err)
+            try:
+                for block in self.blocks():
+                    proc.stdin.write((block * scale).astype(np.float32).tobytes())
+            except BrokenPipeError:
+                pass
+            finally:
+                proc.stdin.close()
+            returncode = proc.wait(timeout=300)
+            if returncode != 0:
+                err.seek(0)
+                raise RuntimeError(f"ffmpeg mux failed: {err.read().decode(errors='replace')[-300:]}")
+        return output_path
+
+
+def _scatter(out: np.ndarray, clip: np.ndarray, starts: np.ndarray, gains: np.ndarray, b0: int) -> None:
+    """Add every hit of a pattern overlapping [b0, b0 + len(out)).
+
+    Short clips (clicks, ticks, dense rolls) go through one np.add.at scatter,
+    where per-hit Python overhead would dominate. np.add.at costs far more per
+    sample than a slice add, so clips longer than SCATTER_MAX_SAMPLES add one
+    contiguous slice per hit — only for the hits the searchsorted window found.
+    """
+    n, length = len(out), len(clip)
+    lo = np.searchsorted(starts, b0 - length, side="right")
+    hi = np.searchsorted(starts, b0 + n, side="left")
+    if lo >= hi:
+        return
+    hits = starts[lo:hi] - b0
+    if length > SCATTER_MAX_SAMPLES:
+        for hit, gain in zip(hits.tolist(), gains[lo:hi].tolist()):
+            s0, s1 = max(0, -hit), min(length, n - hit)
+            out[hit + s0:hit + s1] += clip[s0:s1] * gain
+        return
+    weights = gains[lo:hi, None] * clip[None, :]
+    index = hits[:, None] + np.arange(length)[None, :]
+    if hits[0] < 0 or hits[-1] + length > n:
+        # Hits straddling the block edge: keep only their in-block samples
+        inside = (index >= 0) & (index < n)
+        np.add.at(out, index[inside], weights[inside])
+    else:
+        np.add.at(out, index.ravel(), weights.ravel())
+
+
+def _place(out: np.ndarray, clip: np.ndarray, start: int, gain: float, fade: int, b0: int) -> None:
+    """Add the part of one faded clip that falls inside the block."""
+    s0 = max(0, b0 - start)
+    s1 = min(len(clip), b0 + len(out) - start)
+    if s1 <= s0:
+        return
+    segment = np.asarray(clip[s0:s1], dtype=np.float32) * gain
+    if fade > 0:
+        # Only the first and last fade samples of the clip are ramped
+        head = min(fade, s1) - s0
+        if head > 0:
+            segment[:head] *= np.arange(s0 + 1, s0 + head + 1, dtype=np.float32) / fade
+        tail_from = max(len(clip) - fade, s0)
+        if tail_from < s1:
+            segment[tail_from - s0:] *= np.minimum(
+                1.0, (len(clip) - np.arange(tail_from, s1, dtype=np.float32)) / fade)
+    out[start + s0 - b0:start + s1 - b0] += segment
+
+
+def _duck_gain(key: np.ndarray, tail: np.ndarray, window: int, hop: int, depth: float,
+               threshold: float) -> tuple[np.ndarray, np.ndarray]:
+    """Per-sample gain from the key's moving RMS over window hops.
+
+    Energy is summed per hop and averaged over the last window hops; tail
+    carries the previous block's last window hop energies so the envelope is
+    continuous across blocks. Within each hop the gain ramps linearly from the
+    previous hop's value. Returns (gain, new tail).
+    """
+    n = len(key)
+    frames = -(-n // hop)
+    squared = np.zeros(frames * hop, dtype=np.float32)
+    np.square(key, out=squared[:n])
+    extended = np.concatenate([tail, squared.reshape(frames, hop).sum(axis=1, dtype=np.float64)])
+    energy = np.concatenate([[0.0], np.cumsum(extended)])
+    rms = np.sqrt(np.maximum(energy[window:] - energy[:-window], 0.0) / (window * hop))
+    frame_gain = (1.0 - depth * np.minimum(rms / threshold, 1.0)).astype(np.float32)
+    ramp = np.arange(1, hop + 1, dtype=np.float32) / hop
+    gain = frame_gain[:-1, None] + np.diff(frame_gain)[:, None] * ramp[None, :]
+    return gain.ravel()[:n], extended[-window:]
+
+
+def _rescale_wav(path: str, frames: int, scale: float, chunk: int) -> None:
+    """Multiply a FloatWavWriter file's samples by scale in place, chunk by chunk."""
+    data = np.memmap(path, dtype="<f4", mode="r+", offset=FloatWavWriter.DATA_OFFSET, shape=(frames,))
+    for i in range(0, frames, chunk):
+        data[i:i + chunk] *= scale
+    data.flush()
+    del data
+
+
+class FloatWavWriter:
+    """Incremental mono 32-bit float WAV writer; sizes are patched on close."""
+
+    DATA_OFFSET = 12 + 26 + 12 + 8  # RIFF header, fmt, fact, data chunk header
+
+    def __init__(self, path: str, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self) -> None:
+        data_bytes = self.frames * 4
+        self._file.write(b"RIFF" + struct.pack("<I", 4 + 26 + 12 + 8 + data_bytes) + b"WAVE")
+        # fmt: IEEE float (3), mono, 32-bit, with an empty extension block
+        self._file.write(b"fmt " + struct.pack("<IHHIIHHH", 18, 3, 1, self.sample_rate,
+                                                self.sample_rate * 4, 4, 32, 0))
+        self._file.write(b"fact" + struct.pack("<II", 4, self.frames))
+        self._file.write(b"data" + struct.pack("<I", data_bytes))
+
+    def write(self, samples: np.ndarray) -> None:
+        self._file.write(np.asarray(samples, dtype="<f4").tobytes())
+        self.frames += len(samples)
+
+    def close(self) -> None:
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _synthetic_library(root: Path, source_rate: int = 44100) -> dict[str, list[Path]]:
+    """Short noise-burst / tone clips at a non-working rate so resampling is exercised."""
+    import scipy.io.wavfile
+    rng = np.random.default_rng(0)
+    library: dict[str, list[Path]] = {}
+    for category, seconds, count in (("foley", 0.4, 4), ("breath", 2.0, 4), ("vocal", 3.0, 12), ("voice", 4.0, 12)):
+        library[category] = []
+        for i in range(count):
+            t = np.arange(int(seconds * source_rate)) / source_rate
+            tone = np.sin(2 * np.pi * rng.uniform(120, 600) * t) * np.exp(-t * rng.uniform(1, 6))
+            data = ((tone + rng.normal(0, 0.05, len(t))) * 0.5 * 32767).astype(np.int16)
+            path = root / f"{category}_{i}.wav"
+            scipy.io.wavfile.write(str(path), source_rate, data)
+            library[category].append(path)
+    return library
+
+
+def _episode_plan(duration_s: float, rng) -> list[tuple]:
+    """(category, start_s, gain, max_len_s) placements for a synthetic episode."""
+    plan = []
+    beat = 60.0 / 120
+    t = 0.0
+    while t < duration_s:
+        plan.append(("foley", t, rng.uniform(0.15, 0.25), 1.0))
+        t += beat * (1 + rng.uniform(-0.05, 0.05))
+    t = rng.uniform(0, 1.25)
+    while t < duration_s:
+        plan.append(("breath", t, rng.uniform(0.10, 0.18), None))
+        t += 1.25 * (1 + rng.uniform(-0.1, 0.1))
+    for t in np.arange(1.0, duration_s, 3.0):
+        if rng.random() < 0.35:
+            plan.append(("vocal", float(t), 0.4, rng.uniform(1.5, 3.0)))
+    for t in np.arange(5.0, duration_s, 12.0):
+        plan.append(("voice", float(t), 0.8, None))
+    return plan
+
+
+def _legacy_mix(plan, library, duration_s: float, rng) -> np.ndarray:
+    """The old approach: full-length buffer, a scipy read and a Python slice per placement."""
+    import scipy.io.wavfile
+    output = np.zeros(int(duration_s * SAMPLE_RATE), dtype=np.float32)
+    for category, start_s, gain, max_len_s in plan:
+        _, data = scipy.io.wavfile.read(str(library[category][int(rng.integers(len(library[category])))]))
+        data = data.astype(np.float32) / 32768.0
+        if max_len_s:
+            data = data[:int(max_len_s * SAMPLE_RATE)]
+        pos = int(start_s * SAMPLE_RATE)
+        end = min(pos + len(data), len(output))
+        output[pos:end] += data[:end - pos] * gain
+    peak = np.max(np.abs(output))
+    return output / peak * 0.7 if peak > 0 else output
+
+
+def _engine_mix(plan, library, duration_s: float, rng) -> Mix:
+    mix = Mix(duration_s)
+    patterns: dict[str, list] = {}
+    for category, start_s, gain, max_len_s in plan:
+        path = library[category][int(rng.integers(len(library[category])))]
+        clip = load_clip(path)
+        start = int(start_s * SAMPLE_RATE)
+        if category in ("foley", "breath"):
+            patterns.setdefault(str(path), [clip[:SAMPLE_RATE] if max_len_s else clip, [], []])
+            patterns[str(path)][1].append(start)
+            patterns[str(path)][2].append(gain)
+        else:
+            length = int(max_len_s * SAMPLE_RATE) if max_len_s else len(clip)
+            mix.add_clip(clip[:length], start, gain, fade=int(0.05 * SAMPLE_RATE),
+                         bus="voice" if category == "voice" else "fx")
+    for clip, starts, gains in patterns.values():
+        mix.add_pattern(clip, starts, gains)
+    mix.duck("fx", key="voice")
+    return mix
+
+
+def _measure(fn) -> tuple[float, int]:
+    """Wall time of one run, then peak traced allocation of a second (tracemalloc skews timing)."""
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        fn()
+        return elapsed, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(minutes: float = 20.0, root: Path | None = None) -> dict:
+    """Mix a synthetic episode the legacy way and through the engine; time and peak memory."""
+    global CACHE_DIR
+    import scipy.io.wavfile
+    import scipy.signal  # noqa: F401 — keep the one-off import out of the cold timing
+
+    duration_s = minutes * 60
+    with tempfile.TemporaryDirectory(dir=root) as tmp:
+        tmp = Path(tmp)
+        library = _synthetic_library(tmp)
+        plan = _episode_plan(duration_s, np.random.default_rng(1))
+
+        def legacy():
+            output = _legacy_mix(plan, library, duration_s, np.random.default_rng(2))
+            scipy.io.wavfile.write(str(tmp / "legacy.wav"), SAMPLE_RATE, output)
+
+        def engine():
+            _engine_mix(plan, library, duration_s, np.random.default_rng(2)).write(str(tmp / "engine.wav"))
+
+        def engine_cold():
+            shutil.rmtree(CACHE_DIR, ignore_errors=True)
+            clear_cache()
+            engine()
+
+        def engine_new_worker():
+            clear_cache()  # shared .npy cache is warm, this process's LRU is not
+            engine()
+
+        saved_dir, CACHE_DIR = CACHE_DIR, tmp / "clip_cache"
+        try:
+            legacy_s, legacy_peak = _measure(legacy)
+            cold_s, _ = _measure(engine_cold)
+            worker_s, _ = _measure(engine_new_worker)
+            warm_s, engine_peak = _measure(engine)
+        finally:
+            clear_cache()
+            CACHE_DIR = saved_dir
+
+    return {
+        "episode_minutes": minutes,
+        "placements": len(plan),
+        "legacy_s": round(legacy_s, 2),
+        "legacy_peak_mb": round(legacy_peak / 1e6, 1),
+        "engine_cold_s": round(cold_s, 2),
+        "engine_new_worker_s": round(worker_s, 2),
+        "engine_warm_s": round(warm_s, 2),
+        "engine_peak_mb": round(engine_peak / 1e6, 1),
+        "speedup_warm": round(legacy_s / warm_s, 2) if warm_s else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming audio mixer")
+    parser.add_argument("--benchmark", action="store_true", help="Mix a synthetic episode both ways")
+    parser.add_argument("--minutes", type=float, default=20.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(benchmark(args.minutes) if args.benchmark else stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,9 @@ Instead of slapping a single clip over a video, this sequencer:
    - Vocalization layer (sparse moans/gasps at musical intervals)
 3. Mixes and normalizes to broadcast loudness
 
+Layers are laid out on an audio_mixer.Mix (cached clips, vectorised beat
+placement, block rendering) rather than summed into one full-length buffer.
+
 Uses Bark full-quality clips from /opt/anime-studio/output/sfx_test/bark_full/
 and real extracted foley from /opt/anime-studio/output/sfx_library/
 """
@@ -141,30 +144,18 @@ def _generate_silence(duration: float, sample_rate: int = 24000) -> np.ndarray:
     return np.zeros(int(duration * sample_rate), dtype=np.float32)
 
 
-def sequence_audio(
+def plan_sequence(
     video_duration: float,
     lora_name: Optional[str] = None,
     gender: str = "female",
     pairing: Optional[str] = None,
-    output_path: Optional[str] = None,
-) -> Optional[str]:
-    """Build a BPM-synced multi-layer audio track for a video.
-
-    Args:
-        video_duration: Length of video in seconds
-        lora_name: LoRA action name (determines rhythm)
-        gender: Primary character gender
-        pairing: mm/ff/anthro/None
-        output_path: Where to save. Auto-generated if None.
+):
+    """Lay out the foley / breathing / vocal layers as a Mix timeline (nothing rendered yet).
 
-    Returns:
-        Path to sequenced WAV file, or None on failure.
+    Returns None for clips under a second. Clips come from the audio_mixer
+    cache, decoded and resampled to the working rate once per process.
     """
-    try:
-        import scipy.io.wavfile
-    except ImportError:
-        logger.error("scipy not available for audio sequencing")
-        return None
+    from packages.scene_generation.audio_mixer import Mix, beat_grid, load_clip
 
     profile = _get_profile(lora_name)
     bpm = profile["bpm"]
@@ -175,40 +166,22 @@ def sequence_audio(
 
     SR = 24000  # Match Bark sample rate
     total_samples = int(video_duration * SR)
-
     if total_samples < SR:
         return None
 
-    # Initialize output buffer
-    output = np.zeros(total_samples, dtype=np.float32)
+    mix = Mix(video_duration, SR)
+    rng = np.random.default_rng(random.getrandbits(32))
 
     # --- Layer 1: Body foley at BPM rhythm ---
     if body_layer and bpm > 0:
         foley_path = _pick_foley(body_layer)
         if foley_path:
             try:
-                _, foley_data = scipy.io.wavfile.read(foley_path)
-                if foley_data.dtype != np.float32:
-                    foley_data = foley_data.astype(np.float32) / 32768.0
-                # Resample if needed
-                if len(foley_data) > SR:
-                    foley_data = foley_data[:SR]  # Trim to 1s max
-
-                beat_interval = 60.0 / bpm  # seconds between beats
-                beat_samples = int(beat_interval * SR)
-
-                # Place foley at each beat
-                pos = 0
-                while pos < total_samples:
-                    end = min(pos + len(foley_data), total_samples)
-                    clip_len = end - pos
-                    # Vary volume slightly per hit for realism
-                    vol = random.uniform(0.15, 0.25)
-                    output[pos:end] += foley_data[:clip_len] * vol
-                    pos += beat_samples
-                    # Slight timing humanization (±5%)
-                    pos += int(random.uniform(-0.05, 0.05) * beat_samples)
-
+                foley_data = load_clip(foley_path, SR)[:SR]  # Trim to 1s max
+                beat_samples = int(60.0 / bpm * SR)
+                # Every beat with ±5% timing humanization and per-hit volume
+                beats = beat_grid(0, beat_samples, total_samples, 0.05, rng)
+                mix.add_pattern(foley_data, beats, rng.uniform(0.15, 0.25, len(beats)))
                 logger.debug(f"Body foley: {body_layer} at {bpm}BPM")
             except Exception as e:
                 logger.warning(f"Body foley failed: {e}")
@@ -219,23 +192,11 @@ def sequence_audio(
         breath_path = _pick_clip(breath_cat, gender)
         if breath_path:
             try:
-                _, breath_data = scipy.io.wavfile.read(breath_path)
-                if breath_data.dtype != np.float32:
-                    breath_data = breath_data.astype(np.float32) / 32768.0
-
+                breath_data = load_clip(breath_path, SR)
                 breath_interval = 1.0 / breathing_rate  # seconds between breaths
-                breath_samples = int(breath_interval * SR)
-
-                pos = int(random.uniform(0, breath_interval) * SR)  # Random start offset
-                while pos < total_samples:
-                    end = min(pos + len(breath_data), total_samples)
-                    clip_len = end - pos
-                    vol = random.uniform(0.10, 0.18)
-                    output[pos:end] += breath_data[:clip_len] * vol
-                    pos += breath_samples
-                    # More humanization
-                    pos += int(random.uniform(-0.1, 0.1) * breath_samples)
-
+                first = int(rng.uniform(0, breath_interval) * SR)  # Random start offset
+                breaths = beat_grid(first, int(breath_interval * SR), total_samples, 0.1, rng)
+                mix.add_pattern(breath_data, breaths, rng.uniform(0.10, 0.18, len(breaths)))
                 logger.debug(f"Breathing: {breath_cat} at {breathing_rate}/s")
             except Exception as e:
                 logger.warning(f"Breathing layer failed: {e}")
@@ -254,69 +215,85 @@ def sequence_audio(
             vocal_vol = 0.4
 
         # Decide male or female vocalizations
-        vocal_gender = gender
-        if pairing == "mm":
-            vocal_gender = "male"
+        vocal_gender = "male" if pairing == "mm" else gender
 
         # Place vocalizations at musical intervals (every 2-4 beats)
         if bpm > 0:
-            beat_interval = 60.0 / bpm
-            vocal_interval = beat_interval * random.choice([2, 3, 4])  # Every 2-4 beats
+            vocal_interval = 60.0 / bpm * random.choice([2, 3, 4])
         else:
             vocal_interval = random.uniform(2.0, 4.0)  # Ambient: every 2-4 seconds
 
-        pos = int(random.uniform(0.5, vocal_interval) * SR)  # Start after half interval
-        while pos < total_samples:
-            # Only vocalize with probability = vocal_density
-            if random.random() < vocal_density:
-                cat = random.choice(vocal_cats)
-                clip_path = _pick_clip(cat, vocal_gender)
-                if clip_path:
-                    try:
-                        _, vocal_data = scipy.io.wavfile.read(clip_path)
-                        if vocal_data.dtype != np.float32:
-                            vocal_data = vocal_data.astype(np.float32) / 32768.0
-
-                        # Use first 2-3 seconds of the clip
-                        max_len = int(random.uniform(1.5, 3.0) * SR)
-                        vocal_data = vocal_data[:max_len]
-
-                        # Fade in/out for smooth placement
-                        fade = min(int(0.05 * SR), len(vocal_data) // 4)
-                        if fade > 0:
-                            vocal_data[:fade] *= np.linspace(0, 1, fade)
-                            vocal_data[-fade:] *= np.linspace(1, 0, fade)
-
-                        end = min(pos + len(vocal_data), total_samples)
-                        clip_len = end - pos
-                        output[pos:end] += vocal_data[:clip_len] * vocal_vol
-                    except Exception:
-                        pass
-
-            pos += int(vocal_interval * SR)
-            # Humanize timing ±15%
-            pos += int(random.uniform(-0.15, 0.15) * vocal_interval * SR)
-
-    # --- Normalize final mix ---
-    peak = np.max(np.abs(output))
-    if peak > 0:
-        output = output / peak * 0.7  # -3dB headroom
-
-    # --- Save ---
+        first = int(random.uniform(0.5, vocal_interval) * SR)  # Start after half interval
+        slots = beat_grid(first, int(vocal_interval * SR), total_samples, 0.15, rng)
+        # Only vocalize with probability = vocal_density
+        for pos in slots[rng.random(len(slots)) < vocal_density].tolist():
+            clip_path = _pick_clip(random.choice(vocal_cats), vocal_gender)
+            if not clip_path:
+                continue
+            try:
+                # Use first 2-3 seconds of the clip, faded in/out for smooth placement
+                vocal_data = load_clip(clip_path, SR)[:int(random.uniform(1.5, 3.0) * SR)]
+                fade = min(int(0.05 * SR), len(vocal_data) // 4)
+                mix.add_clip(vocal_data, pos, vocal_vol, fade=fade)
+            except Exception:
+                pass
+
+    return mix
+
+
+def sequence_audio(
+    video_duration: float,
+    lora_name: Optional[str] = None,
+    gender: str = "female",
+    pairing: Optional[str] = None,
+    output_path: Optional[str] = None,
+) -> Optional[str]:
+    """Build a BPM-synced multi-layer audio track for a video.
+
+    Args:
+        video_duration: Length of video in seconds
+        lora_name: LoRA action name (determines rhythm)
+        gender: Primary character gender
+        pairing: mm/ff/anthro/None
+        output_path: Where to save. Auto-generated if None.
+
+    Returns:
+        Path to sequenced WAV file, or None on failure.
+    """
+    try:
+        mix = plan_sequence(video_duration, lora_name, gender, pairing)
+    except ImportError:
+        logger.error("scipy not available for audio sequencing")
+        return None
+    if mix is None:
+        return None
+
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     if output_path is None:
         output_path = str(OUTPUT_DIR / f"seq_{uuid.uuid4().hex[:8]}.wav")
 
-    scipy.io.wavfile.write(output_path, SR, output)
+    # Streamed in blocks and peak-normalized to 0.7 (-3dB headroom)
+    mix.write(output_path, normalize_to=0.7)
+    _log_sequence(mix, lora_name)
+    return output_path
+
 
-    duration = len(output) / SR
+def _log_sequence(mix, lora_name: Optional[str]) -> None:
+    profile = _get_profile(lora_name)
     action = lora_name.split("/")[-1].replace(".safetensors", "") if lora_name else "default"
-    logger.info(f"Sequenced {duration:.1f}s audio: {action} @ {bpm}BPM, "
-                f"body={'yes' if body_layer else 'no'}, "
-                f"vocal_density={vocal_density:.0%}, "
-                f"intensity={intensity}")
+    logger.info(f"Sequenced {mix.duration_s:.1f}s audio: {action} @ {profile['bpm']}BPM, "
+                f"body={'yes' if profile['body_layer'] else 'no'}, "
+                f"vocal_density={profile['vocal_density']:.0%}, "
+                f"intensity={profile['intensity']}")
 
-    return output_path
+
+def _video_duration(video_path: str) -> float:
+    r = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", video_path],
+        capture_output=True, text=True, timeout=10,
+    )
+    return float(r.stdout.strip()) if r.stdout.strip() else 0
 
 
 def sequence_for_video(
@@ -326,14 +303,8 @@ def sequence_for_video(
     pairing: Optional[str] = None,
 ) -> Optional[str]:
     """Convenience: get video duration and sequence audio for it."""
-    dur = 0
     try:
-        r = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "default=noprint_wrappers=1:nokey=1", video_path],
-            capture_output=True, text=True, timeout=10,
-        )
-        dur = float(r.stdout.strip()) if r.stdout.strip() else 0
+        dur = _video_duration(video_path)
     except Exception:
         return None
 
@@ -341,3 +312,45 @@ def sequence_for_video(
         return None
 
     return sequence_audio(dur, lora_name, gender, pairing)
+
+
+def sequence_onto_video(
+    video_path: str,
+    lora_name: Optional[str] = None,
+    gender: str = "female",
+    pairing: Optional[str] = None,
+    output_path: Optional[str] = None,
+) -> Optional[tuple[str, str]]:
+    """Sequence audio for a video and mux it in the same ffmpeg pass.
+
+    The rendered blocks are piped once into ffmpeg, which copies the video
+    stream, applies the final -16 LUFS loudness normalisation that
+    sfx_mapper.mix_voice_and_sfx used to run as a second pass, and writes the
+    sequenced WAV alongside. Returns (muxed mp4, sequenced wav) or None.
+    """
+    from packages.scene_generation.sfx_mapper import _VOICE_OUTPUT_DIR
+
+    try:
+        dur = _video_duration(video_path)
+    except Exception:
+        return None
+    if dur <= 0:
+        return None
+
+    mix = plan_sequence(dur, lora_name, gender, pairing)
+    if mix is None:
+        return None
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    _VOICE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if output_path is None:
+        output_path = str(_VOICE_OUTPUT_DIR / f"av_{Path(video_path).stem}.mp4")
+    wav_path = str(OUTPUT_DIR / f"seq_{uuid.uuid4().hex[:8]}.wav")
+
+    mix.write(
+        output_path, normalize_to=0.7, video_path=video_path, wav_copy=wav_path,
+        audio_filter="loudnorm=I=-16:TP=-1.5:LRA=11,"
+                     "aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo",
+    )
+    _log_sequence(mix, lora_name)
+    return output_path, wav_path
@@ -14,13 +14,14 @@ import asyncio
 import json
 import logging
 import os
-import shutil
 from pathlib import Path
 
 from packages.core.config import BASE_PATH, COMFYUI_URL, COMFYUI_OUTPUT_DIR, COMFYUI_INPUT_DIR, get_comfyui_url
+from packages.core.input_staging import stage_input
 from packages.core.db import connect_direct
 from packages.core.audit import log_decision
 from packages.core.events import event_bus, SHOT_GENERATED
+from packages.core import preemption
 
 
 # LoRA resolution logic lives in lora_resolver.py — re-export for backwards compat
@@ -181,8 +182,8 @@ def clear_cancel():
 
 
 def is_cancelled() -> bool:
-    """Check if cancellation has been signalled."""
-    return _cancel_event.is_set()
+    """Check if cancellation has been signalled (globally or for this render scope)."""
+    return _cancel_event.is_set() or preemption.is_cancelled()
 
 
 
@@ -391,7 +392,9 @@ async def generate_scene(scene_id: str, auto_approve: bool = False, skip_postpro
         return
     try:
         clear_cancel()  # Reset cancel signal for this run
-        await _generate_scene_impl(scene_id, auto_approve=auto_approve, skip_postprocess=skip_postprocess)
+        # Cancelling the scope pulls this scene's renders off ComfyUI
+        with preemption.render_scope(f"scene:{scene_id}"):
+            await _generate_scene_impl(scene_id, auto_approve=auto_approve, skip_postprocess=skip_postprocess)
     finally:
         _scene_generation_lock.release()
 
@@ -512,10 +515,8 @@ async def roll_forward_wan_shot(
         # Extract last frame for next segment's source
         last_frame_path = await extract_last_frame(seg_video)
 
-        # Copy last frame to ComfyUI input dir for next I2V pass
-        dest = str(COMFYUI_INPUT_DIR / Path(last_frame_path).name)
-        shutil.copy2(last_frame_path, dest)
-        current_source = Path(last_frame_path).name
+        # Stage last frame in ComfyUI input dir for next I2V pass
+        current_source = stage_input(last_frame_path)
 
     if not segment_paths:
         return {"video_path": None, "last_frame": None, "segment_count": 0, "total_duration": 0}
@@ -592,6 +593,14 @@ async def _flush_inflight_jobs(
             completions.append(None)
             continue
 
+        if result["status"] == "cancelled":
+            # Render pulled from ComfyUI — leave the shot ready for the next run
+            await conn.execute(
+                "UPDATE shots SET status = 'pending', comfyui_prompt_id = NULL WHERE id = $1", shot_id,
+            )
+            completions.append(None)
+            continue
+
         if result["status"] != "completed" or not result["output_files"]:
             await conn.execute(
                 "UPDATE shots SET status = 'failed', error_message = $2 WHERE id = $1",
@@ -826,6 +835,10 @@ async def _generate_scene_impl(scene_id: str, auto_approve: bool = False, skip_p
         for shot in shots:
             shot_id = shot["id"]
 
+            if is_cancelled():
+                logger.info(f"Scene {scene_id}: cancelled — stopping before shot {shot_id}")
+                break
+
             # Skip already-completed shots (e.g., after a service restart)
             if (shot["status"] in ("completed", "accepted_best")
                     and shot["output_video_path"]
@@ -1399,7 +1412,7 @@ async def _generate_scene_impl(scene_id: str, auto_approve: bool = False, skip_p
                     logger.info(f"Shot {shot_id}: assigned to GPU {_shot_gpu_label} ({_shot_comfyui_url})")
 
                 _project_rating = (scene_row.get("content_rating") if scene_row else None) or "R"
-                _dispatch_result = await _dispatcher.build_and_submit(
+                _dispatch_result = await _dispatcher.dispatch(
                     conn=conn,
                     shot_dict=shot_dict,
                     shot_id=shot_id,
@@ -1491,6 +1504,9 @@ async def _generate_scene_impl(scene_id: str, auto_approve: bool = False, skip_p
                             prev_character = _fr["character_slug"]
                     _inflight_jobs.clear()
 
+            except preemption.RenderCancelled:
+                logger.info(f"Shot {shot_id}: render scope cancelled before submit")
+                break
             except Exception as e:
                 logger.error(f"Shot {shot_id} generation failed: {e}")
                 await conn.execute(
@@ -0,0 +1,196 @@
+"""Compiled LoRA catalog index — built once per catalog version.
+
+The matchers used to re-derive everything from the merged YAML on each call:
+sorting alias tables, looping over every preset and tag with `in text`, and
+stat()ing every LoRA file. CatalogIndex precomputes it all:
+
+  - one Aho-Corasick automaton over keyword aliases, preset label words and
+    motion LoRA tags, so a prompt is scanned exactly once per match call
+  - tier bitmasks per entry (rating gates become a single AND)
+  - normalized-name → entry maps for video_lora_pairs / video_motion_loras
+  - LoRA file presence via the shared asset registry (no per-call stat())
+
+get_catalog_index() rebuilds lazily when catalog_loader's version changes.
+Matching keeps the old substring semantics ("walk" matches "walking").
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from packages.core.asset_registry import registry as assets
+
+from .catalog_loader import catalog_version, load_catalog
+
+logger = logging.getLogger(__name__)
+
+LORA_DIR = assets.root / "loras"
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: find() reports every pattern in text."""
+
+    def __init__(self, patterns):
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[set[str]] = [set()]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._fail = [0] * len(self._goto)
+        self._build()
+
+    def _add(self, pattern: str):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._out.append(set())
+            node = nxt
+        self._out[node].add(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> set[str]:
+        found: set[str] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        return found
+
+
+# LoRA file presence ("wan22_motion/x.safetensors" in lora_files), kept
+# current by the asset registry's directory watcher.
+lora_files = assets.view("loras")
+
+
+def normalize_lora_name(lora_name: str) -> str:
+    """Strip path prefixes, extensions and HIGH/LOW/version suffixes for matching."""
+    name = Path(lora_name).stem.lower()
+    for suffix in ("_high", "_low", "_high_noise", "_low_noise", "_hn", "_ln",
+                   "_i2v", "_v1", "_v2", "_v3", ".safetensors"):
+        name = name.removesuffix(suffix)
+    return name
+
+
+class CatalogIndex:
+    """Precomputed lookups over one version of the merged LoRA catalog."""
+
+    def __init__(self, catalog: dict, aliases: dict[str, str], version: int = 0):
+        self.version = version
+        self.pairs: dict = catalog.get("video_lora_pairs") or {}
+        self.motion_loras: dict = catalog.get("video_motion_loras") or {}
+        self.presets: dict = catalog.get("action_presets") or {}
+        self._tier_bits: dict[str, int] = {}
+
+        # Keyword aliases, longest first (ties keep table order)
+        self.aliases = aliases
+        self.alias_rank = {
+            a: i for i, a in enumerate(sorted(aliases, key=len, reverse=True))
+        }
+
+        self.preset_tier_mask = {
+            key: self.tier_bit(p.get("tier", "universal"))
+            for key, p in self.presets.items()
+        }
+        self.preset_label_words = [
+            (key, self.preset_tier_mask[key],
+             [w for w in p.get("label", "").lower().split() if len(w) > 2])
+            for key, p in self.presets.items()
+        ]
+        self.motion_entries = [
+            (key, e.get("file", ""), e.get("strength", 0.8),
+             self.tier_bit(e.get("tier", "universal")), e.get("tags", []))
+            for key, e in self.motion_loras.items() if e
+        ]
+
+        patterns = set(aliases)
+        for _key, _mask, words in self.preset_label_words:
+            patterns.update(words)
+        for *_rest, tags in self.motion_entries:
+            patterns.update(t for t in tags if isinstance(t, str))
+        self._matcher = AhoCorasick(patterns)
+
+        # Normalized name → entry (first entry in catalog order wins, as before)
+        self.pairs_by_name = self._name_map(self.pairs, ("high", "low"))
+        self.pairs_by_any = self._name_map(self.pairs, ("high", "low", "file"))
+        self.motion_by_name = self._name_map(self.motion_loras, ("file",))
+        self.motion_by_any = self._name_map(self.motion_loras, ("high", "low", "file"))
+
+    @staticmethod
+    def _name_map(section: dict, fields: tuple[str, ...]) -> dict[str, dict]:
+        names: dict[str, dict] = {}
+        for key, entry in section.items():
+            if not entry:
+                continue
+            names.setdefault(key, entry)
+            for field in fields:
+                fname = entry.get(field)
+                if fname:
+                    names.setdefault(normalize_lora_name(fname), entry)
+        return names
+
+    def tier_bit(self, tier: str) -> int:
+        if tier not in self._tier_bits:
+            self._tier_bits[tier] = 1 << len(self._tier_bits)
+        return self._tier_bits[tier]
+
+    def tier_mask(self, tiers) -> int:
+        mask = 0
+        for tier in tiers:
+            mask |= self.tier_bit(tier)
+        return mask
+
+    def scan(self, text: str) -> set[str]:
+        """All aliases, label words and tags occurring in text (one pass)."""
+        return self._matcher.find(text)
+
+    def find_pair(self, lora_name: str, any_field: bool = False) -> dict | None:
+        norm = normalize_lora_name(lora_name)
+        return (self.pairs_by_any if any_field else self.pairs_by_name).get(norm)
+
+    def find_motion(self, lora_name: str, any_field: bool = False) -> dict | None:
+        norm = normalize_lora_name(lora_name)
+        return (self.motion_by_any if any_field else self.motion_by_name).get(norm)
+
+
+_index: CatalogIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_catalog_index() -> CatalogIndex:
+    """Return the compiled index for the current catalog version."""
+    global _index
+    version = catalog_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            from .content_lora_matcher import KEYWORD_ALIASES
+            started = time.perf_counter()
+            _index = CatalogIndex(load_catalog(), KEYWORD_ALIASES, version=catalog_version())
+            logger.info(
+                f"catalog_index: compiled v{_index.version} in "
+                f"{(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+        return _index
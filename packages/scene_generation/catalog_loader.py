@@ -34,6 +34,8 @@ _CATALOG_MONOLITH = _BASE / "config" / "lora_catalog.yaml"
 
 # Module-level cache
 _cache: Optional[dict] = None
+# Bumped on every invalidation so derived structures (catalog_index) can rebuild
+_version = 0
 
 
 def load_catalog() -> dict:
@@ -102,5 +104,11 @@ def _load_modular() -> dict:
 
 def invalidate_catalog():
     """Clear the cached catalog (call when YAML is updated at runtime)."""
-    global _cache
+    global _cache, _version
     _cache = None
+    _version += 1
+
+
+def catalog_version() -> int:
+    """Monotonic counter identifying the current catalog contents."""
+    return _version
@@ -19,12 +19,16 @@ Mask files (pre-generated, stored in ComfyUI/input/):
 import json
 import logging
 import random
-import shutil
 import time
 import urllib.request
 from pathlib import Path
 
 from packages.core.config import BASE_PATH, COMFYUI_URL, COMFYUI_INPUT_DIR, COMFYUI_OUTPUT_DIR
+from packages.core.executors import offload
+from packages.core.input_staging import stage_input
+from packages.core.preemption import finish, post_prompt, was_cancelled
+
+from . import render_cache
 
 logger = logging.getLogger(__name__)
 
@@ -106,10 +110,8 @@ async def pick_best_reference(conn, character_slug: str, project_id: int) -> Pat
 
 
 def _copy_to_comfyui_input(src: Path, name: str) -> str:
-    """Copy an image to ComfyUI input directory, return the filename."""
-    dest = Path(COMFYUI_INPUT_DIR) / name
-    shutil.copy2(src, dest)
-    return name
+    """Stage an image in ComfyUI input directory, return the staged filename."""
+    return stage_input(src, name_hint=name)
 
 
 def build_composite_workflow(
@@ -314,24 +316,26 @@ def is_comfyui_queue_busy(max_pending: int = 20, comfyui_url: str | None = None)
 
 
 def submit_workflow(workflow: dict, comfyui_url: str | None = None) -> str:
-    """Submit a workflow to ComfyUI and return the prompt_id."""
-    url = comfyui_url or COMFYUI_URL
-    payload = json.dumps({"prompt": workflow}).encode()
-    req = urllib.request.Request(
-        f"{url}/prompt",
-        data=payload,
-        headers={"Content-Type": "application/json"},
-    )
-    resp = urllib.request.urlopen(req, timeout=30)
-    result = json.loads(resp.read())
-    return result.get("prompt_id", "")
+    """Submit a workflow to ComfyUI and return the prompt_id (or a render-cache id)."""
+    cached_id, cache_key = render_cache.lookup(workflow, "keyframe")
+    if cached_id:
+        return cached_id
+    prompt_id = post_prompt(workflow, comfyui_url or COMFYUI_URL, kind="keyframe")
+    render_cache.track(prompt_id, cache_key, "keyframe")
+    return prompt_id
 
 
 def poll_completion(prompt_id: str, timeout: int = 300, comfyui_url: str | None = None) -> Path | None:
     """Poll ComfyUI until the prompt completes. Return the output image path."""
+    if render_cache.is_cached_id(prompt_id):
+        outputs = render_cache.cached_outputs(prompt_id)
+        return Path(COMFYUI_OUTPUT_DIR) / outputs[0] if outputs else None
     _base = comfyui_url or COMFYUI_URL
     start = time.time()
     while time.time() - start < timeout:
+        if was_cancelled(prompt_id):
+            logger.info(f"Prompt {prompt_id} cancelled — stop polling")
+            return None
         try:
             url = f"{_base}/history/{prompt_id}"
             req = urllib.request.Request(url)
@@ -346,10 +350,12 @@ def poll_completion(prompt_id: str, timeout: int = 300, comfyui_url: str | None
                         img = images[0]
                         subfolder = img.get("subfolder", "")
                         filename = img["filename"]
-                        if subfolder:
-                            return Path(COMFYUI_OUTPUT_DIR) / subfolder / filename
-                        return Path(COMFYUI_OUTPUT_DIR) / filename
+                        rel = f"{subfolder}/{filename}" if subfolder else filename
+                        render_cache.store(prompt_id, [rel])
+                        finish(prompt_id)
+                        return Path(COMFYUI_OUTPUT_DIR) / rel
                 logger.warning(f"Prompt {prompt_id} completed but no images in output")
+                finish(prompt_id, ok=False)
                 return None
         except Exception:
             pass
@@ -447,7 +453,7 @@ async def generate_composite_source(
         return None
 
     logger.info(f"Composite workflow submitted: {prompt_id}, polling...")
-    result = poll_completion(prompt_id, timeout=300, comfyui_url=_comp_url)
+    result = await offload(poll_completion, prompt_id, timeout=300, comfyui_url=_comp_url)
 
     if result and result.exists():
         logger.info(f"Composite image generated: {result}")
@@ -457,7 +463,7 @@ async def generate_composite_source(
         return None
 
 
-async def generate_simple_keyframe(
+async def build_simple_keyframe_workflow(
     conn,
     project_id: int,
     characters: list[str],
@@ -469,11 +475,12 @@ async def generate_simple_keyframe(
     controlnet_image: str | None = None,
     controlnet_strength: float = 0.7,
     controlnet_type: str = "openpose",
-    comfyui_url: str | None = None,
-) -> Path | None:
-    """Generate a keyframe image that matches the shot's composition requirements.
+) -> dict:
+    """Build the txt2img workflow for a keyframe that matches the shot's composition.
 
     Uses shot_type and camera_angle to drive framing — not just a character portrait.
+    Does not submit anything: generate_simple_keyframe() submits one workflow, and
+    keyframe_batcher merges several of them into one ComfyUI prompt.
 
     Args:
         conn: DB connection
@@ -485,7 +492,7 @@ async def generate_simple_keyframe(
         camera_angle: eye-level, low-angle, high-angle, dutch, overhead
 
     Returns:
-        Path to generated keyframe image, or None on failure.
+        ComfyUI API-format workflow dict.
     """
     # Environment-only shots (no characters) — pure scenery/landscape generation
     is_environment = not characters
@@ -831,6 +838,41 @@ async def generate_simple_keyframe(
             workflow["3"]["inputs"]["negative"] = ["42", 1]
             logger.info(f"Keyframe ControlNet: {controlnet_type} @ {controlnet_strength}")
 
+    return workflow
+
+
+async def generate_simple_keyframe(
+    conn,
+    project_id: int,
+    characters: list[str],
+    scene_prompt: str,
+    checkpoint_model: str = "waiIllustriousSDXL_v160.safetensors",
+    shot_type: str = "medium",
+    camera_angle: str = "eye-level",
+    extra_loras: list[tuple[str, float]] | None = None,
+    controlnet_image: str | None = None,
+    controlnet_strength: float = 0.7,
+    controlnet_type: str = "openpose",
+    comfyui_url: str | None = None,
+) -> Path | None:
+    """Generate a keyframe image that matches the shot's composition requirements.
+
+    See build_simple_keyframe_workflow() for the arguments.
+
+    Returns:
+        Path to generated keyframe image, or None on failure.
+    """
+    workflow = await build_simple_keyframe_workflow(
+        conn, project_id, characters, scene_prompt,
+        checkpoint_model=checkpoint_model,
+        shot_type=shot_type,
+        camera_angle=camera_angle,
+        extra_loras=extra_loras,
+        controlnet_image=controlnet_image,
+        controlnet_strength=controlnet_strength,
+        controlnet_type=controlnet_type,
+    )
+
     # Smart GPU routing: pick best GPU for keyframe if no explicit URL given
     _kf_url = comfyui_url
     if not _kf_url:
@@ -850,7 +892,7 @@ async def generate_simple_keyframe(
         logger.error("Failed to submit keyframe workflow")
         return None
 
-    result = poll_completion(prompt_id, timeout=300, comfyui_url=_kf_url)
+    result = await offload(poll_completion, prompt_id, timeout=300, comfyui_url=_kf_url)
     if result and result.exists():
         logger.info(f"Simple keyframe generated: {result}")
         return result
@@ -6,14 +6,11 @@ then maps to the actual HIGH/LOW or single LoRA files.
 """
 
 import logging
-from pathlib import Path
 
-import yaml
+from .catalog_index import get_catalog_index
 
 logger = logging.getLogger(__name__)
 
-_presets_cache: dict | None = None
-
 # Keyword → preset key mappings for common patterns that don't match tags directly
 KEYWORD_ALIASES = {
     # Position keywords → preset keys
@@ -118,15 +115,6 @@ RATING_TIERS = {
 }
 
 
-def _load_presets() -> dict:
-    global _presets_cache
-    if _presets_cache is not None:
-        return _presets_cache
-    from .catalog_loader import load_catalog
-    _presets_cache = load_catalog().get("action_presets") or {}
-    return _presets_cache
-
-
 def match_content_lora(
     motion_prompt: str = "",
     generation_prompt: str = "",
@@ -138,44 +126,37 @@ def match_content_lora(
     The returned key (e.g., "cowgirl", "walking") is used as shots.lora_name,
     which _resolve_content_lora_pair() then maps to actual files via the catalog.
     """
-    presets = _load_presets()
-    if not presets:
+    index = get_catalog_index()
+    if not index.presets:
         return None
 
     text = f"{motion_prompt} {generation_prompt}".lower()
     if not text.strip():
         return None
 
-    allowed = RATING_TIERS.get(content_rating, {"universal", "wholesome", "mature"})
+    allowed = index.tier_mask(
+        RATING_TIERS.get(content_rating, {"universal", "wholesome", "mature"})
+    )
+    found = index.scan(text)
 
     # Phase 1: Direct keyword alias match (highest confidence)
-    # Check longer phrases first to avoid partial matches
-    sorted_aliases = sorted(KEYWORD_ALIASES.keys(), key=len, reverse=True)
-    for keyword in sorted_aliases:
-        if keyword in text:
-            preset_key = KEYWORD_ALIASES[keyword]
-            if preset_key in presets:
-                tier = presets[preset_key].get("tier", "universal")
-                if tier in allowed:
-                    logger.debug(f"Content LoRA match (alias): '{keyword}' → {preset_key}")
-                    return preset_key
+    # Longer phrases win over partial matches
+    hits = sorted((k for k in found if k in KEYWORD_ALIASES), key=index.alias_rank.get)
+    for keyword in hits:
+        preset_key = KEYWORD_ALIASES[keyword]
+        if index.preset_tier_mask.get(preset_key, 0) & allowed:
+            logger.debug(f"Content LoRA match (alias): '{keyword}' → {preset_key}")
+            return preset_key
 
     # Phase 2: Match against preset labels (fuzzy)
     best_key = None
     best_score = 0
-    for key, preset in presets.items():
-        tier = preset.get("tier", "universal")
-        if tier not in allowed:
+    for key, tier_mask, label_words in index.preset_label_words:
+        if not tier_mask & allowed:
             continue
 
-        label = preset.get("label", "").lower()
-        score = 0
-
-        # Check if label words appear in the text
-        label_words = label.split()
-        for word in label_words:
-            if len(word) > 2 and word in text:
-                score += 1
+        # Count label words that appear in the text
+        score = sum(1 for word in label_words if word in found)
 
         if score > best_score:
             best_score = score
@@ -190,5 +171,5 @@ def match_content_lora(
 
 def invalidate_cache():
     """Clear cached presets (call after config changes)."""
-    global _presets_cache
-    _presets_cache = None
+    from .catalog_loader import invalidate_catalog
+    invalidate_catalog()
@@ -14,6 +14,7 @@ import time
 from abc import ABC, abstractmethod
 from pathlib import Path
 
+from packages.core import preemption
 from packages.core.config import COMFYUI_OUTPUT_DIR, COMFYUI_INPUT_DIR, get_comfyui_url
 
 from .lora_resolver import resolve_content_loras, gate_nsfw_lora, resolve_motion_lora
@@ -85,6 +86,21 @@ class EngineDispatcher(ABC):
         """Whether this engine needs roll-forward chaining for the given duration."""
         return False
 
+    async def dispatch(self, **kwargs) -> dict | None:
+        """build_and_submit() under the caller's render scope (core.preemption).
+
+        The engine submit helpers track their prompts on the current
+        CancelToken, so cancelling the scene/job scope dequeues or interrupts
+        them on ComfyUI. Raises RenderCancelled if the scope is already cancelled.
+        """
+        token = preemption.current_token()
+        if token is not None:
+            token.raise_if_cancelled()
+        result = await self.build_and_submit(**kwargs)
+        if result is not None and token is not None:
+            result.setdefault("render_scope", token.scope)
+        return result
+
 
 # ---------------------------------------------------------------------------
 # Shared helpers used by multiple dispatchers
@@ -2,7 +2,6 @@
 
 import json
 import logging
-import shutil
 from math import ceil
 from pathlib import Path
 
@@ -10,6 +9,7 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
 
 from packages.core.config import BASE_PATH, COMFYUI_URL, COMFYUI_INPUT_DIR, COMFYUI_OUTPUT_DIR
+from packages.core.input_staging import stage_input
 from packages.core.db import get_char_project_map
 from packages.core.auth import get_user_projects
 from packages.core.models import FramePackRequest
@@ -73,18 +73,19 @@ FRAMEPACK_MODELS = {
 
 
 def _submit_comfyui_workflow(workflow: dict, comfyui_url: str | None = None) -> str:
-    """Submit a workflow to ComfyUI and return the prompt_id."""
-    import urllib.request
-    url = comfyui_url or COMFYUI_URL
-    payload = json.dumps({"prompt": workflow}).encode()
-    req = urllib.request.Request(
-        f"{url}/prompt",
-        data=payload,
-        headers={"Content-Type": "application/json"},
-    )
-    resp = urllib.request.urlopen(req, timeout=30)
-    result = json.loads(resp.read())
-    return result.get("prompt_id", "")
+    """Submit a workflow to ComfyUI and return the prompt_id.
+
+    Returns a render-cache prompt id instead if this exact workflow has
+    already been rendered.
+    """
+    from packages.core.preemption import post_prompt
+    from . import render_cache
+    cached_id, cache_key = render_cache.lookup(workflow, "framepack")
+    if cached_id:
+        return cached_id
+    prompt_id = post_prompt(workflow, comfyui_url or COMFYUI_URL, kind="framepack")
+    render_cache.track(prompt_id, cache_key, "framepack")
+    return prompt_id
 
 
 def build_framepack_workflow(
@@ -340,10 +341,7 @@ async def generate_framepack(body: FramePackRequest, allowed_projects: list[int]
 
         source_image = approved_images[0]
         source_path = char_images_dir / source_image
-        dest_path = COMFYUI_INPUT_DIR / source_image
-        if not dest_path.exists():
-            shutil.copy2(source_path, dest_path)
-        image_filename = source_image
+        image_filename = stage_input(source_path)
 
     negative = body.negative_prompt or "low quality, blurry, distorted, watermark"
     latent_window_size = 9
@@ -0,0 +1,335 @@
+"""Keyframe batcher — one ComfyUI prompt per group of compatible keyframes.
+
+keyframe_blitz used to submit one txt2img workflow per shot, paying the queue
+round-trip, the poll loop, checkpoint/LoRA patching and the negative-prompt
+encode for every shot. Shots in a scene usually share checkpoint, LoRA stack,
+resolution, sampler settings and negatives.
+
+run_keyframes() takes single-image workflows (as built by
+composite_image.build_simple_keyframe_workflow), groups the ones with the same
+(checkpoint, LoRA chain, resolution, sampler, steps, cfg, negative) and merges
+each group into one workflow:
+
+  - one CheckpointLoader → LoRA chain → negative CLIPTextEncode, shared
+  - one positive CLIPTextEncode per distinct prompt, shared by its items
+  - one EmptyLatentImage → KSampler → VAEDecode → SaveImage branch per
+    distinct (prompt, seed), with that item's own seed and batch_size=1
+
+Branches are not folded into one latent batch: ComfyUI draws the noise for a
+whole batch from a single generator seeded with the KSampler seed, so image i
+of a batch is not the image a single run with any one item's seed produces.
+Keeping each item's seed keeps every output identical to what its own workflow
+renders, which is what the per-item render-cache entries below claim. Items
+with the same prompt and seed are the same render and share one branch.
+
+Each SaveImage node's image goes to every request key of its branch.
+Workflows that are not plain txt2img (ControlNet, IP-Adapter, img2img) and
+singleton groups are submitted unchanged. Render-cache lookups happen per
+item before grouping, and every item's output is stored under its own cache
+key, so a shot rendered in a batch still hits the cache when re-run alone.
+
+batcher_stats() reports images/minute for the batched and per-shot paths.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import urllib.request
+from dataclasses import dataclass
+from pathlib import Path
+
+from packages.core.config import COMFYUI_OUTPUT_DIR, COMFYUI_URL
+from packages.core.executors import offload
+from packages.core.preemption import finish, post_prompt, was_cancelled
+
+from . import render_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = int(os.getenv("KEYFRAME_BATCH_MAX", "8"))
+BATCHING_ENABLED = os.getenv("KEYFRAME_BATCHING", "1") != "0"
+POLL_INTERVAL_S = 2.0
+POLL_TIMEOUT_S = 300
+PER_IMAGE_TIMEOUT_S = 30  # extra patience per queued image in the same run
+
+_TXT2IMG_NODES = {
+    "CheckpointLoaderSimple", "LoraLoader", "EmptyLatentImage",
+    "CLIPTextEncode", "KSampler", "VAEDecode", "SaveImage",
+}
+
+_stats = {
+    path: {"runs": 0, "images": 0, "failed": 0, "submissions": 0, "seconds": 0.0}
+    for path in ("batched", "single")
+}
+
+
+@dataclass
+class KeyframeRequest:
+    key: str
+    workflow: dict
+
+
+def describe(workflow: dict) -> dict | None:
+    """Parse a single-image txt2img workflow. None when it can't be batched."""
+    try:
+        if any(node["class_type"] not in _TXT2IMG_NODES for node in workflow.values()):
+            return None
+        samplers = [nid for nid, node in workflow.items() if node["class_type"] == "KSampler"]
+        saves = [nid for nid, node in workflow.items() if node["class_type"] == "SaveImage"]
+        if len(samplers) != 1 or len(saves) != 1:
+            return None
+        ks = workflow[samplers[0]]["inputs"]
+        latent = workflow[ks["latent_image"][0]]
+        positive = workflow[ks["positive"][0]]
+        negative = workflow[ks["negative"][0]]
+        save = workflow[saves[0]]["inputs"]
+        decode = workflow[save["images"][0]]
+        if (latent["class_type"] != "EmptyLatentImage"
+                or latent["inputs"].get("batch_size", 1) != 1
+                or positive["class_type"] != "CLIPTextEncode"
+                or negative["class_type"] != "CLIPTextEncode"
+                or decode["class_type"] != "VAEDecode"
+                or decode["inputs"]["samples"][0] != samplers[0]):
+            return None
+
+        # Model chain: KSampler ← LoraLoader* ← CheckpointLoaderSimple, with
+        # both prompts encoded by the CLIP at the end of that chain
+        model_src = ks["model"][0]
+        if positive["inputs"]["clip"][0] != model_src or negative["inputs"]["clip"][0] != model_src:
+            return None
+        loras = []
+        node = workflow[model_src]
+        while node["class_type"] == "LoraLoader":
+            inputs = node["inputs"]
+            if inputs["model"][0] != inputs["clip"][0]:
+                return None
+            loras.append((inputs["lora_name"], inputs["strength_model"], inputs["strength_clip"]))
+            node = workflow[inputs["model"][0]]
+        if node["class_type"] != "CheckpointLoaderSimple":
+            return None
+        loras.reverse()
+
+        return {
+            "group": (
+                node["inputs"]["ckpt_name"], tuple(loras),
+                latent["inputs"]["width"], latent["inputs"]["height"],
+                ks["sampler_name"], ks["scheduler"], ks["steps"], ks["cfg"], ks.get("denoise", 1),
+                negative["inputs"]["text"],
+            ),
+            "positive": positive["inputs"]["text"],
+            "seed": ks["seed"],
+            "prefix": save["filename_prefix"],
+        }
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def merge_workflows(specs: list[dict]) -> tuple[dict, dict[str, list[int]]]:
+    """Merge described items sharing one group key into a single workflow.
+
+    Returns (workflow, {SaveImage node id: [indexes into specs rendered by it]}).
+    """
+    ckpt, loras, width, height, sampler, scheduler, steps, cfg, denoise, negative = specs[0]["group"]
+    workflow: dict[str, dict] = {}
+
+    def add(class_type: str, **inputs) -> str:
+        node_id = str(len(workflow) + 1)
+        workflow[node_id] = {"inputs": inputs, "class_type": class_type}
+        return node_id
+
+    ckpt_id = add("CheckpointLoaderSimple", ckpt_name=ckpt)
+    model_id = ckpt_id
+    for lora_name, strength_model, strength_clip in loras:
+        model_id = add("LoraLoader", lora_name=lora_name, strength_model=strength_model,
+                       strength_clip=strength_clip, model=[model_id, 0], clip=[model_id, 1])
+    negative_id = add("CLIPTextEncode", text=negative, clip=[model_id, 1])
+
+    by_prompt: dict[str, dict[int, list[int]]] = {}
+    for idx, spec in enumerate(specs):
+        by_prompt.setdefault(spec["positive"], {}).setdefault(spec["seed"], []).append(idx)
+
+    outputs = {}
+    for prompt, by_seed in by_prompt.items():
+        positive_id = add("CLIPTextEncode", text=prompt, clip=[model_id, 1])
+        for seed, indexes in by_seed.items():
+            latent_id = add("EmptyLatentImage", width=width, height=height, batch_size=1)
+            sampler_id = add(
+                "KSampler", seed=seed, steps=steps, cfg=cfg, sampler_name=sampler,
+                scheduler=scheduler, denoise=denoise, model=[model_id, 0],
+                positive=[positive_id, 0], negative=[negative_id, 0], latent_image=[latent_id, 0],
+            )
+            decode_id = add("VAEDecode", samples=[sampler_id, 0], vae=[ckpt_id, 2])
+            save_id = add("SaveImage", filename_prefix=specs[indexes[0]]["prefix"], images=[decode_id, 0])
+            outputs[save_id] = indexes
+    return workflow, outputs
+
+
+def plan_submissions(items: list[tuple], batched: bool = True,
+                     max_batch: int = MAX_BATCH) -> list[tuple[dict, dict[str, list]]]:
+    """Turn (key, workflow, spec) items into (workflow, {save node: [keys]}) submissions."""
+    submissions = []
+    groups: dict[tuple, list[tuple]] = {}
+    for key, workflow, spec in items:
+        if batched and spec is not None:
+            groups.setdefault(spec["group"], []).append((key, workflow, spec))
+        else:
+            submissions.append((workflow, {None: [key]}))
+    for members in groups.values():
+        for start in range(0, len(members), max(max_batch, 1)):
+            chunk = members[start:start + max_batch]
+            if len(chunk) == 1:
+                key, workflow, _ = chunk[0]
+                submissions.append((workflow, {None: [key]}))
+                continue
+            merged, outputs = merge_workflows([spec for _, _, spec in chunk])
+            submissions.append((merged, {
+                node_id: [chunk[i][0] for i in indexes] for node_id, indexes in outputs.items()
+            }))
+    return submissions
+
+
+def _submit(workflow: dict, comfyui_url: str) -> str:
+    return post_prompt(workflow, comfyui_url, kind="keyframe")
+
+
+def _history(prompt_id: str, comfyui_url: str) -> dict | None:
+    """Outputs of a finished prompt ({node id: {images: [...]}}), None while pending."""
+    resp = urllib.request.urlopen(urllib.request.Request(f"{comfyui_url}/history/{prompt_id}"), timeout=10)
+    history = json.loads(resp.read())
+    if prompt_id not in history:
+        return None
+    return history[prompt_id].get("outputs", {})
+
+
+def _image_rels(node_out: dict) -> list[str]:
+    rels = []
+    for img in node_out.get("images", []):
+        subfolder = img.get("subfolder", "")
+        rels.append(f"{subfolder}/{img['filename']}" if subfolder else img["filename"])
+    return rels
+
+
+async def _run_submission(workflow: dict, outputs: dict, cache_keys: dict,
+                          comfyui_url: str, deadline: float) -> dict[str, Path | None]:
+    keys = [key for node_keys in outputs.values() for key in node_keys]
+    results: dict[str, Path | None] = {key: None for key in keys}
+    try:
+        prompt_id = await offload(_submit, workflow, comfyui_url)
+    except Exception as e:
+        logger.error(f"Keyframe batch submit failed ({len(keys)} item(s)): {e}")
+        return results
+    if not prompt_id:
+        return results
+    logger.info(f"Keyframe batch submitted: {prompt_id} ({len(keys)} image(s)) → {comfyui_url}")
+
+    history = None
+    try:
+        while time.monotonic() < deadline:
+            if was_cancelled(prompt_id):
+                logger.info(f"Keyframe batch {prompt_id} cancelled")
+                return results
+            try:
+                history = await offload(_history, prompt_id, comfyui_url)
+            except Exception:
+                history = None
+            if history is not None:
+                break
+            await asyncio.sleep(POLL_INTERVAL_S)
+        if history is None:
+            logger.error(f"Keyframe batch {prompt_id} timed out")
+            return results
+    finally:
+        # Cancelled and timed-out prompts must leave the active set too; only
+        # completed ones feed the runtime estimate.
+        finish(prompt_id, ok=history is not None)
+
+    for node_id, node_keys in outputs.items():
+        if node_id is None:
+            # Unmerged workflow — its only output node holds the image
+            rels = next((_image_rels(out) for out in history.values() if out.get("images")), [])
+        else:
+            rels = _image_rels(history.get(node_id, {}))
+        for key in node_keys:
+            if not rels:
+                logger.warning(f"Keyframe batch {prompt_id}: no image for {key}")
+                continue
+            results[key] = Path(COMFYUI_OUTPUT_DIR) / rels[0]
+            if cache_keys.get(key):
+                item_id = f"{prompt_id}#{key}"
+                render_cache.track(item_id, cache_keys[key], "keyframe")
+                await offload(render_cache.store, item_id, [rels[0]])
+    return results
+
+
+async def run_keyframes(
+    requests: list[KeyframeRequest],
+    comfyui_url: str | None = None,
+    batched: bool = BATCHING_ENABLED,
+    max_batch: int = MAX_BATCH,
+    timeout: int = POLL_TIMEOUT_S,
+) -> dict[str, Path | None]:
+    """Render keyframe workflows, batching compatible ones. Returns {key: image path or None}."""
+    from .composite_image import is_comfyui_queue_busy
+
+    started = time.monotonic()
+    results: dict[str, Path | None] = {}
+    pending, cache_keys = [], {}
+    for req in requests:
+        cached_id, cache_key = await offload(render_cache.lookup, req.workflow, "keyframe")
+        if cached_id:
+            outs = render_cache.cached_outputs(cached_id)
+            results[req.key] = Path(COMFYUI_OUTPUT_DIR) / outs[0] if outs else None
+            continue
+        cache_keys[req.key] = cache_key
+        pending.append((req.key, req.workflow, describe(req.workflow) if batched else None))
+
+    submissions = plan_submissions(pending, batched=batched, max_batch=max_batch)
+    if submissions:
+        url = comfyui_url
+        if not url:
+            try:
+                from packages.core.dual_gpu import get_best_gpu_for_task
+                url = get_best_gpu_for_task("keyframe")
+            except ImportError:
+                url = None
+        url = url or COMFYUI_URL
+
+        if await offload(is_comfyui_queue_busy, comfyui_url=url):
+            logger.warning(f"ComfyUI queue busy ({url}) — skipping {len(pending)} keyframe(s)")
+            results.update({key: None for key, _, _ in pending})
+        else:
+            deadline = time.monotonic() + timeout + PER_IMAGE_TIMEOUT_S * len(pending)
+            for part in await asyncio.gather(*(
+                _run_submission(workflow, outputs, cache_keys, url, deadline)
+                for workflow, outputs in submissions
+            )):
+                results.update(part)
+            logger.info(
+                f"Keyframe batcher: {len(pending)} image(s) in {len(submissions)} workflow(s) "
+                f"({'batched' if batched else 'per-shot'})"
+            )
+
+    stats = _stats["batched" if batched else "single"]
+    stats["runs"] += 1
+    stats["images"] += sum(1 for path in results.values() if path is not None)
+    stats["failed"] += sum(1 for path in results.values() if path is None)
+    stats["submissions"] += len(submissions)
+    stats["seconds"] += time.monotonic() - started
+    return results
+
+
+def batcher_stats() -> dict:
+    """Images/minute and workflows per image for the batched and per-shot paths."""
+    out = {}
+    for path, s in _stats.items():
+        out[path] = {
+            **s,
+            "seconds": round(s["seconds"], 2),
+            "images_per_minute": round(s["images"] * 60 / s["seconds"], 1) if s["seconds"] else None,
+            "images_per_workflow": round(s["images"] / s["submissions"], 2) if s["submissions"] else None,
+        }
+    single, batched = out["single"]["images_per_minute"], out["batched"]["images_per_minute"]
+    out["speedup"] = round(batched / single, 2) if single and batched else None
+    return out
@@ -5,7 +5,10 @@ Provides query functions for: best LoRA for a character, best params for a LoRA,
 cross-project rankings, and effectiveness-aware alternative suggestions.
 
 Usage:
-    # Refresh all aggregates (run periodically or after QC batch)
+    # Incremental: update one shot's group (runs on SHOT_QC_RECORDED)
+    await update_shot_effectiveness(shot_id)
+
+    # Full reconcile (periodic safety net)
     await refresh_effectiveness()
 
     # Query best LoRAs for a character
@@ -25,169 +28,256 @@ logger = logging.getLogger(__name__)
 
 
 # ── Aggregation ────────────────────────────────────────────────────────
+#
+# shots.lora_key is a generated column (see db_migrations), so grouping uses a
+# plain indexed column instead of per-row REGEXP_REPLACE. Category averages
+# and issue histograms are computed in SQL from the JSONB/array columns.
+#
+# Maintenance is incremental: when a QC result or review decision lands for a
+# shot, SHOT_QC_RECORDED triggers update_shot_effectiveness(), which
+# re-aggregates only that shot's (lora_key, character, project) group — and,
+# when its LoRA or character changed since it was last counted (tracked in
+# shots.effectiveness_lora_key / effectiveness_char_slug), the group it left.
+# refresh_effectiveness() remains as a periodic reconcile safety net.
+# HIGH/LOW variants of one LoRA share a lora_key and therefore one row.
+
+def _category_avg(key: str) -> str:
+    return (
+        f"AVG(CASE WHEN jsonb_typeof(d.qc_category_averages->'{key}') = 'number' "
+        f"THEN (d.qc_category_averages->>'{key}')::float END)"
+    )
+
+
+_AGGREGATE_SQL = f"""
+    WITH shot_data AS (
+        SELECT
+            s.lora_key,
+            s.lora_name,
+            s.characters_present[1] AS char_slug,
+            sc.project_id,
+            p.name AS project_name,
+            p.content_rating,
+            s.quality_score,
+            s.review_status,
+            s.motion_tier,
+            s.lora_strength,
+            s.guidance_scale,
+            s.steps,
+            s.qc_category_averages,
+            s.qc_issues
+        FROM shots s
+        JOIN scenes sc ON s.scene_id = sc.id
+        JOIN projects p ON sc.project_id = p.id
+        WHERE s.lora_key IS NOT NULL AND s.quality_score IS NOT NULL
+          {{filter}}
+    ),
+    issue_hist AS (
+        SELECT lora_key, char_slug, project_id, jsonb_object_agg(issue, n) AS histogram
+        FROM (
+            SELECT lora_key, char_slug, project_id, issue, COUNT(*) AS n
+            FROM shot_data, unnest(qc_issues) AS issue
+            GROUP BY lora_key, char_slug, project_id, issue
+        ) c
+        GROUP BY lora_key, char_slug, project_id
+    )
+    SELECT
+        d.lora_key,
+        MAX(d.lora_name) AS lora_name,
+        d.char_slug,
+        d.project_id,
+        d.project_name,
+        d.content_rating,
+        COUNT(*) AS sample_count,
+        AVG(d.quality_score) AS avg_quality,
+        {_category_avg("motion_execution")} AS avg_motion,
+        {_category_avg("character_match")} AS avg_char,
+        {_category_avg("reaction_presence")} AS avg_reaction,
+        {_category_avg("state_delta")} AS avg_state_delta,
+        COUNT(*) FILTER (WHERE d.review_status = 'approved')::FLOAT
+            / NULLIF(COUNT(*) FILTER (WHERE d.review_status IS NOT NULL), 0) AS approval_rate,
+        -- Best params = from highest-scoring shot
+        (ARRAY_AGG(d.motion_tier ORDER BY d.quality_score DESC NULLS LAST))[1] AS best_motion_tier,
+        (ARRAY_AGG(d.lora_strength ORDER BY d.quality_score DESC NULLS LAST))[1] AS best_lora_strength,
+        (ARRAY_AGG(d.guidance_scale ORDER BY d.quality_score DESC NULLS LAST))[1] AS best_cfg,
+        (ARRAY_AGG(d.steps ORDER BY d.quality_score DESC NULLS LAST))[1] AS best_steps,
+        COALESCE(h.histogram, jsonb_build_object())::text AS issues_histogram
+    FROM shot_data d
+    LEFT JOIN issue_hist h
+      ON h.lora_key = d.lora_key
+     AND h.char_slug IS NOT DISTINCT FROM d.char_slug
+     AND h.project_id = d.project_id
+    GROUP BY d.lora_key, d.char_slug, d.project_id, d.project_name,
+             d.content_rating, h.histogram
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO lora_effectiveness (
+        lora_key, lora_name, character_slug, project_id, project_name,
+        content_rating, sample_count, avg_quality, avg_motion_execution,
+        avg_character_match, avg_reaction_score, avg_state_delta,
+        approval_rate, best_motion_tier, best_lora_strength, best_cfg,
+        best_steps, issues_histogram, last_updated
+    ) VALUES (
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13,
+        $14, $15, $16, $17, $18::jsonb, NOW()
+    )
+    ON CONFLICT (lora_key, COALESCE(character_slug, ''), COALESCE(project_id, 0))
+    DO UPDATE SET
+        lora_name = EXCLUDED.lora_name,
+        project_name = EXCLUDED.project_name,
+        content_rating = EXCLUDED.content_rating,
+        sample_count = EXCLUDED.sample_count,
+        avg_quality = EXCLUDED.avg_quality,
+        avg_motion_execution = EXCLUDED.avg_motion_execution,
+        avg_character_match = EXCLUDED.avg_character_match,
+        avg_reaction_score = EXCLUDED.avg_reaction_score,
+        avg_state_delta = EXCLUDED.avg_state_delta,
+        approval_rate = EXCLUDED.approval_rate,
+        best_motion_tier = EXCLUDED.best_motion_tier,
+        best_lora_strength = EXCLUDED.best_lora_strength,
+        best_cfg = EXCLUDED.best_cfg,
+        best_steps = EXCLUDED.best_steps,
+        issues_histogram = EXCLUDED.issues_histogram,
+        last_updated = NOW()
+"""
+
+
+def _upsert_params(row) -> tuple:
+    return (
+        row["lora_key"], row["lora_name"], row["char_slug"],
+        row["project_id"], row["project_name"], row["content_rating"],
+        row["sample_count"], row["avg_quality"],
+        row["avg_motion"], row["avg_char"], row["avg_reaction"], row["avg_state_delta"],
+        row["approval_rate"],
+        row["best_motion_tier"], row["best_lora_strength"],
+        row["best_cfg"], row["best_steps"],
+        row["issues_histogram"],
+    )
+
+
+_GROUP_FILTER = (
+    "AND s.lora_key = $1 AND sc.project_id = $2 "
+    "AND s.characters_present[1] IS NOT DISTINCT FROM $3"
+)
+
+# Record which group every counted shot now belongs to (only rows that moved)
+_STAMP_MEMBERSHIP_SQL = """
+    UPDATE shots s
+    SET effectiveness_lora_key = CASE WHEN s.quality_score IS NOT NULL THEN s.lora_key END,
+        effectiveness_char_slug = CASE WHEN s.quality_score IS NOT NULL AND s.lora_key IS NOT NULL
+                                       THEN s.characters_present[1] END
+    FROM scenes sc
+    WHERE s.scene_id = sc.id {filter}
+      AND (s.effectiveness_lora_key IS DISTINCT FROM
+               CASE WHEN s.quality_score IS NOT NULL THEN s.lora_key END
+           OR s.effectiveness_char_slug IS DISTINCT FROM
+               CASE WHEN s.quality_score IS NOT NULL AND s.lora_key IS NOT NULL
+                    THEN s.characters_present[1] END)
+"""
+
 
 async def refresh_effectiveness(project_id: int | None = None):
-    """Aggregate QC scores from shots into lora_effectiveness rows.
+    """Reconcile all lora_effectiveness rows from shots (safety net).
 
-    Groups by lora_key (extracted from lora_name filename) × character_slug × project.
-    Computes averages, approval rates, best-performing params, and issue histograms.
+    Groups by lora_key × character_slug × project. Computes averages, approval
+    rates, best-performing params, and issue histograms, and drops rows for
+    groups that no longer have any scored shots. Normal updates arrive per
+    shot via update_shot_effectiveness().
     """
     pool = await get_pool()
     async with pool.acquire() as conn:
-        # Build WHERE clause
-        where = "WHERE s.lora_name IS NOT NULL AND s.quality_score IS NOT NULL"
         params = []
+        filter_sql = ""
         if project_id:
-            where += " AND sc.project_id = $1"
+            filter_sql = "AND sc.project_id = $1"
             params.append(project_id)
 
-        rows = await conn.fetch(f"""
-            WITH shot_data AS (
-                SELECT
-                    s.lora_name,
-                    -- Extract lora key from filename: wan22_nsfw/assertive_cowgirl_HIGH.safetensors → assertive_cowgirl
-                    REGEXP_REPLACE(
-                        REGEXP_REPLACE(
-                            SPLIT_PART(s.lora_name, '/', -1),
-                            '_(HIGH|LOW)\\.safetensors$', '', 'i'
-                        ),
-                        '\\.safetensors$', '', 'i'
-                    ) AS lora_key,
-                    CASE WHEN s.characters_present IS NOT NULL AND array_length(s.characters_present, 1) > 0
-                         THEN s.characters_present[1] ELSE NULL END AS char_slug,
-                    sc.project_id,
-                    p.name AS project_name,
-                    p.content_rating,
-                    s.quality_score,
-                    s.review_status,
-                    s.motion_tier,
-                    s.lora_strength,
-                    s.guidance_scale,
-                    s.steps,
-                    s.qc_category_averages,
-                    s.qc_issues
-                FROM shots s
-                JOIN scenes sc ON s.scene_id = sc.id
-                JOIN projects p ON sc.project_id = p.id
-                {where}
-            )
-            SELECT
-                lora_key,
-                lora_name,
-                char_slug,
-                project_id,
-                project_name,
-                content_rating,
-                COUNT(*) AS sample_count,
-                AVG(quality_score) AS avg_quality,
-                COUNT(*) FILTER (WHERE review_status = 'approved')::FLOAT
-                    / NULLIF(COUNT(*) FILTER (WHERE review_status IS NOT NULL), 0) AS approval_rate,
-                -- Best params = from highest-scoring shot
-                (ARRAY_AGG(motion_tier ORDER BY quality_score DESC NULLS LAST))[1] AS best_motion_tier,
-                (ARRAY_AGG(lora_strength ORDER BY quality_score DESC NULLS LAST))[1] AS best_lora_strength,
-                (ARRAY_AGG(guidance_scale ORDER BY quality_score DESC NULLS LAST))[1] AS best_cfg,
-                (ARRAY_AGG(steps ORDER BY quality_score DESC NULLS LAST))[1] AS best_steps,
-                -- Collect all qc_category_averages and qc_issues for post-processing
-                ARRAY_AGG(qc_category_averages::text) AS all_qc_avgs,
-                ARRAY_AGG(array_to_json(COALESCE(qc_issues, ARRAY[]::text[]))::text) AS all_qc_issues
-            FROM shot_data
-            GROUP BY lora_key, lora_name, char_slug, project_id, project_name, content_rating
-        """, *params)
+        rows = await conn.fetch(_AGGREGATE_SQL.format(filter=filter_sql), *params)
+        async with conn.transaction():
+            if rows:
+                await conn.executemany(_UPSERT_SQL, [_upsert_params(r) for r in rows])
+            await conn.execute(f"""
+                DELETE FROM lora_effectiveness e
+                WHERE {"e.project_id = $1 AND" if project_id else ""} NOT EXISTS (
+                    SELECT 1 FROM shots s JOIN scenes sc ON s.scene_id = sc.id
+                    WHERE s.lora_key = e.lora_key AND s.quality_score IS NOT NULL
+                      AND sc.project_id = e.project_id
+                      AND s.characters_present[1] IS NOT DISTINCT FROM e.character_slug
+                )
+            """, *params)
+            await conn.execute(_STAMP_MEMBERSHIP_SQL.format(filter=filter_sql), *params)
+
+        logger.info("LoRA effectiveness: reconciled %d rows", len(rows))
+        return len(rows)
+
+
+async def _reaggregate_group(conn, lora_key: str, project_id: int, char_slug: str | None) -> int:
+    """Recompute one group's row; delete it when no scored shots remain."""
+    rows = await conn.fetch(_AGGREGATE_SQL.format(filter=_GROUP_FILTER), lora_key, project_id, char_slug)
+    if rows:
+        await conn.executemany(_UPSERT_SQL, [_upsert_params(r) for r in rows])
+    else:
+        await conn.execute(
+            "DELETE FROM lora_effectiveness WHERE lora_key = $1 AND project_id = $2 "
+            "AND character_slug IS NOT DISTINCT FROM $3",
+            lora_key, project_id, char_slug,
+        )
+    return len(rows)
+
+
+async def update_shot_effectiveness(shot_id) -> int:
+    """Re-aggregate the effectiveness group a shot belongs to (and the one it left).
 
-        upserted = 0
-        for row in rows:
-            # Compute average category scores from JSONB arrays
-            avg_motion = _avg_from_jsonb_array(row["all_qc_avgs"], "motion_execution")
-            avg_char = _avg_from_jsonb_array(row["all_qc_avgs"], "character_match")
-            avg_reaction = _avg_from_jsonb_array(row["all_qc_avgs"], "reaction_presence")
-            avg_state_delta = _avg_from_jsonb_array(row["all_qc_avgs"], "state_delta")
-
-            # Build issue histogram
-            issues_hist = _build_issue_histogram(row["all_qc_issues"])
-
-            # Upsert
-            await conn.execute("""
-                INSERT INTO lora_effectiveness (
-                    lora_key, lora_name, character_slug, project_id, project_name,
-                    content_rating, sample_count, avg_quality, avg_motion_execution,
-                    avg_character_match, avg_reaction_score, avg_state_delta,
-                    approval_rate, best_motion_tier, best_lora_strength, best_cfg,
-                    best_steps, issues_histogram, last_updated
-                ) VALUES (
-                    $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13,
-                    $14, $15, $16, $17, $18::jsonb, NOW()
+    Cost is proportional to the groups' shot counts (indexed on lora_key),
+    not to the whole shots table. Returns rows upserted.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            shot = await conn.fetchrow("""
+                SELECT s.lora_key, s.characters_present[1] AS char_slug, sc.project_id,
+                       s.quality_score, s.effectiveness_lora_key, s.effectiveness_char_slug
+                FROM shots s JOIN scenes sc ON s.scene_id = sc.id
+                WHERE s.id = $1
+                FOR UPDATE OF s
+            """, shot_id)
+            if not shot:
+                return 0
+
+            counted = shot["lora_key"] is not None and shot["quality_score"] is not None
+            current = (shot["lora_key"], shot["char_slug"]) if counted else (None, None)
+            previous = (shot["effectiveness_lora_key"], shot["effectiveness_char_slug"])
+
+            upserted = 0
+            if counted:
+                upserted += await _reaggregate_group(conn, current[0], shot["project_id"], current[1])
+            if previous[0] and previous != current:
+                # The shot moved (LoRA or character changed, or lost its score)
+                upserted += await _reaggregate_group(conn, previous[0], shot["project_id"], previous[1])
+            if previous != current:
+                await conn.execute(
+                    "UPDATE shots SET effectiveness_lora_key = $2, effectiveness_char_slug = $3 "
+                    "WHERE id = $1",
+                    shot_id, *current,
                 )
-                ON CONFLICT (lora_key, COALESCE(character_slug, ''), COALESCE(project_id, 0))
-                DO UPDATE SET
-                    lora_name = EXCLUDED.lora_name,
-                    project_name = EXCLUDED.project_name,
-                    content_rating = EXCLUDED.content_rating,
-                    sample_count = EXCLUDED.sample_count,
-                    avg_quality = EXCLUDED.avg_quality,
-                    avg_motion_execution = EXCLUDED.avg_motion_execution,
-                    avg_character_match = EXCLUDED.avg_character_match,
-                    avg_reaction_score = EXCLUDED.avg_reaction_score,
-                    avg_state_delta = EXCLUDED.avg_state_delta,
-                    approval_rate = EXCLUDED.approval_rate,
-                    best_motion_tier = EXCLUDED.best_motion_tier,
-                    best_lora_strength = EXCLUDED.best_lora_strength,
-                    best_cfg = EXCLUDED.best_cfg,
-                    best_steps = EXCLUDED.best_steps,
-                    issues_histogram = EXCLUDED.issues_histogram,
-                    last_updated = NOW()
-            """,
-                row["lora_key"], row["lora_name"], row["char_slug"],
-                row["project_id"], row["project_name"], row["content_rating"],
-                row["sample_count"], row["avg_quality"],
-                avg_motion, avg_char, avg_reaction, avg_state_delta,
-                row["approval_rate"],
-                row["best_motion_tier"], row["best_lora_strength"],
-                row["best_cfg"], row["best_steps"],
-                json.dumps(issues_hist),
-            )
-            upserted += 1
+            return upserted
 
-        logger.info("LoRA effectiveness: upserted %d rows", upserted)
-        return upserted
 
+async def _on_shot_qc_recorded(data: dict):
+    shot_id = data.get("shot_id")
+    if not shot_id:
+        return
+    if isinstance(shot_id, str):
+        import uuid
+        shot_id = uuid.UUID(shot_id)
+    await update_shot_effectiveness(shot_id)
 
-def _avg_from_jsonb_array(jsonb_array, key: str) -> float | None:
-    """Extract average of a key from an array of JSONB objects (some may be None or strings)."""
-    values = []
-    for item in (jsonb_array or []):
-        if item is None:
-            continue
-        if isinstance(item, str):
-            try:
-                item = json.loads(item)
-            except (json.JSONDecodeError, TypeError):
-                continue
-        if isinstance(item, dict):
-            val = item.get(key)
-            if val is not None:
-                try:
-                    values.append(float(val))
-                except (ValueError, TypeError):
-                    pass
-    return sum(values) / len(values) if values else None
-
-
-def _build_issue_histogram(issues_array) -> dict:
-    """Count issue occurrences across shots."""
-    hist: dict[str, int] = {}
-    for issues in (issues_array or []):
-        if issues is None:
-            continue
-        if isinstance(issues, str):
-            try:
-                issues = json.loads(issues)
-            except (json.JSONDecodeError, TypeError):
-                continue
-        if isinstance(issues, list):
-            for issue in issues:
-                if isinstance(issue, str):
-                    hist[issue] = hist.get(issue, 0) + 1
-    return hist
+
+def register_lora_effectiveness_handlers():
+    """Keep lora_effectiveness current as QC results land. Called once at startup."""
+    from packages.core.events import event_bus, SHOT_QC_RECORDED
+    event_bus.subscribe(SHOT_QC_RECORDED, _on_shot_qc_recorded)
+    logger.info("EventBus: LoRA effectiveness handler registered")
 
 
 # ── Query functions ────────────────────────────────────────────────────
@@ -8,6 +8,8 @@ beyond logging.
 import logging
 from pathlib import Path
 
+from .catalog_index import lora_files
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -64,10 +66,7 @@ def _resolve_content_lora_pair(
         high = lora_name
         low = lora_name.replace("_HIGH", "_LOW")
         # Check LOW exists
-        low_path = LORA_DIR / low
-        if not low_path.exists():
-            low_path = LORA_DIR / "wan22_nsfw" / low
-        if not low_path.exists():
+        if low not in lora_files and f"wan22_nsfw/{low}" not in lora_files:
             low = None  # HIGH-only, no LOW counterpart
         return high, low, 0.85
 
@@ -75,10 +74,7 @@ def _resolve_content_lora_pair(
     if "_LOW" in lora_name:
         low = lora_name
         high = lora_name.replace("_LOW", "_HIGH")
-        high_path = LORA_DIR / high
-        if not high_path.exists():
-            high_path = LORA_DIR / "wan22_nsfw" / high
-        if not high_path.exists():
+        if high not in lora_files and f"wan22_nsfw/{high}" not in lora_files:
             high = None
         return high, low, 0.85
 
@@ -122,7 +118,7 @@ def _resolve_content_lora_pair(
     # Pattern 4: Generic single LoRA (e.g. project-level video_lora) — apply to high model only
     # Only if the file actually exists on disk; otherwise return None to avoid
     # passing bogus strings to ComfyUI
-    if (LORA_DIR / lora_name).exists() or (LORA_DIR / f"{lora_name}.safetensors").exists():
+    if lora_name in lora_files or f"{lora_name}.safetensors" in lora_files:
         return lora_name, None, 0.85
     return None, None, 0.85
 
@@ -12,13 +12,13 @@ Unlike FramePack, LTX-Video supports native LoRA injection.
 
 import json
 import logging
-import shutil
 import time
 from pathlib import Path
 
 from fastapi import APIRouter, HTTPException
 
 from packages.core.config import BASE_PATH, COMFYUI_URL, COMFYUI_INPUT_DIR, COMFYUI_OUTPUT_DIR
+from packages.core.input_staging import stage_input
 from packages.core.db import get_char_project_map
 
 logger = logging.getLogger(__name__)
@@ -34,18 +34,19 @@ LTX_MODELS = {
 
 
 def _submit_comfyui_workflow(workflow: dict, comfyui_url: str | None = None) -> str:
-    """Submit a workflow to ComfyUI and return the prompt_id."""
-    import urllib.request
-    url = comfyui_url or COMFYUI_URL
-    payload = json.dumps({"prompt": workflow}).encode()
-    req = urllib.request.Request(
-        f"{url}/prompt",
-        data=payload,
-        headers={"Content-Type": "application/json"},
-    )
-    resp = urllib.request.urlopen(req, timeout=30)
-    result = json.loads(resp.read())
-    return result.get("prompt_id", "")
+    """Submit a workflow to ComfyUI and return the prompt_id.
+
+    Returns a render-cache prompt id instead if this exact workflow has
+    already been rendered.
+    """
+    from packages.core.preemption import post_prompt
+    from . import render_cache
+    cached_id, cache_key = render_cache.lookup(workflow, "ltx")
+    if cached_id:
+        return cached_id
+    prompt_id = post_prompt(workflow, comfyui_url or COMFYUI_URL, kind="ltx")
+    render_cache.track(prompt_id, cache_key, "ltx")
+    return prompt_id
 
 
 def build_ltx_workflow(
@@ -650,10 +651,7 @@ async def generate_ltx_video(
 
             source_image = approved_images[0]
             source_path = char_images_dir / source_image
-            dest_path = COMFYUI_INPUT_DIR / source_image
-            if not dest_path.exists():
-                shutil.copy2(source_path, dest_path)
-            image_filename = source_image
+            image_filename = stage_input(source_path)
 
     negative = negative_prompt or "low quality, blurry, distorted, watermark, text"
 
@@ -16,11 +16,12 @@ from __future__ import annotations
 import logging
 import re
 from dataclasses import dataclass
-from pathlib import Path
 from typing import Optional
 
 import yaml
 
+from .catalog_index import AhoCorasick, get_catalog_index, normalize_lora_name
+
 logger = logging.getLogger(__name__)
 
 # --- Tier definitions ---
@@ -157,63 +158,37 @@ def _load_catalog() -> dict:
     return load_catalog()
 
 
-def _normalize_lora_name(lora_name: str) -> str:
-    """Strip path prefixes and extensions for matching."""
-    name = Path(lora_name).stem.lower()
-    # Remove common suffixes
-    for suffix in ("_high", "_low", "_high_noise", "_low_noise", "_hn", "_ln",
-                   "_i2v", "_v1", "_v2", "_v3", ".safetensors"):
-        name = name.removesuffix(suffix)
-    return name
+_normalize_lora_name = normalize_lora_name
+
+# Tier keyword sets in priority order, compiled into one automaton so the
+# LoRA name + prompt is scanned once instead of once per keyword.
+_KEYWORD_TIERS = (
+    ("extreme", _EXTREME_KEYWORDS),
+    ("high", _HIGH_KEYWORDS),
+    ("low", _LOW_KEYWORDS),
+    ("medium", _MEDIUM_KEYWORDS),
+)
+_KEYWORD_MATCHER = AhoCorasick(set().union(*(kws for _, kws in _KEYWORD_TIERS)))
 
 
 def _get_catalog_motion_tier(lora_name: str) -> Optional[str]:
     """Look up motion_tier from lora_catalog.yaml video_lora_pairs."""
     if not lora_name:
         return None
-    catalog = _load_catalog()
-    pairs = catalog.get("video_lora_pairs", {})
-    norm = _normalize_lora_name(lora_name)
-
-    for key, entry in pairs.items():
-        if not entry:
-            continue
-        # Match by catalog key
-        if key == norm:
-            return entry.get("motion_tier")
-        # Match by HIGH/LOW filename
-        for field in ("high", "low"):
-            fname = entry.get(field)
-            if fname and _normalize_lora_name(fname) == norm:
-                return entry.get("motion_tier")
-    return None
+    entry = get_catalog_index().find_pair(lora_name)
+    return entry.get("motion_tier") if entry else None
 
 
 def _keyword_classify(lora_name: str, prompt: str) -> str:
     """Classify motion tier by keyword matching on LoRA name and prompt."""
     norm_lora = _normalize_lora_name(lora_name) if lora_name else ""
     prompt_lower = (prompt or "").lower()
-    search_text = f"{norm_lora} {prompt_lower}"
-
-    # Check extreme first (highest priority)
-    for kw in _EXTREME_KEYWORDS:
-        if kw in search_text:
-            return "extreme"
-
-    # Check high
-    for kw in _HIGH_KEYWORDS:
-        if kw in search_text:
-            return "high"
-
-    # Check low
-    for kw in _LOW_KEYWORDS:
-        if kw in search_text:
-            return "low"
+    found = _KEYWORD_MATCHER.find(f"{norm_lora} {prompt_lower}")
 
-    # Check medium
-    for kw in _MEDIUM_KEYWORDS:
-        if kw in search_text:
-            return "medium"
+    # Extreme first (highest priority), then high, low, medium
+    for tier, keywords in _KEYWORD_TIERS:
+        if found & keywords:
+            return tier
 
     # Default
     return "medium"
@@ -280,40 +255,17 @@ def get_counter_motion(lora_name: str) -> Optional[str]:
     """
     if not lora_name:
         return None
-    catalog = _load_catalog()
-    pairs = catalog.get("video_lora_pairs", {})
-    norm = _normalize_lora_name(lora_name)
-
-    for key, entry in pairs.items():
-        if not entry:
-            continue
-        if key == norm:
-            return entry.get("counter_motion")
-        for field in ("high", "low"):
-            fname = entry.get(field)
-            if fname and _normalize_lora_name(fname) == norm:
-                return entry.get("counter_motion")
-    return None
+    entry = get_catalog_index().find_pair(lora_name)
+    return entry.get("counter_motion") if entry else None
 
 
 def _find_catalog_entry(lora_name: str) -> Optional[dict]:
     """Find the catalog entry for a LoRA by key or filename match."""
     if not lora_name:
         return None
-    catalog = _load_catalog()
-    norm = _normalize_lora_name(lora_name)
-
-    for section in ("video_lora_pairs", "video_motion_loras"):
-        for key, entry in catalog.get(section, {}).items():
-            if not entry:
-                continue
-            if key == norm:
-                return entry
-            for field in ("high", "low", "file"):
-                fname = entry.get(field)
-                if fname and _normalize_lora_name(fname) == norm:
-                    return entry
-    return None
+    index = get_catalog_index()
+    return (index.find_pair(lora_name, any_field=True)
+            or index.find_motion(lora_name, any_field=True))
 
 
 def get_motion_description(lora_name: str) -> Optional[str]:
@@ -342,29 +294,12 @@ def get_lora_type(lora_name: str) -> Optional[str]:
     """
     if not lora_name:
         return None
-    catalog = _load_catalog()
-    norm = _normalize_lora_name(lora_name)
+    index = get_catalog_index()
 
-    # Check video_lora_pairs
-    for key, entry in catalog.get("video_lora_pairs", {}).items():
-        if not entry:
-            continue
-        if key == norm:
-            return entry.get("lora_type")
-        for field in ("high", "low"):
-            fname = entry.get(field)
-            if fname and _normalize_lora_name(fname) == norm:
-                return entry.get("lora_type")
-
-    # Check video_motion_loras
-    for key, entry in catalog.get("video_motion_loras", {}).items():
-        if not entry:
-            continue
-        if key == norm:
-            return entry.get("lora_type")
-        fname = entry.get("file")
-        if fname and _normalize_lora_name(fname) == norm:
-            return entry.get("lora_type")
+    # Check video_lora_pairs, then video_motion_loras
+    entry = index.find_pair(lora_name) or index.find_motion(lora_name)
+    if entry:
+        return entry.get("lora_type")
 
     # Heuristic fallback based on path
     lower = lora_name.lower()
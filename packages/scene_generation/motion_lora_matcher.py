@@ -5,18 +5,19 @@ shot's motion_prompt + description to find the best motion LoRA match.
 """
 
 import logging
-from pathlib import Path
 
-import yaml
+from .catalog_index import LORA_DIR, get_catalog_index, lora_files
 
 logger = logging.getLogger(__name__)
 
-LORA_DIR = Path("/opt/ComfyUI/models/loras")
-
-
-def _load_catalog() -> dict:
-    from .catalog_loader import load_catalog
-    return load_catalog().get("video_motion_loras") or {}
+# Rating → allowed tiers
+RATING_TIERS = {
+    "G": {"universal", "wholesome"},
+    "PG": {"universal", "wholesome"},
+    "PG-13": {"universal", "wholesome", "mature"},
+    "R": {"universal", "wholesome", "mature"},
+    "XXX": {"universal", "wholesome", "mature", "explicit"},
+}
 
 
 def match_motion_lora(
@@ -29,51 +30,39 @@ def match_motion_lora(
     Returns (None, 0.0) if no match found or no tags hit.
     Requires at least 1 tag match to return a result.
     """
-    catalog = _load_catalog()
-    if not catalog:
+    index = get_catalog_index()
+    if not index.motion_entries:
         return None, 0.0
 
     text = f"{motion_prompt} {description}".lower()
     if not text.strip():
         return None, 0.0
 
-    # Rating → allowed tiers
-    rating_tiers = {
-        "G": {"universal", "wholesome"},
-        "PG": {"universal", "wholesome"},
-        "PG-13": {"universal", "wholesome", "mature"},
-        "R": {"universal", "wholesome", "mature"},
-        "XXX": {"universal", "wholesome", "mature", "explicit"},
-    }
-    allowed = rating_tiers.get(content_rating, {"universal", "wholesome", "mature"})
+    allowed = index.tier_mask(
+        RATING_TIERS.get(content_rating, {"universal", "wholesome", "mature"})
+    )
+    found = index.scan(text)
 
     best_key = None
     best_score = 0
     best_file = None
     best_strength = 0.8
 
-    for key, entry in catalog.items():
-        tier = entry.get("tier", "universal")
-        if tier not in allowed:
-            continue
-
-        lora_file = entry.get("file", "")
-        if not lora_file:
+    for key, lora_file, strength, tier_mask, tags in index.motion_entries:
+        if not tier_mask & allowed or not lora_file:
             continue
 
         # Check file actually exists
-        full_path = LORA_DIR / lora_file
-        if not full_path.exists():
+        if lora_file not in lora_files:
             continue
 
-        tags = entry.get("tags", [])
-        score = sum(1 for tag in tags if tag in text)
+        score = sum(1 for tag in tags if tag in found)
 
         if score > best_score:
             best_score = score
             best_key = key
             best_file = lora_file
-            best_strength = entry.get("strength", 0.8)
+            best_strength = strength
 
     if best_score >= 1 and best_file:
         logger.info(f"Motion LoRA match: {best_key} (score={best_score}, file={best_file})")
@@ -84,5 +73,5 @@ def match_motion_lora(
 
 def invalidate_cache():
     """Clear cached catalog (call after config changes)."""
-    global _catalog_cache
-    _catalog_cache = None
+    from .catalog_loader import invalidate_catalog
+    invalidate_catalog()
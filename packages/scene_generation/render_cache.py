@@ -0,0 +1,382 @@
+"""Render cache — content-addressed reuse of finished ComfyUI renders.
+
+QC retries, roll-forward, shot regeneration and keyframe blitz regularly
+re-submit workflows that ComfyUI has already rendered. A workflow is
+canonicalized into a key: output filename prefixes are dropped, and files
+referenced by loader nodes (input images/videos, LoRAs) are replaced by the
+SHA-256 of their contents. A re-staged copy of the same image still hits;
+an edited file under the same name misses.
+
+Submit helpers call lookup() before POSTing. On a hit they return a synthetic
+prompt id ("cache:<key>") that the poll helpers resolve to the stored outputs
+without touching ComfyUI. On a miss the real prompt id is tracked and the
+poll helpers call store() once the render completes.
+
+Outputs are hardlinked into COMFYUI_OUTPUT_DIR/render_cache/<key>/ so cleanup
+of the originals does not invalidate entries. The index (outputs, QC results,
+LRU timestamps, file hash memo) is a JSON file next to them; least recently
+used entries are evicted once the cache exceeds RENDER_CACHE_MAX_GB.
+Entry changes are written through; hit timestamps and new file hashes are
+flushed at most every SAVE_INTERVAL_S (and at exit). Files are hashed outside
+the index lock, so hashing a multi-GB LoRA never blocks other lookups.
+"""
+
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+
+from packages.core.config import COMFYUI_INPUT_DIR, COMFYUI_OUTPUT_DIR
+
+logger = logging.getLogger(__name__)
+
+LORA_DIR = Path("/opt/ComfyUI/models/loras")
+CACHE_PREFIX = "cache:"
+CACHE_SUBDIR = "render_cache"
+MAX_BYTES = int(float(os.getenv("RENDER_CACHE_MAX_GB", "40")) * 1024 ** 3)
+MAX_ENTRIES = 5000
+# Memoized file hashes kept in the index (least recently used dropped first)
+MAX_FILE_HASHES = 4096
+SAVE_INTERVAL_S = float(os.getenv("RENDER_CACHE_SAVE_INTERVAL_S", "30"))
+ENABLED = os.getenv("RENDER_CACHE_ENABLED", "1") != "0"
+
+# Inputs that only name the output file — they never change the pixels
+_NON_SEMANTIC_INPUTS = {"filename_prefix"}
+# Loader inputs whose string value names a file in ComfyUI/input
+_FILE_INPUTS = {"image", "video", "mask"}
+
+_lock = threading.Lock()
+_index: dict | None = None
+# prompt_id → (key, engine) for renders submitted through the cache
+_prompt_keys: OrderedDict[str, tuple[str, str]] = OrderedDict()
+_MAX_TRACKED_PROMPTS = 2048
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0, "stores": 0})
+_evictions = 0
+# Unsaved last_used / file hash changes, and when the index was last written
+_dirty = False
+_saved_at = 0.0
+
+
+def _cache_root() -> Path:
+    return Path(COMFYUI_OUTPUT_DIR) / CACHE_SUBDIR
+
+
+def _index_path() -> Path:
+    return _cache_root() / "index.json"
+
+
+def _load_index() -> dict:
+    global _index
+    if _index is None:
+        try:
+            _index = json.loads(_index_path().read_text())
+        except (OSError, ValueError):
+            _index = {}
+        _index.setdefault("entries", {})
+        _index.setdefault("file_hashes", {})
+    return _index
+
+
+def _save_index():
+    global _dirty, _saved_at
+    _dirty, _saved_at = False, time.monotonic()
+    path = _index_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(_index, default=str))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Render cache index write failed: {e}")
+
+
+def _touch_index():
+    """Note a non-critical index change; write it if the last save is old enough."""
+    global _dirty
+    _dirty = True
+    if time.monotonic() - _saved_at >= SAVE_INTERVAL_S:
+        _save_index()
+
+
+def flush():
+    """Write pending hit timestamps / file hashes (also runs at exit)."""
+    with _lock:
+        if _dirty and _index is not None:
+            _save_index()
+
+
+atexit.register(flush)
+
+
+# ── Canonicalization ──────────────────────────────────────────────────────
+
+
+def _file_hash(path: Path) -> str | None:
+    """SHA-256 of a file, memoized on (size, mtime) so large LoRAs hash once.
+
+    Only the memo lookup/update holds _lock; the file is read without it.
+    Must not be called with _lock held.
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    with _lock:
+        memo = _load_index()["file_hashes"]
+        cached = memo.get(str(path))
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            # Re-insert so the memo's insertion order tracks recency
+            memo[str(path)] = memo.pop(str(path))
+            return cached[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _lock:
+        memo = _load_index()["file_hashes"]
+        memo.pop(str(path), None)
+        memo[str(path)] = [st.st_size, st.st_mtime_ns, digest]
+        while len(memo) > MAX_FILE_HASHES:
+            del memo[next(iter(memo))]
+        _touch_index()
+    return digest
+
+
+def _resolve_input(name: str) -> Path:
+    # ComfyUI accepts annotated names like "foo.png [input]"
+    name = name.rsplit(" [", 1)[0] if name.endswith("]") else name
+    p = Path(name)
+    return p if p.is_absolute() else Path(COMFYUI_INPUT_DIR) / p
+
+
+def canonicalize_workflow(workflow: dict) -> dict:
+    """Return a copy of the workflow with file references replaced by content hashes."""
+    canon = {}
+    for node_id, node in copy.deepcopy(workflow).items():
+        if not isinstance(node, dict):
+            canon[node_id] = node
+            continue
+        node.pop("_meta", None)
+        class_type = node.get("class_type", "")
+        inputs = node.get("inputs", {})
+        for name in list(inputs):
+            value = inputs[name]
+            if name in _NON_SEMANTIC_INPUTS:
+                del inputs[name]
+            elif not isinstance(value, str) or not value:
+                continue
+            elif name == "lora_name":
+                digest = _file_hash(LORA_DIR / value)
+                if digest:
+                    inputs[name] = f"sha256:{digest}"
+            elif name in _FILE_INPUTS and "Load" in class_type:
+                digest = _file_hash(_resolve_input(value))
+                if digest:
+                    inputs[name] = f"sha256:{digest}"
+        canon[node_id] = node
+    return canon
+
+
+def workflow_key(workflow: dict) -> str:
+    """Content-addressed key for a ComfyUI workflow."""
+    canon = canonicalize_workflow(workflow)
+    blob = json.dumps(canon, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+# ── Submit / poll integration ─────────────────────────────────────────────
+
+
+def is_cached_id(prompt_id: str | None) -> bool:
+    return bool(prompt_id) and prompt_id.startswith(CACHE_PREFIX)
+
+
+def _entry_valid(entry: dict) -> bool:
+    root = Path(COMFYUI_OUTPUT_DIR)
+    return bool(entry.get("outputs")) and all((root / rel).exists() for rel in entry["outputs"])
+
+
+def lookup(workflow: dict, engine: str) -> tuple[str | None, str | None]:
+    """Check the cache before submitting.
+
+    Returns (cached_prompt_id, key). cached_prompt_id is set on a hit; on a
+    miss pass key to track() together with the real prompt id.
+    """
+    if not ENABLED:
+        return None, None
+    try:
+        key = workflow_key(workflow)  # hashes input files — outside the lock
+        with _lock:
+            entries = _load_index()["entries"]
+            entry = entries.get(key)
+            if entry and not _entry_valid(entry):
+                _drop(key)
+                _save_index()
+                entry = None
+            if entry is None:
+                _stats[engine]["misses"] += 1
+                return None, key
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            _stats[engine]["hits"] += 1
+            _touch_index()
+    except Exception as e:
+        logger.warning(f"Render cache lookup failed ({engine}): {e}")
+        return None, None
+    logger.info(f"Render cache hit ({engine}): {key[:12]} — skipping ComfyUI submit")
+    return CACHE_PREFIX + key, key
+
+
+def track(prompt_id: str, key: str | None, engine: str):
+    """Remember which cache key a freshly submitted prompt will fill."""
+    if not prompt_id or not key:
+        return
+    with _lock:
+        _prompt_keys[prompt_id] = (key, engine)
+        while len(_prompt_keys) > _MAX_TRACKED_PROMPTS:
+            _prompt_keys.popitem(last=False)
+
+
+def _key_for(prompt_id: str) -> str | None:
+    if is_cached_id(prompt_id):
+        return prompt_id[len(CACHE_PREFIX):]
+    tracked = _prompt_keys.get(prompt_id)
+    return tracked[0] if tracked else None
+
+
+def cached_outputs(prompt_id: str) -> list[str] | None:
+    """Output paths (relative to COMFYUI_OUTPUT_DIR) for a cache-hit prompt id."""
+    with _lock:
+        entry = _load_index()["entries"].get(_key_for(prompt_id) or "")
+        if entry and _entry_valid(entry):
+            return list(entry["outputs"])
+    return None
+
+
+def store(prompt_id: str, output_files: list[str]):
+    """Record the outputs of a completed render submitted via track().
+
+    output_files are paths relative to COMFYUI_OUTPUT_DIR. Each is hardlinked
+    (copied across filesystems) into the cache directory.
+    """
+    tracked = _prompt_keys.get(prompt_id)
+    if not tracked or not output_files:
+        return
+    key, engine = tracked
+    root = Path(COMFYUI_OUTPUT_DIR)
+    dest_dir = _cache_root() / key
+    stored, size = [], 0
+    try:
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        for rel in output_files:
+            src = root / rel
+            if not src.exists():
+                continue
+            dest = dest_dir / src.name
+            if not dest.exists():
+                try:
+                    os.link(src, dest)
+                except OSError:
+                    shutil.copy2(src, dest)
+            stored.append(str(dest.relative_to(root)))
+            size += dest.stat().st_size
+    except OSError as e:
+        logger.warning(f"Render cache store failed for {prompt_id}: {e}")
+        return
+    if not stored:
+        return
+
+    with _lock:
+        entries = _load_index()["entries"]
+        previous = entries.get(key, {})
+        now = time.time()
+        entries[key] = {
+            "engine": engine,
+            "outputs": stored,
+            "bytes": size,
+            "qc": previous.get("qc"),
+            "hits": previous.get("hits", 0),
+            "created_at": previous.get("created_at", now),
+            "last_used": now,
+        }
+        _stats[engine]["stores"] += 1
+        _evict()
+        _save_index()
+
+
+def record_qc(prompt_id: str, qc: dict):
+    """Attach a QC result to the cache entry behind a prompt id."""
+    with _lock:
+        entry = _load_index()["entries"].get(_key_for(prompt_id) or "")
+        if entry is not None:
+            entry["qc"] = qc
+            _save_index()
+
+
+def cached_qc(prompt_id: str) -> dict | None:
+    """QC result stored for a cache-hit prompt id, if any."""
+    if not is_cached_id(prompt_id):
+        return None
+    with _lock:
+        entry = _load_index()["entries"].get(_key_for(prompt_id))
+        return copy.deepcopy(entry.get("qc")) if entry else None
+
+
+# ── Eviction / metrics ────────────────────────────────────────────────────
+
+
+def _drop(key: str):
+    _load_index()["entries"].pop(key, None)
+    shutil.rmtree(_cache_root() / key, ignore_errors=True)
+
+
+def _evict():
+    """Drop least recently used entries until under the size and count caps."""
+    global _evictions
+    entries = _load_index()["entries"]
+    total = sum(e.get("bytes", 0) for e in entries.values())
+    if total <= MAX_BYTES and len(entries) <= MAX_ENTRIES:
+        return
+    for key in sorted(entries, key=lambda k: entries[k].get("last_used", 0)):
+        if total <= MAX_BYTES and len(entries) <= MAX_ENTRIES:
+            break
+        total -= entries[key].get("bytes", 0)
+        _drop(key)
+        _evictions += 1
+
+
+def render_cache_stats() -> dict:
+    """Per-engine hit rates plus cache size."""
+    with _lock:
+        entries = _load_index()["entries"]
+        engines = {}
+        for engine, s in _stats.items():
+            total = s["hits"] + s["misses"]
+            engines[engine] = {**s, "hit_rate": round(s["hits"] / total, 3) if total else None}
+        return {
+            "enabled": ENABLED,
+            "entries": len(entries),
+            "bytes": sum(e.get("bytes", 0) for e in entries.values()),
+            "max_bytes": MAX_BYTES,
+            "evictions": _evictions,
+            "engines": engines,
+        }
+
+
+def clear_render_cache() -> int:
+    """Remove every cached render. Returns the number of entries dropped."""
+    with _lock:
+        entries = _load_index()["entries"]
+        count = len(entries)
+        for key in list(entries):
+            _drop(key)
+        _save_index()
+    return count
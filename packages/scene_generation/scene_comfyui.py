@@ -3,23 +3,23 @@
 import asyncio
 import json
 import logging
-import shutil
 from pathlib import Path
 
 from packages.core.config import BASE_PATH, COMFYUI_URL, COMFYUI_OUTPUT_DIR, COMFYUI_INPUT_DIR
+from packages.core.input_staging import stage_input
+from packages.core.preemption import finish, was_cancelled
+
+from . import render_cache
 
 logger = logging.getLogger(__name__)
 
 
 async def copy_to_comfyui_input(image_path: str) -> str:
-    """Copy source image to ComfyUI input dir, return the filename."""
+    """Stage source image in ComfyUI input dir (content-addressed), return the filename."""
     src = Path(image_path)
     if not src.is_absolute():
         src = BASE_PATH / image_path
-    dest = COMFYUI_INPUT_DIR / src.name
-    if not dest.exists():
-        shutil.copy2(str(src), str(dest))
-    return src.name
+    return await asyncio.to_thread(stage_input, src)
 
 
 def is_source_already_queued(source_name: str, comfyui_url: str | None = None) -> str | None:
@@ -53,13 +53,24 @@ def is_source_already_queued(source_name: str, comfyui_url: str | None = None) -
 
 
 async def poll_comfyui_completion(prompt_id: str, timeout_seconds: int = 1800, comfyui_url: str | None = None) -> dict:
-    """Poll ComfyUI /history until the prompt completes or times out."""
+    """Poll ComfyUI /history until the prompt completes or times out.
+
+    Render-cache prompt ids resolve immediately to the stored outputs. Returns
+    status "cancelled" once the prompt's render scope has been cancelled.
+    """
     import urllib.request
     import time as _time
+    if render_cache.is_cached_id(prompt_id):
+        outputs = render_cache.cached_outputs(prompt_id)
+        if outputs:
+            return {"status": "completed", "output_files": outputs, "cached": True}
+        return {"status": "error", "output_files": [], "error": "Render cache entry evicted"}
     url = comfyui_url or COMFYUI_URL
     start = _time.time()
     _not_found_count = 0
     while (_time.time() - start) < timeout_seconds:
+        if was_cancelled(prompt_id):
+            return {"status": "cancelled", "output_files": [], "error": "Render cancelled"}
         try:
             req = urllib.request.Request(f"{url}/history/{prompt_id}")
             resp = urllib.request.urlopen(req, timeout=10)
@@ -96,6 +107,7 @@ async def poll_comfyui_completion(prompt_id: str, timeout_seconds: int = 1800, c
                     for msg in msgs:
                         if isinstance(msg, list) and len(msg) >= 2 and "error" in str(msg[0]).lower():
                             err_detail = str(msg[1])[:200]
+                    finish(prompt_id, ok=False)
                     return {"status": "error", "output_files": [], "error": err_detail or "ComfyUI execution error"}
                 outputs = entry.get("outputs", {})
                 videos = []
@@ -123,6 +135,8 @@ async def poll_comfyui_completion(prompt_id: str, timeout_seconds: int = 1800, c
                         videos = [Path(f).name for f in prompt_files if f.endswith((".mp4", ".webm"))]
                     except Exception:
                         pass
+                render_cache.store(prompt_id, videos)
+                finish(prompt_id)
                 return {"status": "completed", "output_files": videos}
         except Exception:
             pass
@@ -4,17 +4,21 @@ Split from router.py for readability.
 """
 
 import asyncio
+import base64
 import json
 import logging
+import os
 import uuid
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 
 from packages.core.config import BASE_PATH, COMFYUI_OUTPUT_DIR, COMFYUI_URL
 from packages.core.db import connect_direct, get_char_project_map
-from packages.core.auth import get_user_projects
+from packages.core import job_queue, media, preemption
+from packages.core.auth import TTLCache, get_user_projects
+from packages.core.project_versions import not_modified, project_etag
 from packages.core.events import event_bus, SCENE_UPDATED, SHOT_UPDATED, SHOT_GENERATED, KEYFRAME_UPDATED
 from packages.core.models import (
     SceneCreateRequest, ShotCreateRequest, ShotUpdateRequest,
@@ -38,6 +42,18 @@ logger = logging.getLogger(__name__)
 # Concurrency guard: only one scene generation at a time (GPU constraint)
 _scene_gen_semaphore = asyncio.Semaphore(1)
 
+# scene_id → project_id (scenes never move between projects)
+_scene_projects = TTLCache(maxsize=10000, ttl=3600)
+
+# Max scenes per bulk GET /scenes?ids= request
+MAX_BULK_SCENES = 200
+
+# Job queue kinds owned by this module
+GENERATE_ALL_JOB = "scene.generate_all"
+KEYFRAME_BLITZ_JOB = "scene.keyframe_blitz"
+# How long keyframe-blitz?wait=true holds the request before answering 202 with the job id
+KEYFRAME_BLITZ_WAIT_S = float(os.getenv("KEYFRAME_BLITZ_WAIT_S", "600"))
+
 
 async def _scene_content_gate(request: Request, allowed_projects: list[int] = Depends(get_user_projects)):
     """Router-level dependency: block access to scenes/projects the user can't access.
@@ -52,15 +68,19 @@ async def _scene_content_gate(request: Request, allowed_projects: list[int] = De
             sid = uuid.UUID(scene_id)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid scene_id")
-        conn = await connect_direct()
-        try:
-            project_id = await conn.fetchval(
-                "SELECT project_id FROM scenes WHERE id = $1", sid
-            )
-        finally:
-            await conn.close()
+        project_id = _scene_projects.get(sid)
+        if project_id is None:
+            conn = await connect_direct()
+            try:
+                project_id = await conn.fetchval(
+                    "SELECT project_id FROM scenes WHERE id = $1", sid
+                )
+            finally:
+                await conn.close()
         if project_id is None:
             raise HTTPException(status_code=404, detail="Scene not found")
+        _scene_projects.set(sid, project_id)
+        request.state.scene_project_id = project_id
         if project_id not in allowed_projects:
             raise HTTPException(status_code=403, detail="Access denied to this project")
         return
@@ -79,66 +99,185 @@ async def _scene_content_gate(request: Request, allowed_projects: list[int] = De
 router = APIRouter(dependencies=[Depends(_scene_content_gate)])
 
 
+_SCENE_SORT_KEY = (
+    "COALESCE(e.episode_number, 2147483647), COALESCE(s.scene_number, 2147483647), "
+    "COALESCE(s.created_at, 'epoch'), s.id"
+)
+
+_SCENE_LIST_SQL = f"""
+    SELECT s.id, s.project_id, s.scene_number, s.title, s.description, s.location, s.time_of_day,
+           s.weather, s.mood, s.generation_status, s.target_duration_seconds,
+           s.actual_duration_seconds, s.total_shots, s.completed_shots,
+           s.final_video_path, s.created_at,
+           s.audio_track_id, s.audio_track_name, s.audio_track_artist,
+           s.audio_preview_url, s.audio_fade_in, s.audio_fade_out, s.audio_start_offset,
+           s.audio_auto_duck, s.audio_generation_mode, s.audio_source_playlist_id,
+           s.episode_id, e.title as episode_title, e.episode_number,
+           COALESCE(sc.shot_count, 0) AS shot_count, sc.status_counts,
+           COALESCE(e.episode_number, 2147483647) AS k_episode,
+           COALESCE(s.scene_number, 2147483647) AS k_scene,
+           COALESCE(s.created_at, 'epoch') AS k_created
+    FROM scenes s
+    LEFT JOIN episodes e ON s.episode_id = e.id
+    LEFT JOIN LATERAL (
+        SELECT SUM(n)::int AS shot_count, jsonb_object_agg(st, n) AS status_counts
+        FROM (
+            SELECT COALESCE(status, 'pending') AS st, COUNT(*) AS n
+            FROM shots WHERE scene_id = s.id GROUP BY 1
+        ) g
+    ) sc ON TRUE
+    WHERE s.project_id = $1 {{keyset}}
+    ORDER BY {_SCENE_SORT_KEY}
+    {{limit}}
+"""
+
+
+def _encode_cursor(r) -> str:
+    raw = json.dumps([r["k_episode"], r["k_scene"], r["k_created"].isoformat(), str(r["id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    from datetime import datetime
+    try:
+        ep, sn, created, sid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(ep), int(sn), datetime.fromisoformat(created), uuid.UUID(sid)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _scene_summary(r) -> dict:
+    status_counts = r["status_counts"]
+    if isinstance(status_counts, str):
+        status_counts = json.loads(status_counts)
+    scene_data = {
+        "id": str(r["id"]), "project_id": r["project_id"],
+        "scene_number": r["scene_number"],
+        "title": r["title"], "description": r["description"],
+        "location": r["location"], "time_of_day": r["time_of_day"],
+        "weather": r["weather"], "mood": r["mood"],
+        "generation_status": r["generation_status"] or "draft",
+        "episode_id": str(r["episode_id"]) if r["episode_id"] else None,
+        "episode_title": r["episode_title"],
+        "episode_number": r["episode_number"],
+        "target_duration_seconds": r["target_duration_seconds"],
+        "actual_duration_seconds": r["actual_duration_seconds"],
+        "total_shots": r["shot_count"],
+        "completed_shots": r["completed_shots"] or 0,
+        "shot_status_counts": status_counts or {},
+        "final_video_path": r["final_video_path"],
+        "created_at": r["created_at"].isoformat() if r["created_at"] else None,
+    }
+    if r["audio_track_id"]:
+        scene_data["audio"] = {
+            "track_id": r["audio_track_id"],
+            "track_name": r["audio_track_name"],
+            "track_artist": r["audio_track_artist"],
+            "preview_url": r["audio_preview_url"],
+            "fade_in": r["audio_fade_in"],
+            "fade_out": r["audio_fade_out"],
+            "start_offset": r["audio_start_offset"],
+            "auto_duck": r["audio_auto_duck"] or False,
+            "generation_mode": r["audio_generation_mode"],
+            "source_playlist_id": r["audio_source_playlist_id"],
+        }
+    return scene_data
+
+
 @router.get("/scenes")
-async def list_scenes(project_id: int, allowed_projects: list[int] = Depends(get_user_projects)):
-    """List scenes for a project."""
+async def list_scenes(
+    request: Request,
+    response: Response,
+    project_id: int | None = None,
+    ids: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    allowed_projects: list[int] = Depends(get_user_projects),
+):
+    """List scenes for a project, or fetch full scene detail in bulk.
+
+    ?project_id=X lists scene summaries with shot counts per status. Pass
+    limit (and the returned next_cursor) for keyset pagination.
+    ?ids=a,b,c returns the full detail (with shots) of each accessible scene.
+    Both honour If-None-Match against a per-project change counter.
+    """
+    if ids is not None:
+        return await _bulk_scenes(request, response, ids, allowed_projects)
+    if project_id is None:
+        raise HTTPException(status_code=400, detail="project_id or ids is required")
     if project_id not in allowed_projects:
         raise HTTPException(status_code=403, detail="Access denied to this project")
+
+    cached = not_modified(request, response, project_etag(project_id, "list", limit, cursor))
+    if cached:
+        return cached
+
+    params: list = [project_id]
+    keyset = ""
+    if cursor:
+        params.extend(_decode_cursor(cursor))
+        keyset = f"AND ({_SCENE_SORT_KEY}) > ($2, $3, $4, $5)"
+    limit_sql = ""
+    if limit:
+        params.append(limit + 1)
+        limit_sql = f"LIMIT ${len(params)}"
+
     conn = await connect_direct()
     try:
-        rows = await conn.fetch("""
-            SELECT s.id, s.project_id, s.scene_number, s.title, s.description, s.location, s.time_of_day,
-                   s.weather, s.mood, s.generation_status, s.target_duration_seconds,
-                   s.actual_duration_seconds, s.total_shots, s.completed_shots,
-                   s.final_video_path, s.created_at,
-                   s.audio_track_id, s.audio_track_name, s.audio_track_artist,
-                   s.audio_preview_url, s.audio_fade_in, s.audio_fade_out, s.audio_start_offset,
-                   s.audio_auto_duck, s.audio_generation_mode, s.audio_source_playlist_id,
-                   s.episode_id, e.title as episode_title, e.episode_number
-            FROM scenes s
-            LEFT JOIN episodes e ON s.episode_id = e.id
-            WHERE s.project_id = $1
-            ORDER BY e.episode_number NULLS LAST, s.scene_number NULLS LAST, s.created_at
-        """, project_id)
-        scenes = []
-        for r in rows:
-            shot_count = await conn.fetchval(
-                "SELECT COUNT(*) FROM shots WHERE scene_id = $1", r["id"])
-            scene_data = {
-                "id": str(r["id"]), "project_id": r["project_id"],
-                "scene_number": r["scene_number"],
-                "title": r["title"], "description": r["description"],
-                "location": r["location"], "time_of_day": r["time_of_day"],
-                "weather": r["weather"], "mood": r["mood"],
-                "generation_status": r["generation_status"] or "draft",
-                "episode_id": str(r["episode_id"]) if r["episode_id"] else None,
-                "episode_title": r["episode_title"],
-                "episode_number": r["episode_number"],
-                "target_duration_seconds": r["target_duration_seconds"],
-                "actual_duration_seconds": r["actual_duration_seconds"],
-                "total_shots": shot_count,
-                "completed_shots": r["completed_shots"] or 0,
-                "final_video_path": r["final_video_path"],
-                "created_at": r["created_at"].isoformat() if r["created_at"] else None,
-            }
-            if r["audio_track_id"]:
-                scene_data["audio"] = {
-                    "track_id": r["audio_track_id"],
-                    "track_name": r["audio_track_name"],
-                    "track_artist": r["audio_track_artist"],
-                    "preview_url": r["audio_preview_url"],
-                    "fade_in": r["audio_fade_in"],
-                    "fade_out": r["audio_fade_out"],
-                    "start_offset": r["audio_start_offset"],
-                    "auto_duck": r["audio_auto_duck"] or False,
-                    "generation_mode": r["audio_generation_mode"],
-                    "source_playlist_id": r["audio_source_playlist_id"],
-                }
-            scenes.append(scene_data)
-        return {"scenes": scenes}
+        rows = await conn.fetch(_SCENE_LIST_SQL.format(keyset=keyset, limit=limit_sql), *params)
     finally:
         await conn.close()
 
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1])
+    return {"scenes": [_scene_summary(r) for r in rows], "next_cursor": next_cursor}
+
+
+async def _bulk_scenes(request: Request, response: Response, ids: str,
+                       allowed_projects: list[int]) -> dict | Response:
+    """Full detail for a batch of scenes: two queries regardless of batch size."""
+    try:
+        scene_ids = list(dict.fromkeys(uuid.UUID(i.strip()) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid scene id in ids")
+    if len(scene_ids) > MAX_BULK_SCENES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_SCENES} ids per request")
+
+    cached = not_modified(request, response, project_etag(
+        allowed_projects, "bulk", sorted(str(i) for i in scene_ids)))
+    if cached:
+        return cached
+
+    conn = await connect_direct()
+    try:
+        scenes = await conn.fetch("""
+            SELECT s.*, p.name as project_name
+            FROM scenes s LEFT JOIN projects p ON s.project_id = p.id
+            WHERE s.id = ANY($1::uuid[]) AND s.project_id = ANY($2::int[])
+        """, scene_ids, allowed_projects)
+        shots = await conn.fetch(
+            "SELECT * FROM shots WHERE scene_id = ANY($1::uuid[]) ORDER BY scene_id, shot_number",
+            [sc["id"] for sc in scenes],
+        )
+    finally:
+        await conn.close()
+
+    shots_by_scene: dict = {}
+    for sh in shots:
+        shots_by_scene.setdefault(sh["scene_id"], []).append(_shot_detail(sh))
+    by_id = {sc["id"]: sc for sc in scenes}
+    for sc in scenes:
+        _scene_projects.set(sc["id"], sc["project_id"])
+    return {
+        "scenes": [
+            _scene_detail(by_id[sid], shots_by_scene.get(sid, []))
+            for sid in scene_ids if sid in by_id
+        ],
+        "missing": [str(sid) for sid in scene_ids if sid not in by_id],
+    }
+
 
 @router.post("/scenes")
 async def create_scene(body: SceneCreateRequest):
@@ -605,10 +744,82 @@ async def get_shot_recommendations(scene_id: str, top_n: int = 5):
         await conn.close()
 
 
+def _shot_detail(sh) -> dict:
+    return {
+        "id": str(sh["id"]), "shot_number": sh["shot_number"],
+        "shot_type": sh["shot_type"], "camera_angle": sh["camera_angle"],
+        "duration_seconds": float(sh["duration_seconds"]) if sh["duration_seconds"] else 3.0,
+        "characters_present": sh["characters_present"] or [],
+        "motion_prompt": sh["motion_prompt"] or sh["generation_prompt"],
+        "source_image_path": sh["source_image_path"],
+        "source_video_path": sh.get("source_video_path"),
+        "first_frame_path": sh["first_frame_path"],
+        "last_frame_path": sh["last_frame_path"],
+        "output_video_path": sh["output_video_path"],
+        "comfyui_prompt_id": sh["comfyui_prompt_id"],
+        "status": sh["status"] or "pending",
+        "seed": sh["seed"], "steps": sh["steps"],
+        "use_f1": sh["use_f1"] or False,
+        "quality_score": sh["quality_score"],
+        "error_message": sh["error_message"],
+        "generation_time_seconds": sh["generation_time_seconds"],
+        "dialogue_text": sh.get("dialogue_text"),
+        "dialogue_character_slug": sh.get("dialogue_character_slug"),
+        "video_engine": sh.get("video_engine") or "framepack",
+        "transition_type": sh.get("transition_type") or "dissolve",
+        "transition_duration": float(sh.get("transition_duration") or 0.3),
+        "generation_prompt": sh.get("generation_prompt"),
+        "generation_negative": sh.get("generation_negative"),
+        "clip_score": sh.get("clip_score"),
+        "clip_variety_score": sh.get("clip_variety_score"),
+        "sfx_audio_path": sh.get("sfx_audio_path"),
+        "voice_audio_path": sh.get("voice_audio_path"),
+        "lora_name": sh.get("lora_name"),
+        "lora_strength": sh.get("lora_strength"),
+    }
+
+
+def _scene_detail(scene, shot_list: list[dict]) -> dict:
+    return {
+        "id": str(scene["id"]), "project_id": scene["project_id"],
+        "project_name": scene["project_name"],
+        "title": scene["title"], "description": scene["description"],
+        "location": scene["location"], "time_of_day": scene["time_of_day"],
+        "weather": scene["weather"], "mood": scene["mood"],
+        "generation_status": scene["generation_status"] or "draft",
+        "target_duration_seconds": scene["target_duration_seconds"],
+        "actual_duration_seconds": scene["actual_duration_seconds"],
+        "total_shots": len(shot_list),
+        "completed_shots": scene["completed_shots"] or 0,
+        "final_video_path": scene["final_video_path"],
+        "current_generating_shot_id": str(scene["current_generating_shot_id"]) if scene["current_generating_shot_id"] else None,
+        "narrative_text": scene["narrative_text"],
+        "emotional_tone": scene["emotional_tone"],
+        "camera_directions": scene["camera_directions"],
+        "audio": {
+            "track_id": scene["audio_track_id"],
+            "track_name": scene["audio_track_name"],
+            "track_artist": scene["audio_track_artist"],
+            "preview_url": scene["audio_preview_url"],
+            "fade_in": scene["audio_fade_in"],
+            "fade_out": scene["audio_fade_out"],
+            "start_offset": scene["audio_start_offset"],
+            "auto_duck": scene.get("audio_auto_duck", False),
+            "generation_mode": scene.get("audio_generation_mode"),
+            "source_playlist_id": scene.get("audio_source_playlist_id"),
+        } if scene["audio_track_id"] else None,
+        "shots": shot_list,
+    }
+
+
 @router.get("/scenes/{scene_id}")
-async def get_scene(scene_id: str):
+async def get_scene(scene_id: str, request: Request, response: Response):
     """Get scene detail with all shots."""
     sid = uuid.UUID(scene_id)
+    cached = not_modified(request, response, project_etag(
+        request.state.scene_project_id, "scene", scene_id))
+    if cached:
+        return cached
     conn = await connect_direct()
     try:
         scene = await conn.fetchrow("""
@@ -620,70 +831,7 @@ async def get_scene(scene_id: str):
             raise HTTPException(status_code=404, detail="Scene not found")
         shots = await conn.fetch(
             "SELECT * FROM shots WHERE scene_id = $1 ORDER BY shot_number", sid)
-        shot_list = []
-        for sh in shots:
-            shot_list.append({
-                "id": str(sh["id"]), "shot_number": sh["shot_number"],
-                "shot_type": sh["shot_type"], "camera_angle": sh["camera_angle"],
-                "duration_seconds": float(sh["duration_seconds"]) if sh["duration_seconds"] else 3.0,
-                "characters_present": sh["characters_present"] or [],
-                "motion_prompt": sh["motion_prompt"] or sh["generation_prompt"],
-                "source_image_path": sh["source_image_path"],
-                "source_video_path": sh.get("source_video_path"),
-                "first_frame_path": sh["first_frame_path"],
-                "last_frame_path": sh["last_frame_path"],
-                "output_video_path": sh["output_video_path"],
-                "comfyui_prompt_id": sh["comfyui_prompt_id"],
-                "status": sh["status"] or "pending",
-                "seed": sh["seed"], "steps": sh["steps"],
-                "use_f1": sh["use_f1"] or False,
-                "quality_score": sh["quality_score"],
-                "error_message": sh["error_message"],
-                "generation_time_seconds": sh["generation_time_seconds"],
-                "dialogue_text": sh.get("dialogue_text"),
-                "dialogue_character_slug": sh.get("dialogue_character_slug"),
-                "video_engine": sh.get("video_engine") or "framepack",
-                "transition_type": sh.get("transition_type") or "dissolve",
-                "transition_duration": float(sh.get("transition_duration") or 0.3),
-                "generation_prompt": sh.get("generation_prompt"),
-                "generation_negative": sh.get("generation_negative"),
-                "clip_score": sh.get("clip_score"),
-                "clip_variety_score": sh.get("clip_variety_score"),
-                "sfx_audio_path": sh.get("sfx_audio_path"),
-                "voice_audio_path": sh.get("voice_audio_path"),
-                "lora_name": sh.get("lora_name"),
-                "lora_strength": sh.get("lora_strength"),
-            })
-        return {
-            "id": str(scene["id"]), "project_id": scene["project_id"],
-            "project_name": scene["project_name"],
-            "title": scene["title"], "description": scene["description"],
-            "location": scene["location"], "time_of_day": scene["time_of_day"],
-            "weather": scene["weather"], "mood": scene["mood"],
-            "generation_status": scene["generation_status"] or "draft",
-            "target_duration_seconds": scene["target_duration_seconds"],
-            "actual_duration_seconds": scene["actual_duration_seconds"],
-            "total_shots": len(shot_list),
-            "completed_shots": scene["completed_shots"] or 0,
-            "final_video_path": scene["final_video_path"],
-            "current_generating_shot_id": str(scene["current_generating_shot_id"]) if scene["current_generating_shot_id"] else None,
-            "narrative_text": scene["narrative_text"],
-            "emotional_tone": scene["emotional_tone"],
-            "camera_directions": scene["camera_directions"],
-            "audio": {
-                "track_id": scene["audio_track_id"],
-                "track_name": scene["audio_track_name"],
-                "track_artist": scene["audio_track_artist"],
-                "preview_url": scene["audio_preview_url"],
-                "fade_in": scene["audio_fade_in"],
-                "fade_out": scene["audio_fade_out"],
-                "start_offset": scene["audio_start_offset"],
-                "auto_duck": scene.get("audio_auto_duck", False),
-                "generation_mode": scene.get("audio_generation_mode"),
-                "source_playlist_id": scene.get("audio_source_playlist_id"),
-            } if scene["audio_track_id"] else None,
-            "shots": shot_list,
-        }
+        return _scene_detail(scene, [_shot_detail(sh) for sh in shots])
     finally:
         await conn.close()
 
@@ -727,6 +875,9 @@ async def delete_scene(scene_id: str):
     try:
         await conn.execute("DELETE FROM shots WHERE scene_id = $1", sid)
         await conn.execute("DELETE FROM scenes WHERE id = $1", sid)
+        _scene_projects.pop(sid)
+        from .variety_index import remove_scene
+        remove_scene(scene_id)
         return {"message": "Scene deleted"}
     finally:
         await conn.close()
@@ -825,6 +976,8 @@ async def delete_shot(scene_id: str, shot_id: str):
     conn = await connect_direct()
     try:
         await conn.execute("DELETE FROM shots WHERE id = $1", shid)
+        from .variety_index import remove_shot
+        remove_shot(shot_id)
         return {"message": "Shot deleted"}
     finally:
         await conn.close()
@@ -1030,9 +1183,13 @@ async def generate_scene_endpoint(scene_id: str, auto_approve: bool = False):
 
 
 @router.get("/scenes/{scene_id}/status")
-async def get_scene_status(scene_id: str):
+async def get_scene_status(scene_id: str, request: Request, response: Response):
     """Poll generation progress for a scene."""
     sid = uuid.UUID(scene_id)
+    cached = not_modified(request, response, project_etag(
+        request.state.scene_project_id, "status", scene_id))
+    if cached:
+        return cached
     conn = await connect_direct()
     try:
         scene = await conn.fetchrow("""
@@ -1488,31 +1645,59 @@ async def assemble_scene(scene_id: str):
         await conn.close()
 
 
-@router.get("/scenes/{scene_id}/video")
-async def serve_scene_video(scene_id: str):
-    """Serve assembled scene video."""
+async def _scene_media_row(scene_id: str) -> dict | None:
     sid = uuid.UUID(scene_id)
-    conn = await connect_direct()
-    try:
-        path = await conn.fetchval("SELECT final_video_path FROM scenes WHERE id = $1", sid)
-    finally:
-        await conn.close()
+
+    async def fetch():
+        conn = await connect_direct()
+        try:
+            row = await conn.fetchrow(
+                "SELECT project_id, final_video_path, dialogue_audio_path FROM scenes WHERE id = $1",
+                sid,
+            )
+        finally:
+            await conn.close()
+        return (dict(row), row["project_id"]) if row else (None, None)
+
+    return await media.lookup_path("scene", sid, fetch)
+
+
+async def _shot_media_row(shot_id: str) -> dict | None:
+    shid = uuid.UUID(shot_id)
+
+    async def fetch():
+        conn = await connect_direct()
+        try:
+            row = await conn.fetchrow(
+                "SELECT s.project_id, sh.output_video_path, sh.sfx_audio_path "
+                "FROM shots sh JOIN scenes s ON s.id = sh.scene_id WHERE sh.id = $1",
+                shid,
+            )
+        finally:
+            await conn.close()
+        return (dict(row), row["project_id"]) if row else (None, None)
+
+    return await media.lookup_path("shot", shid, fetch)
+
+
+@router.get("/scenes/{scene_id}/video")
+async def serve_scene_video(request: Request, scene_id: str, rendition: str = "full"):
+    """Serve assembled scene video (range-aware; ?rendition=preview|poster for reviewers)."""
+    row = await _scene_media_row(scene_id)
+    path = row["final_video_path"] if row else None
     if not path or not Path(path).exists():
         raise HTTPException(status_code=404, detail="Scene video not found")
-    return FileResponse(path, media_type="video/mp4", filename=f"scene_{scene_id}.mp4")
+    return await media.serve_file(request, path, "video/mp4",
+                                  filename=f"scene_{scene_id}.mp4", rendition=rendition)
 
 
 @router.get("/scenes/{scene_id}/shots/{shot_id}/video")
-async def serve_shot_video(scene_id: str, shot_id: str, with_audio: bool = True):
+async def serve_shot_video(
+    request: Request, scene_id: str, shot_id: str,
+    with_audio: bool = True, rendition: str = "full",
+):
     """Serve individual shot video. Prefers audio-mixed version when available."""
-    shid = uuid.UUID(shot_id)
-    conn = await connect_direct()
-    try:
-        row = await conn.fetchrow(
-            "SELECT output_video_path, sfx_audio_path FROM shots WHERE id = $1", shid
-        )
-    finally:
-        await conn.close()
+    row = await _shot_media_row(shot_id)
     if not row:
         raise HTTPException(status_code=404, detail="Shot not found")
     # Prefer the audio-mixed version (sfx_audio_path) which has video+voice+foley
@@ -1523,21 +1708,18 @@ async def serve_shot_video(scene_id: str, shot_id: str, with_audio: bool = True)
         path = row["output_video_path"]
     if not path:
         raise HTTPException(status_code=404, detail="Shot video not found")
-    return FileResponse(path, media_type="video/mp4", filename=f"shot_{shot_id}.mp4")
+    return await media.serve_file(request, path, "video/mp4",
+                                  filename=f"shot_{shot_id}.mp4", rendition=rendition)
 
 
 @router.get("/scenes/{scene_id}/shots/{shot_id}/audio")
-async def serve_shot_audio(scene_id: str, shot_id: str):
+async def serve_shot_audio(request: Request, scene_id: str, shot_id: str):
     """Serve shot SFX/voice mixed audio file."""
-    shid = uuid.UUID(shot_id)
-    conn = await connect_direct()
-    try:
-        path = await conn.fetchval("SELECT sfx_audio_path FROM shots WHERE id = $1", shid)
-    finally:
-        await conn.close()
+    row = await _shot_media_row(shot_id)
+    path = row["sfx_audio_path"] if row else None
     if not path or not Path(path).exists():
         raise HTTPException(status_code=404, detail="Shot audio not found")
-    return FileResponse(path, media_type="video/mp4", filename=f"shot_{shot_id}_audio.mp4")
+    return await media.serve_file(request, path, "video/mp4", filename=f"shot_{shot_id}_audio.mp4")
 
 
 @router.post("/scenes/{scene_id}/synthesize-dialogue")
@@ -1567,17 +1749,14 @@ async def synthesize_scene_dialogue_endpoint(scene_id: str):
 
 
 @router.get("/scenes/{scene_id}/dialogue-audio")
-async def serve_scene_dialogue_audio(scene_id: str):
+async def serve_scene_dialogue_audio(request: Request, scene_id: str):
     """Serve combined dialogue audio WAV for a scene."""
-    sid = uuid.UUID(scene_id)
-    conn = await connect_direct()
-    try:
-        path = await conn.fetchval("SELECT dialogue_audio_path FROM scenes WHERE id = $1", sid)
-    finally:
-        await conn.close()
+    row = await _scene_media_row(scene_id)
+    path = row["dialogue_audio_path"] if row else None
     if not path or not Path(path).exists():
         raise HTTPException(status_code=404, detail="Scene dialogue audio not found")
-    return FileResponse(path, media_type="audio/wav", filename=f"scene_{scene_id}_dialogue.wav")
+    return await media.serve_file(request, path, "audio/wav",
+                                  filename=f"scene_{scene_id}_dialogue.wav")
 
 
 @router.get("/scenes/{scene_id}/dialogue-status")
@@ -1820,6 +1999,20 @@ async def generate_dialogue_for_scene(scene_id: str):
         await conn.close()
 
 
+@router.get("/scenes/render-cache/stats")
+async def render_cache_stats_endpoint():
+    """Render cache size and per-engine hit rates."""
+    from .render_cache import render_cache_stats
+    return render_cache_stats()
+
+
+@router.delete("/scenes/render-cache")
+async def clear_render_cache_endpoint():
+    """Drop every cached render (forces fresh ComfyUI renders)."""
+    from .render_cache import clear_render_cache
+    return {"cleared": clear_render_cache()}
+
+
 @router.get("/scenes/source-image-stats")
 async def source_image_stats(project_id: int):
     """Get source image effectiveness stats per character for a project."""
@@ -1913,13 +2106,12 @@ async def generate_all_scenes(project_id: int, auto_approve: bool = False, skip_
         if not eligible:
             return {"message": "No scenes to generate", "queued": 0}
 
-        # Check if a generate-all pipeline is already running for this project
+        # Check if a generate-all pipeline is already queued/running for this project
         pipeline_key = f"pipeline_{project_id}"
-        if pipeline_key in _scene_generation_tasks:
-            task = _scene_generation_tasks[pipeline_key]
-            if not task.done():
-                return {"message": "Generation pipeline already running for this project",
-                        "queued": 0}
+        existing = await job_queue.find_job(pipeline_key)
+        if existing:
+            return {"message": "Generation pipeline already running for this project",
+                    "queued": 0, "job_id": existing["id"], "job_status": existing["status"]}
 
         # Reset all eligible shots to pending
         for scene_row in eligible:
@@ -1931,56 +2123,92 @@ async def generate_all_scenes(project_id: int, auto_approve: bool = False, skip_
                 "UPDATE scenes SET completed_shots = 0, "
                 "current_generating_shot_id = NULL WHERE id = $1", sid)
 
-        scene_ids = [r["id"] for r in eligible]
         queued = [{"scene_id": str(r["id"]), "title": r["title"],
                    "episode_number": r["episode_number"],
                    "scene_number": r["scene_number"],
                    "shot_count": r["shot_count"]} for r in eligible]
 
-        async def _flush_comfyui_vram():
-            """Free VRAM between shots to prevent model pile-up."""
-            import aiohttp
-            try:
-                async with aiohttp.ClientSession() as sess:
-                    async with sess.post(
-                        "http://127.0.0.1:8188/free",
-                        json={"unload_models": True, "free_memory": True},
-                        timeout=aiohttp.ClientTimeout(total=10),
-                    ) as resp:
-                        if resp.status == 200:
-                            logger.info("generate-all: VRAM flushed between shots")
-            except Exception as e:
-                logger.debug(f"generate-all: VRAM flush failed (non-fatal): {e}")
-
-        async def _sequential_pipeline(ordered_scene_ids, _auto_approve, _skip_pp):
-            """Generate scenes one at a time in order."""
-            for sid in ordered_scene_ids:
-                scene_id_str = str(sid)
-                try:
-                    await _flush_comfyui_vram()
-                    async with _scene_gen_semaphore:
-                        logger.info(f"generate-all: starting scene {scene_id_str}")
-                        await generate_scene(sid, auto_approve=_auto_approve, skip_postprocess=_skip_pp)
-                        logger.info(f"generate-all: completed scene {scene_id_str}")
-                except Exception as e:
-                    logger.error(f"generate-all: scene {scene_id_str} failed: {e}")
-                    # Continue to next scene on failure
-                _scene_generation_tasks.pop(scene_id_str, None)
-            _scene_generation_tasks.pop(pipeline_key, None)
-            logger.info(f"generate-all: pipeline finished for project {project_id}")
-
-        task = asyncio.create_task(_sequential_pipeline(scene_ids, auto_approve, skip_postprocess))
-        _scene_generation_tasks[pipeline_key] = task
+        job = await job_queue.enqueue(GENERATE_ALL_JOB, {
+            "project_id": project_id,
+            "scene_ids": [q["scene_id"] for q in queued],
+            "auto_approve": auto_approve,
+            "skip_postprocess": skip_postprocess,
+        }, dedupe_key=pipeline_key)
 
         return {
             "message": f"Queued {len(queued)} scenes for sequential generation",
             "queued": len(queued),
             "scenes": queued,
+            "job_id": job["id"],
         }
     finally:
         await conn.close()
 
 
+async def _flush_comfyui_vram():
+    """Free VRAM between shots to prevent model pile-up."""
+    import aiohttp
+    try:
+        async with aiohttp.ClientSession() as sess:
+            async with sess.post(
+                f"{COMFYUI_URL}/free",
+                json={"unload_models": True, "free_memory": True},
+                timeout=aiohttp.ClientTimeout(total=10),
+            ) as resp:
+                if resp.status == 200:
+                    logger.info("generate-all: VRAM flushed between shots")
+    except Exception as e:
+        logger.debug(f"generate-all: VRAM flush failed (non-fatal): {e}")
+
+
+@job_queue.job_kind(GENERATE_ALL_JOB, concurrency=1, max_attempts=2, backoff_s=60)
+async def _generate_all_job(job):
+    """Generate a project's scenes one at a time, in the order they were queued.
+
+    Completed scenes are skipped, so a retried or requeued pipeline resumes
+    where the previous attempt stopped.
+    """
+    project_id = job.payload["project_id"]
+    with preemption.render_scope(f"pipeline:{project_id}", preemption.BATCH):
+        return await _generate_all_scenes(job, project_id, job.payload["scene_ids"])
+
+
+async def _generate_all_scenes(job, project_id: int, scene_ids: list[str]) -> dict:
+    done, failed = [], []
+    for i, scene_id_str in enumerate(scene_ids):
+        if preemption.is_cancelled():
+            break
+        conn = await connect_direct()
+        try:
+            status = await conn.fetchval(
+                "SELECT generation_status FROM scenes WHERE id = $1", uuid.UUID(scene_id_str))
+        finally:
+            await conn.close()
+        if status is None or status == "completed":
+            done.append(scene_id_str)
+            continue
+        await job.progress(scene_index=i + 1, scene_total=len(scene_ids),
+                           current_scene_id=scene_id_str, completed=len(done), failed=len(failed))
+        try:
+            await _flush_comfyui_vram()
+            async with _scene_gen_semaphore:
+                logger.info(f"generate-all: starting scene {scene_id_str}")
+                await generate_scene(uuid.UUID(scene_id_str),
+                                     auto_approve=job.payload.get("auto_approve", False),
+                                     skip_postprocess=job.payload.get("skip_postprocess", False))
+                logger.info(f"generate-all: completed scene {scene_id_str}")
+            done.append(scene_id_str)
+        except Exception as e:
+            logger.error(f"generate-all: scene {scene_id_str} failed: {e}")
+            failed.append(scene_id_str)
+            # Continue to next scene on failure
+        _scene_generation_tasks.pop(scene_id_str, None)
+    logger.info(f"generate-all: pipeline finished for project {project_id}")
+    await job.progress(scene_index=len(scene_ids), scene_total=len(scene_ids),
+                       current_scene_id=None, completed=len(done), failed=len(failed))
+    return {"completed": done, "failed": failed}
+
+
 @router.post("/scenes/cancel-generation")
 async def cancel_generation(project_id: int = None, scene_id: str = None):
     """Cancel running generation pipeline(s).
@@ -1989,24 +2217,29 @@ async def cancel_generation(project_id: int = None, scene_id: str = None):
     - scene_id: cancel a single scene generation task
     - Neither: cancel ALL running pipelines
 
-    Also interrupts ComfyUI, resets generating shots, and force-releases the lock.
+    Scene/project cancels only pull that work's prompts off ComfyUI (dequeue
+    pending, interrupt running) via its render scope. Cancel-all also clears
+    the whole ComfyUI queue and force-releases the scene lock.
     """
     from packages.scene_generation.builder import signal_cancel, force_release_scene_lock
+    from packages.core.executors import offload
     cancelled = []
+    scopes = []
 
     if scene_id:
+        scopes = [f"scene:{uuid.UUID(scene_id)}", f"blitz:{scene_id}"]
         task = _scene_generation_tasks.get(scene_id)
         if task and not task.done():
             task.cancel()
             cancelled.append(scene_id)
         _scene_generation_tasks.pop(scene_id, None)
+        for job_id in await job_queue.cancel_jobs([KEYFRAME_BLITZ_JOB], dedupe_key=f"blitz_{scene_id}"):
+            cancelled.append(f"job_{job_id}")
     elif project_id:
+        scopes = [f"pipeline:{project_id}"]
         pipeline_key = f"pipeline_{project_id}"
-        task = _scene_generation_tasks.get(pipeline_key)
-        if task and not task.done():
-            task.cancel()
-            cancelled.append(pipeline_key)
-        _scene_generation_tasks.pop(pipeline_key, None)
+        for job_id in await job_queue.cancel_jobs([GENERATE_ALL_JOB], dedupe_key=pipeline_key):
+            cancelled.append(f"{pipeline_key} (job {job_id})")
         # Also pause any pending shots for this project
         conn = await connect_direct()
         try:
@@ -2024,44 +2257,69 @@ async def cancel_generation(project_id: int = None, scene_id: str = None):
                 task.cancel()
                 cancelled.append(key)
         _scene_generation_tasks.clear()
+        for job_id in await job_queue.cancel_jobs([GENERATE_ALL_JOB, KEYFRAME_BLITZ_JOB]):
+            cancelled.append(f"job_{job_id}")
+
+    # Pull the cancelled work's renders off the GPU
+    reclaimed = 0.0
+    for scope in scopes:
+        result = await offload(preemption.cancel_scope, scope, "cancel-generation")
+        if result:
+            reclaimed += result["gpu_seconds_reclaimed"]
+            cancelled.append(f"{scope}: {result['dequeued']} dequeued, {result['interrupted']} interrupted")
+
+    if not scene_id and not project_id:
+        # Signal cancellation to any running generation loops
+        signal_cancel()
+        for result in await offload(preemption.cancel_all, "cancel-generation"):
+            reclaimed += result["gpu_seconds_reclaimed"]
+
+        # Interrupt ComfyUI queue (stop running + clear pending)
+        try:
+            import urllib.request
+            urllib.request.urlopen(
+                urllib.request.Request(f"{COMFYUI_URL}/interrupt", method="POST"),
+                timeout=5,
+            )
+            req = urllib.request.Request(
+                f"{COMFYUI_URL}/queue",
+                data=json.dumps({"clear": True}).encode(),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            urllib.request.urlopen(req, timeout=5)
+            cancelled.append("comfyui_interrupted")
+        except Exception as e:
+            logger.warning(f"cancel-generation: ComfyUI interrupt failed: {e}")
 
-    # Signal cancellation to any running generation loops
-    signal_cancel()
-
-    # Interrupt ComfyUI queue (stop running + clear pending)
-    try:
-        import urllib.request
-        urllib.request.urlopen(
-            urllib.request.Request(f"{COMFYUI_URL}/interrupt", method="POST"),
-            timeout=5,
-        )
-        req = urllib.request.Request(
-            f"{COMFYUI_URL}/queue",
-            data=json.dumps({"clear": True}).encode(),
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        urllib.request.urlopen(req, timeout=5)
-        cancelled.append("comfyui_interrupted")
-    except Exception as e:
-        logger.warning(f"cancel-generation: ComfyUI interrupt failed: {e}")
-
-    # Reset any stuck 'generating' shots back to 'pending'
+    # Reset stuck 'generating' shots back to 'pending'
     conn = await connect_direct()
     try:
-        result = await conn.execute(
-            "UPDATE shots SET status = 'pending', error_message = NULL "
-            "WHERE status = 'generating'"
-        )
+        if scene_id:
+            result = await conn.execute(
+                "UPDATE shots SET status = 'pending', error_message = NULL "
+                "WHERE status = 'generating' AND scene_id = $1", uuid.UUID(scene_id))
+        elif project_id:
+            result = await conn.execute(
+                "UPDATE shots SET status = 'pending', error_message = NULL "
+                "WHERE status = 'generating' "
+                "AND scene_id IN (SELECT id FROM scenes WHERE project_id = $1)", project_id)
+        else:
+            result = await conn.execute(
+                "UPDATE shots SET status = 'pending', error_message = NULL "
+                "WHERE status = 'generating'"
+            )
         cancelled.append(f"reset_generating_shots: {result}")
     finally:
         await conn.close()
 
-    # Force-release the scene generation lock
-    force_release_scene_lock()
-    cancelled.append("lock_released")
+    if not scene_id and not project_id:
+        # Force-release the scene generation lock
+        force_release_scene_lock()
+        cancelled.append("lock_released")
 
-    return {"cancelled": cancelled, "remaining_tasks": len(_scene_generation_tasks)}
+    return {"cancelled": cancelled, "remaining_tasks": len(_scene_generation_tasks),
+            "gpu_seconds_reclaimed": round(reclaimed, 1)}
 
 
 @router.post("/scenes/resume-generation")
@@ -2280,21 +2538,52 @@ async def clear_continuity_frames(project_id: int):
 
 
 @router.post("/scenes/{scene_id}/keyframe-blitz")
-async def keyframe_blitz_endpoint(scene_id: str, skip_existing: bool = True):
+async def keyframe_blitz_endpoint(scene_id: str, skip_existing: bool = True, wait: bool = True):
     """Generate keyframe images for all shots in a scene (~18s each).
 
     Pass 1 of two-pass generation: enriches shot specs then generates txt2img
     keyframes. Use this to quickly preview all shots before committing to slow
     video rendering.
+
+    Runs as a queued job. wait=false returns the job immediately (poll
+    GET /api/system/jobs/{job_id}); otherwise the request waits for the result,
+    up to KEYFRAME_BLITZ_WAIT_S, then answers 202 with the job id to poll.
     """
+    conn = await connect_direct()
+    try:
+        # Verify scene exists
+        scene = await conn.fetchrow("SELECT id FROM scenes WHERE id = $1", scene_id)
+        if not scene:
+            raise HTTPException(status_code=404, detail="Scene not found")
+    finally:
+        await conn.close()
+
+    job = await job_queue.enqueue(KEYFRAME_BLITZ_JOB, {
+        "scene_id": scene_id, "skip_existing": skip_existing,
+    }, priority=job_queue.PRIORITY_HIGH, dedupe_key=f"blitz_{scene_id}")
+    if not wait:
+        return {"job_id": job["id"], "status": job["status"], "deduplicated": job["deduplicated"]}
+
+    job_id = job["id"]
+    job = await job_queue.wait_for(job_id, timeout=KEYFRAME_BLITZ_WAIT_S)
+    if job is None:
+        raise HTTPException(status_code=500, detail=f"Keyframe blitz job {job_id} disappeared")
+    if job["status"] not in job_queue.FINISHED:
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"]})
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=500, detail=f"Keyframe blitz {job['status']}: {job.get('error')}")
+    return job["result"]
+
+
+@job_queue.job_kind(KEYFRAME_BLITZ_JOB, concurrency=1, max_attempts=2, backoff_s=30)
+async def _keyframe_blitz_job(job):
+    scene_id = job.payload["scene_id"]
     async with _scene_gen_semaphore:
         conn = await connect_direct()
         try:
-            # Verify scene exists
-            scene = await conn.fetchrow("SELECT id FROM scenes WHERE id = $1", scene_id)
-            if not scene:
-                raise HTTPException(status_code=404, detail="Scene not found")
-            result = await keyframe_blitz(conn, scene_id, skip_existing=skip_existing)
-            return result
+            # Keyframes are previewed by a person — ahead of queued batch video work
+            with preemption.render_scope(f"blitz:{scene_id}", preemption.REVIEW):
+                return await keyframe_blitz(conn, scene_id,
+                                            skip_existing=job.payload.get("skip_existing", True))
         finally:
             await conn.close()
@@ -29,7 +29,9 @@ async def keyframe_blitz(conn, scene_id: str, skip_existing: bool = True,
 
     Pass 1 of two-pass generation. Enriches shot specs via Ollama, then generates
     txt2img keyframes with project checkpoint + character LoRA. Skips shots that
-    already have source_image_path when skip_existing=True.
+    already have source_image_path when skip_existing=True. Shots sharing
+    checkpoint/LoRAs/resolution/negatives are rendered as one ComfyUI prompt
+    (see keyframe_batcher).
 
     When clip_evaluate=True (default), each generated keyframe is scored via
     Echo Brain CLIP endpoint. Scores are advisory — low scores flag shots for
@@ -37,7 +39,8 @@ async def keyframe_blitz(conn, scene_id: str, skip_existing: bool = True,
 
     Returns: {generated: int, skipped: int, failed: int, shots: [...]}
     """
-    from .composite_image import generate_simple_keyframe
+    from .composite_image import build_simple_keyframe_workflow
+    from .keyframe_batcher import KeyframeRequest, run_keyframes
     from .shot_spec import enrich_shot_spec, get_scene_context, get_recent_shots
 
     shots = await conn.fetch(
@@ -76,7 +79,10 @@ async def keyframe_blitz(conn, scene_id: str, skip_existing: bool = True,
     generated = 0
     skipped = 0
     failed = 0
-    shot_results = []
+    shot_results: list[dict | None] = []
+    # Pass A: build every shot's workflow; pass B renders them in batches
+    pending: list[tuple] = []  # (result slot, shot row, prompt)
+    requests: list[KeyframeRequest] = []
 
     for shot in shots:
         shot_dict = dict(shot)
@@ -115,22 +121,36 @@ async def keyframe_blitz(conn, scene_id: str, skip_existing: bool = True,
         if shot.get("image_lora"):
             _extra_loras.append((shot["image_lora"], shot.get("image_lora_strength") or 0.7))
 
-        # Generate keyframe — smart route to least-busy GPU
-        _kf_gpu_url = None
         try:
-            from packages.core.dual_gpu import get_best_gpu_for_task
-            _kf_gpu_url = get_best_gpu_for_task("keyframe")
-        except ImportError:
-            pass
-
-        try:
-            kf_path = await generate_simple_keyframe(
+            workflow = await build_simple_keyframe_workflow(
                 conn, project_id, chars, prompt, checkpoint,
                 shot_type=shot.get("shot_type") or "medium",
                 camera_angle=shot.get("camera_angle") or "eye-level",
                 extra_loras=_extra_loras or None,
-                comfyui_url=_kf_gpu_url,
             )
+        except Exception as e:
+            failed += 1
+            shot_results.append({
+                "shot_id": shot_id, "shot_number": shot["shot_number"],
+                "status": "failed", "error": str(e),
+            })
+            logger.warning(f"Keyframe blitz: shot {shot['shot_number']} failed: {e}")
+            continue
+        pending.append((len(shot_results), shot, prompt))
+        requests.append(KeyframeRequest(key=shot_id, workflow=workflow))
+        shot_results.append(None)  # filled in after rendering
+
+    # Render — compatible shots share one ComfyUI prompt, routed to the least-busy GPU
+    try:
+        paths = await run_keyframes(requests) if requests else {}
+    except Exception as e:
+        logger.warning(f"Keyframe blitz: batch render failed: {e}")
+        paths = {}
+
+    for slot, shot, prompt in pending:
+        shot_id = str(shot["id"])
+        kf_path = paths.get(shot_id)
+        try:
             if kf_path and kf_path.exists():
                 # Update source image AND reset any queued (not yet generating) video job
                 # so it picks up the new keyframe instead of the stale one.
@@ -180,19 +200,19 @@ async def keyframe_blitz(conn, scene_id: str, skip_existing: bool = True,
                 else:
                     logger.info(f"Keyframe blitz: shot {shot['shot_number']} → {kf_path.name}")
 
-                shot_results.append(shot_result)
+                shot_results[slot] = shot_result
             else:
                 failed += 1
-                shot_results.append({
+                shot_results[slot] = {
                     "shot_id": shot_id, "shot_number": shot["shot_number"],
                     "status": "failed", "error": "keyframe returned None",
-                })
+                }
         except Exception as e:
             failed += 1
-            shot_results.append({
+            shot_results[slot] = {
                 "shot_id": shot_id, "shot_number": shot["shot_number"],
                 "status": "failed", "error": str(e),
-            })
+            }
             logger.warning(f"Keyframe blitz: shot {shot['shot_number']} failed: {e}")
 
     return {
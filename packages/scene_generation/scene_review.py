@@ -12,6 +12,7 @@ from pathlib import Path
 from fastapi import APIRouter, HTTPException
 
 from packages.core.db import connect_direct
+from packages.core.events import event_bus, SHOT_QC_RECORDED
 from packages.core.models import VideoReviewRequest, BatchVideoReviewRequest
 
 logger = logging.getLogger(__name__)
@@ -134,6 +135,7 @@ async def review_video(body: VideoReviewRequest):
                        review_feedback = $2
                 WHERE id = $1
             """, shot_id, body.feedback)
+        await event_bus.emit(SHOT_QC_RECORDED, {"shot_id": shot_id})
 
         if body.reject_engine and not body.approved:
             chars = shot["characters_present"]
@@ -210,6 +212,7 @@ async def batch_review_video(body: BatchVideoReviewRequest):
             """, sid, status, body.feedback)
             if "UPDATE 1" in result:
                 updated += 1
+                await event_bus.emit(SHOT_QC_RECORDED, {"shot_id": sid})
 
         # After batch approval, check each affected scene for auto-assembly
         assemblies = []
@@ -367,6 +370,7 @@ async def qc_review_shot(scene_id: str, shot_id: str, auto_fix: bool = False):
             "UPDATE shots SET quality_score = $2 WHERE id = $1",
             shid, review["overall_score"],
         )
+        await event_bus.emit(SHOT_QC_RECORDED, {"shot_id": shid})
 
         return result
     finally:
@@ -140,12 +140,9 @@ async def _run_vision_qc(
             except Exception as _mp_err:
                 logger.debug(f"Shot {shot_id}: motion pattern record failed: {_mp_err}")
 
-        # Trigger LoRA effectiveness refresh so learned params update promptly
-        try:
-            from .lora_effectiveness import refresh_effectiveness
-            await refresh_effectiveness()
-        except Exception as _eff_err:
-            logger.debug(f"Shot {shot_id}: effectiveness refresh failed: {_eff_err}")
+        # Update this shot's LoRA effectiveness group so learned params update promptly
+        from packages.core.events import event_bus, SHOT_QC_RECORDED
+        await event_bus.emit(SHOT_QC_RECORDED, {"shot_id": shot_id})
 
         # All shots go to review — no auto-approve
         review_status = "pending_review"
@@ -2,7 +2,8 @@
 
 After generation completes, compares the output against recent accepted shots
 in the same scene. If similarity exceeds threshold, flags the shot as "too_similar"
-with a suggestion for what to change.
+with a suggestion for what to change. Embeddings are cached by file hash and the
+whole project is searched through variety_index's ANN index (project_matches).
 
 Uses open_clip ViT-B-32 for 512-dim embeddings. Runs on AMD GPU (same as Ollama).
 """
@@ -72,6 +73,38 @@ def embed_image(image_path: str | Path) -> np.ndarray | None:
         return None
 
 
+def embed_images(image_paths: list, batch_size: int = 16) -> list[np.ndarray | None]:
+    """Batch CLIP embeddings (one forward pass per batch_size images). None per unreadable file."""
+    results: list[np.ndarray | None] = [None] * len(image_paths)
+    if not image_paths:
+        return results
+    try:
+        _load_clip()
+        import torch
+        from PIL import Image
+    except Exception as e:
+        logger.warning(f"variety_check: CLIP unavailable: {e}")
+        return results
+
+    device = next(_clip_model.parameters()).device
+    for start in range(0, len(image_paths), batch_size):
+        tensors, slots = [], []
+        for i in range(start, min(start + batch_size, len(image_paths))):
+            try:
+                tensors.append(_clip_preprocess(Image.open(image_paths[i]).convert("RGB")))
+                slots.append(i)
+            except Exception as e:
+                logger.warning(f"variety_check: failed to load {image_paths[i]}: {e}")
+        if not tensors:
+            continue
+        with torch.no_grad():
+            batch = _clip_model.encode_image(torch.stack(tensors).to(device))
+            batch = batch / batch.norm(dim=-1, keepdim=True)
+        for slot, vec in zip(slots, batch.cpu().numpy()):
+            results[slot] = vec
+    return results
+
+
 def embed_text(text: str) -> np.ndarray | None:
     """Compute CLIP text embedding. Returns 512-dim vector or None on failure."""
     try:
@@ -122,6 +155,7 @@ async def check_sequence_variety(
             "most_similar_shot_id": str | None,
             "similarity_score": float,
             "suggestion": str | None,
+            "project_matches": [{"shot_id", "scene_id", "similarity"}, ...],
         }
     """
     result = {
@@ -129,6 +163,7 @@ async def check_sequence_variety(
         "most_similar_shot_id": None,
         "similarity_score": 0.0,
         "suggestion": None,
+        "project_matches": [],
     }
 
     if not output_image_path or not Path(output_image_path).exists():
@@ -144,15 +179,32 @@ async def check_sequence_variety(
         ORDER BY shot_number DESC
         LIMIT 5
     """, scene_id, shot_id)
+    recent_shots = [rs for rs in recent_shots if Path(rs["last_frame_path"]).exists()]
 
-    if not recent_shots:
-        return result
+    # Current + recent frames in one cache-first batch; only changed frames hit CLIP
+    from packages.core.executors import offload
+    from .variety_index import get_embeddings, similarity_matrix, project_index, upsert_shot
 
-    # Embed current shot
-    current_embedding = embed_image(output_image_path)
+    vectors = await offload(
+        get_embeddings, [output_image_path] + [rs["last_frame_path"] for rs in recent_shots],
+    )
+    current_embedding = vectors[0]
     if current_embedding is None:
         return result
 
+    # Project-wide near-duplicates via the ANN index, then index this shot's frame
+    project_id = await conn.fetchval("SELECT project_id FROM scenes WHERE id = $1", scene_id)
+    if project_id is not None:
+        index = await project_index(conn, project_id)
+        await index.refresh()
+        nearest = index.nearest(current_embedding, k=3, exclude={str(shot_id)})
+        result["project_matches"] = [m for m in nearest if m["similarity"] > SIMILARITY_THRESHOLD]
+        upsert_shot(project_id, str(shot_id), str(scene_id), current_embedding)
+
+    refs = [(rs, vec) for rs, vec in zip(recent_shots, vectors[1:]) if vec is not None]
+    if not refs:
+        return result
+
     # Get the must_differ_from list for the current shot
     current_shot = await conn.fetchrow(
         "SELECT must_differ_from FROM shots WHERE id = $1", shot_id
@@ -161,24 +213,12 @@ async def check_sequence_variety(
     if current_shot and current_shot["must_differ_from"]:
         must_differ = {str(uid) for uid in current_shot["must_differ_from"]}
 
-    # Compare against each recent shot
-    max_sim = 0.0
-    most_similar_id = None
-    most_similar_pose = None
-
-    for rs in recent_shots:
-        if not rs["last_frame_path"] or not Path(rs["last_frame_path"]).exists():
-            continue
-
-        ref_embedding = embed_image(rs["last_frame_path"])
-        if ref_embedding is None:
-            continue
-
-        sim = cosine_similarity(current_embedding, ref_embedding)
-        if sim > max_sim:
-            max_sim = sim
-            most_similar_id = rs["shot_id"]
-            most_similar_pose = rs["pose_type"]
+    # Compare against all recent shots at once
+    sims = similarity_matrix(np.stack([vec for _, vec in refs]), current_embedding)[:, 0]
+    best = int(np.argmax(sims))
+    max_sim = max(float(sims[best]), 0.0)
+    most_similar_id = refs[best][0]["shot_id"] if max_sim > 0 else None
+    most_similar_pose = refs[best][0]["pose_type"] if max_sim > 0 else None
 
     result["similarity_score"] = round(max_sim, 4)
     result["most_similar_shot_id"] = most_similar_id
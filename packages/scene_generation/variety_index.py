@@ -0,0 +1,375 @@
+"""Variety index — cached CLIP keyframe embeddings and a project-wide NumPy ANN index.
+
+check_sequence_variety() used to re-embed the new keyframe and all five
+comparison frames on every call, one CLIP forward pass per image, and compare
+them pair by pair in Python. Re-checking a scene after one shot changed paid
+for every frame again. Here:
+
+  - embeddings are cached by SHA-256 of the image file (memory LRU + one .npy
+    per hash under output/variety_cache/), so only new or changed frames reach
+    CLIP, and those go through variety_check.embed_images() as one batch
+  - similarity is a matrix product of L2-normalised rows (cosine = dot)
+  - each project gets an IVFIndex over every completed shot's last frame: a
+    spherical k-means coarse quantiser with ~sqrt(N) lists, searched by probing
+    the NPROBE nearest lists, so a new keyframe is compared with the whole
+    project in roughly O(sqrt(N)) dot products instead of N
+  - the index is updated incrementally: upsert_shot() after a check,
+    SHOT_GENERATED queues a shot's new frame (embedded by refresh() before
+    the next query), and shot/scene deletes remove their vectors. Lists are retrained when the
+    index has doubled since the last training.
+
+Indexes are built lazily on the first check for a project and live in memory;
+the embedding cache makes a rebuild after restart cheap.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from packages.core.config import _PROJECT_DIR
+from packages.core.events import event_bus, SHOT_GENERATED
+from packages.visual_pipeline.wd14 import file_digest
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_DIR = Path(os.getenv("VARIETY_CACHE_DIR", str(_PROJECT_DIR / "output" / "variety_cache")))
+EMBED_DIM = 512
+IVF_MIN_TRAIN = int(os.getenv("VARIETY_IVF_MIN_TRAIN", "256"))
+NPROBE = int(os.getenv("VARIETY_IVF_NPROBE", "4"))
+KMEANS_ITERATIONS = 10
+_MEMORY_CACHE_SIZE = 20000
+
+_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_embed_lock = threading.Lock()
+_stats = {"embed_hits": 0, "embed_disk_hits": 0, "embed_misses": 0, "searches": 0, "candidates": 0}
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise rows (zero rows stay zero)."""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def similarity_matrix(a: np.ndarray, b: np.ndarray | None = None) -> np.ndarray:
+    """Cosine similarity of every row of a against every row of b (or a) — one matmul."""
+    a = normalize(a)
+    return a @ (a if b is None else normalize(b)).T
+
+
+# ---- Embedding cache ----
+
+def _cache_file(digest: str) -> Path:
+    return EMBED_CACHE_DIR / digest[:2] / f"{digest}.npy"
+
+
+def _cache_get(digest: str) -> np.ndarray | None:
+    with _embed_lock:
+        vec = _embeddings.get(digest)
+        if vec is not None:
+            _embeddings.move_to_end(digest)
+            _stats["embed_hits"] += 1
+            return vec
+    path = _cache_file(digest)
+    if path.exists():
+        try:
+            vec = np.load(path)
+        except (OSError, ValueError):
+            return None
+        _cache_put(digest, vec, persist=False)
+        _stats["embed_disk_hits"] += 1
+        return vec
+    return None
+
+
+def _cache_put(digest: str, vec: np.ndarray, persist: bool = True):
+    with _embed_lock:
+        _embeddings[digest] = vec
+        _embeddings.move_to_end(digest)
+        while len(_embeddings) > _MEMORY_CACHE_SIZE:
+            _embeddings.popitem(last=False)
+    if persist:
+        path = _cache_file(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npy")
+        np.save(tmp, vec)
+        os.replace(tmp, path)
+
+
+def get_embeddings(paths: list) -> list[np.ndarray | None]:
+    """Normalised CLIP embeddings for paths; only uncached files are embedded (in one batch)."""
+    from .variety_check import embed_images
+
+    results: list[np.ndarray | None] = [None] * len(paths)
+    missing: dict[str, list[int]] = {}
+    missing_paths: list = []
+    for i, path in enumerate(paths):
+        try:
+            digest = file_digest(Path(path))
+        except OSError:
+            continue
+        vec = _cache_get(digest)
+        if vec is not None:
+            results[i] = vec
+            continue
+        if digest not in missing:
+            missing[digest] = []
+            missing_paths.append(path)
+        missing[digest].append(i)
+
+    if missing_paths:
+        _stats["embed_misses"] += len(missing_paths)
+        for (digest, slots), vec in zip(missing.items(), embed_images(missing_paths)):
+            if vec is None:
+                continue
+            vec = normalize(vec)[0]
+            _cache_put(digest, vec)
+            for slot in slots:
+                results[slot] = vec
+    return results
+
+
+# ---- ANN index ----
+
+class IVFIndex:
+    """Inverted-file index over unit vectors; inner product is cosine similarity.
+
+    Below min_train vectors (or before the first training) search is an exact
+    scan. After training, each vector lives in the list of its nearest
+    centroid and a query scans only the nprobe closest lists.
+    """
+
+    def __init__(self, dim: int = EMBED_DIM, min_train: int = IVF_MIN_TRAIN, nprobe: int = NPROBE):
+        self.dim = dim
+        self.min_train = min_train
+        self.nprobe = nprobe
+        self._vectors = np.zeros((64, dim), dtype=np.float32)
+        self._ids: list[str | None] = []
+        self._rows: dict[str, int] = {}
+        self._free: list[int] = []
+        self.centroids: np.ndarray | None = None
+        self._lists: list[list[int]] = []
+        self._row_list: dict[int, int] = {}
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+
+    def add(self, item_id: str, vector: np.ndarray):
+        """Insert or replace a vector."""
+        vector = normalize(vector)[0]
+        if item_id in self._rows:
+            self.remove(item_id)
+        if self._free:
+            row = self._free.pop()
+            self._ids[row] = item_id
+        else:
+            row = len(self._ids)
+            if row >= len(self._vectors):
+                grown = np.zeros((len(self._vectors) * 2, self.dim), dtype=np.float32)
+                grown[:row] = self._vectors[:row]
+                self._vectors = grown
+            self._ids.append(item_id)
+        self._vectors[row] = vector
+        self._rows[item_id] = row
+        if self.centroids is not None:
+            self._assign(row)
+        if len(self) >= max(self.min_train, 2 * self._trained_size):
+            self.train()
+
+    def remove(self, item_id: str) -> bool:
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+        self._ids[row] = None
+        self._free.append(row)
+        list_no = self._row_list.pop(row, None)
+        if list_no is not None:
+            self._lists[list_no].remove(row)
+        return True
+
+    def _assign(self, row: int):
+        list_no = int(np.argmax(self.centroids @ self._vectors[row]))
+        self._lists[list_no].append(row)
+        self._row_list[row] = list_no
+
+    def train(self, seed: int = 0):
+        """Spherical k-means over the live vectors; rebuilds all inverted lists."""
+        rows = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+        n_lists = max(1, int(np.sqrt(len(rows))))
+        data = self._vectors[rows]
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(len(rows), n_lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]  # keep empty lists' centroids where they were
+            centroids = normalize(sums)
+        labels = np.argmax(data @ centroids.T, axis=1)
+
+        self.centroids = centroids
+        self._lists = [[] for _ in range(n_lists)]
+        self._row_list = {}
+        for row, list_no in zip(rows.tolist(), labels.tolist()):
+            self._lists[list_no].append(row)
+            self._row_list[row] = list_no
+        self._trained_size = len(rows)
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+        nprobe = min(self.nprobe, len(self._lists))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.fromiter((r for p in probes for r in self._lists[p]), dtype=np.int64)
+
+    def search(self, vector: np.ndarray, k: int = 5, exclude=()) -> list[tuple[str, float]]:
+        """Top-k (id, similarity) for vector, best first."""
+        query = normalize(vector)[0]
+        rows = self._candidates(query)
+        if exclude:
+            skip = {self._rows[i] for i in exclude if i in self._rows}
+            rows = rows[~np.isin(rows, list(skip))] if skip else rows
+        _stats["searches"] += 1
+        _stats["candidates"] += len(rows)
+        if not len(rows):
+            return []
+        scores = self._vectors[rows] @ query
+        top = np.argsort(-scores)[:k]
+        return [(self._ids[rows[i]], float(scores[i])) for i in top]
+
+
+class ProjectIndex:
+    """One project's shot keyframes: the ANN index plus shot → scene/frame bookkeeping."""
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.index = IVFIndex()
+        self.scenes: dict[str, str] = {}
+        self.pending: dict[str, str] = {}
+
+    def upsert(self, shot_id: str, scene_id: str, vector: np.ndarray):
+        self.index.add(shot_id, vector)
+        self.scenes[shot_id] = scene_id
+        self.pending.pop(shot_id, None)
+
+    def remove(self, shot_id: str):
+        self.index.remove(shot_id)
+        self.scenes.pop(shot_id, None)
+        self.pending.pop(shot_id, None)
+
+    async def refresh(self):
+        """Embed frames queued by SHOT_GENERATED (cache-first, one batch, off the loop)."""
+        if not self.pending:
+            return
+        from packages.core.executors import offload
+
+        queued = dict(self.pending)
+        vectors = await offload(get_embeddings, list(queued.values()))
+        for (shot_id, path), vec in zip(queued.items(), vectors):
+            if self.pending.get(shot_id) != path:
+                continue  # re-queued with a newer frame meanwhile
+            self.pending.pop(shot_id)
+            if vec is not None:
+                self.upsert(shot_id, self.scenes.get(shot_id), vec)
+
+    def nearest(self, vector: np.ndarray, k: int = 5, exclude=()) -> list[dict]:
+        return [
+            {"shot_id": shot_id, "scene_id": self.scenes.get(shot_id), "similarity": round(score, 4)}
+            for shot_id, score in self.index.search(vector, k, exclude)
+        ]
+
+
+_projects: dict = {}
+_scene_projects: dict[str, object] = {}
+
+
+async def project_index(conn, project_id) -> ProjectIndex:
+    """The project's index, built on first use from every completed shot's last frame."""
+    idx = _projects.get(project_id)
+    if idx is not None:
+        return idx
+
+    from packages.core.executors import offload
+
+    rows = await conn.fetch("""
+        SELECT s.id::text AS shot_id, s.scene_id::text AS scene_id, s.last_frame_path
+        FROM shots s JOIN scenes sc ON s.scene_id = sc.id
+        WHERE sc.project_id = $1 AND s.status = 'completed' AND s.last_frame_path IS NOT NULL
+    """, project_id)
+    rows = [r for r in rows if Path(r["last_frame_path"]).exists()]
+    vectors = await offload(get_embeddings, [r["last_frame_path"] for r in rows])
+
+    idx = ProjectIndex(project_id)
+    for r, vec in zip(rows, vectors):
+        _scene_projects[r["scene_id"]] = project_id
+        if vec is not None:
+            idx.upsert(r["shot_id"], r["scene_id"], vec)
+    _projects[project_id] = idx
+    logger.info(f"variety_index: built project {project_id} index ({len(idx.index)} keyframes)")
+    return idx
+
+
+def upsert_shot(project_id, shot_id: str, scene_id: str, vector: np.ndarray):
+    """Add/replace a shot's keyframe vector in a loaded project index."""
+    idx = _projects.get(project_id)
+    _scene_projects[str(scene_id)] = project_id
+    if idx is not None:
+        idx.upsert(str(shot_id), str(scene_id), vector)
+
+
+def mark_shot_changed(shot_id: str, scene_id: str, frame_path: str):
+    """Queue a shot's new keyframe; it is embedded on the next query of its project."""
+    idx = _projects.get(_scene_projects.get(str(scene_id)))
+    if idx is not None and frame_path:
+        idx.scenes[str(shot_id)] = str(scene_id)
+        idx.pending[str(shot_id)] = frame_path
+
+
+def remove_shot(shot_id: str):
+    for idx in _projects.values():
+        if str(shot_id) in idx.scenes:
+            idx.remove(str(shot_id))
+
+
+def remove_scene(scene_id: str):
+    idx = _projects.get(_scene_projects.pop(str(scene_id), None))
+    if idx is not None:
+        for shot_id in [s for s, sc in idx.scenes.items() if sc == str(scene_id)]:
+            idx.remove(shot_id)
+
+
+def clear():
+    """Drop every project index (embedding cache is kept)."""
+    _projects.clear()
+    _scene_projects.clear()
+
+
+def stats() -> dict:
+    searches = _stats["searches"]
+    return {
+        **_stats,
+        "avg_candidates": round(_stats["candidates"] / searches, 1) if searches else None,
+        "memory_embeddings": len(_embeddings),
+        "projects": {
+            str(pid): {"keyframes": len(idx.index), "lists": len(idx.index._lists),
+                       "pending": len(idx.pending)}
+            for pid, idx in _projects.items()
+        },
+    }
+
+
+# ---- EventBus Handlers ----
+
+@event_bus.on(SHOT_GENERATED)
+async def _handle_shot_generated(data: dict):
+    if data.get("shot_id") and data.get("scene_id") and data.get("last_frame_path"):
+        mark_shot_changed(data["shot_id"], data["scene_id"], data["last_frame_path"])
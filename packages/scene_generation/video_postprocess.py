@@ -15,12 +15,16 @@ ffmpeg fallback (when GPU is busy or nodes unavailable):
 import json
 import logging
 import subprocess
-import shutil
 import time
 import urllib.request
 from pathlib import Path
 
 from packages.core.config import COMFYUI_URL, COMFYUI_OUTPUT_DIR, COMFYUI_INPUT_DIR
+from packages.core.executors import offload
+from packages.core.input_staging import stage_input
+from packages.core.preemption import finish, post_prompt, was_cancelled
+
+from . import render_cache
 
 logger = logging.getLogger(__name__)
 
@@ -118,21 +122,25 @@ def build_postprocess_workflow(
 
 
 def _submit_workflow(workflow: dict) -> str:
-    """Submit workflow to ComfyUI, return prompt_id."""
-    payload = json.dumps({"prompt": workflow}).encode()
-    req = urllib.request.Request(
-        f"{COMFYUI_URL}/prompt",
-        data=payload,
-        headers={"Content-Type": "application/json"},
-    )
-    resp = urllib.request.urlopen(req, timeout=30)
-    return json.loads(resp.read()).get("prompt_id", "")
+    """Submit workflow to ComfyUI, return prompt_id (or a render-cache id)."""
+    cached_id, cache_key = render_cache.lookup(workflow, "postprocess")
+    if cached_id:
+        return cached_id
+    prompt_id = post_prompt(workflow, COMFYUI_URL, kind="postprocess")
+    render_cache.track(prompt_id, cache_key, "postprocess")
+    return prompt_id
 
 
 def _poll_completion(prompt_id: str, timeout: int = 600) -> dict | None:
     """Poll ComfyUI history for completion. Return output info or None."""
+    if render_cache.is_cached_id(prompt_id):
+        outputs = render_cache.cached_outputs(prompt_id)
+        return {"filename": outputs[0], "subfolder": ""} if outputs else None
     start = time.time()
     while time.time() - start < timeout:
+        if was_cancelled(prompt_id):
+            logger.info(f"Post-processing {prompt_id} cancelled — stop polling")
+            return None
         try:
             url = f"{COMFYUI_URL}/history/{prompt_id}"
             resp = urllib.request.urlopen(urllib.request.Request(url), timeout=10)
@@ -142,15 +150,18 @@ def _poll_completion(prompt_id: str, timeout: int = 600) -> dict | None:
                 status = history[prompt_id].get("status", {})
                 if status.get("status_str") == "error":
                     logger.error(f"ComfyUI post-processing failed: {status}")
+                    finish(prompt_id, ok=False)
                     return None
                 # Look for video output from VHS_VideoCombine
                 for nid, out in outputs.items():
-                    gifs = out.get("gifs", [])
-                    if gifs:
-                        return {"filename": gifs[0].get("filename", ""), "subfolder": gifs[0].get("subfolder", "")}
-                    images = out.get("images", [])
-                    if images:
-                        return {"filename": images[0].get("filename", ""), "subfolder": images[0].get("subfolder", "")}
+                    items = out.get("gifs", []) or out.get("images", [])
+                    if items:
+                        info = {"filename": items[0].get("filename", ""), "subfolder": items[0].get("subfolder", "")}
+                        rel = f"{info['subfolder']}/{info['filename']}" if info["subfolder"] else info["filename"]
+                        render_cache.store(prompt_id, [rel])
+                        finish(prompt_id)
+                        return info
+                finish(prompt_id, ok=False)
                 return None
         except Exception:
             pass
@@ -172,9 +183,7 @@ def postprocess_gpu(
     input_p = Path(input_video)
     comfyui_input = Path(COMFYUI_INPUT_DIR)
     if not str(input_p).startswith(str(comfyui_input)):
-        dest = comfyui_input / input_p.name
-        shutil.copy2(input_p, dest)
-        video_for_workflow = input_p.name
+        video_for_workflow = stage_input(input_p)
     else:
         video_for_workflow = input_p.name
 
@@ -356,8 +365,8 @@ async def postprocess_wan_video(
     if use_gpu and upscale and interpolate:
         try:
             ts = int(time.time())
-            gpu_result = postprocess_gpu(
-                current,
+            gpu_result = await offload(
+                postprocess_gpu, current,
                 output_prefix=f"pp_{stem}_{ts}",
                 timeout=600,
             )
@@ -367,7 +376,8 @@ async def postprocess_wan_video(
                 # Apply color grading on top (always ffmpeg, fast)
                 if color_grade:
                     graded = str(Path(output_dir) / f"{stem}_final.mp4")
-                    if apply_color_grade(current, graded, lut_path, style=color_style):
+                    if await offload(apply_color_grade, current, graded, lut_path,
+                                     style=color_style, pool="media"):
                         current = graded
                 # Clean up intermediate pp_ file
                 try:
@@ -385,19 +395,19 @@ async def postprocess_wan_video(
     intermediates = []
     if interpolate:
         interpolated = str(Path(output_dir) / f"{stem}_interp.mp4")
-        if interpolate_video_ffmpeg(current, interpolated, target_fps):
+        if await offload(interpolate_video_ffmpeg, current, interpolated, target_fps, pool="media"):
             intermediates.append(current if current != str(input_p) else None)
             current = interpolated
 
     if upscale:
         upscaled = str(Path(output_dir) / f"{stem}_upscaled.mp4")
-        if upscale_video_ffmpeg(current, upscaled, scale_factor):
+        if await offload(upscale_video_ffmpeg, current, upscaled, scale_factor, pool="media"):
             intermediates.append(current)
             current = upscaled
 
     if color_grade:
         graded = str(Path(output_dir) / f"{stem}_final.mp4")
-        if apply_color_grade(current, graded, lut_path, style=color_style):
+        if await offload(apply_color_grade, current, graded, lut_path, style=color_style, pool="media"):
             intermediates.append(current)
             current = graded
 
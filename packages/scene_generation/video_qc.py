@@ -22,6 +22,8 @@ from shutil import copy2
 from packages.core.config import BASE_PATH, COMFYUI_OUTPUT_DIR
 from packages.core.audit import log_decision
 
+from . import render_cache
+
 # Re-export vision functions so external callers can still import from video_qc
 from .video_vision import (  # noqa: F401
     KNOWN_ISSUES,
@@ -562,13 +564,19 @@ async def run_qc_loop(
                 from packages.core.config import BASE_PATH
                 source_img = str(BASE_PATH / source_img) if (BASE_PATH / source_img).exists() else source_img
 
-            frame_paths = await extract_review_frames(video_path)
-            if frame_paths:
+            review = render_cache.cached_qc(comfyui_prompt_id)
+            frame_paths = None if review else await extract_review_frames(video_path)
+            if review:
+                # Identical render already reviewed — reuse its verdict
+                shot_quality = review["overall_score"]
+                issues = review["issues"]
+            elif frame_paths:
                 review = await review_video_frames(
                     frame_paths, current_prompt, character_slug, source_img,
                 )
                 shot_quality = review["overall_score"]
                 issues = review["issues"]
+                render_cache.record_qc(comfyui_prompt_id, review)
             else:
                 # Fallback: no frames extracted, assume decent
                 shot_quality = 0.5
@@ -32,12 +32,12 @@ Model files needed in ComfyUI/models/:
     - loras/ (optional): lightx2v_I2V_14B_480p_cfg_step_distill_rank64_bf16.safetensors
 """
 
-import json
 import logging
 import time
 
 from fastapi import APIRouter, HTTPException
 
+from packages.core.asset_registry import registry as assets
 from packages.core.config import COMFYUI_URL, COMFYUI_OUTPUT_DIR
 
 logger = logging.getLogger(__name__)
@@ -95,18 +95,19 @@ DASIWA_MODELS = {
 
 
 def _submit_comfyui_workflow(workflow: dict, comfyui_url: str | None = None) -> str:
-    """Submit a workflow to ComfyUI and return the prompt_id."""
-    import urllib.request
-    url = comfyui_url or COMFYUI_URL
-    payload = json.dumps({"prompt": workflow}).encode()
-    req = urllib.request.Request(
-        f"{url}/prompt",
-        data=payload,
-        headers={"Content-Type": "application/json"},
-    )
-    resp = urllib.request.urlopen(req, timeout=30)
-    result = json.loads(resp.read())
-    return result.get("prompt_id", "")
+    """Submit a workflow to ComfyUI and return the prompt_id.
+
+    Returns a render-cache prompt id instead if this exact workflow has
+    already been rendered.
+    """
+    from packages.core.preemption import post_prompt
+    from . import render_cache
+    cached_id, cache_key = render_cache.lookup(workflow, "wan")
+    if cached_id:
+        return cached_id
+    prompt_id = post_prompt(workflow, comfyui_url or COMFYUI_URL, kind="wan")
+    render_cache.track(prompt_id, cache_key, "wan")
+    return prompt_id
 
 
 def build_wan_t2v_workflow(
@@ -875,20 +876,17 @@ def build_wan22_14b_i2v_workflow(
 
 def check_wan22_14b_ready() -> tuple[bool, str]:
     """Check if Wan 2.2 14B I2V models are available."""
-    from pathlib import Path
-    base = Path("/opt/ComfyUI/models")
     missing = []
     for key in ("unet_high", "unet_low"):
-        if not (base / "unet" / WAN22_14B_MODELS[key]).exists():
+        if not assets.exists("unet", WAN22_14B_MODELS[key]):
             missing.append(f"{key}: {WAN22_14B_MODELS[key]}")
-    if not (base / "text_encoders" / WAN22_14B_MODELS["text_encoder"]).exists():
+    if not assets.exists("text_encoders", WAN22_14B_MODELS["text_encoder"]):
         missing.append(f"text_encoder: {WAN22_14B_MODELS['text_encoder']}")
-    if not (base / "clip_vision" / WAN22_14B_MODELS["clip_vision"]).exists():
+    if not assets.exists("clip_vision", WAN22_14B_MODELS["clip_vision"]):
         # Also check alternative name
-        alt = base / "clip_vision" / "CLIP-ViT-H-14-laion2B-s32B-b79K.safetensors"
-        if not alt.exists():
+        if not assets.exists("clip_vision", "CLIP-ViT-H-14-laion2B-s32B-b79K.safetensors"):
             missing.append(f"clip_vision: {WAN22_14B_MODELS['clip_vision']}")
-    if not (base / "vae" / WAN22_14B_MODELS["vae"]).exists():
+    if not assets.exists("vae", WAN22_14B_MODELS["vae"]):
         missing.append(f"vae: {WAN22_14B_MODELS['vae']}")
     if missing:
         return False, f"Missing Wan 2.2 14B models: {', '.join(missing)}"
@@ -897,9 +895,6 @@ def check_wan22_14b_ready() -> tuple[bool, str]:
 
 def check_wan_models_available() -> dict:
     """Check which Wan model files are present in ComfyUI directories."""
-    from pathlib import Path
-    base = Path("/opt/ComfyUI/models")
-
     # Each model type → list of directories to check
     search_dirs = {
         "unet": ["diffusion_models", "unet"],
@@ -910,29 +905,23 @@ def check_wan_models_available() -> dict:
     status = {}
     for key, filename in WAN_MODELS.items():
         dirs = search_dirs.get(key, ["diffusion_models", "unet", "text_encoders", "clip", "vae"])
-        found = any((base / d / filename).exists() for d in dirs)
+        found = assets.find(filename, dirs) is not None
         status[key] = {"filename": filename, "available": found}
 
     # GGUF unet (Wan 2.1)
-    gguf_found = any(
-        (base / d / WAN_GGUF_MODELS["unet"]).exists()
-        for d in ["diffusion_models", "unet"]
-    )
+    gguf_found = assets.find(WAN_GGUF_MODELS["unet"], ["diffusion_models", "unet"]) is not None
     status["unet_gguf"] = {
         "filename": WAN_GGUF_MODELS["unet"],
         "available": gguf_found,
     }
 
     # Wan 2.2 models
-    wan22_unet_found = any(
-        (base / d / WAN22_MODELS["unet_gguf"]).exists()
-        for d in ["diffusion_models", "unet"]
-    )
+    wan22_unet_found = assets.find(WAN22_MODELS["unet_gguf"], ["diffusion_models", "unet"]) is not None
     status["wan22_unet_gguf"] = {
         "filename": WAN22_MODELS["unet_gguf"],
         "available": wan22_unet_found,
     }
-    wan22_vae_found = (base / "vae" / WAN22_MODELS["vae"]).exists()
+    wan22_vae_found = assets.exists("vae", WAN22_MODELS["vae"])
     status["wan22_vae"] = {
         "filename": WAN22_MODELS["vae"],
         "available": wan22_vae_found,
@@ -1587,13 +1576,11 @@ def build_dasiwa_i2v_workflow(
 
 def check_dasiwa_ready() -> tuple[bool, str]:
     """Check if DaSiWa SynthSeduction v9 models are available."""
-    from pathlib import Path
-    base = Path("/opt/ComfyUI/models/unet")
     missing = []
     for key, fname in DASIWA_MODELS.items():
         if key == "format":
             continue
-        if not (base / fname).exists():
+        if not assets.exists("unet", fname):
             missing.append(f"{key}: {fname}")
     if missing:
         return False, f"Missing DaSiWa models: {', '.join(missing)}"
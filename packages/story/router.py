@@ -9,7 +9,7 @@ from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, Request
 from packages.core.config import BASE_PATH, OLLAMA_URL
 from packages.core.db import get_char_project_map, invalidate_char_cache, connect_direct
-from packages.core.auth import get_user_projects
+from packages.core.auth import get_user_projects, invalidate_project_access
 from packages.core.models import (
     ProjectCreate, ProjectUpdate,
     StorylineUpsert, WorldSettingsUpsert, StyleUpdate,
@@ -173,6 +173,7 @@ async def create_project(body: ProjectCreate, request: Request):
                 studio_user_id, pid)
 
         await conn.close()
+        invalidate_project_access()
         logger.info(f"Created project '{body.name}' (id={pid}) with style '{style_name}', rating={content_rating}")
         return {"project_id": pid, "style_name": style_name, "message": f"Project '{body.name}' created"}
     except HTTPException:
@@ -198,6 +199,8 @@ async def update_project(project_id: int, body: ProjectUpdate, allowed_projects:
         params.append(project_id)
         await conn.execute(f"UPDATE projects SET {','.join(updates)} WHERE id=${idx}", *params)
         await conn.close()
+        if body.content_rating is not None:
+            invalidate_project_access()
         logger.info(f"Updated project {project_id}: {','.join(updates)}")
         return {"message": f"Project {project_id} updated"}
     except HTTPException:
@@ -276,10 +279,10 @@ async def update_style(project_id: int, body: StyleUpdate, allowed_projects: lis
         if current:
             # Get generation stats for this checkpoint
             stats = await conn.fetchrow("""
-                SELECT COUNT(*) as gen_count, AVG(quality_score) as avg_quality
-                FROM generation_history
+                SELECT COALESCE(SUM(scored), 0) as gen_count,
+                       SUM(sum_quality) / NULLIF(SUM(scored), 0) as avg_quality
+                FROM generation_history_summary
                 WHERE project_name=$1 AND checkpoint_model=$2
-                  AND quality_score IS NOT NULL
             """, project_name, current["checkpoint_model"])
 
             await conn.execute("""
@@ -379,10 +382,10 @@ async def get_style_history(project_id: int, allowed_projects: list[int] = Depen
         for r in rows:
             # Get live stats for this checkpoint from generation_history
             live = await conn.fetchrow("""
-                SELECT COUNT(*) as total,
-                       COUNT(*) FILTER (WHERE status = 'approved') as approved,
-                       AVG(quality_score) FILTER (WHERE quality_score IS NOT NULL) as avg_quality
-                FROM generation_history
+                SELECT COALESCE(SUM(generations), 0) as total,
+                       COALESCE(SUM(generations) FILTER (WHERE status = 'approved'), 0) as approved,
+                       SUM(sum_quality) / NULLIF(SUM(scored), 0) as avg_quality
+                FROM generation_history_summary
                 WHERE project_name=$1 AND checkpoint_model=$2
             """, project_name, r["checkpoint_model"])
 
@@ -427,13 +430,13 @@ async def get_style_stats(project_id: int, allowed_projects: list[int] = Depends
         rows = await conn.fetch("""
             SELECT
                 checkpoint_model,
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE status = 'approved') as approved,
-                COUNT(*) FILTER (WHERE status = 'rejected') as rejected,
-                AVG(quality_score) FILTER (WHERE quality_score IS NOT NULL) as avg_quality,
-                MIN(generated_at) as first_used,
-                MAX(generated_at) as last_used
-            FROM generation_history
+                SUM(generations) as total,
+                COALESCE(SUM(generations) FILTER (WHERE status = 'approved'), 0) as approved,
+                COALESCE(SUM(generations) FILTER (WHERE status = 'rejected'), 0) as rejected,
+                SUM(sum_quality) / NULLIF(SUM(scored), 0) as avg_quality,
+                MIN(first_at) as first_used,
+                MAX(last_at) as last_used
+            FROM generation_history_summary
             WHERE project_name = $1
               AND checkpoint_model IS NOT NULL
             GROUP BY checkpoint_model
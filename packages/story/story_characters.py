@@ -76,8 +76,8 @@ async def get_characters(allowed_projects: list[int] = Depends(get_user_projects
     try:
         conn = await connect_direct()
         gen_rows = await conn.fetch("""
-            SELECT character_slug, checkpoint_model, COUNT(*) as count
-            FROM generation_history
+            SELECT character_slug, checkpoint_model, SUM(generations) as count
+            FROM generation_history_summary
             WHERE checkpoint_model IS NOT NULL AND checkpoint_model != ''
             GROUP BY character_slug, checkpoint_model
             ORDER BY character_slug, count DESC
@@ -14,14 +14,12 @@ works without modification.
 import logging
 import random
 import uuid
-import yaml
-from pathlib import Path
 
 from packages.core.db import connect_direct
+from packages.scene_generation.catalog_index import lora_files
 
 logger = logging.getLogger(__name__)
 
-LORA_CATALOG_PATH = Path("/opt/anime-studio/config/lora_catalog.yaml")
 
 # Shot template: each entry defines a role and how to build it
 # Every shot features characters — no empty establishing shots.
@@ -114,11 +112,9 @@ def _build_trailer_template(num_characters: int, num_loras: int) -> list[dict]:
 
 
 def _load_lora_catalog() -> dict:
-    """Load LoRA catalog from YAML."""
-    if not LORA_CATALOG_PATH.exists():
-        return {}
-    with open(LORA_CATALOG_PATH) as f:
-        return yaml.safe_load(f) or {}
+    """Load the merged LoRA catalog (shared, cached per-process)."""
+    from packages.scene_generation.catalog_loader import load_catalog
+    return load_catalog()
 
 
 def _pick_motion_loras(content_rating: str, catalog: dict, count: int = 2) -> list[dict]:
@@ -142,8 +138,7 @@ def _pick_motion_loras(content_rating: str, catalog: dict, count: int = 2) -> li
         tier = pair.get("tier", "universal")
         if tier in priority_tiers:
             high = pair.get("high") or ""
-            high_path = Path(f"/opt/ComfyUI/models/loras/{high}")
-            if high and high_path.exists():
+            if high and high in lora_files:
                 eligible.append({"key": key, **pair})
 
     if not eligible:
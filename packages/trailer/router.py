@@ -15,9 +15,10 @@ import asyncio
 import logging
 import uuid
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 
+from packages.core import job_queue
 from packages.core.db import connect_direct
 
 from .generator import create_trailer, get_trailer, list_trailers, update_trailer_shot, approve_trailer
@@ -28,6 +29,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/trailers", tags=["trailers"])
 
+KEYFRAMES_JOB = "trailer.keyframes"
+VIDEOS_JOB = "trailer.videos"
+
 
 class TrailerCreateRequest(BaseModel):
     project_id: int
@@ -94,7 +98,7 @@ async def get_trailer_endpoint(trailer_id: str):
 # ── Generate Keyframes ──────────────────────────────────────────────────
 
 @router.post("/{trailer_id}/generate-keyframes")
-async def generate_keyframes_endpoint(trailer_id: str, background_tasks: BackgroundTasks):
+async def generate_keyframes_endpoint(trailer_id: str):
     """Generate keyframe images for all trailer shots (~18s per shot).
 
     Uses the existing keyframe_blitz pipeline. Review keyframes before
@@ -106,20 +110,23 @@ async def generate_keyframes_endpoint(trailer_id: str, background_tasks: Backgro
 
     scene_id = trailer["scene_id"]
 
-    # Run keyframe blitz in background
-    background_tasks.add_task(_run_keyframe_blitz, scene_id, trailer_id)
+    job = await job_queue.enqueue(KEYFRAMES_JOB, {"scene_id": scene_id, "trailer_id": trailer_id},
+                                  dedupe_key=f"trailer_keyframes_{trailer_id}")
 
     return {
         "trailer_id": trailer_id,
         "scene_id": scene_id,
         "status": "generating_keyframes",
+        "job_id": job["id"],
         "message": f"Generating keyframes for {len(trailer['shots'])} shots. "
                    f"Check GET /api/trailers/{trailer_id} for progress.",
     }
 
 
-async def _run_keyframe_blitz(scene_id: str, trailer_id: str):
-    """Background task: run keyframe blitz on trailer's scene."""
+@job_queue.job_kind(KEYFRAMES_JOB, concurrency=1, max_attempts=2)
+async def _run_keyframe_blitz(job):
+    """Queued job: run keyframe blitz on trailer's scene."""
+    scene_id, trailer_id = job.payload["scene_id"], job.payload["trailer_id"]
     try:
         from packages.scene_generation.scene_keyframe import keyframe_blitz
         conn = await connect_direct()
@@ -139,8 +146,11 @@ async def _run_keyframe_blitz(scene_id: str, trailer_id: str):
         finally:
             await conn.close()
 
+        return result
+
     except Exception as e:
         logger.error(f"Trailer {trailer_id} keyframe blitz failed: {e}")
+        raise
 
 
 # ── Generate Videos ─────────────────────────────────────────────────────
@@ -149,7 +159,6 @@ async def _run_keyframe_blitz(scene_id: str, trailer_id: str):
 async def generate_videos_endpoint(
     trailer_id: str,
     body: GenerateVideosRequest = GenerateVideosRequest(),
-    background_tasks: BackgroundTasks = None,
 ):
     """Generate videos for trailer shots.
 
@@ -174,21 +183,24 @@ async def generate_videos_endpoint(
         finally:
             await conn.close()
 
-    # Run scene generation in background
-    background_tasks.add_task(_run_video_generation, scene_id, trailer_id)
+    job = await job_queue.enqueue(VIDEOS_JOB, {"scene_id": scene_id, "trailer_id": trailer_id},
+                                  dedupe_key=f"trailer_videos_{trailer_id}")
 
     return {
         "trailer_id": trailer_id,
         "scene_id": scene_id,
         "status": "generating_videos",
+        "job_id": job["id"],
         "shot_ids": body.shot_ids,
         "message": f"Generating videos for trailer. "
                    f"Check GET /api/trailers/{trailer_id} for progress.",
     }
 
 
-async def _run_video_generation(scene_id: str, trailer_id: str):
-    """Background task: generate all pending shots in trailer's scene."""
+@job_queue.job_kind(VIDEOS_JOB, concurrency=1, max_attempts=2, backoff_s=60)
+async def _run_video_generation(job):
+    """Queued job: generate all pending shots in trailer's scene."""
+    scene_id, trailer_id = job.payload["scene_id"], job.payload["trailer_id"]
     try:
         # Force trailer shots to use WAN 2.2 14B (not FramePack default)
         # and clear any auto-assigned movie clip sources
@@ -242,8 +254,11 @@ async def _run_video_generation(scene_id: str, trailer_id: str):
         except Exception as score_err:
             logger.warning(f"Trailer {trailer_id} auto-score failed: {score_err}")
 
+        return {"completed": completed, "total": total, "status": new_status}
+
     except Exception as e:
         logger.error(f"Trailer {trailer_id} video generation failed: {e}")
+        raise
 
 
 # ── Assemble ────────────────────────────────────────────────────────────
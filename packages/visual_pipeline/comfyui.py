@@ -227,12 +227,9 @@ def build_comfyui_workflow(
         if ref_images:
             import random as _rand
             ref_img = _rand.choice(ref_images)
-            # Copy reference to ComfyUI input if not already there
-            comfyui_input = Path("/opt/ComfyUI/input")
-            ref_dest = comfyui_input / f"ref_{character_slug}.png"
-            if not ref_dest.exists() or ref_dest.stat().st_mtime < ref_img.stat().st_mtime:
-                import shutil
-                shutil.copy2(ref_img, ref_dest)
+            # Stage reference in ComfyUI input (content-addressed, linked not copied)
+            from packages.core.input_staging import stage_input
+            ref_name = stage_input(ref_img, name_hint=f"ref_{character_slug}{ref_img.suffix}")
 
             # Determine which node provides the model (LoRA or checkpoint)
             model_source = ["10", 0] if lora_path is not None else ["4", 0]
@@ -244,7 +241,7 @@ def build_comfyui_workflow(
             }
             # Load reference image
             workflow["21"] = {
-                "inputs": {"image": ref_dest.name, "upload": "image"},
+                "inputs": {"image": ref_name, "upload": "image"},
                 "class_type": "LoadImage",
             }
             # IP-Adapter Unified Loader
@@ -352,18 +349,12 @@ def build_comfyui_workflow(
 
 
 def submit_comfyui_workflow(workflow: dict, comfyui_url: str | None = None) -> str:
-    """Submit a workflow to ComfyUI and return the prompt_id."""
-    import urllib.request
-    url = comfyui_url or COMFYUI_URL
-    payload = json.dumps({"prompt": workflow}).encode()
-    req = urllib.request.Request(
-        f"{url}/prompt",
-        data=payload,
-        headers={"Content-Type": "application/json"},
-    )
-    resp = urllib.request.urlopen(req, timeout=30)
-    result = json.loads(resp.read())
-    return result.get("prompt_id", "")
+    """Submit a workflow to ComfyUI and return the prompt_id.
+
+    Placed by the priority of the current render scope (see core.preemption).
+    """
+    from packages.core.preemption import post_prompt
+    return post_prompt(workflow, comfyui_url or COMFYUI_URL, kind="image")
 
 
 def get_comfyui_progress(prompt_id: str, comfyui_url: str | None = None) -> dict:
@@ -0,0 +1,319 @@
+"""Single-decode image analysis — quality metrics, perceptual hashes and thumbnail in one pass.
+
+The quality scorer and the perceptual-hash dedup index each used to decode the
+same dataset PNG on their own (cv2.imread for scoring, PIL for the average
+hash), and batch scoring walked the datasets one file at a time. Here
+each image is decoded once and everything is derived from that array:
+
+  - blur (Laplacian variance), contrast, brightness and edge density — the same
+    formulas and weights server/quality_scorer.py has always used, with the
+    mean/std reductions done by cv2.meanStdDev instead of separate numpy passes
+  - average hash (the dedup key; same "0x…" format as vision.perceptual_hash)
+    and difference hash, from INTER_AREA downscales of the grayscale frame
+  - a JPEG thumbnail (longest side THUMB_SIZE) under <character>/thumbs/
+
+Results go into the image's .meta.json sidecar together with the file's
+size/mtime stamp, so an unchanged image is never re-analysed and dedup can read
+its hash from the sidecar instead of decoding. The metrics are calibrated at
+full resolution (Laplacian variance and edge density change with scale), and
+PNG has no reduced-size decode, so the one decode is a full one; only the hash
+and thumbnail work on downscaled copies.
+
+analyze_paths() runs the batch on a process pool (IMAGE_ANALYSIS_WORKERS
+processes, IMAGE_ANALYSIS_CHUNK images per task) and reports throughput;
+benchmark() compares it against the old separate-decode path on a synthetic
+dataset.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_VERSION = 1
+HASH_SIZE = 8
+THUMB_SIZE = int(os.getenv("IMAGE_ANALYSIS_THUMB_SIZE", "256"))
+THUMB_QUALITY = 85
+WORKERS = int(os.getenv("IMAGE_ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+CHUNK_SIZE = int(os.getenv("IMAGE_ANALYSIS_CHUNK", "32"))
+
+
+def decode(image_path) -> np.ndarray | None:
+    """Decode an image to a BGR array (None when unreadable)."""
+    return cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+
+
+def to_gray(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def quality_metrics(gray: np.ndarray) -> dict:
+    """Blur/contrast/brightness/edge scores for a grayscale frame (quality_scorer weights)."""
+    _, lap_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_64F))
+    blur_score = min(float(lap_std[0, 0]) ** 2 / 1000.0, 1.0)
+
+    mean, std = cv2.meanStdDev(gray)
+    contrast = float(std[0, 0]) / 255.0
+    brightness = float(mean[0, 0]) / 255.0
+    brightness_score = 1.0 - abs(brightness - 0.5) * 2
+
+    edges = cv2.Canny(gray, 50, 150)
+    edge_density = cv2.countNonZero(edges) / edges.size
+
+    quality_score = min(
+        blur_score * 0.3 + contrast * 0.3 + brightness_score * 0.2 + edge_density * 0.2,
+        1.0,
+    )
+    return {
+        "quality_score": round(quality_score, 4),
+        "blur_score": round(blur_score, 4),
+        "contrast": round(contrast, 4),
+        "brightness": round(brightness, 4),
+        "brightness_score": round(brightness_score, 4),
+        "edge_density": round(edge_density, 4),
+    }
+
+
+def _bits_to_hex(bits: np.ndarray) -> str:
+    return hex(int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big"))
+
+
+def average_hash(gray: np.ndarray, hash_size: int = HASH_SIZE) -> str:
+    """Bits above the mean of a hash_size² area-downscale, as a hex string."""
+    small = cv2.resize(gray, (hash_size, hash_size), interpolation=cv2.INTER_AREA)
+    return _bits_to_hex(small > small.mean())
+
+
+def difference_hash(gray: np.ndarray, hash_size: int = HASH_SIZE) -> str:
+    """Horizontal-gradient hash: bit set where a pixel is brighter than its right neighbour."""
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return _bits_to_hex(small[:, :-1] > small[:, 1:])
+
+
+def make_thumbnail(image: np.ndarray, size: int = THUMB_SIZE) -> np.ndarray:
+    """Area-downscale so the longest side is at most size."""
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def analyze_image(image_path, thumb_path: Path | None = None, thumb_size: int = THUMB_SIZE) -> dict:
+    """Decode once and derive metrics, hashes and (optionally) a thumbnail file."""
+    path = Path(image_path)
+    if not path.exists():
+        return {"quality_score": None, "error": "file not found"}
+    try:
+        image = decode(path)
+        if image is None:
+            return {"quality_score": None, "error": "failed to read image"}
+
+        height, width = image.shape[:2]
+        gray = to_gray(image)
+        result = quality_metrics(gray)
+        result["resolution"] = f"{width}x{height}"
+        result["phash"] = average_hash(gray)
+        result["dhash"] = difference_hash(gray)
+
+        if thumb_path is not None:
+            thumb_path.parent.mkdir(parents=True, exist_ok=True)
+            cv2.imwrite(str(thumb_path), make_thumbnail(image, thumb_size),
+                        [cv2.IMWRITE_JPEG_QUALITY, THUMB_QUALITY])
+            result["thumbnail"] = str(thumb_path)
+        return result
+    except Exception as e:
+        return {"quality_score": None, "error": str(e)}
+
+
+# ---- Metadata index (.meta.json sidecars) ----
+
+def meta_path(image_path: Path) -> Path:
+    return image_path.with_suffix(".meta.json")
+
+
+def thumb_path_for(image_path: Path) -> Path:
+    """<character>/images/x.png -> <character>/thumbs/x.jpg"""
+    return image_path.parent.parent / "thumbs" / f"{image_path.stem}.jpg"
+
+
+def _stamp(image_path: Path) -> dict:
+    st = image_path.stat()
+    return {"version": ANALYSIS_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _read_meta(image_path: Path) -> dict:
+    path = meta_path(image_path)
+    if not path.exists():
+        return {}
+    try:
+        meta = json.loads(path.read_text())
+        return meta if isinstance(meta, dict) else {}
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+
+def current_analysis(image_path: Path) -> dict | None:
+    """The sidecar's meta when its analysis stamp still matches the file, else None."""
+    meta = _read_meta(image_path)
+    try:
+        if meta.get("analysis") == _stamp(image_path):
+            return meta
+    except OSError:
+        pass
+    return None
+
+
+def write_meta(image_path: Path, result: dict) -> None:
+    """Merge analysis results into the image's .meta.json."""
+    meta = _read_meta(image_path)
+    meta["quality_score"] = result["quality_score"]
+    meta["quality_breakdown"] = {
+        "blur": result["blur_score"],
+        "contrast": result["contrast"],
+        "brightness": result["brightness_score"],
+        "edge_density": result["edge_density"],
+    }
+    meta["phash"] = result["phash"]
+    meta["dhash"] = result["dhash"]
+    meta["resolution"] = result["resolution"]
+    if result.get("thumbnail"):
+        meta["thumbnail"] = os.path.relpath(result["thumbnail"], image_path.parent.parent)
+    meta["analysis"] = _stamp(image_path)
+    meta_path(image_path).write_text(json.dumps(meta, indent=2))
+
+
+def analyze_dataset_image(image_path, write: bool = True, force: bool = False) -> dict:
+    """Analyse one dataset image and update its sidecar (process-pool task)."""
+    path = Path(image_path)
+    if not force and write:
+        meta = current_analysis(path)
+        if meta is not None:
+            return {"path": str(path), "quality_score": meta.get("quality_score"), "skipped": True}
+    result = analyze_image(path, thumb_path_for(path) if write else None)
+    if write and result.get("quality_score") is not None:
+        write_meta(path, result)
+    return {"path": str(path), "quality_score": result.get("quality_score"),
+            "error": result.get("error"), "skipped": False}
+
+
+def _init_worker():
+    # One OpenCV thread per process — the pool provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def _analyze_chunk(paths: list[str], write: bool, force: bool) -> list[dict]:
+    return [analyze_dataset_image(p, write, force) for p in paths]
+
+
+def analyze_paths(paths: list, workers: int = WORKERS, chunk_size: int = CHUNK_SIZE,
+                  write: bool = True, force: bool = False) -> dict:
+    """Analyse many images, in-process (workers <= 1) or on a process pool.
+
+    Returns per-image results plus counts and images/second.
+    """
+    paths = [str(p) for p in paths]
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), max(1, chunk_size))]
+    started = time.monotonic()
+    results: list[dict] = []
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            results.extend(_analyze_chunk(chunk, write, force))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for chunk_results in pool.map(_analyze_chunk, chunks,
+                                          [write] * len(chunks), [force] * len(chunks)):
+                results.extend(chunk_results)
+    seconds = time.monotonic() - started
+
+    return {
+        "images": len(paths),
+        "analyzed": sum(1 for r in results if not r["skipped"] and r["quality_score"] is not None),
+        "skipped": sum(1 for r in results if r["skipped"]),
+        "errors": sum(1 for r in results if r.get("error")),
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "seconds": round(seconds, 2),
+        "images_per_s": round(len(paths) / seconds, 1) if seconds else None,
+        "results": results,
+    }
+
+
+def dataset_images(datasets_dir) -> list[Path]:
+    """All <character>/images/*.png under a datasets directory."""
+    base = Path(datasets_dir)
+    return [
+        png
+        for char_dir in sorted(base.iterdir()) if (char_dir / "images").is_dir()
+        for png in sorted((char_dir / "images").glob("*.png"))
+    ]
+
+
+# ---- Benchmark ----
+
+def make_synthetic_dataset(root: Path, count: int, size: tuple[int, int] = (416, 608),
+                           characters: int = 20, seed: int = 0) -> list[Path]:
+    """Write count noisy-gradient PNGs laid out like datasets/<character>/images/."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    ramp = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    paths = []
+    for i in range(count):
+        images_dir = root / f"char_{i % characters:02d}" / "images"
+        images_dir.mkdir(parents=True, exist_ok=True)
+        noise = rng.normal(0, 40, size=(height, width, 3)).astype(np.float32)
+        image = np.clip(ramp * rng.uniform(0.3, 1.0, size=3) + noise, 0, 255).astype(np.uint8)
+        path = images_dir / f"img_{i:05d}.png"
+        cv2.imwrite(str(path), image)
+        paths.append(path)
+    return paths
+
+
+def _legacy_pass(path: str) -> None:
+    """What scoring + dedup used to cost per image: a cv2 decode and a PIL decode."""
+    from PIL import Image
+
+    image = cv2.imread(path)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    cv2.Laplacian(gray, cv2.CV_64F).var()
+    gray.std(), gray.mean()
+    np.count_nonzero(cv2.Canny(gray, 50, 150))
+    pixels = list(Image.open(path).convert("L").resize((HASH_SIZE, HASH_SIZE), Image.LANCZOS).getdata())
+    avg = sum(pixels) / len(pixels)
+    "".join("1" if p > avg else "0" for p in pixels)
+
+
+def benchmark(count: int = 10000, size: tuple[int, int] = (416, 608), workers: int = WORKERS,
+              chunk_size: int = CHUNK_SIZE, root: Path | None = None) -> dict:
+    """Images/second on a synthetic dataset: legacy separate decodes, one-pass serial, one-pass pool."""
+    with tempfile.TemporaryDirectory(dir=root) as tmp:
+        paths = make_synthetic_dataset(Path(tmp), count, size)
+
+        started = time.monotonic()
+        for path in paths:
+            _legacy_pass(str(path))
+        legacy_s = time.monotonic() - started
+
+        serial = analyze_paths(paths, workers=1, write=False)
+        pooled = analyze_paths(paths, workers=workers, chunk_size=chunk_size, write=True, force=True)
+        incremental = analyze_paths(paths, workers=workers, chunk_size=chunk_size, write=True)
+
+    return {
+        "images": count,
+        "size": f"{size[0]}x{size[1]}",
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "legacy_ips": round(count / legacy_s, 1) if legacy_s else None,
+        "single_pass_ips": serial["images_per_s"],
+        "pool_with_meta_ips": pooled["images_per_s"],
+        "unchanged_rescan_ips": incremental["images_per_s"],
+    }
@@ -370,20 +370,24 @@ async def get_gallery_filters():
     pool = await get_pool()
 
     projects = await pool.fetch("""
-        SELECT DISTINCT project_name FROM generation_history
-        WHERE project_name IS NOT NULL ORDER BY project_name
+        SELECT project_name FROM generation_history WHERE project_name IS NOT NULL
+        UNION SELECT project_name FROM generation_history_daily WHERE project_name IS NOT NULL
+        ORDER BY project_name
     """)
     characters = await pool.fetch("""
-        SELECT DISTINCT character_slug FROM generation_history
-        WHERE character_slug IS NOT NULL ORDER BY character_slug
+        SELECT character_slug FROM generation_history WHERE character_slug IS NOT NULL
+        UNION SELECT character_slug FROM generation_history_daily WHERE character_slug IS NOT NULL
+        ORDER BY character_slug
     """)
     checkpoints = await pool.fetch("""
-        SELECT DISTINCT checkpoint_model FROM generation_history
-        WHERE checkpoint_model IS NOT NULL ORDER BY checkpoint_model
+        SELECT checkpoint_model FROM generation_history WHERE checkpoint_model IS NOT NULL
+        UNION SELECT checkpoint_model FROM generation_history_daily WHERE checkpoint_model IS NOT NULL
+        ORDER BY checkpoint_model
     """)
     sources = await pool.fetch("""
-        SELECT DISTINCT source FROM generation_history
-        WHERE source IS NOT NULL ORDER BY source
+        SELECT source FROM generation_history WHERE source IS NOT NULL
+        UNION SELECT source FROM generation_history_daily WHERE source IS NOT NULL
+        ORDER BY source
     """)
 
     return {
@@ -15,18 +15,19 @@ def perceptual_hash(image_path: Path, hash_size: int = 8) -> str:
     Resizes to hash_size x hash_size grayscale, computes mean,
     returns hex string of bits > mean. Images that look similar
     get the same hash even if they differ by compression/scaling.
+    Uses the same decode path as image_analysis so hashes stored in
+    .meta.json sidecars compare equal.
     """
     try:
-        from PIL import Image
-        img = Image.open(image_path).convert("L").resize((hash_size, hash_size), Image.LANCZOS)
-        pixels = list(img.getdata())
-        avg = sum(pixels) / len(pixels)
-        bits = "".join("1" if p > avg else "0" for p in pixels)
-        return hex(int(bits, 2))
+        from packages.visual_pipeline.image_analysis import average_hash, decode, to_gray
+        image = decode(image_path)
+        if image is None:
+            raise ValueError(f"unreadable image: {image_path}")
+        return average_hash(to_gray(image), hash_size)
     except Exception:
-        # Fallback to file hash if PIL fails
+        # Fallback to file hash if decoding fails
         import hashlib
-        return hashlib.md5(image_path.read_bytes()).hexdigest()[:16]
+        return hashlib.md5(Path(image_path).read_bytes()).hexdigest()[:16]
 
 
 def extract_json_from_vision(raw: str) -> dict | None:
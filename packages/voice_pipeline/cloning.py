@@ -14,6 +14,7 @@ import uuid
 from datetime import datetime
 from pathlib import Path
 
+from packages.core import job_queue
 from packages.core.config import BASE_PATH
 from packages.core.db import connect_direct
 from packages.core.events import event_bus, VOICE_TRAINING_SUBMITTED, VOICE_TRAINING_COMPLETED
@@ -27,6 +28,9 @@ RVC_DIR = Path("/opt/rvc-v2")
 # Track running processes
 _running_jobs: dict[str, subprocess.Popen] = {}
 
+# Both engines train on GPU 0 — one job at a time across all workers
+VOICE_TRAINING_JOB = "voice.train"
+
 
 def _get_approved_samples(character_slug: str) -> list[Path]:
     """Get list of approved WAV samples for a character."""
@@ -123,10 +127,9 @@ async def start_sovits_training(
         "duration": total_dur,
     })
 
-    # Launch training subprocess
-    asyncio.create_task(_run_sovits_training(
-        job_id, character_slug, character_name, output_dir, list_file, epochs, log_path
-    ))
+    # Queue the training subprocess
+    await _enqueue_training("sovits", job_id, character_slug, character_name,
+                            output_dir, list_file, epochs, log_path)
 
     return {
         "job_id": job_id,
@@ -139,6 +142,33 @@ async def start_sovits_training(
     }
 
 
+async def _enqueue_training(
+    engine: str, job_id: str, character_slug: str, character_name: str,
+    output_dir: Path, training_input: Path, epochs: int, log_path: Path,
+):
+    await job_queue.enqueue(VOICE_TRAINING_JOB, {
+        "engine": engine, "job_id": job_id, "character_slug": character_slug,
+        "character_name": character_name, "output_dir": str(output_dir),
+        "training_input": str(training_input), "epochs": epochs, "log_path": str(log_path),
+    }, dedupe_key=f"voice_{job_id}")
+
+
+@job_queue.job_kind(VOICE_TRAINING_JOB, concurrency=1, max_attempts=1)
+async def _voice_training_job(job):
+    """Queued job: run one SoVITS/RVC training subprocess to completion."""
+    p = job.payload
+    run = _run_sovits_training if p["engine"] == "sovits" else _run_rvc_training
+    try:
+        await run(p["job_id"], p["character_slug"], p["character_name"], Path(p["output_dir"]),
+                  Path(p["training_input"]), p["epochs"], Path(p["log_path"]))
+    except (asyncio.CancelledError, job_queue.JobCancelled):
+        proc = _running_jobs.pop(p["job_id"], None)
+        if proc and proc.poll() is None:
+            proc.send_signal(signal.SIGTERM)
+        raise
+    return {"job_id": p["job_id"], "engine": p["engine"]}
+
+
 async def _run_sovits_training(
     job_id: str, character_slug: str, character_name: str,
     output_dir: Path, list_file: Path, epochs: int, log_path: Path,
@@ -276,9 +306,8 @@ async def start_rvc_training(
         "engine": "rvc", "samples": len(samples), "duration": total_dur,
     })
 
-    asyncio.create_task(_run_rvc_training(
-        job_id, character_slug, character_name, output_dir, combined_wav, epochs, log_path
-    ))
+    await _enqueue_training("rvc", job_id, character_slug, character_name,
+                            output_dir, combined_wav, epochs, log_path)
 
     return {
         "job_id": job_id,
@@ -411,6 +440,8 @@ async def cancel_training_job(job_id: str) -> dict:
     if proc and proc.poll() is None:
         proc.send_signal(signal.SIGTERM)
         _running_jobs.pop(job_id, None)
+    # Queued, or running in another worker process (its heartbeat stops it)
+    await job_queue.cancel_jobs([VOICE_TRAINING_JOB], dedupe_key=f"voice_{job_id}")
 
     conn = await connect_direct()
     try:
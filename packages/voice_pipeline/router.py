@@ -9,8 +9,8 @@ import logging
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form
-from fastapi.responses import FileResponse
 
+from packages.core import media
 from packages.core.auth import get_user_projects
 
 from packages.core.config import BASE_PATH
@@ -423,20 +423,25 @@ async def get_synthesis_result(job_id: str):
 
 
 @router.get("/synthesis/{job_id}/audio")
-async def stream_synthesis_audio(job_id: str):
+async def stream_synthesis_audio(request: Request, job_id: str):
     """Stream synthesized audio WAV file."""
-    conn = await connect_direct()
-    try:
-        output_path = await conn.fetchval(
-            "SELECT output_path FROM voice_synthesis_jobs WHERE job_id = $1", job_id
-        )
-    finally:
-        await conn.close()
+    async def fetch():
+        conn = await connect_direct()
+        try:
+            output_path = await conn.fetchval(
+                "SELECT output_path FROM voice_synthesis_jobs WHERE job_id = $1", job_id
+            )
+        finally:
+            await conn.close()
+        return {"output_path": output_path}, None
 
+    # A finished job's output_path never changes, so it is cached once set
+    row = await media.lookup_path("voice_job", job_id, fetch, final=lambda r: bool(r["output_path"]))
+    output_path = row["output_path"]
     if not output_path or not Path(output_path).exists():
         raise HTTPException(status_code=404, detail="Audio file not found")
 
-    return FileResponse(output_path, media_type="audio/wav")
+    return await media.serve_file(request, output_path, "audio/wav")
 
 
 @router.post("/scene/{scene_id}/dialogue")
@@ -680,7 +685,7 @@ async def sfx_library():
 
 
 @router.get("/sfx/audio/{category}/{filename}")
-async def stream_sfx_audio(category: str, filename: str):
+async def stream_sfx_audio(request: Request, category: str, filename: str):
     """Stream an SFX audio file by category/filename."""
     safe_cat = Path(category).name
     safe_file = Path(filename).name
@@ -698,7 +703,7 @@ async def stream_sfx_audio(category: str, filename: str):
         audio_path = BASE_PATH.parent / "output" / "sfx_library" / "foley" / foley_tag / safe_file
     if not audio_path.exists() or audio_path.suffix != ".wav":
         raise HTTPException(status_code=404, detail="SFX file not found")
-    return FileResponse(audio_path, media_type="audio/wav")
+    return await media.serve_file(request, audio_path, "audio/wav")
 
 
 # =============================================================================
@@ -857,25 +862,25 @@ async def batch_approve_motion_sfx(request: Request):
 
 
 @router.get("/sfx/motion/audio/{category}/{filename}")
-async def stream_motion_sfx(category: str, filename: str):
+async def stream_motion_sfx(request: Request, category: str, filename: str):
     """Stream a motion SFX WAV file."""
     safe_cat = Path(category).name
     safe_file = Path(filename).name
     audio_path = MOTION_SFX_DIR / safe_cat / "sfx" / safe_file
     if not audio_path.exists() or audio_path.suffix != ".wav":
         raise HTTPException(status_code=404, detail="Motion SFX not found")
-    return FileResponse(audio_path, media_type="audio/wav")
+    return await media.serve_file(request, audio_path, "audio/wav")
 
 
 @router.get("/sfx/motion/video/{category}/{filename}")
-async def stream_motion_video(category: str, filename: str):
+async def stream_motion_video(request: Request, category: str, filename: str, rendition: str = "full"):
     """Stream a motion training clip MP4 (for visual preview)."""
     safe_cat = Path(category).name
     safe_file = Path(filename).name
     video_path = MOTION_SFX_DIR / safe_cat / "clips" / safe_file
     if not video_path.exists() or video_path.suffix != ".mp4":
         raise HTTPException(status_code=404, detail="Motion clip not found")
-    return FileResponse(video_path, media_type="video/mp4")
+    return await media.serve_file(request, video_path, "video/mp4", rendition=rendition)
 
 
 @router.get("/sfx/player")
@@ -390,6 +390,7 @@ async def sync_idea_approvals():
             WHERE ifl.generation_history_id = gh.id
               AND ifl.approved IS NULL
               AND gh.status IN ('approved', 'rejected')
+              AND gh.generated_at > NOW() - INTERVAL '30 days'  -- prunes to recent partitions
         """)
         await conn.close()
     except Exception as e:
@@ -18,15 +18,17 @@ import time
 from pathlib import Path
 
 import torch
-from PIL import Image
-from torch.utils.data import Dataset, DataLoader
-from torchvision import transforms
 from diffusers import StableDiffusionXLPipeline, AutoencoderKL, UNet2DConditionModel
 from diffusers.utils import convert_state_dict_to_diffusers
 from transformers import CLIPTextModel, CLIPTokenizer, CLIPTextModelWithProjection
 from peft import LoraConfig, get_peft_model
 from safetensors.torch import save_file, load_file
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from packages.lora_training.latent_cache import (  # noqa: E402
+    BucketBatchLoader, LatentCache, build_cache, model_id, sdxl_encoders,
+)
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -34,22 +36,17 @@ logger = logging.getLogger(__name__)
 CHECKPOINT = "/opt/ComfyUI/models/checkpoints/waiIllustriousSDXL_v160.safetensors"
 DATASETS_DIR = Path("/opt/anime-studio/datasets")
 OUTPUT_DIR = Path("/opt/ComfyUI/models/loras")
-RESOLUTION = 768
+RESOLUTION = 768  # bucket area, not a square crop
 DTYPE = torch.float32  # CPU needs FP32
+ENCODE_BATCH = 4  # VAE images per encode batch
 
 
-class CharacterDataset(Dataset):
-    """Load character images + captions for LoRA training."""
+class CharacterDataset:
+    """Character images + captions for LoRA training (encoded via the latent cache)."""
 
     def __init__(self, character_name: str, resolution: int = 768):
         self.img_dir = DATASETS_DIR / character_name / "images"
         self.resolution = resolution
-        self.transform = transforms.Compose([
-            transforms.Resize(resolution, interpolation=transforms.InterpolationMode.LANCZOS),
-            transforms.CenterCrop(resolution),
-            transforms.ToTensor(),
-            transforms.Normalize([0.5], [0.5]),
-        ])
 
         # Load approval status
         approval_file = DATASETS_DIR / character_name / "approval_status.json"
@@ -88,12 +85,6 @@ class CharacterDataset(Dataset):
     def __len__(self):
         return len(self.samples)
 
-    def __getitem__(self, idx):
-        img_path, caption = self.samples[idx]
-        image = Image.open(img_path).convert("RGB")
-        image = self.transform(image)
-        return {"pixel_values": image, "caption": caption}
-
 
 def train_lora(
     character_name: str,
@@ -114,9 +105,8 @@ def train_lora(
         logger.error(f"Only {len(dataset)} images for {character_name} — need at least 5")
         return False
 
-    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=0)
-    num_epochs = max(1, steps // len(dataset))
-    total_steps = num_epochs * len(dataset)
+    num_epochs = max(1, steps // max(1, len(dataset) // batch_size))
+    total_steps = num_epochs * max(1, len(dataset) // batch_size)
     logger.info(f"Training {character_name}: {len(dataset)} images, {num_epochs} epochs, ~{total_steps} steps, rank={rank}")
 
     # Load pipeline on CPU
@@ -171,66 +161,39 @@ def train_lora(
     step = 0
     best_loss = float('inf')
 
-    # Pre-encode all latents and text embeddings to save time
-    logger.info("Pre-encoding latents and text embeddings...")
-    cached_data = []
+    # Encode only what the latent cache doesn't already hold, batched per aspect bucket
+    logger.info("Updating latent/text-embedding cache...")
     vae.eval()
     text_encoder.eval()
     text_encoder_2.eval()
-    for batch in DataLoader(dataset, batch_size=1, shuffle=False, num_workers=0):
-        with torch.no_grad():
-            pixel_values = batch["pixel_values"].to(DTYPE)
-            captions = batch["caption"]
-
-            # Encode image to latent
-            latent = vae.encode(pixel_values).latent_dist.sample()
-            latent = latent * vae.config.scaling_factor
-
-            # Encode text with both encoders
-            tokens1 = tokenizer(
-                captions, padding="max_length", max_length=77,
-                truncation=True, return_tensors="pt"
-            )
-            text_embeds1 = text_encoder(tokens1.input_ids, output_hidden_states=True)
-            hidden1 = text_embeds1.hidden_states[-2]  # penultimate
-
-            tokens2 = tokenizer_2(
-                captions, padding="max_length", max_length=77,
-                truncation=True, return_tensors="pt"
-            )
-            text_out2 = text_encoder_2(tokens2.input_ids, output_hidden_states=True)
-            hidden2 = text_out2.hidden_states[-2]  # penultimate
-            pooled = text_out2.text_embeds  # [batch, proj_dim] pooled output
-
-            encoder_hidden_states = torch.cat([hidden1, hidden2], dim=-1)
-
-            cached_data.append({
-                'latent': latent.detach(),
-                'encoder_hidden_states': encoder_hidden_states.detach(),
-                'pooled': pooled.detach(),
-            })
-
-    # Free VAE and text encoders from memory
-    del vae, text_encoder, text_encoder_2, tokenizer, tokenizer_2
+    ckpt_id = model_id(CHECKPOINT)
+    cache = LatentCache(vae_id=ckpt_id, encoder_id=ckpt_id)
+    encode_images, encode_text = sdxl_encoders(
+        vae, text_encoder, text_encoder_2, tokenizer, tokenizer_2, "cpu", DTYPE,
+    )
+    cached_items, cache_stats = build_cache(
+        dataset.samples, cache, encode_images, encode_text,
+        resolution=RESOLUTION, batch_size=ENCODE_BATCH,
+    )
+    loader = BucketBatchLoader(cache, cached_items, batch_size=batch_size)
+    total_steps = num_epochs * len(loader)
+
+    # Free VAE and text encoders from memory (the encode closures hold references too)
+    del vae, text_encoder, text_encoder_2, tokenizer, tokenizer_2, encode_images, encode_text
+    pipe.vae = pipe.text_encoder = pipe.text_encoder_2 = None
     import gc; gc.collect()
-    logger.info(f"Pre-encoded {len(cached_data)} samples. Freed VAE+text encoders from RAM.")
+    logger.info(f"Latent cache ready for {len(cached_items)} samples. Freed VAE+text encoders from RAM.")
 
     logger.info(f"Starting training on CPU — estimated ~{total_steps * 30 / 3600:.1f} hours")
 
-    add_time_ids = torch.tensor([[RESOLUTION, RESOLUTION, 0, 0, RESOLUTION, RESOLUTION]], dtype=DTYPE)
-
     for epoch in range(num_epochs):
         epoch_loss = 0.0
-        # Shuffle indices each epoch
-        import random
-        indices = list(range(len(cached_data)))
-        random.shuffle(indices)
-
-        for batch_idx, idx in enumerate(indices):
-            data = cached_data[idx]
-            latents = data['latent']
-            encoder_hidden_states = data['encoder_hidden_states']
-            pooled = data['pooled']
+        # The loader reshuffles (within aspect buckets) each epoch
+        for batch_idx, data in enumerate(loader):
+            latents = torch.from_numpy(data['latent'])
+            encoder_hidden_states = torch.from_numpy(data['hidden'])
+            pooled = torch.from_numpy(data['pooled'])
+            add_time_ids = torch.from_numpy(data['time_ids'])
 
             # Add noise
             noise = torch.randn_like(latents)
@@ -239,7 +202,7 @@ def train_lora(
 
             added_cond_kwargs = {
                 "text_embeds": pooled,
-                "time_ids": add_time_ids.repeat(latents.shape[0], 1),
+                "time_ids": add_time_ids,
             }
 
             # Predict noise
@@ -286,7 +249,7 @@ def train_lora(
     logger.info(f"Best loss: {best_loss:.6f}, Total steps: {step}")
 
     # Cleanup
-    del pipe, unet, vae, text_encoder, text_encoder_2
+    del pipe, unet
     torch.cuda.empty_cache() if torch.cuda.is_available() else None
 
     return True
@@ -17,20 +17,22 @@ import gc
 import json
 import logging
 import os
-import random
 import sys
 import time
 from pathlib import Path
 
 import torch
 from PIL import Image
-from torch.utils.data import Dataset, DataLoader
-from torchvision import transforms
 from diffusers import StableDiffusionXLPipeline
 from diffusers import DDPMScheduler
 from peft import LoraConfig, get_peft_model
 from safetensors.torch import save_file
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from packages.lora_training.latent_cache import (  # noqa: E402
+    BucketBatchLoader, LatentCache, build_cache, model_id, sdxl_encoders,
+)
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -40,21 +42,16 @@ DATASETS_DIR = Path("/opt/anime-studio/datasets")
 OUTPUT_DIR = Path("/opt/ComfyUI/models/loras")
 DEVICE = "cuda"
 DTYPE = torch.float16  # FP16 for 12GB VRAM
-RESOLUTION = 768  # Safe for 12GB
+RESOLUTION = 768  # Safe for 12GB (bucket area, not a square crop)
+ENCODE_BATCH = 4  # VAE images per encode batch
 
 
-class CharacterDataset(Dataset):
-    """Load character images + captions for LoRA training."""
+class CharacterDataset:
+    """Character images + captions for LoRA training (encoded via the latent cache)."""
 
     def __init__(self, character_name: str, resolution: int = 768):
         self.img_dir = DATASETS_DIR / character_name / "images"
         self.resolution = resolution
-        self.transform = transforms.Compose([
-            transforms.Resize(resolution, interpolation=transforms.InterpolationMode.LANCZOS),
-            transforms.CenterCrop(resolution),
-            transforms.ToTensor(),
-            transforms.Normalize([0.5], [0.5]),
-        ])
 
         # Load approval status
         approval_file = DATASETS_DIR / character_name / "approval_status.json"
@@ -96,16 +93,6 @@ class CharacterDataset(Dataset):
     def __len__(self):
         return len(self.samples)
 
-    def __getitem__(self, idx):
-        img_path, caption = self.samples[idx]
-        try:
-            image = Image.open(img_path).convert("RGB")
-        except Exception as e:
-            logger.warning(f"Corrupt image {img_path}: {e} — using blank placeholder")
-            image = Image.new("RGB", (self.resolution, self.resolution), (128, 128, 128))
-        image = self.transform(image)
-        return {"pixel_values": image, "caption": caption}
-
 
 def train_lora(
     character_name: str,
@@ -135,9 +122,8 @@ def train_lora(
         logger.error(f"Only {len(dataset)} images for {character_name} — need at least 5")
         return False
 
-    num_epochs = max(1, steps // len(dataset))
-    total_steps = num_epochs * len(dataset)
-    logger.info(f"Training {character_name}: {len(dataset)} images, {num_epochs} epochs, ~{total_steps} steps, rank={rank}")
+    num_epochs = max(1, steps // max(1, len(dataset) // batch_size))
+    logger.info(f"Training {character_name}: {len(dataset)} images, {num_epochs} epochs, ~{num_epochs * len(dataset) // batch_size} steps, rank={rank}")
 
     # Load pipeline on CPU first, then move components to GPU individually
     logger.info("Loading SDXL pipeline...")
@@ -160,9 +146,9 @@ def train_lora(
     tokenizer_2 = pipe.tokenizer_2
     unet = pipe.unet
 
-    # Phase 1: Pre-encode all latents and text embeddings on GPU
-    # Move VAE + text encoders to GPU, encode everything, then free them
-    logger.info("Phase 1: Pre-encoding latents and text embeddings on GPU...")
+    # Phase 1: Encode whatever the latent cache doesn't already hold
+    # (new/changed images or captions), batched per aspect bucket, then free the encoders
+    logger.info("Phase 1: Updating latent/text-embedding cache on GPU...")
 
     vae.to(DEVICE)
     vae.eval()
@@ -176,43 +162,19 @@ def train_lora(
     text_encoder_2.eval()
     text_encoder_2.requires_grad_(False)
 
-    cached_data = []
-    for batch in DataLoader(dataset, batch_size=1, shuffle=False, num_workers=0):
-        with torch.no_grad():
-            pixel_values = batch["pixel_values"].to(DEVICE, dtype=DTYPE)
-            captions = batch["caption"]
-
-            latent = vae.encode(pixel_values).latent_dist.sample()
-            latent = latent * vae.config.scaling_factor
-
-            tokens1 = tokenizer(
-                captions, padding="max_length", max_length=77,
-                truncation=True, return_tensors="pt"
-            )
-            text_embeds1 = text_encoder(tokens1.input_ids.to(DEVICE), output_hidden_states=True)
-            hidden1 = text_embeds1.hidden_states[-2]
-
-            tokens2 = tokenizer_2(
-                captions, padding="max_length", max_length=77,
-                truncation=True, return_tensors="pt"
-            )
-            text_out2 = text_encoder_2(tokens2.input_ids.to(DEVICE), output_hidden_states=True)
-            hidden2 = text_out2.hidden_states[-2]
-            pooled = text_out2.text_embeds
-
-            encoder_hidden_states = torch.cat([hidden1, hidden2], dim=-1)
-
-            # Store on CPU to free GPU for UNet
-            cached_data.append({
-                'latent': latent.detach().cpu(),
-                'encoder_hidden_states': encoder_hidden_states.detach().cpu(),
-                'pooled': pooled.detach().cpu(),
-            })
-
-    logger.info(f"Pre-encoded {len(cached_data)} samples")
+    ckpt_id = model_id(ckpt)
+    cache = LatentCache(vae_id=ckpt_id, encoder_id=ckpt_id)
+    encode_images, encode_text = sdxl_encoders(
+        vae, text_encoder, text_encoder_2, tokenizer, tokenizer_2, DEVICE, DTYPE,
+    )
+    cached_items, cache_stats = build_cache(
+        dataset.samples, cache, encode_images, encode_text,
+        resolution=RESOLUTION, batch_size=ENCODE_BATCH,
+    )
+    loader = BucketBatchLoader(cache, cached_items, batch_size=batch_size)
 
-    # Free VAE and text encoders from GPU
-    del vae, text_encoder, text_encoder_2, tokenizer, tokenizer_2
+    # Free VAE and text encoders from GPU (the encode closures hold references too)
+    del vae, text_encoder, text_encoder_2, tokenizer, tokenizer_2, encode_images, encode_text
     pipe.vae = None
     pipe.text_encoder = None
     pipe.text_encoder_2 = None
@@ -260,10 +222,7 @@ def train_lora(
         beta_schedule="scaled_linear",
     )
 
-    add_time_ids = torch.tensor(
-        [[RESOLUTION, RESOLUTION, 0, 0, RESOLUTION, RESOLUTION]], dtype=DTYPE
-    ).to(DEVICE)
-
+    total_steps = num_epochs * len(loader)
     unet.train()
     step = 0
     best_loss = float('inf')
@@ -273,14 +232,12 @@ def train_lora(
 
     for epoch in range(num_epochs):
         epoch_loss = 0.0
-        indices = list(range(len(cached_data)))
-        random.shuffle(indices)
 
-        for batch_idx, idx in enumerate(indices):
-            data = cached_data[idx]
-            latents = data['latent'].to(DEVICE)
-            encoder_hidden_states = data['encoder_hidden_states'].to(DEVICE)
-            pooled = data['pooled'].to(DEVICE)
+        for batch_idx, data in enumerate(loader):
+            latents = torch.from_numpy(data['latent']).to(DEVICE, dtype=DTYPE)
+            encoder_hidden_states = torch.from_numpy(data['hidden']).to(DEVICE, dtype=DTYPE)
+            pooled = torch.from_numpy(data['pooled']).to(DEVICE, dtype=DTYPE)
+            add_time_ids = torch.from_numpy(data['time_ids']).to(DEVICE, dtype=DTYPE)
 
             noise = torch.randn_like(latents)
             timesteps = torch.randint(
@@ -291,7 +248,7 @@ def train_lora(
 
             added_cond_kwargs = {
                 "text_embeds": pooled,
-                "time_ids": add_time_ids.repeat(latents.shape[0], 1),
+                "time_ids": add_time_ids,
             }
 
             with torch.amp.autocast('cuda', dtype=DTYPE):
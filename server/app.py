@@ -116,8 +116,16 @@ app.include_router(share_router, prefix="/api", tags=["sharing"])    # /api/stud
 
 @app.on_event("startup")
 async def startup():
+    # Log a stack sample whenever a handler blocks the event loop (>100ms)
+    from packages.core.executors import lag_monitor
+    lag_monitor.start()
+
     await init_pool()
     await run_migrations()
+
+    # LISTEN for project change notifications (ETag counters for polled reads)
+    from packages.core.project_versions import start_listener
+    await start_listener()
     reconcile_training_jobs()
 
     # Register graph sync EventBus handlers
@@ -136,6 +144,10 @@ async def startup():
     from packages.core.events import register_keyframe_handlers
     register_keyframe_handlers()
 
+    # Register incremental LoRA effectiveness maintenance (QC result → group update)
+    from packages.scene_generation.lora_effectiveness import register_lora_effectiveness_handlers
+    register_lora_effectiveness_handlers()
+
     # Register NSM EventBus handlers
     from packages.narrative_state.hooks import register_nsm_handlers
     register_nsm_handlers()
@@ -152,6 +164,18 @@ async def startup():
     from packages.scene_generation.motion_intensity import load_adaptive_cache
     await load_adaptive_cache()
 
+    # Index ComfyUI model directories and keep the registry current
+    from packages.core.asset_registry import start_watcher
+    await start_watcher()
+
+    # Durable job queue — in-process worker (more via python -m packages.core.job_queue)
+    from packages.core.job_queue import start_workers
+    await start_workers()
+
+    # Daily generation_history partition upkeep (next months + retention rollups)
+    from packages.core.history_partitions import schedule_maintenance
+    await schedule_maintenance()
+
     # Start interactive session cleanup loop
     from packages.interactive.session_store import store as interactive_store
     interactive_store.start_cleanup()
@@ -162,6 +186,23 @@ async def startup():
     logger.info("Tower Anime Studio v3.5 started — 10 packages + graph + orchestrator + NSM + interactive + GPU arbiter mounted")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    from packages.interactive.engine import close_http_client
+    from packages.core.auth import close_auth_client
+    from packages.core.project_versions import stop_listener
+    from packages.core.asset_registry import stop_watcher
+    from packages.core.job_queue import stop_workers
+    from packages.core.executors import lag_monitor, shutdown_executors
+    await stop_workers()
+    await close_http_client()
+    await close_auth_client()
+    await stop_listener()
+    await stop_watcher()
+    lag_monitor.stop()
+    shutdown_executors()
+
+
 # ── System Endpoints ─────────────────────────────────────────────────────
 
 
@@ -276,6 +317,111 @@ async def arbiter_release_vision():
     return {"success": success, "model": gpu_arbiter.VISION_MODEL, "unloaded": success}
 
 
+@app.get("/api/system/assets")
+async def asset_inventory(kind: str | None = None, detail: bool = False):
+    """Model/LoRA inventory from the asset registry (counts, sizes, optional file list)."""
+    from packages.core.asset_registry import registry
+    if kind and kind not in registry.kinds:
+        raise HTTPException(400, f"Unknown asset kind. Use: {list(registry.kinds)}")
+    return registry.inventory(kind=kind, detail=detail)
+
+
+@app.post("/api/system/assets/rescan")
+async def asset_rescan():
+    """Force an immediate rescan of the model directories."""
+    import asyncio
+    from packages.core.asset_registry import registry
+    changed = await asyncio.to_thread(registry.refresh, True)
+    return {"changed": changed, "counts": registry.counts()}
+
+
+@app.get("/api/system/input-staging")
+async def input_staging_stats():
+    """ComfyUI input staging — staged files, link/copy counters, bytes copied."""
+    from packages.core.input_staging import staging_stats
+    return staging_stats()
+
+
+@app.get("/api/system/jobs")
+async def list_queue_jobs(kind: str | None = None, status: str | None = None, limit: int = 50):
+    """Recent jobs from the durable queue, newest first."""
+    from packages.core.job_queue import list_jobs
+    return {"jobs": await list_jobs(kind=kind, status=status, limit=min(limit, 500))}
+
+
+@app.get("/api/system/jobs/stats")
+async def job_queue_stats():
+    """Queue depth per kind/status, oldest queued age, in-process worker state."""
+    from packages.core.job_queue import queue_stats
+    return await queue_stats()
+
+
+@app.get("/api/system/jobs/{job_id}")
+async def get_queue_job(job_id: int):
+    """One job: status, attempts, progress, result or error."""
+    from packages.core.job_queue import get_job
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@app.post("/api/system/jobs/{job_id}/cancel")
+async def cancel_queue_job(job_id: int):
+    """Cancel a queued job, or stop a running one at its worker's next heartbeat."""
+    from packages.core.job_queue import cancel_job
+    job = await cancel_job(job_id)
+    if job is None:
+        raise HTTPException(409, "Job is not queued or running")
+    return job
+
+
+@app.get("/api/system/executors")
+async def executor_pool_stats():
+    """Offload pools (io/media/cpu) queue depth and latency, plus event-loop lag."""
+    from packages.core.executors import executor_stats
+    return executor_stats()
+
+
+@app.get("/api/system/keyframes/batching")
+async def keyframe_batching_stats():
+    """Keyframe batcher throughput: images/minute batched vs per-shot."""
+    from packages.scene_generation.keyframe_batcher import batcher_stats
+    return batcher_stats()
+
+
+@app.get("/api/system/wd14")
+async def wd14_tagger_stats():
+    """WD14 tagger throughput, cache hits and loaded models."""
+    from packages.visual_pipeline.wd14 import tagger_stats
+    return tagger_stats()
+
+
+@app.get("/api/system/renders")
+async def render_preemption_stats():
+    """Active render scopes, prompts per priority class and GPU-seconds reclaimed by cancels."""
+    from packages.core.preemption import preemption_stats
+    return preemption_stats()
+
+
+@app.post("/api/system/renders/cancel")
+async def cancel_render_scope(scope: str):
+    """Cancel one render scope (e.g. scene:<id>, blitz:<id>, pipeline:<project_id>)."""
+    from packages.core.executors import offload
+    from packages.core.preemption import cancel_scope
+    result = await offload(cancel_scope, scope, "api")
+    if result is None:
+        raise HTTPException(404, f"No active render scope '{scope}'")
+    return result
+
+
+@app.get("/api/system/media/stats")
+async def media_delivery_stats():
+    """Media delivery — path-cache hit rate, range/304 counts, rendition jobs."""
+    from packages.core.media import media_stats
+    return media_stats()
+
+
 @app.get("/api/system/events/stats")
 async def events_stats():
     """EventBus statistics — registered handlers, emit count, errors."""
@@ -291,6 +437,60 @@ async def get_learning_stats():
     return await learning.learning_stats()
 
 
+@app.get("/api/system/quality-stats")
+async def get_quality_stats_status():
+    """Incremental quality aggregates — ready flag, last rebuild, key count."""
+    from packages.core.quality_stats import stats_status
+    return await stats_status()
+
+
+@app.post("/api/system/quality-stats/rebuild")
+async def rebuild_quality_stats():
+    """Queue a full rebuild of the quality aggregates from generation_history."""
+    from packages.core import job_queue
+    from packages.core.quality_stats import REBUILD_JOB
+    return await job_queue.enqueue(REBUILD_JOB, dedupe_key=REBUILD_JOB)
+
+
+@app.get("/api/system/prompt-plans")
+async def get_prompt_plan_stats():
+    """generate_batch prompt-plan cache — size, hits, misses, invalidations, hit rate."""
+    from packages.core.prompt_plan import stats
+    return stats()
+
+
+@app.get("/api/system/variety-index")
+async def get_variety_index_stats():
+    """Keyframe embedding cache hits and per-project ANN index sizes."""
+    from packages.scene_generation.variety_index import stats
+    return stats()
+
+
+@app.get("/api/system/ingest-pipelines")
+async def get_ingest_pipelines():
+    """Per-stage throughput and queue backlog of running and recent bulk ingests."""
+    from packages.lora_training.ingest_pipeline import status
+    return status()
+
+
+@app.get("/api/system/audio-mixer")
+async def get_audio_mixer():
+    """Clip cache hit rate and render speed of this process's audio mixer."""
+    from packages.scene_generation.audio_mixer import stats
+    return stats()
+
+
+@app.get("/api/system/generation-history/partitions")
+async def get_history_partitions():
+    """generation_history partition layout, retention window and rollup coverage.
+
+    Before conversion, also lists the foreign keys into generation_history(id)
+    that converting would drop.
+    """
+    from packages.core.history_partitions import status
+    return await status()
+
+
 @app.get("/api/system/learning/suggest/{character_slug}")
 async def get_suggestions(character_slug: str):
     """Suggest optimal generation parameters based on historical quality data."""
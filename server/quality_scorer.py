@@ -4,6 +4,8 @@ Lightweight image quality scorer for LoRA Studio.
 
 Uses OpenCV for blur, contrast, brightness, and edge analysis.
 Extracted from /opt/anime-studio/quality/comfyui_quality_integration.py.
+Scoring runs through packages/visual_pipeline/image_analysis.py, which decodes
+each image once and also derives its perceptual hashes and thumbnail.
 
 Usage:
     # As a library
@@ -13,15 +15,18 @@ Usage:
     # As CLI
     python3 quality_scorer.py /path/to/image.png
     python3 quality_scorer.py --batch /path/to/datasets/  # score all dataset images
+    python3 quality_scorer.py --batch /path/to/datasets/ --write --workers 8 --chunk 64
+    python3 quality_scorer.py --benchmark 10000  # images/sec on a synthetic dataset
 """
 
 import json
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 try:
-    import cv2
-    import numpy as np
+    from packages.visual_pipeline import image_analysis
     HAS_CV2 = True
 except ImportError:
     HAS_CV2 = False
@@ -31,108 +36,66 @@ def score_image(image_path: str) -> dict:
     """Score an image's quality. Returns dict with overall score and breakdown."""
     if not HAS_CV2:
         return {"quality_score": None, "error": "opencv not available"}
-
-    path = Path(image_path)
-    if not path.exists():
-        return {"quality_score": None, "error": "file not found"}
-
-    try:
-        image = cv2.imread(str(path))
-        if image is None:
-            return {"quality_score": None, "error": "failed to read image"}
-
-        height, width = image.shape[:2]
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-        # Blur detection (Laplacian variance)
-        blur_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        blur_score = min(blur_var / 1000.0, 1.0)
-
-        # Contrast (standard deviation of grayscale)
-        contrast = gray.std() / 255.0
-
-        # Brightness (penalize extremes)
-        brightness = gray.mean() / 255.0
-        brightness_score = 1.0 - abs(brightness - 0.5) * 2
-
-        # Edge density (detail richness)
-        edges = cv2.Canny(gray, 50, 150)
-        edge_density = np.count_nonzero(edges) / edges.size
-
-        # Weighted combination
-        quality_score = (
-            blur_score * 0.3 +
-            contrast * 0.3 +
-            brightness_score * 0.2 +
-            edge_density * 0.2
-        )
-        quality_score = min(quality_score, 1.0)
-
-        return {
-            "quality_score": round(quality_score, 4),
-            "blur_score": round(blur_score, 4),
-            "contrast": round(contrast, 4),
-            "brightness": round(brightness, 4),
-            "brightness_score": round(brightness_score, 4),
-            "edge_density": round(edge_density, 4),
-            "resolution": f"{width}x{height}",
-        }
-    except Exception as e:
-        return {"quality_score": None, "error": str(e)}
-
-
-def batch_score_datasets(datasets_dir: str, write_to_meta: bool = False):
-    """Score all images in dataset directories and optionally update .meta.json files."""
-    base = Path(datasets_dir)
-    total = 0
-    scored = 0
-
-    for char_dir in sorted(base.iterdir()):
-        if not char_dir.is_dir():
-            continue
-        images_dir = char_dir / "images"
-        if not images_dir.exists():
-            continue
-
-        for png in sorted(images_dir.glob("*.png")):
-            total += 1
-            result = score_image(str(png))
-
-            if result.get("quality_score") is not None:
-                scored += 1
-
-                if write_to_meta:
-                    meta_path = png.with_suffix(".meta.json")
-                    meta = {}
-                    if meta_path.exists():
-                        try:
-                            meta = json.loads(meta_path.read_text())
-                        except (json.JSONDecodeError, IOError):
-                            pass
-                    meta["quality_score"] = result["quality_score"]
-                    meta["quality_breakdown"] = {
-                        "blur": result["blur_score"],
-                        "contrast": result["contrast"],
-                        "brightness": result["brightness_score"],
-                        "edge_density": result["edge_density"],
-                    }
-                    meta_path.write_text(json.dumps(meta, indent=2))
-
-                print(f"  {char_dir.name}/{png.name}: {result['quality_score']:.3f}")
-
-    print(f"\nScored {scored}/{total} images")
+    return image_analysis.analyze_image(image_path)
+
+
+def batch_score_datasets(datasets_dir: str, write_to_meta: bool = False,
+                         workers: int | None = None, chunk_size: int | None = None,
+                         force: bool = False):
+    """Score all images in dataset directories and optionally update .meta.json files.
+
+    With write_to_meta, images whose sidecar already holds a current analysis are
+    skipped unless force is set.
+    """
+    paths = image_analysis.dataset_images(datasets_dir)
+    summary = image_analysis.analyze_paths(
+        paths,
+        workers=workers or image_analysis.WORKERS,
+        chunk_size=chunk_size or image_analysis.CHUNK_SIZE,
+        write=write_to_meta,
+        force=force,
+    )
+    for r in summary["results"]:
+        if r["quality_score"] is not None:
+            path = Path(r["path"])
+            print(f"  {path.parent.parent.name}/{path.name}: {r['quality_score']:.3f}")
+
+    scored = summary["analyzed"] + summary["skipped"]
+    print(f"\nScored {scored}/{summary['images']} images "
+          f"({summary['skipped']} unchanged) in {summary['seconds']}s — "
+          f"{summary['images_per_s']} images/s on {summary['workers']} worker(s)")
+
+
+def _flag(name: str, default=None):
+    if name in sys.argv:
+        i = sys.argv.index(name)
+        if i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+    return default
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python3 quality_scorer.py <image_path>")
-        print("       python3 quality_scorer.py --batch <datasets_dir> [--write]")
+        print("       python3 quality_scorer.py --batch <datasets_dir> [--write] [--force] "
+              "[--workers N] [--chunk N]")
+        print("       python3 quality_scorer.py --benchmark [N]")
         sys.exit(1)
 
     if sys.argv[1] == "--batch":
         datasets_dir = sys.argv[2] if len(sys.argv) > 2 else str(Path(__file__).resolve().parent.parent / "datasets")
         write = "--write" in sys.argv
-        batch_score_datasets(datasets_dir, write_to_meta=write)
+        workers = _flag("--workers")
+        chunk = _flag("--chunk")
+        batch_score_datasets(datasets_dir, write_to_meta=write,
+                             workers=int(workers) if workers else None,
+                             chunk_size=int(chunk) if chunk else None,
+                             force="--force" in sys.argv)
+    elif sys.argv[1] == "--benchmark":
+        count = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 10000
+        workers = _flag("--workers")
+        print(json.dumps(image_analysis.benchmark(
+            count, workers=int(workers) if workers else image_analysis.WORKERS), indent=2))
     else:
         result = score_image(sys.argv[1])
         print(json.dumps(result, indent=2))
@@ -17,9 +17,11 @@ Usage:
 """
 
 import argparse
+import fcntl
 import gc
 import json
 import logging
+import os
 import signal
 import sys
 import time
@@ -50,20 +52,28 @@ JOBS_FILE = Path(__file__).resolve().parent.parent / "training_jobs.json"
 def update_job_status(job_id: str, status: str, **extra):
     """Update a training job's status in the shared JSON file."""
     try:
-        jobs = []
-        if JOBS_FILE.exists():
-            with open(JOBS_FILE) as f:
-                jobs = json.load(f)
-
-        for job in jobs:
-            if job["job_id"] == job_id:
-                job["status"] = status
-                job["last_heartbeat"] = time.strftime("%Y-%m-%dT%H:%M:%S")
-                job.update(extra)
-                break
-
-        with open(JOBS_FILE, "w") as f:
-            json.dump(jobs, f, indent=2)
+        # Same lock file and atomic replace as packages/lora_training/feedback.py
+        with open(JOBS_FILE.with_suffix(".lock"), "w") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                jobs = []
+                if JOBS_FILE.exists():
+                    with open(JOBS_FILE) as f:
+                        jobs = json.load(f)
+
+                for job in jobs:
+                    if job["job_id"] == job_id:
+                        job["status"] = status
+                        job["last_heartbeat"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                        job.update(extra)
+                        break
+
+                tmp = JOBS_FILE.with_name(f"{JOBS_FILE.name}.{os.getpid()}.tmp")
+                with open(tmp, "w") as f:
+                    json.dump(jobs, f, indent=2)
+                os.replace(tmp, JOBS_FILE)
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
     except Exception as e:
         logger.warning(f"Failed to update job status: {e}")
 
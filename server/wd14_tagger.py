@@ -3,7 +3,9 @@
 Standalone WD14 auto-tagger for LoRA Studio.
 
 Uses the same ONNX model as the ComfyUI WD14 Tagger node, but runs independently.
-Downloads the model on first use to the local models/ directory.
+Downloads the model on first use to the local models/ directory. Inference runs
+through packages/visual_pipeline/wd14.py (one resident session, batched, with a
+content-hash tag cache).
 
 Usage:
     # Tag a single image
@@ -14,112 +16,20 @@ Usage:
 
     # Specify threshold
     python3 wd14_tagger.py --threshold 0.35 /path/to/image.png
+
+    # Images/second: per-image sessions vs the batched engine
+    python3 wd14_tagger.py --benchmark /path/to/images/
 """
 
 import json
-import os
 import sys
-import csv
 from pathlib import Path
 
-_SCRIPT_DIR = Path(__file__).resolve().parent
-MODELS_DIR = _SCRIPT_DIR.parent / "models" / "wd14"
-DEFAULT_MODEL = "wd-swinv2-tagger-v3"
-MODEL_REPO = "https://huggingface.co/SmilingWolf/wd-swinv2-tagger-v3/resolve/main/"
-
-
-def ensure_model(model_name: str = DEFAULT_MODEL) -> tuple:
-    """Download model if not present. Returns (onnx_path, csv_path)."""
-    MODELS_DIR.mkdir(parents=True, exist_ok=True)
-    onnx_path = MODELS_DIR / f"{model_name}.onnx"
-    csv_path = MODELS_DIR / f"{model_name}.csv"
-
-    if not onnx_path.exists() or not csv_path.exists():
-        import urllib.request
-        print(f"Downloading WD14 model '{model_name}'...")
-        if not onnx_path.exists():
-            print(f"  Downloading model.onnx...")
-            urllib.request.urlretrieve(f"{MODEL_REPO}model.onnx", str(onnx_path))
-        if not csv_path.exists():
-            print(f"  Downloading selected_tags.csv...")
-            urllib.request.urlretrieve(f"{MODEL_REPO}selected_tags.csv", str(csv_path))
-        print("  Done.")
-
-    return onnx_path, csv_path
-
-
-def load_tags(csv_path: Path) -> list:
-    """Load tag names from the CSV file."""
-    tags = []
-    with open(csv_path, "r") as f:
-        reader = csv.reader(f)
-        next(reader)  # skip header
-        for row in reader:
-            if len(row) >= 2:
-                tags.append(row[1])  # tag_name column
-    return tags
-
-
-def tag_image(image_path: str, threshold: float = 0.35,
-              model_name: str = DEFAULT_MODEL) -> dict:
-    """Tag a single image. Returns dict with tags and confidence scores."""
-    try:
-        import onnxruntime as ort
-        from PIL import Image
-        import numpy as np
-    except ImportError as e:
-        return {"tags": [], "error": f"Missing dependency: {e}. Install: pip install onnxruntime pillow numpy"}
-
-    path = Path(image_path)
-    if not path.exists():
-        return {"tags": [], "error": "file not found"}
-
-    try:
-        onnx_path, csv_path = ensure_model(model_name)
-        tags_list = load_tags(csv_path)
-
-        # Load and preprocess image
-        image = Image.open(path).convert("RGB")
-
-        # Get model input size
-        session = ort.InferenceSession(str(onnx_path))
-        input_shape = session.get_inputs()[0].shape
-        target_size = input_shape[1] if len(input_shape) >= 3 else 448
-
-        # Resize with padding (same as ComfyUI node)
-        image = image.resize((target_size, target_size), Image.LANCZOS)
-        img_array = np.array(image, dtype=np.float32)
-
-        # BGR conversion (model expects BGR)
-        img_array = img_array[:, :, ::-1]
-
-        # Add batch dimension
-        img_array = np.expand_dims(img_array, axis=0)
-
-        # Run inference
-        input_name = session.get_inputs()[0].name
-        output = session.run(None, {input_name: img_array})
-        predictions = output[0][0]
-
-        # Filter by threshold
-        results = []
-        for i, score in enumerate(predictions):
-            if i < len(tags_list) and float(score) >= threshold:
-                results.append({
-                    "tag": tags_list[i],
-                    "confidence": round(float(score), 4),
-                })
-
-        # Sort by confidence descending
-        results.sort(key=lambda x: x["confidence"], reverse=True)
-
-        return {
-            "tags": results,
-            "tag_string": ", ".join(r["tag"] for r in results),
-            "count": len(results),
-        }
-    except Exception as e:
-        return {"tags": [], "error": str(e)}
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from packages.visual_pipeline.wd14 import (  # noqa: E402
+    DEFAULT_MODEL, benchmark, ensure_model, load_tags, tag_image, tag_paths, tagger_stats,
+)
 
 
 def batch_tag_datasets(datasets_dir: str, threshold: float = 0.35,
@@ -137,9 +47,10 @@ def batch_tag_datasets(datasets_dir: str, threshold: float = 0.35,
             continue
 
         print(f"\n  {char_dir.name}:")
-        for png in sorted(images_dir.glob("*.png")):
+        pngs = sorted(images_dir.glob("*.png"))
+        results = tag_paths(pngs, threshold=threshold)
+        for png, result in zip(pngs, results):
             total += 1
-            result = tag_image(str(png), threshold=threshold)
 
             if result.get("error"):
                 print(f"    {png.name}: ERROR - {result['error']}")
@@ -179,7 +90,9 @@ def batch_tag_datasets(datasets_dir: str, threshold: float = 0.35,
                 meta["wd14_tag_string"] = result["tag_string"]
                 meta_path.write_text(json.dumps(meta, indent=2))
 
-    print(f"\nTagged {tagged}/{total} images")
+    stats = tagger_stats()
+    print(f"\nTagged {tagged}/{total} images "
+          f"({stats['cache_hits']} from cache, {stats['images_per_second']} img/s)")
 
 
 if __name__ == "__main__":
@@ -196,8 +109,14 @@ if __name__ == "__main__":
     if not args:
         print("Usage: python3 wd14_tagger.py [--threshold 0.35] <image_path>")
         print("       python3 wd14_tagger.py --batch <datasets_dir> [--write-captions] [--write-meta]")
+        print("       python3 wd14_tagger.py --benchmark <images_dir>")
         sys.exit(1)
 
+    if args[0] == "--benchmark":
+        images = sorted(Path(args[1]).rglob("*.png"))[:200] if len(args) > 1 else []
+        print(json.dumps(benchmark(images, threshold=threshold), indent=2))
+        sys.exit(0)
+
     if args[0] == "--batch":
         datasets_dir = args[1] if len(args) > 1 else str(Path(__file__).resolve().parent.parent / "datasets")
         write_captions = "--write-captions" in args
@@ -46,6 +46,7 @@ def mock_conn():
     conn.fetchrow = AsyncMock(return_value=None)
     conn.fetchval = AsyncMock(return_value=0)
     conn.execute = AsyncMock()
+    conn.transaction = MagicMock(side_effect=lambda *a, **kw: _MockAsyncCtx(None))
     return conn
 
 
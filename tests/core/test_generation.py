@@ -207,6 +207,15 @@ class TestPollUntilComplete:
 _SENTINEL = object()
 
 
+@pytest.fixture(autouse=True)
+def _clear_prompt_plans():
+    """Each test patches generation inputs differently — never reuse a cached plan."""
+    from packages.core import prompt_plan
+    prompt_plan.clear()
+    yield
+    prompt_plan.clear()
+
+
 def _make_generate_batch_patches(
     sample_char_map,
     submit_return="prompt-123",
@@ -21,6 +21,7 @@ async def test_list_scenes(app_client):
     mock_row = {
         "id": SCENE_UUID_OBJ,
         "project_id": 1,
+        "scene_number": 1,
         "title": "Opening Scene",
         "description": "The beginning",
         "location": "City",
@@ -44,9 +45,16 @@ async def test_list_scenes(app_client):
         "audio_auto_duck": None,
         "audio_generation_mode": None,
         "audio_source_playlist_id": None,
+        "episode_id": None,
+        "episode_title": None,
+        "episode_number": None,
+        "shot_count": 3,
+        "status_counts": '{"pending": 2, "completed": 1}',
+        "k_episode": 2147483647,
+        "k_scene": 1,
+        "k_created": datetime(2026, 2, 18),
     }
     mock_conn.fetch = AsyncMock(return_value=[mock_row])
-    mock_conn.fetchval = AsyncMock(return_value=3)  # shot_count
     mock_conn.close = AsyncMock()
     with patch(
         f"{_CRUD}.connect_direct",
@@ -60,6 +68,8 @@ async def test_list_scenes(app_client):
         assert len(data["scenes"]) == 1
         assert data["scenes"][0]["title"] == "Opening Scene"
         assert data["scenes"][0]["total_shots"] == 3
+        assert data["scenes"][0]["shot_status_counts"] == {"pending": 2, "completed": 1}
+        assert data["next_cursor"] is None
 
 
 @pytest.mark.unit
@@ -165,3 +175,26 @@ async def test_delete_scene(app_client):
         assert data["message"] == "Scene deleted"
         # Verify both shots and scene were deleted
         assert mock_conn.execute.call_count == 2
+
+
+@pytest.mark.unit
+async def test_keyframe_blitz_wait_times_out_with_202(app_client):
+    scene_id = uuid.uuid4()  # not yet in the access gate's scene → project cache
+    mock_conn = AsyncMock()
+    mock_conn.fetchval = AsyncMock(return_value=1)  # scene's project, for the access gate
+    mock_conn.fetchrow = AsyncMock(return_value={"id": scene_id})
+    mock_conn.close = AsyncMock()
+    queued = {"id": 41, "status": "queued", "deduplicated": False}
+    wait_for = AsyncMock(return_value={"id": 41, "status": "queued"})  # no worker picked it up
+    with patch(f"{_CRUD}.connect_direct", new_callable=AsyncMock, return_value=mock_conn), \
+            patch(f"{_CRUD}.job_queue.enqueue", new_callable=AsyncMock, return_value=queued), \
+            patch(f"{_CRUD}.job_queue.wait_for", wait_for), \
+            patch(f"{_CRUD}.KEYFRAME_BLITZ_WAIT_S", 0.5):
+        resp = await app_client.post(f"/api/scenes/{scene_id}/keyframe-blitz")
+        assert resp.status_code == 202
+        assert resp.json() == {"job_id": 41, "status": "queued"}
+        assert wait_for.await_args.kwargs["timeout"] == 0.5
+
+        wait_for.return_value = {"id": 41, "status": "succeeded", "result": {"generated": 3}}
+        resp = await app_client.post(f"/api/scenes/{scene_id}/keyframe-blitz")
+        assert resp.status_code == 200 and resp.json() == {"generated": 3}
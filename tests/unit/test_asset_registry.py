@@ -0,0 +1,88 @@
+"""Unit tests for the model/LoRA asset registry."""
+
+import os
+
+import pytest
+
+from packages.core.asset_registry import AssetRegistry
+
+
+@pytest.fixture
+def models(tmp_path):
+    (tmp_path / "unet").mkdir()
+    (tmp_path / "loras" / "wan22_motion").mkdir(parents=True)
+    (tmp_path / "unet" / "wan_high.safetensors").write_bytes(b"x" * 10)
+    (tmp_path / "loras" / "mei_lora.safetensors").write_bytes(b"abc")
+    (tmp_path / "loras" / "wan22_motion" / "walk.safetensors").write_bytes(b"")
+    return tmp_path
+
+
+def _touch_dir(path, ns):
+    os.utime(path, ns=(ns, ns))
+
+
+@pytest.mark.unit
+def test_index_lookup_and_inventory(models):
+    reg = AssetRegistry(models, kinds=("unet", "loras", "vae"), interval=0)
+    asset = reg.get("unet", "wan_high.safetensors")
+    assert asset.size == 10 and asset.path == models / "unet" / "wan_high.safetensors"
+    assert reg.exists("loras", "wan22_motion/walk.safetensors")
+    assert "mei_lora.safetensors" in reg.view("loras")
+    assert reg.find("wan_high.safetensors", ["vae", "unet"]).kind == "unet"
+    assert [a.name for a in reg.assets("loras", "*_lora.safetensors")] == ["mei_lora.safetensors"]
+
+    inv = reg.inventory(detail=True)
+    assert inv["kinds"]["loras"]["count"] == 2
+    assert inv["kinds"]["vae"]["count"] == 0
+
+
+@pytest.mark.unit
+def test_rescan_relists_only_changed_directories(models):
+    reg = AssetRegistry(models, kinds=("unet", "loras"), interval=0)
+    reg.refresh(force=True)
+    relisted = reg._stats["dirs_relisted"]
+    assert reg.refresh(force=True) is False
+    assert reg._stats["dirs_relisted"] == relisted
+
+    (models / "loras" / "wan22_motion" / "run.safetensors").write_bytes(b"")
+    _touch_dir(models / "loras" / "wan22_motion", 1)
+    (models / "unet" / "wan_high.safetensors").unlink()
+    _touch_dir(models / "unet", 2)
+    assert reg.refresh(force=True) is True
+    assert reg._stats["dirs_relisted"] == relisted + 2
+    assert reg.exists("loras", "wan22_motion/run.safetensors")
+    assert not reg.exists("unet", "wan_high.safetensors")
+
+
+@pytest.mark.unit
+def test_recent_files_pick_up_size_changes(models):
+    reg = AssetRegistry(models, kinds=("loras",), interval=0)
+    assert reg.get("loras", "mei_lora.safetensors").size == 3
+    st = os.stat(models / "loras")
+    (models / "loras" / "mei_lora.safetensors").write_bytes(b"abcdef")
+    os.utime(models / "loras", ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert reg.get("loras", "mei_lora.safetensors").size == 6
+
+
+@pytest.mark.unit
+def test_content_hash_is_memoized(models):
+    reg = AssetRegistry(models, kinds=("loras",), interval=0)
+    asset = reg.get("loras", "mei_lora.safetensors")
+    digest = reg.content_hash(asset)
+    assert digest == "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+    assert reg._hashes[(str(asset.path), asset.size, asset.mtime)] == digest
+
+
+@pytest.mark.unit
+def test_invalidate_rescans_even_while_watching(models):
+    reg = AssetRegistry(models, kinds=("loras",), interval=3600)
+    reg.refresh(force=True)
+    reg._watching = True  # lookups no longer rescan on their own
+    st = os.stat(models / "loras")
+    (models / "loras" / "mei_lora.safetensors").unlink()
+    os.utime(models / "loras", ns=(st.st_atime_ns, st.st_mtime_ns))  # same mtime tick
+    assert reg.exists("loras", "mei_lora.safetensors")  # stale until told
+
+    reg.invalidate()
+    assert not reg.exists("loras", "mei_lora.safetensors")
+    assert reg.exists("loras", "wan22_motion/walk.safetensors")
@@ -0,0 +1,115 @@
+"""Unit tests for the streaming audio mixer — block rendering, clip cache, ducking, WAV output."""
+
+import numpy as np
+import pytest
+import scipy.io.wavfile
+
+from packages.scene_generation import audio_mixer as am
+from packages.scene_generation import audio_sequencer
+
+
+@pytest.fixture
+def clip_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(am, "CACHE_DIR", tmp_path / "clip_cache")
+    am.clear_cache()
+    yield tmp_path / "clip_cache"
+    am.clear_cache()
+
+
+def _naive(total, placements):
+    out = np.zeros(total, dtype=np.float32)
+    for clip, start, gain, fade in placements:
+        clip = clip.astype(np.float32) * gain
+        if fade:
+            offsets = np.arange(len(clip))
+            clip *= np.minimum(1.0, np.minimum((offsets + 1) / fade, (len(clip) - offsets) / fade))
+        s0 = max(0, -start)
+        end = min(start + len(clip), total)
+        out[start + s0:end] += clip[s0:end - start]
+    return out
+
+
+@pytest.mark.unit
+def test_block_render_matches_full_buffer_mix():
+    rng = np.random.default_rng(0)
+    short, long = rng.normal(size=40).astype(np.float32), rng.normal(size=700).astype(np.float32)
+    voice = rng.normal(size=2500).astype(np.float32)
+    mix = am.Mix(1.0, sample_rate=8000, block_s=0.1)  # 800-sample blocks: hits straddle edges
+
+    beats = am.beat_grid(-20, 390, mix.total, jitter=0.05, rng=rng)
+    assert beats[0] == -20 and np.all(np.diff(beats) >= 370)
+    gains = rng.uniform(0.1, 0.3, len(beats))
+    mix.add_pattern(short, beats, gains)
+    mix.add_pattern(long, beats + 5, 0.5)
+    mix.add_clip(voice, 1500, 0.8, fade=200)
+    mix.add_clip(voice, 7000, 0.4, fade=100)  # runs past the end
+
+    blocks = list(mix.blocks())
+    assert max(len(b) for b in blocks) == mix.block and sum(len(b) for b in blocks) == 8000
+    expected = _naive(8000, [(short, int(s), g, 0) for s, g in zip(beats, gains)]
+                      + [(long, int(s) + 5, 0.5, 0) for s in beats]
+                      + [(voice, 1500, 0.8, 200), (voice, 7000, 0.4, 100)])
+    assert np.allclose(np.concatenate(blocks), expected, atol=1e-5)
+
+
+@pytest.mark.unit
+def test_clip_cache_resamples_once_and_shares_npy(tmp_path, clip_cache):
+    path = tmp_path / "tick.wav"
+    tone = (np.sin(np.arange(4410) / 10) * 16000).astype(np.int16)
+    scipy.io.wavfile.write(str(path), 44100, tone)
+    before = dict(am._stats)
+
+    clip = am.load_clip(path, 24000)
+    assert len(clip) == 2400 and clip.dtype == np.float32
+    assert np.abs(clip).max() == pytest.approx(16000 / 32768, abs=0.02)
+    assert am.load_clip(path, 24000) is clip  # in-process LRU
+
+    am.clear_cache()  # a new worker maps the decoded .npy instead of decoding
+    assert isinstance(am.load_clip(path, 24000), np.memmap)
+    assert am._stats["decodes"] - before["decodes"] == 1
+    assert am._stats["disk_hits"] - before["disk_hits"] == 1
+    assert am._stats["hits"] - before["hits"] == 1
+    assert len(list(clip_cache.glob("*.npy"))) == 1
+
+    scipy.io.wavfile.write(str(path), 44100, tone[:441])  # edited clip → new key
+    assert len(am.load_clip(path, 24000)) == 240
+
+
+@pytest.mark.unit
+def test_duck_lowers_fx_only_while_voice_is_present():
+    sr = 8000
+    mix = am.Mix(2.0, sample_rate=sr, block_s=0.25)
+    mix.add_pattern(np.full(sr * 2, 0.2, dtype=np.float32), [0])
+    mix.add_clip(np.full(sr // 2, 0.5, dtype=np.float32), sr // 2, 1.0, bus="voice")
+    mix.duck("fx", key="voice", depth=0.6, threshold=0.05)
+    out = np.concatenate(list(mix.blocks()))
+
+    assert np.allclose(out[:sr // 4], 0.2)                       # before the voice
+    assert np.allclose(out[int(sr * 0.6):int(sr * 0.9)], 0.5 + 0.2 * 0.4, atol=1e-4)
+    assert np.allclose(out[int(sr * 1.2):], 0.2)                 # released after the window
+    assert np.all(np.diff(out[sr // 2 - 10:sr // 2 + 500]) <= 0.5 + 1e-6)  # no step beyond the voice onset
+
+
+@pytest.mark.unit
+def test_sequence_audio_streams_normalised_float_wav(tmp_path, clip_cache, monkeypatch):
+    rng = np.random.default_rng(3)
+    library = {}
+    for name, seconds in (("foley", 0.3), ("breath", 1.0), ("vocal", 2.5)):
+        library[name] = str(tmp_path / f"{name}.wav")
+        scipy.io.wavfile.write(library[name], 24000, (rng.normal(0, 0.2, int(seconds * 24000)) * 32767 * 0.5).astype(np.int16))
+    monkeypatch.setattr(audio_sequencer, "_pick_foley", lambda category: library["foley"])
+    monkeypatch.setattr(audio_sequencer, "_pick_clip",
+                        lambda category, gender="female": library["breath" if category in ("panting", "breathing") else "vocal"])
+    monkeypatch.setattr(audio_sequencer, "OUTPUT_DIR", tmp_path / "out")
+
+    decodes = am._stats["decodes"]
+    assert audio_sequencer.sequence_audio(0.5, "doggy") is None
+    mix = audio_sequencer.plan_sequence(12.0, "doggy_v2.safetensors")
+    assert len(mix._patterns) == 2 and all(len(starts) > 5 for _, starts, _, _ in mix._patterns)
+
+    path = audio_sequencer.sequence_audio(12.0, "doggy_v2.safetensors")
+    rate, data = scipy.io.wavfile.read(path)
+    assert rate == 24000 and data.dtype == np.float32 and len(data) == 12 * 24000
+    assert np.abs(data).max() == pytest.approx(0.7, abs=1e-4)
+    assert am._stats["decodes"] - decodes == 3  # each clip decoded once across both plans
+    assert am.stats()["mixes"] >= 1 and am.stats()["realtime_factor"] > 1
@@ -1,8 +1,14 @@
-"""Unit tests for packages.core.auth — trusted network check and rate limiter."""
+"""Unit tests for packages.core.auth — trusted network check, rate limiter and cached auth."""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from starlette.requests import Request
 
-from packages.core.auth import RateLimiter, is_trusted_network
+from packages.core import auth
+from packages.core.auth import AuthMiddleware, RateLimiter, TTLCache, is_trusted_network
 
 
 # ---------------------------------------------------------------------------
@@ -71,3 +77,128 @@ def test_rate_limiter_separate_keys():
     assert limiter.is_allowed("key_a", 3, 60) is False
     # key_b is fresh
     assert limiter.is_allowed("key_b", 3, 60) is True
+
+
+# ---------------------------------------------------------------------------
+# Cached auth fast path
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def clean_caches():
+    for cache in (auth._token_cache, auth._user_cache, auth._share_cache, auth._project_cache):
+        cache.clear()
+    yield
+    for cache in (auth._token_cache, auth._user_cache, auth._share_cache, auth._project_cache):
+        cache.clear()
+
+
+@pytest.mark.unit
+def test_ttl_cache_respects_expiry_and_size():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1, expires_at=time.time() - 1)  # already expired (JWT exp)
+    assert cache.get("a") is None
+    cache.set("b", 2)
+    cache.set("c", 3)
+    cache.get("b")
+    cache.set("d", 4)  # evicts least recently used ("c")
+    assert (cache.get("b"), cache.get("c"), cache.get("d")) == (2, None, 4)
+
+
+@pytest.mark.unit
+async def test_verified_token_is_cached_and_rechecked_in_background(clean_caches):
+    claims = {"valid": True, "auth_user_id": "u1", "expires": time.time() + 600}
+    with patch.object(auth, "_verify_jwt_locally", MagicMock(return_value=claims)) as local, \
+         patch.object(auth, "_recheck_with_auth_service", AsyncMock()) as recheck, \
+         patch.object(auth, "_verify_with_auth_service", AsyncMock()) as remote:
+        assert await auth._verify_token("tok") == claims
+        assert await auth._verify_token("tok") == claims
+        await asyncio.sleep(0)
+    local.assert_called_once()
+    recheck.assert_awaited_once()
+    remote.assert_not_awaited()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("expires, ttl", [
+    ("2030-01-01T00:00:00Z", auth.TOKEN_CACHE_TTL),   # ISO string, beyond the cache TTL
+    ("1999-01-01T00:00:00+00:00", None),              # ISO string, already expired
+    ("next tuesday", auth.TOKEN_CACHE_TTL),           # garbage → default TTL, no 500
+    ({"at": 1}, auth.TOKEN_CACHE_TTL),
+])
+async def test_remote_expiry_formats_never_raise(clean_caches, expires, ttl):
+    claims = {"valid": True, "auth_user_id": "u1", "expires": expires}
+    with patch.object(auth, "_verify_jwt_locally", MagicMock(return_value=None)), \
+         patch.object(auth, "_verify_with_auth_service", AsyncMock(return_value=claims)):
+        assert await auth._verify_token("tok") == claims
+    cached = auth._token_cache._data.get(auth._token_key("tok"))
+    if ttl is None:
+        assert auth._token_cache.get(auth._token_key("tok")) is None
+    else:
+        assert cached[1] == pytest.approx(time.time() + ttl, abs=5)
+
+
+async def _call(app, path="/api/things", headers=None):
+    scope = {
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "headers": headers or [], "client": ("8.8.8.8", 1234),
+        "server": ("test", 80), "scheme": "http", "root_path": "",
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return scope, sent
+
+
+@pytest.mark.unit
+async def test_middleware_second_request_does_no_io(clean_caches):
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(Request(scope).state.user)
+
+    claims = {"valid": True, "auth_user_id": "u1", "expires": time.time() + 600}
+    row = {"id": 7, "display_name": "Kai", "role": "viewer", "auth_user_id": "u1"}
+    headers = [(b"authorization", b"Bearer tok")]
+    with patch.object(auth, "_verify_jwt_locally", MagicMock(return_value=claims)), \
+         patch.object(auth, "_recheck_with_auth_service", AsyncMock()), \
+         patch.object(auth, "_load_or_create_studio_user", AsyncMock(return_value=row)) as load:
+        before = auth.auth_stats()
+        await _call(AuthMiddleware(app), headers=headers)
+        await _call(AuthMiddleware(app), headers=headers)
+
+    load.assert_awaited_once()
+    assert [u["studio_user_id"] for u in seen] == [7, 7]
+    after = auth.auth_stats()
+    assert after["cache_hits"] - before["cache_hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+
+@pytest.mark.unit
+async def test_middleware_rejects_external_without_auth(clean_caches):
+    app = AsyncMock()
+    _, sent = await _call(AuthMiddleware(app))
+    app.assert_not_awaited()
+    assert sent[0]["status"] == 401
+
+
+@pytest.mark.unit
+async def test_user_projects_cached_until_invalidated(clean_caches):
+    conn = AsyncMock()
+    conn.fetch = AsyncMock(side_effect=lambda sql, *a: (
+        [{"id": 1}, {"id": 2}] if "FROM projects" in sql else [{"project_id": 2}]
+    ))
+    request = MagicMock()
+    request.state.user = {"studio_user_id": 7, "max_rating": "R", "role": "viewer"}
+    with patch("packages.core.db.connect_direct", AsyncMock(return_value=conn)) as connect:
+        assert await auth.get_user_projects(request) == [2]
+        assert await auth.get_user_projects(request) == [2]
+        assert connect.await_count == 1
+        auth.invalidate_user_cache(7)
+        await auth.get_user_projects(request)
+        assert connect.await_count == 2
@@ -0,0 +1,51 @@
+"""Unit tests for the compiled LoRA catalog index."""
+
+import pytest
+
+from packages.scene_generation import catalog_index, catalog_loader
+from packages.scene_generation.catalog_index import AhoCorasick
+from packages.scene_generation.content_lora_matcher import match_content_lora
+
+_CATALOG = {
+    "action_presets": {
+        "walking": {"label": "Walking forward", "tier": "universal"},
+        "reverse_cowgirl": {"label": "Reverse cowgirl", "tier": "explicit"},
+        "cowgirl": {"label": "Cowgirl riding", "tier": "explicit"},
+        "slow_dance": {"label": "Slow romantic dance", "tier": "wholesome"},
+    },
+    "video_lora_pairs": {
+        "cowgirl": {"high": "wan22_nsfw/cowgirl_HIGH.safetensors", "motion_tier": "high"},
+    },
+}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(catalog_index, "load_catalog", lambda: _CATALOG)
+    monkeypatch.setattr(catalog_index, "_index", None)
+    catalog_loader.invalidate_catalog()
+    yield catalog_index.get_catalog_index()
+    catalog_loader.invalidate_catalog()
+
+
+@pytest.mark.unit
+def test_aho_corasick_reports_overlapping_substrings():
+    ac = AhoCorasick(["he", "she", "his", "hers", "walk"])
+    assert ac.find("ushers sleepwalking") == {"he", "she", "hers", "walk"}
+    assert ac.find("") == set()
+
+
+@pytest.mark.unit
+def test_content_match_prefers_longest_alias_and_gates_rating(index):
+    assert match_content_lora("reverse cowgirl, slow", "", "XXX") == "reverse_cowgirl"
+    assert match_content_lora("reverse cowgirl while walking", "", "PG") == "walking"
+    # No alias hit — two label words score the preset
+    assert match_content_lora("a romantic evening, slow", "", "G") == "slow_dance"
+
+
+@pytest.mark.unit
+def test_index_rebuilds_on_catalog_invalidation(index):
+    assert index.find_pair("cowgirl_HIGH.safetensors")["motion_tier"] == "high"
+    assert catalog_index.get_catalog_index() is index
+    catalog_loader.invalidate_catalog()
+    assert catalog_index.get_catalog_index() is not index
@@ -0,0 +1,59 @@
+"""Unit tests for the shared offload executors and the loop-lag monitor."""
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from packages.core import executors
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(executors, "_stats", {name: executors._PoolStats() for name in executors.POOL_SIZES})
+    yield
+    executors.shutdown_executors()
+
+
+@pytest.mark.unit
+async def test_offload_runs_off_loop_and_records_latency():
+    loop_thread = threading.get_ident()
+    thread = await executors.offload(threading.get_ident, pool="media")
+    assert thread != loop_thread
+    assert await executors.offload(sorted, [3, 1, 2], reverse=True) == [3, 2, 1]
+
+    stats = executors.executor_stats()["pools"]
+    assert stats["media"]["completed"] == 1 and stats["io"]["completed"] == 1
+    assert stats["io"]["run_ms"]["p50"] >= 0
+    assert stats["cpu"]["submitted"] == 0
+
+
+@pytest.mark.unit
+async def test_offload_counts_errors_and_rejects_unknown_pool():
+    with pytest.raises(ZeroDivisionError):
+        await executors.offload(divmod, 1, 0)
+    assert executors.executor_stats()["pools"]["io"]["errors"] == 1
+    with pytest.raises(ValueError):
+        await executors.offload(print, pool="gpu")
+
+
+@pytest.mark.unit
+async def test_cpu_pool_runs_in_another_process():
+    assert await executors.offload(os.getpid, pool="cpu") != os.getpid()
+
+
+@pytest.mark.unit
+async def test_lag_monitor_samples_blocking_stack():
+    monitor = executors.LagMonitor(threshold_ms=50, interval_s=0.01)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        time.sleep(0.3)  # block the loop
+        await asyncio.sleep(0.05)
+    finally:
+        monitor.stop()
+    assert monitor.stalls == 1
+    assert monitor.max_lag_ms >= 200
+    assert "time.sleep(0.3)" in monitor.last_stall["stack"]
@@ -1,7 +1,7 @@
 """Unit tests for feedback loop helpers in packages.lora_training.feedback.
 
 Tests record_rejection, get_feedback_negatives, REJECTION_NEGATIVE_MAP,
-register_pending_image, and register_image_status.
+register_pending_image, register_image_status and register_image_statuses.
 
 All filesystem tests use monkeypatch to redirect BASE_PATH to tmp_path.
 """
@@ -16,6 +16,7 @@ from packages.lora_training.feedback import (
     REJECTION_NEGATIVE_MAP,
     register_pending_image,
     register_image_status,
+    register_image_statuses,
 )
 
 
@@ -142,3 +143,14 @@ def test_register_image_status_approved(feedback_fs):
     status_path = feedback_fs / "test_char" / "approval_status.json"
     data = json.loads(status_path.read_text())
     assert data["gen_test_002.png"] == "approved"
+
+
+@pytest.mark.unit
+def test_register_image_statuses_batch_never_downgrades(feedback_fs):
+    """A batch write adds new images but leaves reviewed ones alone."""
+    register_image_status("test_char", "old.png", "approved")
+    register_image_statuses("test_char", {"old.png": "pending", "a.png": "pending", "b.png": "pending"})
+    data = json.loads((feedback_fs / "test_char" / "approval_status.json").read_text())
+    assert data == {"old.png": "approved", "a.png": "pending", "b.png": "pending"}
+    with pytest.raises(ValueError):
+        register_image_statuses("test_char", {"c.png": "maybe"})
@@ -0,0 +1,66 @@
+"""Unit tests for the autonomous generation loop's local video path (ComfyUI and DB mocked)."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from packages.core import generation_loop
+from packages.core.generation_loop import ProjectGenerationLoop
+from packages.scene_generation import scene_comfyui, wan_video
+
+
+def _shot(**overrides):
+    shot = {"id": "shot-1", "scene_id": "scene-1", "motion_prompt": "she turns", "lora_name": None,
+            "lora_strength": None, "source_image_path": "mira/images/kf_001.png",
+            "characters_present": ["mira"]}
+    shot.update(overrides)
+    return shot
+
+
+@pytest.fixture
+def video_env(monkeypatch):
+    env = MagicMock()
+    env.workflow_args = {}
+
+    def build(**kwargs):
+        env.workflow_args.update(kwargs)
+        return {"1": {"class_type": "SaveVideo"}}, kwargs["output_prefix"]
+
+    monkeypatch.setattr(wan_video, "build_dasiwa_i2v_workflow", build)
+    monkeypatch.setattr(scene_comfyui, "copy_to_comfyui_input",
+                        AsyncMock(return_value="kf_001__0123456789abcdef.png"))
+    monkeypatch.setattr(generation_loop, "_submit_comfyui", lambda url, workflow: "p1")
+    monkeypatch.setattr(generation_loop, "_poll_comfyui", AsyncMock(return_value={"outputs": {}}))
+    monkeypatch.setattr(generation_loop, "_extract_video_path", lambda result, prefix: "/out/shot.mp4")
+    env.emit = AsyncMock()
+    monkeypatch.setattr(generation_loop.event_bus, "emit", env.emit)
+    monkeypatch.setattr(generation_loop, "_last_frame", AsyncMock(return_value="/out/shot_lastframe.png"))
+    env.conn = MagicMock()
+    env.conn.execute = AsyncMock()
+    return env
+
+
+@pytest.mark.unit
+async def test_local_video_loads_the_staged_input_name(video_env):
+    loop = ProjectGenerationLoop(7, {})
+    await loop._generate_video_local(video_env.conn, _shot())
+
+    scene_comfyui.copy_to_comfyui_input.assert_awaited_once_with("mira/images/kf_001.png")
+    assert video_env.workflow_args["ref_image"] == "kf_001__0123456789abcdef.png"
+    assert loop._videos_generated == 1
+
+
+@pytest.mark.unit
+async def test_shot_generated_carries_scene_and_last_frame(video_env, monkeypatch):
+    from packages.scene_generation import variety_index
+
+    changed = []
+    monkeypatch.setattr(variety_index, "mark_shot_changed", lambda *args: changed.append(args))
+    await ProjectGenerationLoop(7, {})._generate_video_local(video_env.conn, _shot())
+
+    event, payload = video_env.emit.await_args.args
+    assert event == generation_loop.SHOT_GENERATED
+    assert payload["scene_id"] == "scene-1" and payload["last_frame_path"] == "/out/shot_lastframe.png"
+    assert "last_frame_path = $5" in video_env.conn.execute.await_args.args[0]
+    await variety_index._handle_shot_generated(payload)
+    assert changed == [("shot-1", "scene-1", "/out/shot_lastframe.png")]
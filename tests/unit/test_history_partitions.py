@@ -0,0 +1,273 @@
+"""Unit tests for generation_history partitioning — month ranges, retention, conversion SQL."""
+
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from datetime import date
+
+import pytest
+
+from packages.core import history_partitions as hp
+
+
+class FakeConn:
+    """Records executed SQL; partitions and default-partition stray rows are scripted."""
+
+    def __init__(self, partitions=(), stray_months=()):
+        self.partitions = list(partitions)
+        self.stray_months = set(stray_months)
+        self.sql: list[str] = []
+
+    async def fetch(self, sql, *args):
+        return [{"relname": name} for name in self.partitions]
+
+    async def fetchval(self, sql, *args):
+        return args[0] in self.stray_months
+
+    async def execute(self, sql, *args):
+        self.sql.append(" ".join(sql.split()))
+        return "INSERT 0 0"
+
+    @asynccontextmanager
+    async def _tx(self):
+        yield
+
+    def transaction(self):
+        return self._tx()
+
+
+@pytest.mark.unit
+def test_month_ranges_and_names():
+    assert hp.add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert hp.add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    name = hp.partition_name(date(2026, 2, 1))
+    assert name == "generation_history_y2026m02"
+    assert hp.partition_bounds(name) == (date(2026, 2, 1), date(2026, 3, 1))
+    assert hp.partition_bounds(hp.DEFAULT_PARTITION) is None
+
+    months = hp.months_needed(date(2025, 11, 17), today=date(2026, 1, 5), months_ahead=2)
+    assert months == [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)]
+
+
+@pytest.mark.unit
+def test_retention_only_drops_whole_expired_months():
+    names = [hp.partition_name(date(2024, m, 1)) for m in range(9, 13)] + [
+        hp.partition_name(date(2025, 1, 1)), hp.DEFAULT_PARTITION,
+    ]
+    expired = hp.expired_partitions(names, today=date(2026, 11, 20), keep_months=24)
+    assert expired == ["generation_history_y2024m09", "generation_history_y2024m10"]
+    assert hp.expired_partitions(names, today=date(2026, 11, 20), keep_months=0) == []
+
+
+@pytest.mark.unit
+def test_mirror_trigger_and_rollup_sql():
+    sql = hp.mirror_function_sql(["id", "character_slug", "quality_score", "generated_at"])
+    assert f"INSERT INTO {hp.NEW_TABLE} (id, character_slug, quality_score, generated_at)" in sql
+    assert "VALUES (NEW.id, NEW.character_slug, NEW.quality_score, NEW.generated_at)" in sql
+    assert "DO UPDATE SET character_slug = EXCLUDED.character_slug, quality_score = EXCLUDED.quality_score;" in sql
+    assert "OLD.generated_at IS DISTINCT FROM NEW.generated_at" in sql
+
+    rollup = " ".join(hp.rollup_sql("generation_history_y2024m09").split())
+    assert "FROM generation_history_y2024m09 GROUP BY generated_at::date, project_name" in rollup
+    assert all(dim in rollup for dim in hp.ROLLUP_DIMENSIONS)
+
+
+@pytest.mark.unit
+async def test_ensure_partitions_creates_missing_and_moves_default_rows():
+    conn = FakeConn(
+        partitions=[hp.DEFAULT_PARTITION, hp.partition_name(date(2026, 10, 1))],
+        stray_months={date(2026, 12, 1)},
+    )
+    created = await hp.ensure_partitions(conn, since=date(2026, 10, 3), months_ahead=2, today=date(2026, 10, 18))
+
+    assert created == ["generation_history_y2026m11", "generation_history_y2026m12"]
+    assert not any("DEFAULT" in s and "CREATE TABLE" in s for s in conn.sql)
+    assert any("y2026m11 PARTITION OF generation_history FOR VALUES FROM ('2026-11-01') TO ('2026-12-01')" in s
+               for s in conn.sql)
+    # December already has rows in the default partition: detach, move, re-attach
+    detach = conn.sql.index(f"ALTER TABLE generation_history DETACH PARTITION {hp.DEFAULT_PARTITION}")
+    assert "DELETE FROM generation_history_default" in conn.sql[detach + 2]
+    assert conn.sql[detach + 3].endswith(f"ATTACH PARTITION {hp.DEFAULT_PARTITION} DEFAULT")
+
+
+class ConvertConn:
+    """A plain generation_history with ids 1..rows; the copy and swap move ids into NEW_TABLE."""
+
+    def __init__(self, rows=12, foreign_keys=(), fail_on_batch=None, skip_ids=()):
+        self.old_ids = set(range(1, rows + 1))
+        self.new_ids: set[int] = set()
+        self.partitions: dict[str, list[str]] = {hp.TABLE: [], hp.NEW_TABLE: []}
+        self.partitioned = False
+        self.foreign_keys = [{"tbl": t, "conname": c} for t, c in foreign_keys]
+        self.fail_on_batch = fail_on_batch
+        self.skip_ids = set(skip_ids)  # rows the copy "misses", to force a count mismatch
+        self.batches = 0
+        self.sql: list[str] = []
+
+    async def fetchval(self, sql, *args):
+        if "relkind" in sql:
+            return "p" if self.partitioned and args[0] == hp.TABLE else "r"
+        if "to_regclass" in sql:
+            return True
+        if "MIN(generated_at)" in sql:
+            return date(2026, 9, 14)
+        if "MAX(id)" in sql:
+            return max(self.old_ids)
+        if "pg_get_serial_sequence" in sql:
+            return "public.generation_history_id_seq"
+        if f"COUNT(*) FROM {hp.NEW_TABLE}" in sql:
+            return len(self.new_ids)
+        if f"COUNT(*) FROM {hp.TABLE}" in sql:
+            return len(self.old_ids)
+        return False  # no stray rows in the default partition
+
+    async def fetch(self, sql, *args):
+        if "information_schema.columns" in sql:
+            return [{"column_name": c} for c in ("id", "character_slug", "generated_at")]
+        if "pg_inherits" in sql:
+            return [{"relname": n} for n in self.partitions[args[0].removeprefix("public.")]]
+        if "pg_constraint" in sql:
+            return self.foreign_keys
+        return []
+
+    async def execute(self, sql, *args):
+        sql = " ".join(sql.split())
+        self.sql.append(sql)
+        if sql.startswith(f"INSERT INTO {hp.NEW_TABLE}"):
+            self.batches += 1
+            if self.batches == self.fail_on_batch:
+                raise ConnectionError("connection lost")
+            batch = {i for i in self.old_ids if args[0] < i <= args[1]} - self.skip_ids - self.new_ids
+            self.new_ids |= batch
+            return f"INSERT 0 {len(batch)}"
+        if m := re.match(r"CREATE TABLE (?:IF NOT EXISTS )?(\w+) PARTITION OF (\w+)", sql):
+            self.partitions[m.group(2)].append(m.group(1))
+        if sql == f"ALTER TABLE {hp.NEW_TABLE} RENAME TO {hp.TABLE}":
+            self.partitioned = True
+        return "OK"
+
+    @asynccontextmanager
+    async def _tx(self):
+        yield
+
+    def transaction(self):
+        return self._tx()
+
+
+@pytest.mark.unit
+async def test_convert_copies_then_swaps_tables_indexes_and_foreign_keys():
+    conn = ConvertConn(rows=12, foreign_keys=[("rejections", "rejections_gen_fk"), ("approvals", "approvals_gen_fk")])
+    result = await hp.convert(conn, batch_rows=5)
+
+    assert result["converted"] and result["rows"] == 12 and result["copied"] == 12
+    assert conn.batches == 3 and conn.partitioned
+    assert result["dropped_foreign_keys"] == ["rejections.rejections_gen_fk", "approvals.approvals_gen_fk"]
+
+    swap = conn.sql[conn.sql.index(f"LOCK TABLE {hp.TABLE} IN ACCESS EXCLUSIVE MODE"):]
+    assert swap[1:3] == ['ALTER TABLE rejections DROP CONSTRAINT "rejections_gen_fk"',
+                         'ALTER TABLE approvals DROP CONSTRAINT "approvals_gen_fk"']
+    renamed = swap.index(f"ALTER TABLE {hp.NEW_TABLE} RENAME TO {hp.TABLE}")
+    assert swap[renamed - 1] == f"ALTER TABLE {hp.TABLE} RENAME TO {hp.LEGACY_TABLE}"
+    for name in (hp.UNIQUE_KEY, *hp.INDEXES):
+        legacy = swap.index(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_legacy")
+        assert swap.index(f"ALTER INDEX {name}_p RENAME TO {name}") == legacy + 1 > renamed
+    assert "ALTER SEQUENCE public.generation_history_id_seq OWNED BY generation_history.id" in swap
+
+    assert await hp.convert(conn) == {"converted": False, "reason": "already partitioned"}
+
+
+@pytest.mark.unit
+async def test_convert_aborts_swap_on_row_count_mismatch():
+    conn = ConvertConn(rows=8, foreign_keys=[("rejections", "rejections_gen_fk")], skip_ids={5})
+    with pytest.raises(RuntimeError, match="row count mismatch after copy: 8 vs 7"):
+        await hp.convert(conn, batch_rows=4)
+    assert not conn.partitioned
+    assert not any("DROP CONSTRAINT" in s or "RENAME" in s for s in conn.sql)
+
+
+@pytest.mark.unit
+async def test_convert_resumes_after_interrupted_copy():
+    conn = ConvertConn(rows=10, fail_on_batch=2)
+    with pytest.raises(ConnectionError):
+        await hp.convert(conn, batch_rows=4)
+    assert conn.new_ids == {1, 2, 3, 4} and not conn.partitioned
+    partitions = list(conn.partitions[hp.NEW_TABLE])
+
+    result = await hp.convert(conn, batch_rows=4)
+    assert result["converted"] and result["rows"] == 10
+    assert result["copied"] == 6  # the first batch is not copied twice
+    assert conn.partitions[hp.NEW_TABLE] == partitions  # partitions reused, not recreated
+    assert conn.sql.count(f"DROP TRIGGER IF EXISTS generation_history_mirror ON {hp.TABLE}") == 2
+
+
+@pytest.mark.unit
+async def test_startup_migrate_does_not_convert_unless_opted_in(monkeypatch):
+    conn = ConvertConn(rows=3)
+    monkeypatch.setattr(hp, "CONVERT_ON_STARTUP", False)
+    await hp.migrate(conn)
+    assert not conn.partitioned and conn.batches == 0
+
+    monkeypatch.setattr(hp, "CONVERT_ON_STARTUP", True)
+    await hp.migrate(conn)
+    assert conn.partitioned
+
+
+class RetentionConn(FakeConn):
+    """Partitioned table with per-partition row counts."""
+
+    def __init__(self, rows_by_partition, partitioned=True):
+        super().__init__(partitions=list(rows_by_partition))
+        self.rows_by_partition = rows_by_partition
+        self.partitioned = partitioned
+
+    async def fetchval(self, sql, *args):
+        if "relkind" in sql:
+            return "p" if self.partitioned else "r"
+        return self.rows_by_partition[sql.split("FROM ")[-1].strip()]
+
+    async def execute(self, sql, *args):
+        self.sql.append((" ".join(sql.split()), args))
+        return "INSERT 0 4"
+
+
+@pytest.mark.unit
+async def test_apply_retention_rolls_up_then_drops_expired_months():
+    rows = {hp.partition_name(date(2024, m, 1)): 10 * m for m in (9, 10, 11)}
+    rows[hp.DEFAULT_PARTITION] = 0
+    conn = RetentionConn(rows)
+
+    dropped = await hp.apply_retention(conn, keep_months=24, today=date(2026, 11, 20))
+    assert dropped == [
+        {"partition": "generation_history_y2024m09", "rows": 90, "rollup_rows": 4},
+        {"partition": "generation_history_y2024m10", "rows": 100, "rollup_rows": 4},
+    ]
+    statements = [sql for sql, _ in conn.sql]
+    first = statements[:4]
+    assert first[0] == f"DELETE FROM {hp.SUMMARY_TABLE} WHERE day >= $1 AND day < $2"
+    assert conn.sql[0][1] == (date(2024, 9, 1), date(2024, 10, 1))  # re-run replaces, never doubles
+    assert first[1].startswith(f"INSERT INTO {hp.SUMMARY_TABLE}") and "FROM generation_history_y2024m09" in first[1]
+    assert first[2:] == ["ALTER TABLE generation_history DETACH PARTITION generation_history_y2024m09",
+                         "DROP TABLE generation_history_y2024m09"]
+    assert not any("y2024m11" in s for s in statements)
+
+    assert await hp.apply_retention(conn, keep_months=0, today=date(2026, 11, 20)) == []
+    assert await hp.apply_retention(RetentionConn(rows, partitioned=False), keep_months=24) == []
+
+
+@pytest.mark.unit
+async def test_status_lists_foreign_keys_conversion_would_drop(monkeypatch):
+    conn = ConvertConn(rows=3, foreign_keys=[("rejections", "rejections_gen_fk")])
+    conn.close = lambda: asyncio.sleep(0)
+
+    async def connect():
+        return conn
+    monkeypatch.setattr(hp, "connect_direct", connect)
+
+    before = await hp.status()
+    assert not before["partitioned"]
+    assert before["convert_drops_foreign_keys"] == ["rejections.rejections_gen_fk"]
+    assert "convert_warning" in before
+
+    await hp.convert(conn)
+    after = await hp.status()
+    assert after["partitioned"] and "convert_drops_foreign_keys" not in after
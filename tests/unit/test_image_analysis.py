@@ -0,0 +1,91 @@
+"""Unit tests for single-decode image analysis — metrics, hashes, sidecar index, batch pool."""
+
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from packages.visual_pipeline import image_analysis as ia
+
+
+def _write(path, seed=0, size=(96, 64)):
+    rng = np.random.default_rng(seed)
+    width, height = size
+    ramp = np.linspace(0, 255, width)[None, :, None]
+    image = np.clip(ramp * 0.8 + rng.normal(0, 30, (height, width, 3)), 0, 255).astype(np.uint8)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cv2.imwrite(str(path), image)
+    return path
+
+
+@pytest.mark.unit
+def test_metrics_match_legacy_formulas(tmp_path):
+    path = _write(tmp_path / "a.png")
+    gray = cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_BGR2GRAY)
+    result = ia.analyze_image(path)
+
+    blur = min(cv2.Laplacian(gray, cv2.CV_64F).var() / 1000.0, 1.0)
+    brightness = gray.mean() / 255.0
+    edge_density = np.count_nonzero(cv2.Canny(gray, 50, 150)) / gray.size
+    expected = min(blur * 0.3 + gray.std() / 255.0 * 0.3 + (1.0 - abs(brightness - 0.5) * 2) * 0.2
+                   + edge_density * 0.2, 1.0)
+    assert result["quality_score"] == round(expected, 4)
+    assert result["contrast"] == round(gray.std() / 255.0, 4)
+    assert result["edge_density"] == round(edge_density, 4)
+    assert result["resolution"] == "96x64"
+    assert ia.analyze_image(tmp_path / "missing.png")["error"] == "file not found"
+
+
+@pytest.mark.unit
+def test_hashes_share_the_dedup_format(tmp_path):
+    from packages.visual_pipeline.vision import perceptual_hash
+
+    path = _write(tmp_path / "a.png")
+    result = ia.analyze_image(path)
+    assert result["phash"] == perceptual_hash(path)
+    assert result["phash"].startswith("0x")
+
+    gray = np.tile(np.arange(0, 256, 16, dtype=np.uint8), (16, 1))
+    # Left-to-right ramp: every pixel is darker than its right neighbour
+    assert ia.difference_hash(gray) == "0x0"
+    assert ia.difference_hash(gray[:, ::-1]) == hex(2 ** 64 - 1)
+
+
+@pytest.mark.unit
+def test_sidecar_index_skips_unchanged_and_feeds_dedup(tmp_path, monkeypatch):
+    from packages.lora_training import dedup
+
+    path = _write(tmp_path / "roxy" / "images" / "img_001.png")
+    path.with_suffix(".meta.json").write_text(json.dumps({"seed": 7}))
+
+    first = ia.analyze_dataset_image(path)
+    meta = json.loads(path.with_suffix(".meta.json").read_text())
+    assert not first["skipped"] and meta["seed"] == 7
+    assert meta["thumbnail"] == "thumbs/img_001.jpg" and (tmp_path / "roxy" / "thumbs" / "img_001.jpg").exists()
+    assert ia.analyze_dataset_image(path)["skipped"]
+
+    # Dedup index reads the sidecar hash instead of decoding
+    monkeypatch.setattr(dedup, "BASE_PATH", tmp_path)
+    monkeypatch.setattr(dedup, "perceptual_hash", lambda p: pytest.fail("decoded"))
+    dedup.invalidate_cache()
+    assert dedup.build_hash_index("roxy") == {meta["phash"]}
+
+    _write(path, seed=1)  # file changed → stamp no longer matches
+    assert ia.current_analysis(path) is None
+    assert not ia.analyze_dataset_image(path)["skipped"]
+    dedup.invalidate_cache()
+
+
+@pytest.mark.unit
+def test_process_pool_matches_serial(tmp_path):
+    paths = ia.make_synthetic_dataset(tmp_path, 12, size=(64, 48), characters=3)
+    assert len(ia.dataset_images(tmp_path)) == 12
+
+    serial = ia.analyze_paths(paths, workers=1, write=False)
+    pooled = ia.analyze_paths(paths, workers=2, chunk_size=4, write=True)
+    assert pooled["analyzed"] == 12 and pooled["errors"] == 0
+    assert [r["quality_score"] for r in pooled["results"]] == [r["quality_score"] for r in serial["results"]]
+
+    again = ia.analyze_paths(paths, workers=2, chunk_size=4)
+    assert again["skipped"] == 12
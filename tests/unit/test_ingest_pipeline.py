@@ -0,0 +1,138 @@
+"""Unit tests for the staged ingest pipeline — segments, back-pressure, batching, end-to-end persist."""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from packages.lora_training import dedup, ingest_helpers, ingest_pipeline as ip
+
+
+@pytest.mark.unit
+def test_plan_segments_share_frame_budget():
+    segments = ip.plan_segments(3 * 3600, 500, segment_s=600)
+    assert len(segments) == 18
+    assert sum(quota for _, _, quota in segments) == 500
+    assert segments[-1][0] + segments[-1][1] == pytest.approx(3 * 3600)
+    assert ip.plan_segments(90, 50, segment_s=600) == [(0.0, 90, 50)]
+    assert ip.plan_segments(0, 50) == [(0.0, 0.0, 50)]
+    assert len(ip.plan_segments(3600, 3, segment_s=60)) == 3  # every window gets at least one frame
+
+
+@pytest.mark.unit
+async def test_bounded_queues_apply_back_pressure_and_batch():
+    produced = consumed = 0
+    in_flight = []
+    batches = []
+
+    async def explode(n):
+        nonlocal produced
+        for i in range(n):
+            produced += 1
+            in_flight.append(produced - consumed)
+            yield i
+
+    async def slow(i):
+        nonlocal consumed
+        consumed += 1
+        await asyncio.sleep(0)
+        if i == 13:
+            raise ValueError("bad frame")
+        return [i]
+
+    pipeline = ip.Pipeline("test", [
+        ip.Stage("extract", explode),
+        ip.Stage("classify", slow, 2),
+        ip.Stage("persist", batches.append, batch_size=8, flush_s=0.05),
+    ], queue_size=4)
+    await pipeline.run([100])
+
+    # The producer never ran more than the queue plus in-flight workers ahead
+    assert max(in_flight) <= 4 + 2 + 1
+    assert sorted(i for batch in batches for i in batch) == [i for i in range(100) if i != 13]
+    assert all(len(batch) <= 8 for batch in batches)
+
+    stages = {s["name"]: s for s in pipeline.stats()["stages"]}
+    assert stages["extract"]["out"] == 100 and pipeline.stages[0].blocked_s > 0
+    assert stages["classify"]["errors"] == 1 and stages["persist"]["in"] == 99
+    assert ip.status()["recent"][-1]["name"] == "test" and not ip._active
+
+
+@pytest.mark.unit
+async def test_fatal_stage_aborts_pipeline():
+    seen = []
+
+    async def download(url):
+        raise RuntimeError(f"yt-dlp failed for {url}")
+
+    pipeline = ip.Pipeline("fatal", [ip.Stage("download", download, fatal=True),
+                                     ip.Stage("persist", seen.append)])
+    with pytest.raises(RuntimeError, match="yt-dlp failed"):
+        await asyncio.wait_for(pipeline.run(["https://example.invalid/v"]), 5)
+    assert not seen and "fatal" not in ip._active
+
+
+@pytest.mark.unit
+async def test_run_ingest_dedups_classifies_and_batches_status_writes(tmp_path, monkeypatch):
+    datasets = tmp_path / "datasets"
+    workdirs = []
+
+    async def inline(fn, *args, pool="io", **kwargs):
+        return fn(*args, **kwargs)
+
+    def extract_segment(video, index, start, length, quota, tmpdir):
+        workdirs.append(tmpdir)
+        hashes = [f"h{index}_{k}" for k in range(quota)]
+        if index == 1:
+            hashes[1] = "h0_1"  # repeated shot across the window boundary
+        out = []
+        for h in hashes:
+            path = Path(tmpdir) / f"{h}_{index}.png"
+            path.write_bytes(h.encode())
+            out.append((str(path), h))
+        return out
+
+    async def classify(path, **kwargs):
+        assert kwargs == {"project_name": "Proj"}
+        return ([], "no match") if path.name.startswith("h0_1") else (["roxy"], "CLIP match")
+
+    status_calls = []
+
+    def register_image_statuses(slug, statuses):
+        status_calls.append(slug)
+        real_register(slug, statuses)
+
+    real_register = ip.register_image_statuses
+    for module in (ip, ingest_helpers):
+        monkeypatch.setattr(module, "offload", inline)
+    monkeypatch.setattr(ingest_helpers, "BASE_PATH", datasets)
+    monkeypatch.setattr(dedup, "BASE_PATH", datasets)
+    monkeypatch.setattr("packages.lora_training.feedback.BASE_PATH", datasets)
+    monkeypatch.setattr(ip, "extract_segment", extract_segment)
+    monkeypatch.setattr(ip, "get_video_duration", lambda video: 2 * ip.SEGMENT_S)  # two windows
+    monkeypatch.setattr(ip, "_classify_image", classify)
+    monkeypatch.setattr(ip, "_batch_tags", lambda paths: asyncio.sleep(0, {}))
+    monkeypatch.setattr(ip, "register_image_statuses", register_image_statuses)
+    dedup.invalidate_cache()
+    monkeypatch.setitem(dedup._hash_caches, "roxy", {"h1_2"})  # already in the dataset
+    progress = []
+
+    result = await ip.run_ingest(
+        "local-video", str(tmp_path / "movie.mp4"),
+        download=False, project_name="Proj", char_map={"roxy": {"name": "Roxy"}},
+        source_label="local_video", prefix="vid", max_frames=6,
+        classify_kwargs={"project_name": "Proj"}, report=progress.append,
+    )
+
+    assert result["frames_extracted"] == 5
+    assert result["per_character"] == {"roxy": 3} and result["frames_matched"] == 3
+    assert result["frames_unclassified"] == 1 and result["frames_duplicate"] == 1
+    assert sorted(status_calls) == ["_unclassified", "roxy"]  # one status write per slug per batch
+    statuses = json.loads((datasets / "roxy" / "approval_status.json").read_text())
+    assert len(statuses) == 3 and set(statuses.values()) == {"pending"}
+    meta = json.loads((datasets / "roxy" / "images" / sorted(statuses)[0]).with_suffix(".meta.json").read_text())
+    assert meta["source"] == "local_video" and meta["character_name"] == "Roxy"
+    assert not Path(workdirs[0]).exists()  # temp frames cleaned up
+    assert progress and "stages" in progress[0]
+    dedup.invalidate_cache()
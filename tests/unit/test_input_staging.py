@@ -0,0 +1,140 @@
+"""Unit tests for content-addressed ComfyUI input staging."""
+
+import json
+import os
+import time
+
+import pytest
+
+from packages.core import input_staging
+
+
+@pytest.fixture
+def staging(tmp_path, monkeypatch):
+    inp = tmp_path / "input"
+    monkeypatch.setattr(input_staging, "COMFYUI_INPUT_DIR", inp)
+    monkeypatch.setattr(input_staging, "_index", None)
+    monkeypatch.setattr(input_staging, "_stats", dict.fromkeys(input_staging._stats, 0))
+    return inp
+
+
+@pytest.mark.unit
+def test_stage_links_once_and_hits_on_retry(staging, tmp_path):
+    src = tmp_path / "frame.png"
+    src.write_bytes(b"pixels")
+    name = input_staging.stage_input(src)
+    assert name.startswith("frame__") and name.endswith(".png")
+    assert (staging / name).read_bytes() == b"pixels"
+    assert os.stat(staging / name).st_ino == os.stat(src).st_ino
+
+    assert input_staging.stage_input(src) == name
+    # Re-staging the staged file itself keeps the same name
+    assert input_staging.stage_input(staging / name) == name
+    stats = input_staging.staging_stats()
+    assert stats["linked"] == 1 and stats["hits"] == 2 and stats["bytes_copied"] == 0
+
+
+@pytest.mark.unit
+def test_same_name_different_content_gets_distinct_files(staging, tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.mkdir()
+    b.mkdir()
+    (a / "last.png").write_bytes(b"one")
+    (b / "last.png").write_bytes(b"two")
+    assert input_staging.stage_input(a / "last.png") != input_staging.stage_input(b / "last.png")
+
+
+@pytest.mark.unit
+def test_falls_back_to_copy_when_link_fails(staging, tmp_path, monkeypatch):
+    src = tmp_path / "clip.mp4"
+    src.write_bytes(b"video")
+    def cross_device(*args):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr(input_staging.os, "link", cross_device)
+    monkeypatch.setattr(input_staging, "_reflink", lambda s, d: False)
+    name = input_staging.stage_input(src, name_hint="source.mp4")
+    assert name.startswith("source__")
+    assert (staging / name).read_bytes() == b"video"
+    assert input_staging.staging_stats()["bytes_copied"] == 5
+
+
+@pytest.mark.unit
+def test_lru_eviction_respects_cap_and_min_age(staging, tmp_path, monkeypatch):
+    monkeypatch.setattr(input_staging, "MAX_BYTES", 8)
+    monkeypatch.setattr(input_staging, "MIN_AGE_S", 0)
+    names = []
+    for i in range(3):
+        src = tmp_path / f"k{i}.png"
+        src.write_bytes(bytes([i]) * 4)
+        names.append(input_staging.stage_input(src))
+    assert not (staging / names[0]).exists()
+    assert (staging / names[1]).exists() and (staging / names[2]).exists()
+
+    monkeypatch.setattr(input_staging, "MIN_AGE_S", 3600)
+    src = tmp_path / "k3.png"
+    src.write_bytes(b"\x03" * 4)
+    input_staging.stage_input(src)
+    assert (staging / names[1]).exists()
+
+
+def _as_process(state=None):
+    """Swap the module's in-memory index to simulate another process's view."""
+    previous = (input_staging._index, input_staging._index_mtime_ns, input_staging._saved_at)
+    input_staging._index, input_staging._index_mtime_ns, input_staging._saved_at = state or (None, None, 0.0)
+    return previous
+
+
+@pytest.mark.unit
+def test_hits_do_not_rewrite_the_index(staging, tmp_path, monkeypatch):
+    monkeypatch.setattr(input_staging, "SAVE_INTERVAL_S", 3600)
+    writes = []
+    real_save = input_staging._save_index
+    monkeypatch.setattr(input_staging, "_save_index", lambda: (writes.append(1), real_save()))
+    src = tmp_path / "frame.png"
+    src.write_bytes(b"pixels")
+    name = input_staging.stage_input(src)
+    assert len(writes) == 1
+    for _ in range(20):
+        assert input_staging.stage_input(src) == name
+    assert len(writes) == 1 and input_staging.staging_stats()["hits"] == 20
+
+    monkeypatch.setattr(input_staging, "SAVE_INTERVAL_S", 0)  # debounced last_used flush
+    input_staging.stage_input(src)
+    assert len(writes) == 2
+
+
+@pytest.mark.unit
+def test_processes_share_index_and_respect_each_others_files(staging, tmp_path, monkeypatch):
+    monkeypatch.setattr(input_staging, "MAX_BYTES", 8)
+    monkeypatch.setattr(input_staging, "MIN_AGE_S", 60)
+    monkeypatch.setattr(input_staging, "SAVE_INTERVAL_S", 3600)
+    srcs = []
+    for i in range(3):
+        srcs.append(tmp_path / f"k{i}.png")
+        srcs[-1].write_bytes(bytes([i]) * 4)
+
+    old = input_staging.stage_input(srcs[0])               # process A
+    a_state = _as_process()
+    b_name = input_staging.stage_input(srcs[1])            # process B, fresh memory
+    _as_process(a_state)
+
+    index = input_staging._read_index()[0]["files"]
+    assert set(index) == {old, b_name}                     # B's entry was not overwritten
+
+    # Both staged an hour ago; B then reuses its file without an index write
+    path = staging / input_staging.INDEX_NAME
+    aged = json.loads(path.read_text())
+    for name, entry in aged["files"].items():
+        entry["last_used"] -= 3600
+        st = os.stat(staging / name)
+        os.utime(staging / name, ns=(st.st_mtime_ns - 3600 * 10**9, st.st_mtime_ns))
+    path.write_text(json.dumps(aged))
+    _as_process((None, None, time.monotonic()))
+    input_staging.stage_input(srcs[1])
+    _as_process()
+    monkeypatch.setattr(input_staging, "MAX_BYTES", 4)
+
+    input_staging.stage_input(srcs[2])                     # A needs room: evicts only its own stale file
+    assert not (staging / old).exists() and (staging / b_name).exists()
+    assert b_name in input_staging._read_index()[0]["files"]
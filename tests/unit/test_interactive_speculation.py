@@ -0,0 +1,113 @@
+"""Unit tests for packages.interactive.speculation — branch prefetch."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from packages.interactive import speculation
+from packages.interactive.models import SceneData, StoryChoice
+from packages.interactive.session_store import SessionState
+
+
+def _session():
+    s = SessionState(
+        session_id="abc", project_id=1, project_name="P",
+        character_slugs=[], characters=[], world_context="",
+        checkpoint_model="x.safetensors", generation_params={},
+    )
+    s.scenes.append({
+        "narration": "start",
+        "choices": [
+            {"text": "Run", "tone": "cautious"},
+            {"text": "Fight", "tone": "bold"},
+        ],
+    })
+    return s
+
+
+def _scene(text):
+    return SceneData(
+        scene_index=1, narration=f"after {text}", image_prompt="p",
+        choices=[StoryChoice(text="a"), StoryChoice(text="b")],
+    )
+
+
+@pytest.mark.unit
+def test_rank_prefers_previously_picked_tone():
+    s = _session()
+    s.scenes.append({"chosen_text": "Fight", "choices": [{"text": "x", "tone": "bold"}]})
+    choices = [{"text": "A", "tone": "cautious"}, {"text": "B", "tone": "bold"}]
+    assert speculation.rank_choices(s, choices) == [1, 0]
+
+
+@pytest.mark.unit
+def test_rank_keeps_offered_order_without_history():
+    choices = [{"text": "A"}, {"text": "B"}, {"text": "C"}]
+    assert speculation.rank_choices(_session(), choices) == [0, 1, 2]
+
+
+@pytest.mark.unit
+async def test_hit_commits_speculative_draft_and_cancels_rest():
+    s = _session()
+    drafted = []
+
+    async def fake_draft(session, choice_text=None):
+        drafted.append(choice_text)
+        return _scene(choice_text)
+
+    with patch.object(speculation, "draft_scene", side_effect=fake_draft), \
+         patch.object(speculation, "generate_scene_image", AsyncMock()), \
+         patch.object(speculation, "start_image_generation", AsyncMock()):
+        await speculation.speculate(s)
+        assert set(s.speculative_branches) == {"Run", "Fight"}
+        await asyncio.sleep(0)
+        scene = await speculation.resolve_choice(s, "Fight")
+
+    assert scene.narration == "after Fight"
+    assert s.scenes[-1]["chosen_text"] == "Fight"
+    assert sorted(drafted) == ["Fight", "Run"]  # no extra draft on a hit
+    assert s.speculative_branches == {}
+    assert s.speculation_stats["hits"] == 1
+    assert speculation.speculation_stats(s)["hit_rate"] == 1.0
+
+
+@pytest.mark.unit
+async def test_miss_falls_back_to_fresh_draft():
+    s = _session()
+    s.speculation_budget = 0
+
+    with patch.object(speculation, "draft_scene",
+                      AsyncMock(side_effect=lambda sess, t=None: _scene(t))), \
+         patch.object(speculation, "start_image_generation", AsyncMock()) as img:
+        await speculation.speculate(s)
+        assert s.speculative_branches == {}
+        scene = await speculation.resolve_choice(s, "Run")
+
+    assert scene.narration == "after Run"
+    assert s.speculation_stats["misses"] == 1
+    img.assert_awaited_once()
+
+
+@pytest.mark.unit
+async def test_cancel_discards_queued_keyframe_off_the_event_loop():
+    import threading
+    import time
+
+    s = _session()
+    s.speculative_branches["Run"] = speculation.Branch(
+        choice_text="Run", rank=0, image_record={"prompt_id": "p1", "status": "queued"})
+    calls = []
+
+    def slow_discard(prompt_id):
+        time.sleep(0.2)
+        calls.append((prompt_id, threading.current_thread() is threading.main_thread()))
+        return True
+
+    with patch.object(speculation, "discard_queued_prompt", slow_discard):
+        started = time.monotonic()
+        speculation.cancel_all(s)
+        assert time.monotonic() - started < 0.1  # the HTTP call didn't block the loop
+        await asyncio.gather(*speculation._pending_discards)
+
+    assert calls == [("p1", False)] and not speculation._pending_discards
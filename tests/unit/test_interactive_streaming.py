@@ -0,0 +1,105 @@
+"""Unit tests for packages.interactive.streaming — incremental scene parsing."""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from packages.interactive import streaming
+from packages.interactive.session_store import SessionState
+from packages.interactive.streaming import SceneStreamParser
+
+SCENE = {
+    "narration": "You step into the rain.\nA \"stranger\" waves — é.",
+    "image_prompt": "rainy alley, neon, anime",
+    "dialogue": [{"character": "Kai", "text": "Over here!", "emotion": "happy"}],
+    "choices": [{"text": "Approach", "tone": "bold"}, {"text": "Hide", "tone": "cautious"}],
+    "story_effects": [],
+    "is_ending": False,
+    "ending_type": None,
+}
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_narration_deltas_reassemble_exactly(size):
+    """Deltas concatenate to the decoded narration regardless of chunking."""
+    parser = SceneStreamParser()
+    deltas, fields = [], {}
+    for chunk in _chunks(json.dumps(SCENE), size):
+        for kind, name, value in parser.feed(chunk):
+            if kind == "delta":
+                deltas.append(value)
+            else:
+                fields[name] = value
+    assert "".join(deltas) == SCENE["narration"]
+    assert fields["image_prompt"] == SCENE["image_prompt"]
+    assert parser.result() == SCENE
+
+
+@pytest.mark.unit
+def test_image_prompt_reported_before_choices_arrive():
+    text = json.dumps(SCENE)
+    cut = text.index('"dialogue"')
+    parser = SceneStreamParser()
+    events = parser.feed(text[:cut])
+    assert ("field", "image_prompt", SCENE["image_prompt"]) in events
+
+
+@pytest.mark.unit
+def test_nested_strings_are_not_reported():
+    parser = SceneStreamParser()
+    events = parser.feed(json.dumps({"dialogue": [{"text": "hi"}], "narration": "x"}))
+    assert [e for e in events if e[0] == "field"] == [("field", "narration", "x")]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("narration", ["C:\\saves\\slot1", "ends with \\", "\\u12 literal"])
+def test_chunk_boundary_after_escaped_backslash(narration):
+    text = json.dumps({"narration": narration})
+    parser = SceneStreamParser()
+    deltas = []
+    start = 0
+    # Cut right after every escaped backslash pair in the raw JSON
+    for cut in [i + 2 for i in range(len(text)) if text.startswith("\\\\", i)] + [len(text)]:
+        deltas += [value for kind, _, value in parser.feed(text[start:cut]) if kind == "delta"]
+        start = cut
+    assert "".join(deltas) == narration
+    assert all("\\\\" not in d for d in deltas)  # no raw escaped text leaked
+
+
+@pytest.mark.unit
+def test_invalid_json_falls_back():
+    parser = SceneStreamParser()
+    parser.feed('{"narration": "cut off')
+    assert parser.result()["choices"]
+
+
+@pytest.mark.unit
+async def test_stream_choice_submits_image_before_scene_commit():
+    session = SessionState(
+        session_id="s", project_id=1, project_name="P", character_slugs=[],
+        characters=[], world_context="", checkpoint_model="m", generation_params={},
+    )
+    session.scenes.append({"narration": "start", "choices": SCENE["choices"]})
+
+    async def fake_stream(prompt):
+        for chunk in _chunks(json.dumps(SCENE), 5):
+            yield chunk
+
+    order = []
+    with patch.object(streaming, "_stream_ollama", fake_stream), \
+         patch.object(streaming, "start_image_generation",
+                      AsyncMock(side_effect=lambda *a: order.append(("image", len(session.scenes))))):
+        events = [e async for e in streaming.stream_choice(session, "Approach")]
+
+    kinds = [k for k, _ in events]
+    assert kinds[0] == "narration_delta"
+    assert kinds.index("image_submitted") < kinds.index("scene")
+    assert order == [("image", 1)]  # submitted while the scene was still uncommitted
+    assert session.scenes[-1]["chosen_text"] == "Approach"
+    assert streaming.streaming_stats()["streams"] >= 1
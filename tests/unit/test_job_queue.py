@@ -0,0 +1,128 @@
+"""Unit tests for the durable job queue (DB mocked)."""
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from packages.core import job_queue
+
+
+def _pool(conn):
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+
+    @asynccontextmanager
+    async def transaction():
+        yield
+
+    conn.transaction = transaction
+    pool = MagicMock()
+    pool.acquire = acquire
+    return AsyncMock(return_value=pool)
+
+
+def _row(**overrides):
+    row = {"id": 7, "kind": "test.kind", "payload": '{"n": 1}', "progress": "{}",
+           "result": None, "status": "queued", "attempts": 1, "max_attempts": 3,
+           "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc), "run_after": None,
+           "started_at": None, "heartbeat_at": None, "finished_at": None}
+    row.update(overrides)
+    return row
+
+
+@pytest.fixture
+def kinds(monkeypatch):
+    monkeypatch.setattr(job_queue, "_kinds", {})
+    finish, retry = AsyncMock(), AsyncMock()
+    monkeypatch.setattr(job_queue, "_finish", finish)
+    monkeypatch.setattr(job_queue, "_retry", retry)
+    return finish, retry
+
+
+@pytest.mark.unit
+async def test_failures_retry_with_backoff_then_fail(kinds):
+    finish, retry = kinds
+
+    @job_queue.job_kind("test.kind", max_attempts=3, backoff_s=10)
+    async def boom(job):
+        raise RuntimeError("gpu busy")
+
+    spec = job_queue._kinds["test.kind"]
+    assert [job_queue.backoff_delay(spec, n) for n in (1, 2, 3)] == [10, 20, 40]
+
+    worker = job_queue.Worker(worker_id="w1")
+    await worker._execute(job_queue.Job(job_queue._row_to_dict(_row(attempts=2))))
+    retry.assert_awaited_once_with(7, "w1", 20, "RuntimeError: gpu busy")
+    finish.assert_not_awaited()
+
+    await worker._execute(job_queue.Job(job_queue._row_to_dict(_row(attempts=3))))
+    assert finish.await_args.args[:3] == (7, "w1", "failed")
+
+
+@pytest.mark.unit
+async def test_success_and_cancellation_finish_the_row(kinds):
+    finish, _ = kinds
+
+    @job_queue.job_kind("test.kind")
+    async def double(job):
+        return {"n": job.payload["n"] * 2}
+
+    worker = job_queue.Worker(worker_id="w1")
+    await worker._execute(job_queue.Job(job_queue._row_to_dict(_row())))
+    finish.assert_awaited_with(7, "w1", "succeeded", result={"n": 2})
+
+    @job_queue.job_kind("test.kind")
+    async def cancelled(job):
+        job.cancel_requested = True
+        await job.progress(step=1)
+
+    await worker._execute(job_queue.Job(job_queue._row_to_dict(_row())))
+    finish.assert_awaited_with(7, "w1", "cancelled", error="cancelled")
+
+
+@pytest.mark.unit
+async def test_finish_and_retry_only_touch_rows_the_worker_owns(monkeypatch, caplog):
+    conn = MagicMock()
+    conn.execute = AsyncMock(return_value="UPDATE 0")  # reaped and claimed by another worker
+    monkeypatch.setattr(job_queue, "get_pool", _pool(conn))
+
+    await job_queue._finish(7, "w1", "succeeded", result={"ok": True})
+    sql, *args = conn.execute.await_args.args
+    assert "worker_id = $2 AND status = 'running'" in sql and args[:3] == [7, "w1", "succeeded"]
+
+    await job_queue._retry(7, "w1", 30, "boom")
+    sql, *args = conn.execute.await_args.args
+    assert "worker_id = $2 AND status = 'running'" in sql and args[:2] == [7, "w1"]
+    assert "no longer owns it" in caplog.text
+
+
+@pytest.mark.unit
+async def test_enqueue_returns_active_duplicate(monkeypatch):
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(side_effect=[None, _row(id=3, status="running")])
+    monkeypatch.setattr(job_queue, "get_pool", _pool(conn))
+    job = await job_queue.enqueue("test.kind", {"n": 1}, dedupe_key="k")
+    assert job["id"] == 3 and job["deduplicated"] is True
+    assert job["payload"] == {"n": 1}
+    assert "ON CONFLICT (dedupe_key)" in conn.fetchrow.await_args_list[0].args[0]
+
+
+@pytest.mark.unit
+async def test_claim_locks_then_passes_kind_limits(monkeypatch, kinds):
+    conn = MagicMock()
+    conn.execute = AsyncMock()
+    conn.fetchrow = AsyncMock(return_value=_row(status="running"))
+    monkeypatch.setattr(job_queue, "get_pool", _pool(conn))
+    job_queue.job_kind("a", concurrency=2)(AsyncMock())
+    job_queue.job_kind("b", concurrency=1)(AsyncMock())
+
+    worker = job_queue.Worker(kinds=["b", "missing"], worker_id="w1")
+    row = await worker.claim()
+    assert row["status"] == "running"
+    assert "pg_advisory_xact_lock" in conn.execute.await_args.args[0]
+    sql, names, limits, worker_id = conn.fetchrow.await_args.args
+    assert "SKIP LOCKED" in sql
+    assert (names, limits, worker_id) == (["b"], [1], "w1")
@@ -0,0 +1,155 @@
+"""Unit tests for the keyframe batcher, against an in-process fake ComfyUI."""
+
+import time
+
+import pytest
+
+from packages.scene_generation import composite_image, keyframe_batcher, render_cache
+from packages.scene_generation.keyframe_batcher import KeyframeRequest
+
+
+def _keyframe(prompt: str, seed: int = 1, negative: str = "blurry", lora: str | None = "hero.safetensors",
+              width: int = 832, controlnet: bool = False) -> dict:
+    model_src = "10" if lora else "4"
+    workflow = {
+        "3": {"inputs": {"seed": seed, "steps": 25, "cfg": 5.0, "sampler_name": "euler_ancestral",
+                         "scheduler": "normal", "denoise": 1, "model": [model_src, 0],
+                         "positive": ["6", 0], "negative": ["7", 0], "latent_image": ["5", 0]},
+              "class_type": "KSampler"},
+        "4": {"inputs": {"ckpt_name": "wai.safetensors"}, "class_type": "CheckpointLoaderSimple"},
+        "5": {"inputs": {"width": width, "height": 1216, "batch_size": 1}, "class_type": "EmptyLatentImage"},
+        "6": {"inputs": {"text": prompt, "clip": [model_src, 1]}, "class_type": "CLIPTextEncode"},
+        "7": {"inputs": {"text": negative, "clip": [model_src, 1]}, "class_type": "CLIPTextEncode"},
+        "8": {"inputs": {"samples": ["3", 0], "vae": ["4", 2]}, "class_type": "VAEDecode"},
+        "9": {"inputs": {"filename_prefix": f"kf_{seed}", "images": ["8", 0]}, "class_type": "SaveImage"},
+    }
+    if lora:
+        workflow["10"] = {"inputs": {"lora_name": lora, "strength_model": 0.7, "strength_clip": 0.7,
+                                     "model": ["4", 0], "clip": ["4", 1]}, "class_type": "LoraLoader"}
+    if controlnet:
+        workflow["40"] = {"inputs": {"control_net_name": "pose"}, "class_type": "ControlNetLoader"}
+    return workflow
+
+
+class FakeComfyUI:
+    """Serial queue: each prompt costs a fixed load/encode overhead plus per-image sampling."""
+
+    def __init__(self, overhead_s: float = 0.05, per_image_s: float = 0.01):
+        self.overhead_s = overhead_s
+        self.per_image_s = per_image_s
+        self.prompts: dict[str, tuple[float, dict]] = {}
+        self.busy_until = 0.0
+
+    def submit(self, workflow: dict, comfyui_url: str) -> str:
+        outputs, images = {}, 0
+        for node_id, node in workflow.items():
+            if node["class_type"] != "SaveImage":
+                continue
+            sampler = workflow[workflow[node["inputs"]["images"][0]]["inputs"]["samples"][0]]
+            batch = workflow[sampler["inputs"]["latent_image"][0]]["inputs"]["batch_size"]
+            prefix = node["inputs"]["filename_prefix"]
+            outputs[node_id] = {"images": [{"filename": f"{prefix}_{i:05d}_.png", "subfolder": "",
+                                            "type": "output"} for i in range(batch)]}
+            images += batch
+        self.busy_until = max(time.monotonic(), self.busy_until) + self.overhead_s + self.per_image_s * images
+        prompt_id = f"p{len(self.prompts)}"
+        self.prompts[prompt_id] = (self.busy_until, outputs)
+        return prompt_id
+
+    def history(self, prompt_id: str, comfyui_url: str) -> dict | None:
+        done_at, outputs = self.prompts[prompt_id]
+        return outputs if time.monotonic() >= done_at else None
+
+
+@pytest.fixture
+def comfy(monkeypatch):
+    fake = FakeComfyUI()
+    monkeypatch.setattr(keyframe_batcher, "_submit", fake.submit)
+    monkeypatch.setattr(keyframe_batcher, "_history", fake.history)
+    monkeypatch.setattr(keyframe_batcher, "POLL_INTERVAL_S", 0.005)
+    monkeypatch.setattr(keyframe_batcher, "_stats", {
+        path: {"runs": 0, "images": 0, "failed": 0, "submissions": 0, "seconds": 0.0}
+        for path in ("batched", "single")
+    })
+    monkeypatch.setattr(render_cache, "ENABLED", False)
+    monkeypatch.setattr(composite_image, "is_comfyui_queue_busy", lambda **kw: False)
+    return fake
+
+
+@pytest.mark.unit
+def test_describe_groups_compatible_shots_only():
+    a = keyframe_batcher.describe(_keyframe("hero runs", seed=1))
+    b = keyframe_batcher.describe(_keyframe("hero jumps", seed=2))
+    assert a["group"] == b["group"]
+    assert a["group"][1] == (("hero.safetensors", 0.7, 0.7),)
+    assert a["positive"] == "hero runs" and a["seed"] == 1
+
+    assert keyframe_batcher.describe(_keyframe("x", width=1216))["group"] != a["group"]
+    assert keyframe_batcher.describe(_keyframe("x", negative="other"))["group"] != a["group"]
+    assert keyframe_batcher.describe(_keyframe("x", controlnet=True)) is None
+
+
+@pytest.mark.unit
+def test_merge_shares_model_and_prompt_encodes():
+    specs = [keyframe_batcher.describe(_keyframe(p, seed=s))
+             for p, s in [("walk", 0), ("walk", 1), ("fight", 2), ("walk", 0)]]
+    workflow, outputs = keyframe_batcher.merge_workflows(specs)
+    types = [node["class_type"] for node in workflow.values()]
+    assert types.count("CheckpointLoaderSimple") == 1 and types.count("LoraLoader") == 1
+    assert types.count("CLIPTextEncode") == 3  # negative + one per distinct prompt
+    assert sorted(outputs.values()) == [[0, 3], [1], [2]]  # same prompt and seed → same render
+
+
+@pytest.mark.unit
+def test_merge_keeps_every_items_own_seed():
+    seeds = [7, 123, 8, 7]
+    specs = [keyframe_batcher.describe(_keyframe("walk", seed=s)) for s in seeds]
+    workflow, outputs = keyframe_batcher.merge_workflows(specs)
+    for save_id, indexes in outputs.items():
+        sampler = workflow[workflow[workflow[save_id]["inputs"]["images"][0]]["inputs"]["samples"][0]]
+        latent = workflow[sampler["inputs"]["latent_image"][0]]
+        assert latent["inputs"]["batch_size"] == 1
+        assert {seeds[i] for i in indexes} == {sampler["inputs"]["seed"]}
+
+
+@pytest.mark.unit
+async def test_outputs_split_back_to_their_shots(comfy):
+    requests = [KeyframeRequest(f"shot{i}", _keyframe(f"pose {i}", seed=i)) for i in range(3)]
+    requests.append(KeyframeRequest("cn", _keyframe("pose cn", seed=9, controlnet=True)))
+    paths = await keyframe_batcher.run_keyframes(requests, comfyui_url="http://fake")
+    assert len(comfy.prompts) == 2  # three merged + the ControlNet shot alone
+    assert {key: path.name for key, path in paths.items()} == {
+        "shot0": "kf_0_00000_.png", "shot1": "kf_1_00000_.png",
+        "shot2": "kf_2_00000_.png", "cn": "kf_9_00000_.png",
+    }
+
+
+@pytest.mark.unit
+async def test_batched_path_beats_per_shot_images_per_minute(comfy):
+    def shots():
+        return [KeyframeRequest(f"s{i}", _keyframe(f"pose {i}", seed=i)) for i in range(8)]
+
+    single = await keyframe_batcher.run_keyframes(shots(), comfyui_url="http://fake", batched=False)
+    batched = await keyframe_batcher.run_keyframes(shots(), comfyui_url="http://fake", batched=True)
+    assert all(single.values()) and all(batched.values())
+
+    stats = keyframe_batcher.batcher_stats()
+    assert stats["single"]["submissions"] == 8 and stats["batched"]["submissions"] == 1
+    assert stats["batched"]["images_per_workflow"] == 8
+    assert stats["speedup"] > 2
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("outcome", ["done", "cancelled", "timed_out"])
+async def test_submission_is_finished_on_every_exit(comfy, monkeypatch, outcome):
+    finished = []
+    monkeypatch.setattr(keyframe_batcher, "finish", lambda prompt_id, ok=True: finished.append((prompt_id, ok)))
+    monkeypatch.setattr(keyframe_batcher, "was_cancelled", lambda prompt_id: outcome == "cancelled")
+    if outcome == "timed_out":
+        monkeypatch.setattr(keyframe_batcher, "_history", lambda prompt_id, comfyui_url: None)
+
+    workflow, outputs = keyframe_batcher.merge_workflows([keyframe_batcher.describe(_keyframe("walk"))])
+    results = await keyframe_batcher._run_submission(workflow, outputs, {}, "http://fake",
+                                                     deadline=time.monotonic() + 0.2)
+    assert finished == [("p0", outcome == "done")]
+    assert all(results.values()) == (outcome == "done")
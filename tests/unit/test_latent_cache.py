@@ -0,0 +1,105 @@
+"""Unit tests for the LoRA training latent cache — buckets, incremental encoding, loader."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from packages.lora_training import latent_cache
+from packages.lora_training.latent_cache import BucketBatchLoader, LatentCache, build_cache
+
+
+class FakeEncoders:
+    """numpy stand-ins for the VAE and text encoders; record what they were asked to encode."""
+
+    def __init__(self):
+        self.image_batches: list[tuple] = []
+        self.captions: list[str] = []
+
+    def encode_images(self, pixels):
+        self.image_batches.append(pixels.shape)
+        _, _, h, w = pixels.shape
+        return pixels[:, :1, ::8, ::8].repeat(4, axis=1)[:, :, :h // 8, :w // 8]
+
+    def encode_text(self, captions):
+        self.captions += captions
+        n = len(captions)
+        lengths = np.array([len(c) for c in captions], dtype=np.float32)
+        return {"hidden": np.ones((n, 77, 8), dtype=np.float32) * lengths[:, None, None],
+                "pooled": np.ones((n, 4), dtype=np.float32)}
+
+
+def _dataset(tmp_path, sizes):
+    samples = []
+    for i, size in enumerate(sizes):
+        path = tmp_path / f"img_{i}.png"
+        Image.new("RGB", size, (i * 20, 100, 200)).save(path)
+        samples.append((path, f"caption {i}"))
+    return samples
+
+
+@pytest.mark.unit
+def test_buckets_cover_aspect_ratios_within_area():
+    buckets = latent_cache.make_buckets(768)
+    assert (768, 768) in buckets
+    assert all(w % 64 == 0 and h % 64 == 0 and w * h <= 768 * 768 for w, h in buckets)
+    assert all(max(w, h) / min(w, h) <= 2.0 for w, h in buckets)
+    portrait = latent_cache.assign_bucket(600, 900, buckets)
+    assert portrait[0] < portrait[1] and abs(portrait[0] / portrait[1] - 2 / 3) < 0.05
+    assert latent_cache.assign_bucket(1024, 1024, buckets) == (768, 768)
+
+
+@pytest.mark.unit
+def test_prepare_image_crops_minimally(tmp_path):
+    path = tmp_path / "wide.png"
+    Image.new("RGB", (1000, 500)).save(path)
+    pixels = latent_cache.prepare_image(path, (1024, 512))
+    assert pixels.shape == (3, 512, 1024) and pixels.min() >= -1.0
+    assert latent_cache.time_ids(1000, 500, (1024, 512)) == (500, 1000, 0, 0, 512, 1024)
+    assert latent_cache.time_ids(1000, 500, (768, 768))[2:4] == (0, 384)
+
+
+@pytest.mark.unit
+def test_build_cache_only_encodes_new_or_changed_items(tmp_path):
+    samples = _dataset(tmp_path, [(512, 512), (512, 512), (400, 800), (800, 400), (512, 512)])
+    fake = FakeEncoders()
+    cache = LatentCache("vae1", "te1", root=tmp_path / "cache")
+    items, stats = build_cache(samples, cache, fake.encode_images, fake.encode_text, resolution=256, batch_size=2)
+    assert stats["encoded_images"] == 5 and stats["buckets"] == 3
+    # batched per bucket: the two squares go together, the odd one out alone
+    assert sorted(shape[0] for shape in fake.image_batches) == [1, 1, 1, 2]
+    assert len({shape[2:] for shape in fake.image_batches}) == 3
+
+    # Add one image and edit one caption; reopen the cache from disk
+    new_image = tmp_path / "img_new.png"
+    Image.new("RGB", (512, 512), (1, 2, 3)).save(new_image)
+    samples = samples + [(new_image, "caption 5")]
+    samples[1] = (samples[1][0], "edited caption")
+    fake2 = FakeEncoders()
+    cache2 = LatentCache("vae1", "te1", root=tmp_path / "cache")
+    items2, stats2 = build_cache(samples, cache2, fake2.encode_images, fake2.encode_text, resolution=256)
+    assert stats2["encoded_images"] == 1
+    assert sorted(fake2.captions) == ["caption 5", "edited caption"]
+
+    # A different VAE id invalidates latents but not text embeddings
+    fake3 = FakeEncoders()
+    build_cache(samples, LatentCache("vae2", "te1", root=tmp_path / "cache"),
+                fake3.encode_images, fake3.encode_text, resolution=256)
+    assert sum(s[0] for s in fake3.image_batches) == 6 and fake3.captions == []
+
+
+@pytest.mark.unit
+def test_loader_yields_same_bucket_batches_from_mmap(tmp_path):
+    samples = _dataset(tmp_path, [(512, 512)] * 3 + [(400, 800)] * 2)
+    fake = FakeEncoders()
+    cache = LatentCache("vae1", "te1", root=tmp_path / "cache")
+    items, _ = build_cache(samples, cache, fake.encode_images, fake.encode_text, resolution=256)
+
+    loader = BucketBatchLoader(LatentCache("vae1", "te1", root=tmp_path / "cache"), items, batch_size=2, seed=0)
+    assert len(loader) == 3
+    batches = list(loader)
+    assert sorted(b["latent"].shape[0] for b in batches) == [1, 2, 2]
+    for batch in batches:
+        assert batch["latent"].dtype == np.float32
+        assert batch["hidden"].shape[1:] == (77, 8) and batch["time_ids"].shape[1] == 6
+        assert len({tuple(t[4:]) for t in batch["time_ids"]}) == 1
+    assert isinstance(loader.cache.get("latent", items[0].latent_key)["latent"], np.memmap)
@@ -0,0 +1,162 @@
+"""Unit tests for incremental LoRA effectiveness aggregation (DB faked in memory)."""
+
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from packages.scene_generation import lora_effectiveness as le
+
+
+class FakeDB:
+    """Just enough of shots + lora_effectiveness to follow the module's SQL."""
+
+    def __init__(self):
+        self.shots: dict = {}
+        self.table: dict = {}
+
+    def add(self, lora_key, char, project=1, score=None):
+        shot_id = uuid.uuid4()
+        self.shots[shot_id] = {"lora_key": lora_key, "char_slug": char, "project_id": project,
+                               "quality_score": score, "effectiveness_lora_key": None,
+                               "effectiveness_char_slug": None}
+        return shot_id
+
+    def _counted(self):
+        return [s for s in self.shots.values() if s["lora_key"] and s["quality_score"] is not None]
+
+    def _aggregate(self, shots):
+        groups: dict = {}
+        for s in shots:
+            groups.setdefault((s["lora_key"], s["char_slug"], s["project_id"]), []).append(s["quality_score"])
+        return [{"lora_key": k[0], "lora_name": k[0], "char_slug": k[1], "project_id": k[2],
+                 "project_name": "P", "content_rating": "R", "sample_count": len(v),
+                 "avg_quality": sum(v) / len(v), "avg_motion": None, "avg_char": None,
+                 "avg_reaction": None, "avg_state_delta": None, "approval_rate": None,
+                 "best_motion_tier": None, "best_lora_strength": None, "best_cfg": None,
+                 "best_steps": None, "issues_histogram": "{}"} for k, v in groups.items()]
+
+    async def fetchrow(self, sql, shot_id):
+        assert "FOR UPDATE" in sql
+        return self.shots.get(shot_id)
+
+    async def fetch(self, sql, *params):
+        shots = self._counted()
+        if "AND s.lora_key = $1" in sql:
+            shots = [s for s in shots if (s["lora_key"], s["project_id"], s["char_slug"]) == params]
+        elif "AND sc.project_id = $1" in sql:
+            shots = [s for s in shots if s["project_id"] == params[0]]
+        return self._aggregate(shots)
+
+    async def executemany(self, sql, rows):
+        assert "ON CONFLICT" in sql
+        for p in rows:
+            self.table[(p[0], p[2], p[3])] = (p[6], p[7])
+
+    async def execute(self, sql, *params):
+        if sql.startswith("DELETE FROM lora_effectiveness WHERE lora_key = $1"):
+            self.table.pop((params[0], params[2], params[1]), None)
+        elif sql.startswith("UPDATE shots SET effectiveness_lora_key"):
+            shot = self.shots[params[0]]
+            shot["effectiveness_lora_key"], shot["effectiveness_char_slug"] = params[1:]
+        elif "NOT EXISTS" in sql:
+            live = {(s["lora_key"], s["char_slug"], s["project_id"]) for s in self._counted()}
+            self.table = {k: v for k, v in self.table.items() if k in live}
+        elif "effectiveness_lora_key IS DISTINCT FROM" in sql:
+            for s in self.shots.values():
+                counted = s["lora_key"] and s["quality_score"] is not None
+                s["effectiveness_lora_key"] = s["lora_key"] if counted else None
+                s["effectiveness_char_slug"] = s["char_slug"] if counted else None
+        else:
+            raise AssertionError(f"unexpected SQL: {sql[:60]}")
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+
+    @asynccontextmanager
+    async def acquire():
+        yield fake
+
+    pool = MagicMock()
+    pool.acquire = acquire
+    monkeypatch.setattr(le, "get_pool", AsyncMock(return_value=pool))
+    return fake
+
+
+@pytest.mark.unit
+async def test_incremental_upsert_touches_only_the_shots_group(db):
+    a1 = db.add("cowgirl", "mira", score=0.6)
+    a2 = db.add("cowgirl", "mira", score=0.8)
+    db.add("doggy", "mira", score=0.5)
+    unscored = db.add("cowgirl", "mira")
+
+    assert await le.update_shot_effectiveness(a1) == 1
+    assert db.table == {("cowgirl", "mira", 1): (2, pytest.approx(0.7))}
+    assert await le.update_shot_effectiveness(unscored) == 0  # not counted, no group to update
+    assert db.shots[a2]["effectiveness_lora_key"] is None      # only the updated shot is stamped
+    assert db.shots[a1]["effectiveness_lora_key"] == "cowgirl"
+    assert await le.update_shot_effectiveness(uuid.uuid4()) == 0
+
+
+@pytest.mark.unit
+async def test_shot_moving_groups_recomputes_the_group_it_left(db):
+    a1 = db.add("cowgirl", "mira", score=0.6)
+    a2 = db.add("cowgirl", "mira", score=0.8)
+    for shot_id in (a1, a2):
+        await le.update_shot_effectiveness(shot_id)
+
+    db.shots[a2].update(lora_key="doggy", quality_score=0.4)  # regenerated with another LoRA
+    assert await le.update_shot_effectiveness(a2) == 2
+    assert db.table == {("cowgirl", "mira", 1): (1, 0.6), ("doggy", "mira", 1): (1, 0.4)}
+
+    db.shots[a1]["char_slug"] = "kai"  # character reassigned: old group emptied → row dropped
+    await le.update_shot_effectiveness(a1)
+    assert db.table == {("cowgirl", "kai", 1): (1, 0.6), ("doggy", "mira", 1): (1, 0.4)}
+
+    db.shots[a1]["quality_score"] = None  # QC cleared
+    await le.update_shot_effectiveness(a1)
+    assert set(db.table) == {("doggy", "mira", 1)}
+    assert db.shots[a1]["effectiveness_lora_key"] is None
+
+
+@pytest.mark.unit
+async def test_incremental_updates_match_full_refresh(db):
+    import random
+    rng = random.Random(5)
+    ids = [db.add(rng.choice(["a", "b", "c"]), rng.choice(["mira", None]), rng.choice([1, 2]),
+                  rng.choice([None, 0.3, 0.9])) for _ in range(30)]
+    for shot_id in ids:
+        await le.update_shot_effectiveness(shot_id)
+    for _ in range(40):  # QC results, LoRA swaps and recasts arriving one by one
+        shot_id = rng.choice(ids)
+        db.shots[shot_id].update(lora_key=rng.choice(["a", "b", "c"]),
+                                 char_slug=rng.choice(["mira", "kai", None]),
+                                 quality_score=rng.choice([None, 0.2, 0.7]))
+        await le.update_shot_effectiveness(shot_id)
+    incremental = dict(db.table)
+
+    db.table = {("stale", None, 1): (9, 0.1)}
+    await le.refresh_effectiveness()
+    assert db.table == incremental
+
+
+@pytest.mark.unit
+async def test_qc_event_triggers_update_with_uuid(monkeypatch):
+    calls = []
+    monkeypatch.setattr(le, "update_shot_effectiveness", AsyncMock(side_effect=calls.append))
+    shot_id = uuid.uuid4()
+    await le._on_shot_qc_recorded({"shot_id": str(shot_id)})
+    await le._on_shot_qc_recorded({})
+    assert calls == [shot_id]
+
+    bus = MagicMock()
+    monkeypatch.setattr("packages.core.events.event_bus", bus)
+    le.register_lora_effectiveness_handlers()
+    bus.subscribe.assert_called_once_with("shot.qc_recorded", le._on_shot_qc_recorded)
@@ -0,0 +1,85 @@
+"""Unit tests for range-aware media delivery and cached lookups."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from packages.core import media, project_versions
+
+
+def _request(**headers):
+    req = MagicMock()
+    req.headers = {k.replace("_", "-"): v for k, v in headers.items()}
+    return req
+
+
+@pytest.fixture
+def clip(tmp_path):
+    path = tmp_path / "shot.mp4"
+    path.write_bytes(bytes(range(100)))
+    return path
+
+
+async def _body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.mark.unit
+async def test_range_request_returns_206_slice(clip):
+    resp = await media.serve_file(_request(range="bytes=10-19"), clip, "video/mp4")
+    assert resp.status_code == 206
+    assert resp.headers["content-range"] == "bytes 10-19/100"
+    assert await _body(resp) == bytes(range(10, 20))
+
+    suffix = await media.serve_file(_request(range="bytes=-5"), clip, "video/mp4")
+    assert await _body(suffix) == bytes(range(95, 100))
+
+    with pytest.raises(HTTPException) as exc:
+        await media.serve_file(_request(range="bytes=200-"), clip, "video/mp4")
+    assert exc.value.status_code == 416
+
+
+@pytest.mark.unit
+async def test_conditional_request_returns_304(clip):
+    full = await media.serve_file(_request(), clip, "video/mp4")
+    assert full.status_code == 200 and full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+    again = await media.serve_file(_request(if_none_match=etag), clip, "video/mp4")
+    assert again.status_code == 304
+    # Stale If-Range → whole file instead of a slice
+    stale = await media.serve_file(_request(range="bytes=0-9", if_range='"old"'), clip, "video/mp4")
+    assert stale.status_code == 200
+
+
+@pytest.mark.unit
+async def test_preview_falls_back_to_full_while_rendering(clip, monkeypatch):
+    started = asyncio.Event()
+
+    async def slow_build(src, dest, rendition):
+        started.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(media, "_build_rendition", slow_build)
+    monkeypatch.setattr(media, "RENDITION_WAIT_S", 0.01)
+    resp = await media.serve_file(_request(), clip, "video/mp4", rendition="preview")
+    assert started.is_set()
+    assert resp.status_code == 200 and resp.media_type == "video/mp4"
+    assert len(media._inflight) == 1
+    for task in list(media._inflight.values()):
+        task.cancel()
+
+
+@pytest.mark.unit
+async def test_lookup_reuses_row_until_project_changes(monkeypatch):
+    monkeypatch.setattr(project_versions, "_epoch", "e1")
+    monkeypatch.setattr(project_versions, "_versions", {})
+    fetch = AsyncMock(return_value=({"path": "/a.mp4"}, 7))
+    assert await media.lookup_path("shot", "s1", fetch) == {"path": "/a.mp4"}
+    await media.lookup_path("shot", "s1", fetch)
+    assert fetch.await_count == 1
+    project_versions.bump(7)
+    await media.lookup_path("shot", "s1", fetch)
+    assert fetch.await_count == 2
+    media.forget_path("shot", "s1")
@@ -0,0 +1,94 @@
+"""Unit tests for set-based narrative state propagation."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from packages.narrative_state.engine import NarrativeStateEngine, plan_propagation
+
+
+def _state(slug, **kw):
+    return {
+        "character_slug": slug,
+        "emotional_state": "furious",
+        "body_state": "clean",
+        "energy_level": "normal",
+        "injuries": [],
+        "state_source": "auto",
+        **kw,
+    }
+
+
+@pytest.mark.unit
+def test_plan_decays_along_the_chain():
+    """Each downstream scene receives one more decay step than the previous."""
+    writes = plan_propagation(
+        [_state("rina")],
+        [("s2", {}), ("s3", {}), ("s4", {})],
+    )
+    assert [(sid, slug) for sid, slug, _ in writes] == [
+        ("s2", "rina"), ("s3", "rina"), ("s4", "rina"),
+    ]
+    assert [st["emotional_state"] for _, _, st in writes] == [
+        "angry", "irritated", "calm",
+    ]
+
+
+@pytest.mark.unit
+def test_plan_skips_manual_and_uses_it_as_base():
+    """Manual overrides are not written but seed the following scenes."""
+    manual = _state("rina", emotional_state="terrified", state_source="manual")
+    writes = plan_propagation(
+        [_state("rina")],
+        [("s2", {}), ("s3", {"rina": manual}), ("s4", {})],
+    )
+    assert [sid for sid, _, _ in writes] == ["s2", "s4"]
+    assert writes[1][2]["emotional_state"] == "scared"
+
+
+@pytest.mark.unit
+def test_plan_handles_characters_independently():
+    """A manual override for one character does not affect another."""
+    manual = _state("kai", state_source="manual")
+    writes = plan_propagation(
+        [_state("rina"), _state("kai")],
+        [("s2", {"kai": manual})],
+    )
+    assert [(sid, slug) for sid, slug, _ in writes] == [("s2", "rina")]
+
+
+@pytest.mark.unit
+def test_plan_empty_without_downstream():
+    assert plan_propagation([_state("rina")], []) == []
+
+
+@pytest.mark.unit
+async def test_propagate_uses_one_read_and_one_batch_write():
+    """The matrix is loaded once and all rows go out in a single executemany."""
+    src = "11111111-1111-1111-1111-111111111111"
+    ds = "22222222-2222-2222-2222-222222222222"
+    matrix = [
+        {"scene_key": src, "id": 1, "scene_id": src, **_state("rina")},
+        {"scene_key": ds, "id": None, "scene_id": None, "character_slug": None},
+    ]
+    conn = AsyncMock()
+    conn.fetch = AsyncMock(side_effect=[matrix, [
+        {"id": 2, "scene_id": ds, **_state("rina", emotional_state="angry",
+                                           state_source="propagated")},
+    ]])
+    conn.transaction = MagicMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock()
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    with patch("packages.narrative_state.engine.connect_direct",
+               AsyncMock(return_value=conn)):
+        report = await NarrativeStateEngine().propagate(src)
+
+    assert conn.fetch.await_count == 2
+    conn.executemany.assert_awaited_once()
+    params = conn.executemany.await_args.args[1]
+    assert len(params) == 1
+    assert params[0][0] == ds and params[0][1] == "rina"
+    assert report["rows_written"] == 1
+    assert report["states"][0]["emotional_state"] == "angry"
+    assert report["elapsed_ms"] >= 0
@@ -0,0 +1,118 @@
+"""Unit tests for render preemption — priority placement and targeted cancellation."""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+import pytest
+
+from packages.core import executors, preemption
+
+
+class FakeQueue:
+    """Stands in for ComfyUI's /prompt, /queue and /interrupt endpoints."""
+
+    def __init__(self, running=(), pending=()):
+        self.running = [[0, pid] for pid in running]
+        self.pending = [[n + 1, pid] for n, pid in enumerate(pending)]
+        self.posted: list[dict] = []
+        self.deleted: list[str] = []
+        self.interrupted: list[str] = []
+
+    def __call__(self, url: str, body: dict | None = None, timeout: float = 5):
+        if url.endswith("/queue") and body is None:
+            return {"queue_running": self.running, "queue_pending": self.pending}
+        if url.endswith("/queue"):
+            self.deleted += body["delete"]
+            self.pending = [item for item in self.pending if item[1] not in body["delete"]]
+            return None
+        if url.endswith("/interrupt"):
+            self.interrupted.append(body["prompt_id"])
+            return None
+        self.posted.append(body)
+        prompt_id = f"new{len(self.posted)}"
+        self.pending.append([body.get("number", len(self.pending) + 100), prompt_id])
+        return {"prompt_id": prompt_id}
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(preemption, "_tokens", {})
+    monkeypatch.setattr(preemption, "_active", OrderedDict())
+    monkeypatch.setattr(preemption, "_cancelled_ids", OrderedDict())
+    monkeypatch.setattr(preemption, "_runtime_s", {})
+    monkeypatch.setattr(preemption, "_metrics", {
+        "submitted": {name: 0 for name in preemption.PRIORITY_RANK},
+        "queue_jumps": {name: 0 for name in preemption.PRIORITY_RANK},
+        "cancelled_scopes": 0, "dequeued": 0, "interrupted": 0, "gpu_seconds_reclaimed": 0.0,
+    })
+
+
+@pytest.mark.unit
+def test_queue_number_orders_interactive_review_batch(fresh):
+    pending = [[5, "b1"], [3, "r1"], [7, "b2"]]
+    preemption.track("r1", "http://gpu", priority=preemption.REVIEW)
+    assert preemption.queue_number_for(pending, preemption.BATCH) is None
+    # review goes behind the queued review prompt, ahead of batch b1
+    assert preemption.queue_number_for(pending, preemption.REVIEW) == 4
+    # interactive goes to the front
+    assert preemption.queue_number_for(pending, preemption.INTERACTIVE) == 2
+    assert preemption.queue_number_for([[1, "x"]], preemption.INTERACTIVE) == 0
+
+
+@pytest.mark.unit
+def test_submit_jumps_queue_under_interactive_scope(fresh, monkeypatch):
+    fake = FakeQueue(pending=["b1", "b2"])
+    monkeypatch.setattr(preemption, "_http", fake)
+    with preemption.render_scope("play:s1", preemption.INTERACTIVE) as token:
+        prompt_id = preemption.post_prompt({"1": {}}, "http://gpu", kind="image")
+    assert fake.posted[0]["number"] == 0
+    assert prompt_id in token.prompts
+    assert preemption.preemption_stats()["queue_jumps"]["interactive"] == 1
+
+    preemption.post_prompt({"1": {}}, "http://gpu")  # no scope → batch, appended
+    assert "number" not in fake.posted[1]
+
+
+@pytest.mark.unit
+def test_cancel_dequeues_pending_interrupts_running_and_cascades(fresh, monkeypatch):
+    fake = FakeQueue(running=["run1"], pending=["other", "pend1"])
+    monkeypatch.setattr(preemption, "_http", fake)
+    with preemption.render_scope("pipeline:1") as pipeline:
+        with preemption.render_scope("scene:a") as scene:
+            preemption.track("run1", "http://gpu", kind="wan")
+            preemption.track("pend1", "http://gpu", kind="wan")
+            result = preemption.cancel_scope("pipeline:1")
+            assert scene.cancelled and preemption.is_cancelled()
+            with pytest.raises(preemption.RenderCancelled):
+                preemption.post_prompt({}, "http://gpu")
+    assert pipeline.cancelled
+    assert fake.deleted == ["pend1"] and fake.interrupted == ["run1"]
+    assert result["dequeued"] == 1 and result["interrupted"] == 1
+    # pending reclaims the full estimate; running at most the same
+    assert 240 <= result["gpu_seconds_reclaimed"] <= 480
+    assert preemption.was_cancelled("pend1") and not preemption.was_cancelled("other")
+    assert preemption.cancel_scope("pipeline:1") is None  # scope closed
+
+
+@pytest.mark.unit
+async def test_task_cancel_pulls_prompts_and_offload_keeps_scope(fresh, monkeypatch):
+    fake = FakeQueue(pending=["p1"])
+    monkeypatch.setattr(preemption, "_http", fake)
+
+    async def render():
+        with preemption.render_scope("blitz:x", preemption.REVIEW):
+            assert await executors.offload(preemption.current_priority) == preemption.REVIEW
+            preemption.track("p1", "http://gpu", kind="keyframe")
+            await asyncio.sleep(10)
+
+    task = asyncio.create_task(render())
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    deadline = time.monotonic() + 2
+    while not fake.deleted and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    assert fake.deleted == ["p1"]
+    executors.shutdown_executors()
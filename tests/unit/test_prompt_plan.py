@@ -0,0 +1,91 @@
+"""Unit tests for the generate_batch prompt-plan cache — keys, invalidation, hit metrics."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from packages.core import prompt_plan
+from packages.core.events import event_bus, IMAGE_REJECTED
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    prompt_plan.clear()
+    yield
+    prompt_plan.clear()
+
+
+def _info(**overrides):
+    return {
+        "project_name": "Proj", "design_prompt": "1girl, red hair", "appearance_data": {"species": "human"},
+        "negative_prompt_template": "worst quality", "cfg_scale": 7.0, "steps": 30,
+        "sampler": "euler", "scheduler": "normal", **overrides,
+    }
+
+
+def _key(slug="roxy", checkpoint="a.safetensors"):
+    return prompt_plan.plan_key(slug, checkpoint, False, "1girl, red hair", True, True)
+
+
+@pytest.mark.unit
+def test_hit_miss_and_stale_fingerprint():
+    info = _info()
+    assert prompt_plan.get(_key(), info) is None
+    prompt_plan.put(_key(), info, {"negative": "worst quality"})
+    assert prompt_plan.get(_key(), _info())["negative"] == "worst quality"
+    assert prompt_plan.get(_key(checkpoint="b.safetensors"), info) is None
+
+    # Character map reloaded with an edited template → plan is rebuilt, not served
+    assert prompt_plan.get(_key(), _info(negative_prompt_template="lowres")) is None
+    stats = prompt_plan.stats()
+    assert (stats["hits"], stats["misses"], stats["stale"], stats["size"]) == (1, 3, 1, 0)
+    assert stats["hit_rate"] == 0.25
+
+
+@pytest.mark.unit
+async def test_review_events_and_char_cache_invalidate():
+    from packages.core.db import invalidate_char_cache
+
+    for slug in ("roxy", "gem"):
+        prompt_plan.put(_key(slug), _info(), {})
+    await event_bus.emit(IMAGE_REJECTED, {"character_slug": "roxy"})
+    assert prompt_plan.get(_key("roxy"), _info()) is None
+    assert prompt_plan.get(_key("gem"), _info()) is not None
+
+    invalidate_char_cache()
+    assert prompt_plan.stats()["size"] == 0
+    assert prompt_plan.stats()["invalidations"] == 2
+
+
+@pytest.mark.unit
+def test_lru_eviction(monkeypatch):
+    monkeypatch.setattr(prompt_plan, "MAX_PLANS", 2)
+    for slug in ("a", "b"):
+        prompt_plan.put(_key(slug), _info(), {})
+    prompt_plan.get(_key("a"), _info())
+    prompt_plan.put(_key("c"), _info(), {})
+    assert prompt_plan.get(_key("b"), _info()) is None
+    assert prompt_plan.get(_key("a"), _info()) is not None
+    assert prompt_plan.stats()["evictions"] == 1
+
+
+@pytest.mark.unit
+async def test_generate_batch_reuses_plan_and_keeps_char_map_clean(sample_char_map):
+    from packages.core import generation
+
+    recommend = AsyncMock(return_value={"learned_negatives": "extra fingers", "confidence": "none"})
+    with patch.object(generation, "get_char_project_map", AsyncMock(return_value=sample_char_map)), \
+         patch.object(generation, "recommend_params", recommend), \
+         patch.object(generation, "get_feedback_negatives", return_value="") as feedback, \
+         patch.object(generation, "log_model_change", AsyncMock()), \
+         patch.object(generation, "submit_comfyui_workflow", side_effect=ConnectionError("down")), \
+         patch.object(generation, "build_comfyui_workflow", return_value={"3": {"inputs": {"seed": 1}}}) as build:
+        await generation.generate_batch("luigi", count=1)
+        await generation.generate_batch("luigi", count=2)
+        await generation.generate_batch("luigi", count=1, checkpoint_override="other.safetensors")
+
+    assert recommend.await_count == 2 and feedback.call_count == 2
+    assert "extra fingers" in build.call_args_list[0].kwargs["negative_prompt"]
+    assert build.call_args_list[1].kwargs["negative_prompt"] == build.call_args_list[0].kwargs["negative_prompt"]
+    assert sample_char_map["luigi"]["checkpoint_model"] == "realcartoonPixar_v12.safetensors"
+    assert prompt_plan.stats()["hits"] == 1
@@ -0,0 +1,201 @@
+"""Unit tests for the incremental quality statistics store — sketch, deltas, read answers."""
+
+import json
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+
+from packages.core import quality_stats
+from packages.core.quality_stats import Aggregate, QuantileSketch
+
+
+def _gen(i, quality, status="pending", character="roxy", ckpt="a.safetensors", sampler="euler",
+         scheduler="normal", cfg=7.0, steps=30, when=None):
+    return {
+        "id": i, "character_slug": character, "project_name": "Proj", "checkpoint_model": ckpt,
+        "sampler": sampler, "scheduler": scheduler, "cfg_scale": cfg, "steps": steps,
+        "width": 832, "height": 1216, "quality_score": quality, "status": status,
+        "generated_at": when or datetime(2026, 10, 1) + timedelta(minutes=i),
+    }
+
+
+def _rows(gens):
+    aggs: dict[tuple, Aggregate] = {}
+    for g in gens:
+        agg = aggs.setdefault(quality_stats._key(g), Aggregate())
+        agg.add_generation(g["generated_at"])
+        agg.apply_score(g, g["quality_score"], g["status"])
+    return [(dict(zip(quality_stats._KEY_FIELDS, key)), agg) for key, agg in aggs.items()]
+
+
+@pytest.mark.unit
+def test_sketch_matches_percentile_cont_and_merges():
+    rng = np.random.default_rng(0)
+    cfgs = rng.choice([5.0, 6.5, 7.0, 7.5, 8.0], size=301)
+    left, right = QuantileSketch(), QuantileSketch()
+    for i, v in enumerate(cfgs):
+        (left if i % 2 else right).add(v)
+    merged = QuantileSketch(left.to_json()).merge(right)
+    for q in (0.25, 0.5, 0.9):
+        assert merged.quantile(q) == pytest.approx(np.percentile(cfgs, q * 100))
+    assert QuantileSketch([[4.0, 1], [6.0, 1]]).quantile(0.5) == 5.0  # interpolates like PERCENTILE_CONT
+
+    continuous = QuantileSketch(max_bins=32)
+    values = rng.normal(0.7, 0.1, size=5000)
+    for v in values:
+        continuous.add(v)
+    assert len(continuous.values) == 32
+    assert continuous.quantile(0.5) == pytest.approx(np.median(values), abs=0.02)
+
+
+@pytest.mark.unit
+def test_rescore_applies_delta_and_round_trips_json():
+    first = _gen(1, 0.5, "rejected")
+    agg = Aggregate()
+    agg.add_generation(first["generated_at"])
+    agg.apply_score(first, 0.5, "rejected")
+    agg = Aggregate(json.loads(json.dumps(agg.to_json())))
+    # re-review: subtract the old score, add the new one
+    agg.apply_score(first, 0.5, "rejected", sign=-1)
+    agg.apply_score(first, 0.9, "approved")
+
+    fresh = _rows([_gen(1, 0.9, "approved")])[0][1]
+    assert agg.to_json()["tiers"] == fresh.to_json()["tiers"]
+    assert (agg.scored, agg.approved, agg.rejected, agg.total) == (1, 1, 0, 1)
+    assert agg.sum_q == pytest.approx(0.9) and agg.recent == fresh.recent
+    assert agg.days == {"2026-10-01": [1, pytest.approx(0.9), 1, 0]}
+
+
+@pytest.mark.unit
+def test_params_and_checkpoint_answers_match_sql_semantics():
+    gens = [_gen(i, 0.8, cfg=c, steps=s, sampler="euler")
+            for i, (c, s) in enumerate([(6.0, 20), (7.0, 30), (8.0, 40)])]
+    gens += [_gen(10 + i, 0.95, cfg=9.0, steps=25, sampler="dpmpp_2m", scheduler="karras") for i in range(4)]
+    gens += [_gen(20, 0.4, cfg=3.0), _gen(21, 0.9, cfg=None, sampler=None)]
+    gens += [_gen(30 + i, 0.66, ckpt="b.safetensors") for i in range(3)]
+    rows = _rows(gens)
+
+    success = quality_stats.params_from([r for r in rows if r[0]["checkpoint_model"] == "a.safetensors"], 0.7)
+    included = [g for g in gens if g["checkpoint_model"] == "a.safetensors"
+                and g["quality_score"] >= 0.7 and g["cfg_scale"] is not None]
+    assert success["sample_count"] == len(included) == 7
+    assert success["median_cfg"] == np.median([g["cfg_scale"] for g in included])
+    assert success["median_steps"] == np.median([g["steps"] for g in included])
+    assert success["best_sampler"] == "dpmpp_2m" and success["best_scheduler"] == "karras"
+    assert success["top_sampler"]["sampler"] == "dpmpp_2m" and success["top_sampler"]["n"] == 4
+
+    best = quality_stats.best_checkpoint_from(rows, 0.65)
+    assert best["checkpoint_model"] == "a.safetensors" and best["n"] == 8
+    table = quality_stats.checkpoint_table_from(rows)
+    assert [r["checkpoint"] for r in table] == ["a.safetensors", "b.safetensors"]
+    assert table[0]["total"] == 9
+
+
+@pytest.mark.unit
+def test_drift_trend_and_summary_from_aggregates():
+    start = datetime(2026, 10, 10)
+    gens = [_gen(i, 0.85, when=start + timedelta(hours=i)) for i in range(30)]
+    gens += [_gen(100 + i, 0.45, "rejected", when=start + timedelta(days=3, hours=i)) for i in range(20)]
+    gens += [_gen(200 + i, 0.8, "approved", character="gem", when=start + timedelta(hours=i)) for i in range(10)]
+    rows = _rows(gens)
+
+    alerts = quality_stats.drift_from(rows, window=20, min_samples=5, alert_threshold=0.55)
+    assert [a["character_slug"] for a in alerts] == ["roxy"]
+    assert alerts[0]["recent_avg"] == 0.45 and alerts[0]["alert"] and alerts[0]["total_count"] == 50
+    assert alerts[0]["overall_avg"] == pytest.approx((30 * 0.85 + 20 * 0.45) / 50, abs=1e-3)
+
+    trend = quality_stats.trend_from([r for r in rows if r[0]["character_slug"] == "roxy"], days=7,
+                                     today=date(2026, 10, 14))
+    assert [t["date"] for t in trend] == ["2026-10-10", "2026-10-11", "2026-10-13"]
+    assert [t["count"] for t in trend] == [24, 6, 20] and trend[-1]["rejected"] == 20
+
+    summary = quality_stats.character_summary_from(rows)
+    assert [s["character_slug"] for s in summary] == ["gem", "roxy"]
+    assert summary[0]["approval_rate"] == 1.0 and summary[1]["worst_quality"] == 0.45
+
+
+class FakeHistoryConn:
+    """generation_history + live quality_stats with REPEATABLE READ snapshots and a table lock."""
+
+    def __init__(self, history):
+        self.history = list(history)
+        self.live: dict[tuple, tuple] = {}
+        self.snapshot = None
+        self.locked = False
+        self.writers: dict[int, dict] = {}  # scan number → generation committed while it runs
+        self.scans: list[tuple[bool, int]] = []
+        self.table = None
+        self.clock = 0
+
+    def write(self, gen):
+        """A committed audit.log_generation: history row plus a touched stats row."""
+        assert not self.locked, "writer ran while the rebuild held the lock"
+        self.history.append(gen)
+        self.clock += 1
+        self.live[quality_stats._key(gen)] = (self.clock, "{}")
+
+    @asynccontextmanager
+    async def transaction(self, isolation=None, readonly=False):
+        if isolation == "repeatable_read":
+            self.snapshot = (list(self.history), dict(self.live))
+        try:
+            yield
+        finally:
+            self.snapshot, self.locked = None, False
+
+    def _view(self):
+        return self.snapshot or (self.history, self.live)
+
+    async def fetch(self, sql, *args):
+        assert "FROM quality_stats" in sql
+        return [{**dict(zip(quality_stats._KEY_FIELDS, key)), "updated_at": ts, "stats": stats}
+                for key, (ts, stats) in self._view()[1].items()]
+
+    def cursor(self, sql, *args, prefetch=None):
+        rows = self._view()[0]
+        if args:
+            slugs, null = args
+            rows = [r for r in rows if r["character_slug"] in slugs or (null and r["character_slug"] is None)]
+        self.scans.append((self.locked, len(rows)))
+        writer = self.writers.pop(len(self.scans), None)
+
+        async def gen():
+            for i, row in enumerate(rows):
+                yield row
+                if writer and i == 0:
+                    self.write(writer)
+        return gen()
+
+    async def execute(self, sql, *args):
+        if sql.startswith("LOCK TABLE"):
+            self.locked = True
+
+    async def executemany(self, sql, rows):
+        self.table = {tuple(r[:4]): json.loads(r[4]) for r in rows}
+
+
+@pytest.mark.unit
+async def test_rebuild_scans_unlocked_and_catches_up_concurrent_writers(monkeypatch):
+    gens = [_gen(i, 0.5 + i / 100, character=c) for i, c in enumerate(["roxy"] * 6 + ["gem"] * 3 + ["luna"] * 4)]
+    conn = FakeHistoryConn(gens)
+    late = [_gen(100, 0.9, "approved"), _gen(101, 0.3, "rejected", character="gem")]
+    conn.writers = {1: late[0], 2: late[1]}  # during the full scan, during the unlocked catch-up
+    pool = MagicMock()
+
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+
+    pool.acquire = acquire
+    monkeypatch.setattr(quality_stats, "get_pool", AsyncMock(return_value=pool))
+    monkeypatch.setattr(quality_stats, "_ready", False)
+
+    result = await quality_stats.rebuild()
+    assert conn.scans == [(False, 13), (False, 7), (True, 4)]  # full, roxy catch-up, gem under the lock
+    assert result["rows_scanned"] == 13 and result["rows_rescanned"] == 11
+    expected = {tuple(key.values()): json.loads(json.dumps(agg.to_json())) for key, agg in _rows(gens + late)}
+    assert conn.table == expected
+    assert quality_stats._ready
@@ -0,0 +1,134 @@
+"""Unit tests for packages.scene_generation.render_cache — workflow-keyed reuse."""
+
+import pytest
+
+from packages.scene_generation import render_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    out, inp, loras = tmp_path / "output", tmp_path / "input", tmp_path / "loras"
+    for d in (out, inp, loras):
+        d.mkdir()
+    monkeypatch.setattr(render_cache, "COMFYUI_OUTPUT_DIR", out)
+    monkeypatch.setattr(render_cache, "COMFYUI_INPUT_DIR", inp)
+    monkeypatch.setattr(render_cache, "LORA_DIR", loras)
+    monkeypatch.setattr(render_cache, "_index", None)
+    monkeypatch.setattr(render_cache, "_evictions", 0)
+    monkeypatch.setattr(render_cache, "_dirty", False)
+    render_cache._prompt_keys.clear()
+    render_cache._stats.clear()
+    (inp / "src.png").write_bytes(b"source-a")
+    (loras / "rina.safetensors").write_bytes(b"lora-weights")
+    return tmp_path
+
+
+def _workflow(prefix="shot_1", image="src.png", seed=42):
+    return {
+        "1": {"class_type": "LoadImage", "inputs": {"image": image}},
+        "2": {"class_type": "LoraLoaderModelOnly",
+              "inputs": {"lora_name": "rina.safetensors", "strength_model": 0.8}},
+        "3": {"class_type": "KSampler", "inputs": {"seed": seed}},
+        "4": {"class_type": "VHS_VideoCombine", "inputs": {"filename_prefix": prefix}},
+    }
+
+
+def _render(cache, prompt_id, name, data=b"video"):
+    (cache / "output" / name).write_bytes(data)
+    render_cache.store(prompt_id, [name])
+
+
+@pytest.mark.unit
+def test_key_ignores_output_prefix_but_not_seed(cache):
+    assert render_cache.workflow_key(_workflow("a")) == render_cache.workflow_key(_workflow("b"))
+    assert render_cache.workflow_key(_workflow(seed=1)) != render_cache.workflow_key(_workflow(seed=2))
+
+
+@pytest.mark.unit
+def test_key_follows_input_content_not_name(cache):
+    (cache / "input" / "copy.png").write_bytes(b"source-a")
+    assert render_cache.workflow_key(_workflow(image="copy.png")) == render_cache.workflow_key(_workflow())
+    before = render_cache.workflow_key(_workflow())
+    (cache / "loras" / "rina.safetensors").write_bytes(b"retrained-lora")
+    assert render_cache.workflow_key(_workflow()) != before
+
+
+@pytest.mark.unit
+def test_hit_after_store_returns_cached_outputs_and_qc(cache):
+    cached_id, key = render_cache.lookup(_workflow(), "wan")
+    assert cached_id is None
+    render_cache.track("p1", key, "wan")
+    _render(cache, "p1", "shot_1_00001.mp4")
+    render_cache.record_qc("p1", {"overall_score": 0.8, "issues": []})
+    (cache / "output" / "shot_1_00001.mp4").unlink()  # originals may be cleaned up
+
+    cached_id, _ = render_cache.lookup(_workflow("retry"), "wan")
+    assert render_cache.is_cached_id(cached_id)
+    outputs = render_cache.cached_outputs(cached_id)
+    assert (cache / "output" / outputs[0]).read_bytes() == b"video"
+    assert render_cache.cached_qc(cached_id)["overall_score"] == 0.8
+    stats = render_cache.render_cache_stats()["engines"]["wan"]
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+@pytest.mark.unit
+def test_lru_eviction_by_size(cache, monkeypatch):
+    monkeypatch.setattr(render_cache, "MAX_BYTES", 10)
+    for seed in (1, 2):
+        _, key = render_cache.lookup(_workflow(seed=seed), "ltx")
+        render_cache.track(f"p{seed}", key, "ltx")
+        _render(cache, f"p{seed}", f"out_{seed}.mp4", b"x" * 6)
+
+    assert render_cache.lookup(_workflow(seed=1), "ltx")[0] is None
+    assert render_cache.lookup(_workflow(seed=2), "ltx")[0] is not None
+    assert render_cache.render_cache_stats()["evictions"] == 1
+
+
+@pytest.mark.unit
+def test_lookups_do_not_rewrite_index_and_hash_outside_lock(cache, monkeypatch):
+    import hashlib
+    import json
+    import time
+
+    real_sha256 = hashlib.sha256
+    saves = []
+    real_save = render_cache._save_index
+    monkeypatch.setattr(render_cache, "_save_index", lambda: (saves.append(1), real_save()))
+    monkeypatch.setattr(render_cache, "SAVE_INTERVAL_S", 3600)
+    monkeypatch.setattr(render_cache, "_saved_at", time.monotonic())
+
+    class CheckedSha:
+        def __init__(self):
+            self._h = real_sha256()
+
+        def update(self, data):
+            assert not render_cache._lock.locked()  # other lookups are never blocked
+            self._h.update(data)
+
+        def hexdigest(self):
+            return self._h.hexdigest()
+
+    monkeypatch.setattr(render_cache.hashlib, "sha256", lambda *a: real_sha256(*a) if a else CheckedSha())
+    _, key = render_cache.lookup(_workflow(), "wan")
+    render_cache.track("p1", key, "wan")
+    _render(cache, "p1", "a.mp4")
+    assert len(saves) == 1  # the store; misses and new file hashes are deferred
+
+    for _ in range(5):
+        assert render_cache.lookup(_workflow(), "wan")[0] is not None
+    assert len(saves) == 1 and render_cache._dirty
+    render_cache.flush()
+    assert len(saves) == 2 and not render_cache._dirty
+    index = json.loads((cache / "output" / "render_cache" / "index.json").read_text())
+    assert index["entries"][key]["hits"] == 5
+
+
+@pytest.mark.unit
+def test_file_hash_memo_is_bounded(cache, monkeypatch):
+    monkeypatch.setattr(render_cache, "MAX_FILE_HASHES", 3)
+    for i in range(5):
+        (cache / "input" / f"f{i}.png").write_bytes(b"%d" % i)
+        render_cache.workflow_key(_workflow(image=f"f{i}.png"))
+    memo = render_cache._load_index()["file_hashes"]
+    assert len(memo) == 3
+    assert str(cache / "input" / "f4.png") in memo and str(cache / "input" / "f0.png") not in memo
@@ -0,0 +1,169 @@
+"""Unit tests for the resident LoRA trainer — base reuse, queue handling, cancellation."""
+
+import json
+
+import pytest
+
+from packages.lora_training import feedback, resident_trainer
+from packages.lora_training.resident_trainer import ResidentTrainer
+
+
+class FakeBackend:
+    """Records loads/trains; 'adapters' must be gone after every job."""
+
+    def __init__(self, fail_for=(), epochs_hook=None):
+        self.loads: list[tuple] = []
+        self.trained: list[str] = []
+        self.fail_for = set(fail_for)
+        self.epochs_hook = epochs_hook
+        self.saved: list[str] = []
+
+    def load_base(self, checkpoint, model_type):
+        self.loads.append((checkpoint, model_type))
+        return {"id": checkpoint, "adapters": []}
+
+    def train(self, base, job, progress):
+        base["adapters"].append(job["job_id"])
+        try:
+            if job["job_id"] in self.fail_for:
+                raise RuntimeError("No approved images found in dataset")
+            for epoch in range(1, 3):
+                if self.epochs_hook:
+                    self.epochs_hook(job, epoch)
+                progress(epoch, 2, 0.1 / epoch, epoch * 3)
+            self.trained.append(job["job_id"])
+            return {"state_dict": {"w": 1}, "images": 12, "encode_s": 0.0,
+                    "total_steps": 6, "best_loss": 0.05, "final_loss": 0.05}
+        finally:
+            base["adapters"].remove(job["job_id"])
+
+    def base_is_clean(self, base):
+        return not base["adapters"]
+
+    def save(self, state_dict, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"lora")
+        self.saved.append(path.name)
+
+
+@pytest.fixture
+def jobs_file(tmp_path, monkeypatch):
+    path = tmp_path / "training_jobs.json"
+    monkeypatch.setattr(feedback, "TRAINING_JOBS_FILE", path)
+    monkeypatch.setattr(resident_trainer, "_record_in_db", lambda *a: None)
+    return path
+
+
+def _queue(tmp_path, slug, checkpoint="/ckpt/a.safetensors", **params):
+    dataset = tmp_path / slug
+    (dataset / "images").mkdir(parents=True, exist_ok=True)
+    return resident_trainer.enqueue_job(
+        slug, checkpoint, "sdxl", dataset_dir=str(dataset),
+        output_path=str(tmp_path / "loras" / f"{slug}_xl_lora.safetensors"), **params,
+    )
+
+
+@pytest.mark.unit
+def test_base_loaded_once_for_same_checkpoint(jobs_file, tmp_path):
+    for slug in ("roxy", "gem", "buck"):
+        _queue(tmp_path, slug)
+    backend = FakeBackend()
+    trainer = ResidentTrainer(backend)
+    assert trainer.run_pending() == 3
+
+    assert backend.loads == [("/ckpt/a.safetensors", "sdxl")]
+    jobs = json.loads(jobs_file.read_text())
+    assert [j["status"] for j in jobs] == ["completed"] * 3
+    assert [j["base_reused"] for j in jobs] == [False, True, True]
+    assert all(j["load_s"] >= 0 and "train_s" in j for j in jobs)
+    assert (tmp_path / "loras" / "roxy_xl_lora.manifest.json").exists()
+    assert trainer.stats()["base_loads"] == 1
+
+
+@pytest.mark.unit
+def test_checkpoint_switch_reloads_and_failure_does_not_stop_queue(jobs_file, tmp_path):
+    first = _queue(tmp_path, "roxy")
+    bad = _queue(tmp_path, "gem")
+    _queue(tmp_path, "luna", checkpoint="/ckpt/b.safetensors")
+    backend = FakeBackend(fail_for={bad["job_id"]})
+    ResidentTrainer(backend).run_pending()
+
+    assert [c for c, _ in backend.loads] == ["/ckpt/a.safetensors", "/ckpt/b.safetensors"]
+    jobs = {j["character_slug"]: j for j in json.loads(jobs_file.read_text())}
+    assert jobs["gem"]["status"] == "failed" and "approved images" in jobs["gem"]["error"]
+    assert jobs["luna"]["status"] == "completed" and not jobs["luna"]["base_reused"]
+    assert jobs["roxy"]["job_id"] == first["job_id"]
+
+
+@pytest.mark.unit
+def test_cancel_via_job_file_stops_after_epoch(jobs_file, tmp_path):
+    job = _queue(tmp_path, "roxy")
+
+    def cancel_during_first_epoch(running_job, epoch):
+        if epoch == 1:
+            resident_trainer.update_job(running_job["job_id"], status="failed", error="Cancelled by user")
+
+    backend = FakeBackend(epochs_hook=cancel_during_first_epoch)
+    trainer = ResidentTrainer(backend)
+    trainer.run_pending()
+
+    saved = json.loads(jobs_file.read_text())[0]
+    assert saved["job_id"] == job["job_id"] and saved["status"] == "failed"
+    assert "after epoch 1/2" in saved["error"]
+    assert backend.saved == [] and trainer.base is not None  # adapter removed, base kept
+
+
+@pytest.mark.unit
+def test_reconcile_leaves_resident_queue_alone(jobs_file, tmp_path):
+    _queue(tmp_path, "roxy")
+    feedback.save_training_jobs(feedback.load_training_jobs() + [
+        {"job_id": "old", "status": "queued", "created_at": "2026-01-01T00:00:00"},
+    ])
+    assert feedback.reconcile_training_jobs() == 1
+    statuses = {j["job_id"]: j["status"] for j in feedback.load_training_jobs()}
+    assert statuses["old"] == "failed"
+    assert list(statuses.values()).count("queued") == 1
+
+
+@pytest.mark.unit
+def test_concurrent_writers_do_not_lose_jobs(jobs_file, tmp_path):
+    import threading
+
+    running = _queue(tmp_path, "roxy")
+    resident_trainer.claim_next_job()
+    errors = []
+
+    def worker_epochs():
+        for epoch in range(60):
+            resident_trainer.update_job(running["job_id"], epoch=epoch)
+            try:
+                resident_trainer.is_cancelled(running["job_id"])  # reader never sees a partial file
+            except ValueError as e:
+                errors.append(e)
+
+    def api_appends():
+        for n in range(30):
+            _queue(tmp_path, f"char{n}")
+
+    threads = [threading.Thread(target=worker_epochs), threading.Thread(target=api_appends)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    jobs = feedback.load_training_jobs()
+    assert not errors and len(jobs) == 31
+    assert jobs[0]["epoch"] == 59 and jobs[0]["status"] == "running"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+@pytest.mark.unit
+def test_worker_outcome_does_not_overwrite_cancel(jobs_file, tmp_path):
+    job = _queue(tmp_path, "roxy")
+    resident_trainer.claim_next_job()
+    with feedback.locked_training_jobs() as jobs:  # the API's cancel
+        jobs[0].update(status="failed", error="Cancelled by user")
+
+    resident_trainer.update_job(job["job_id"], status="completed", output_path="/loras/roxy.safetensors")
+    saved = feedback.load_training_jobs()[0]
+    assert saved["status"] == "failed" and saved["output_path"] == "/loras/roxy.safetensors"
@@ -0,0 +1,83 @@
+"""Unit tests for set-based scene listing and project-version ETags."""
+
+import uuid
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import Response
+
+from packages.core import project_versions
+from packages.scene_generation import scene_crud
+
+
+@pytest.fixture
+def listening(monkeypatch):
+    monkeypatch.setattr(project_versions, "_epoch", "e1")
+    monkeypatch.setattr(project_versions, "_versions", {})
+
+
+def _request(if_none_match=""):
+    req = MagicMock()
+    req.headers = {"if-none-match": if_none_match} if if_none_match else {}
+    return req
+
+
+def _row(n, shots=2):
+    return {
+        "id": uuid.UUID(int=n), "project_id": 1, "scene_number": n, "title": f"S{n}",
+        "description": None, "location": None, "time_of_day": None, "weather": None,
+        "mood": None, "generation_status": None, "target_duration_seconds": None,
+        "actual_duration_seconds": None, "total_shots": None, "completed_shots": 0,
+        "final_video_path": None, "created_at": datetime(2026, 1, 1),
+        "audio_track_id": None, "episode_id": None, "episode_title": None,
+        "episode_number": None, "shot_count": shots,
+        "status_counts": '{"completed": 1, "pending": 1}',
+        "k_episode": 2147483647, "k_scene": n, "k_created": datetime(2026, 1, 1),
+    }
+
+
+@pytest.mark.unit
+def test_etag_changes_only_with_project_counter(listening):
+    tag = project_versions.project_etag(1, "list")
+    project_versions.bump(2)
+    assert project_versions.project_etag(1, "list") == tag
+    project_versions.bump(1)
+    assert project_versions.project_etag(1, "list") != tag
+
+
+@pytest.mark.unit
+def test_no_etag_while_listener_down(monkeypatch):
+    monkeypatch.setattr(project_versions, "_epoch", None)
+    assert project_versions.project_etag(1) is None
+    assert project_versions.not_modified(_request("x"), Response(), None) is None
+
+
+@pytest.mark.unit
+async def test_list_scenes_single_query_and_keyset_cursor(listening):
+    conn = AsyncMock()
+    conn.fetch = AsyncMock(return_value=[_row(1), _row(2), _row(3)])
+    with patch.object(scene_crud, "connect_direct", AsyncMock(return_value=conn)):
+        result = await scene_crud.list_scenes(
+            _request(), Response(), project_id=1, ids=None, limit=2, cursor=None,
+            allowed_projects=[1],
+        )
+    conn.fetch.assert_awaited_once()
+    assert [s["scene_number"] for s in result["scenes"]] == [1, 2]
+    assert result["scenes"][0]["shot_status_counts"] == {"completed": 1, "pending": 1}
+    assert scene_crud._decode_cursor(result["next_cursor"])[1] == 2
+
+
+@pytest.mark.unit
+async def test_list_scenes_304_skips_database(listening):
+    response = Response()
+    conn = AsyncMock()
+    conn.fetch = AsyncMock(return_value=[_row(1)])
+    with patch.object(scene_crud, "connect_direct", AsyncMock(return_value=conn)) as connect:
+        await scene_crud.list_scenes(_request(), response, project_id=1, ids=None,
+                                     limit=None, cursor=None, allowed_projects=[1])
+        etag = response.headers["etag"]
+        again = await scene_crud.list_scenes(_request(etag), Response(), project_id=1, ids=None,
+                                             limit=None, cursor=None, allowed_projects=[1])
+    assert again.status_code == 304
+    assert connect.await_count == 1
@@ -0,0 +1,127 @@
+"""Unit tests for the variety index — embedding cache, matrix similarity, IVF search, updates."""
+
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pytest
+
+from packages.scene_generation import variety_check, variety_index as vi
+
+
+@pytest.fixture
+def fake_clip(tmp_path, monkeypatch):
+    """Deterministic 'CLIP': a vector seeded by the file's bytes; counts embedded files."""
+    calls = []
+
+    def embed_images(paths, batch_size=16):
+        calls.append([str(p) for p in paths])
+        return [np.abs(np.random.default_rng(sum(open(p, "rb").read())).normal(size=vi.EMBED_DIM)) for p in paths]
+
+    monkeypatch.setattr(variety_check, "embed_images", embed_images)
+    monkeypatch.setattr(vi, "EMBED_CACHE_DIR", tmp_path / "cache")
+    vi._embeddings.clear()
+    vi.clear()
+    yield calls
+    vi._embeddings.clear()
+    vi.clear()
+
+
+@pytest.mark.unit
+def test_similarity_matrix_matches_pairwise_cosine():
+    rng = np.random.default_rng(1)
+    a, b = rng.normal(size=(4, 16)), rng.normal(size=(3, 16))
+    sims = vi.similarity_matrix(a, b)
+    assert sims.shape == (4, 3)
+    for i in range(4):
+        for j in range(3):
+            assert sims[i, j] == pytest.approx(variety_check.cosine_similarity(a[i], b[j]), abs=1e-5)
+    assert np.allclose(np.diag(vi.similarity_matrix(a)), 1.0, atol=1e-5)
+
+
+@pytest.mark.unit
+def test_embedding_cache_keyed_by_content(tmp_path, fake_clip):
+    frames = []
+    for i, payload in enumerate([b"aa", b"bb", b"aa"]):
+        frames.append(tmp_path / f"f{i}.png")
+        frames[-1].write_bytes(payload)
+
+    first = vi.get_embeddings(frames + [tmp_path / "missing.png"])
+    assert fake_clip == [[str(frames[0]), str(frames[1])]]  # duplicate content embedded once
+    assert np.array_equal(first[0], first[2]) and first[3] is None
+
+    vi._embeddings.clear()  # disk cache survives a restart
+    assert np.array_equal(vi.get_embeddings([frames[1]])[0], first[1]) and len(fake_clip) == 1
+
+    frames[1].write_bytes(b"cc")  # shot re-rendered → new hash → re-embedded
+    vi.get_embeddings(frames)
+    assert fake_clip[-1] == [str(frames[1])]
+
+
+@pytest.mark.unit
+def test_ivf_index_search_is_sublinear_and_incremental():
+    rng = np.random.default_rng(0)
+    centers = vi.normalize(rng.normal(size=(40, 64)))
+    data = vi.normalize(centers[rng.integers(0, 40, 3000)] + rng.normal(scale=0.15, size=(3000, 64)))
+
+    index = vi.IVFIndex(dim=64, min_train=256, nprobe=4)
+    for i, vec in enumerate(data):
+        index.add(f"s{i}", vec)
+    assert index.centroids is not None and len(index._lists) == int(np.sqrt(2048))
+
+    hits = sum(index.search(data[i] + rng.normal(scale=0.01, size=64), k=1)[0][0] == f"s{i}"
+               for i in range(0, 3000, 30))
+    assert hits >= 95
+    before = vi._stats["candidates"]
+    index.search(data[0], k=5)
+    assert vi._stats["candidates"] - before < 3000 / 4
+
+    assert index.search(data[7], k=1, exclude={"s7"})[0][0] != "s7"
+    index.remove("s7")
+    assert "s7" not in index and index.search(data[7], k=1)[0][0] != "s7"
+    index.add("s7b", data[7])
+    assert index.search(data[7], k=1)[0] == ("s7b", pytest.approx(1.0, abs=1e-5))
+
+
+@pytest.mark.unit
+async def test_check_sequence_variety_uses_project_index(tmp_path, fake_clip, monkeypatch):
+    from packages.core.events import event_bus, SHOT_GENERATED
+
+    async def inline(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+    monkeypatch.setattr("packages.core.executors.offload", inline)
+
+    def frame(name, payload):
+        path = tmp_path / name
+        path.write_bytes(payload)
+        return str(path)
+
+    old = frame("old.png", b"same")            # other scene, same content as the new frame
+    recent = frame("recent.png", b"different")
+    new = frame("new.png", b"same")
+
+    conn = AsyncMock()
+    conn.fetch.side_effect = [
+        [{"shot_id": "r1", "last_frame_path": recent, "pose_type": "standing",
+          "camera_angle": None, "must_differ_from": None}],
+        [{"shot_id": "o1", "scene_id": "scene-a", "last_frame_path": old},
+         {"shot_id": "r1", "scene_id": "scene-b", "last_frame_path": recent}],
+    ]
+    conn.fetchval.return_value = 7
+    conn.fetchrow.return_value = None
+
+    result = await variety_check.check_sequence_variety(conn, "n1", "scene-b", new)
+    assert not result["similar"] and result["most_similar_shot_id"] == "r1"
+    assert [m["shot_id"] for m in result["project_matches"]] == ["o1"]
+    assert len(fake_clip) == 1  # the project build reused the cached frame embeddings
+
+    index = vi._projects[7]
+    assert "n1" in index.index
+    await event_bus.emit(SHOT_GENERATED, {"shot_id": "r1", "scene_id": "scene-b",
+                                          "last_frame_path": frame("r1v2.png", b"v2")})
+    assert index.pending == {"r1": str(tmp_path / "r1v2.png")}
+    await index.refresh()
+    assert not index.pending and fake_clip[-1] == [str(tmp_path / "r1v2.png")]
+
+    vi.remove_shot("n1")
+    vi.remove_scene("scene-a")
+    assert len(index.index) == 1 and "o1" not in index.scenes
@@ -0,0 +1,91 @@
+"""Unit tests for the WD14 tagger engine — batching, thresholding and the tag cache."""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from packages.visual_pipeline import wd14
+
+
+class FakeTagger:
+    """Stands in for a loaded ONNX session: score = mean channel value per tag column."""
+
+    model_name = "fake"
+    size = 8
+
+    def __init__(self):
+        self.tags = np.array(["red", "green", "blue", "dark"], dtype=object)
+        self.batches: list[int] = []
+
+    def predict(self, batch):
+        self.batches.append(len(batch))
+        means = batch.mean(axis=(1, 2)) / 255.0  # BGR
+        rgb = means[:, ::-1]
+        return np.hstack([rgb, 1.0 - rgb.mean(axis=1, keepdims=True)]).astype(np.float32)
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    tagger = FakeTagger()
+    monkeypatch.setattr(wd14, "MODELS_DIR", tmp_path / "models")
+    monkeypatch.setattr(wd14, "_taggers", {"fake": tagger})
+    monkeypatch.setattr(wd14, "_cache", OrderedDict())
+    monkeypatch.setattr(wd14, "_stats", {k: 0 if isinstance(v, int) else 0.0 for k, v in wd14._stats.items()})
+    return tagger
+
+
+def _image(path, color):
+    Image.new("RGB", (16, 16), color).save(path)
+    return path
+
+
+@pytest.mark.unit
+def test_select_tags_thresholds_and_orders_per_row():
+    probs = np.array([[0.1, 0.9, 0.5], [0.0, 0.2, 0.1], [0.6, 0.6, 0.7]], dtype=np.float32)
+    rows = wd14.select_tags(probs, 0.5)
+    assert [i for i, _ in rows[0]] == [1, 2]
+    assert rows[1] == []
+    assert [i for i, _ in rows[2]] == [2, 0, 1]
+
+
+@pytest.mark.unit
+def test_tag_paths_batches_and_keeps_order(fake, tmp_path):
+    paths = [_image(tmp_path / f"{i}.png", color) for i, color in
+             enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 0, 0), (0, 0, 0)])]
+    paths.insert(2, tmp_path / "missing.png")
+    results = wd14.tag_paths(paths, threshold=0.5, model_name="fake", batch_size=2)
+
+    assert fake.batches == [2, 2, 1]
+    assert [r["tags"][0]["tag"] if r.get("tags") else None for r in results] == \
+        ["red", "green", None, "blue", "red", "dark"]
+    assert results[2]["error"] == "file not found"
+    assert results[0]["tag_string"] == "red, dark"
+
+
+@pytest.mark.unit
+def test_cache_skips_inference_and_serves_other_thresholds(fake, tmp_path):
+    path = _image(tmp_path / "a.png", (200, 100, 0))
+    first = wd14.tag_paths([path], threshold=0.5, model_name="fake")[0]
+    assert not first["cached"] and fake.batches == [1]
+
+    wd14._cache.clear()  # force the on-disk entry
+    lower = wd14.tag_paths([path], threshold=0.3, model_name="fake")[0]
+    assert lower["cached"] and fake.batches == [1]
+    assert {t["tag"] for t in lower["tags"]} > {t["tag"] for t in first["tags"]}
+
+    # New contents, same name → cache miss
+    _image(path, (0, 0, 0))
+    assert not wd14.tag_paths([path], threshold=0.5, model_name="fake")[0]["cached"]
+    assert wd14.tagger_stats()["cache_hits"] == 1
+
+
+@pytest.mark.unit
+async def test_tag_images_offloads(fake, tmp_path):
+    from packages.core import executors
+    path = _image(tmp_path / "b.png", (0, 0, 255))
+    results = await wd14.tag_images([path], model_name="fake")
+    assert results[0]["tags"][0]["tag"] == "blue"
+    assert await wd14.tag_images([]) == []
+    executors.shutdown_executors()